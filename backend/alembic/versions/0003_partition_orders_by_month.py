@@ -0,0 +1,145 @@
+"""partition orders by month on order_time and add archive tables
+
+Revision ID: 0003_partition_orders_by_month
+Revises: 0002_add_order_snapshot_and_totals
+Create Date: 2026-10-19 00:00:00.000000
+"""
+from datetime import date
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0003_partition_orders_by_month'
+down_revision = '0002_add_order_snapshot_and_totals'
+branch_labels = None
+depends_on = None
+
+# Number of future monthly partitions created up front. The partition manager
+# in app/helpers/partitions.py keeps this window rolling afterwards.
+MONTHS_AHEAD = 3
+
+# Child tables whose foreign keys point at orders.id. A partitioned table can
+# only be referenced through a unique key that includes the partition column,
+# so these constraints are dropped and integrity is kept by the application.
+CHILD_FKS = [
+    ('order_items', 'order_items_order_id_fkey'),
+    ('order_steps', 'order_steps_order_id_fkey'),
+    ('payments', 'payments_order_id_fkey'),
+    ('complaints', 'complaints_order_id_fkey'),
+]
+
+
+def _add_months(d: date, months: int) -> date:
+    month_index = d.month - 1 + months
+    return date(d.year + month_index // 12, month_index % 12 + 1, 1)
+
+
+def _create_month_partitions(conn, start: date, end: date) -> None:
+    current = date(start.year, start.month, 1)
+    while current <= end:
+        upper = _add_months(current, 1)
+        name = f"orders_y{current.year:04d}m{current.month:02d}"
+        conn.execute(sa.text(
+            f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF orders "
+            f"FOR VALUES FROM ('{current.isoformat()}') TO ('{upper.isoformat()}')"
+        ))
+        current = upper
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    if conn.dialect.name != 'postgresql':
+        # Declarative partitioning is Postgres-only; other dialects keep the plain table.
+        return
+
+    relkind = conn.execute(sa.text("SELECT relkind FROM pg_class WHERE relname = 'orders'")).scalar()
+    if relkind == 'p':
+        # Already partitioned (migration re-run against a converted database).
+        return
+
+    for table, constraint in CHILD_FKS:
+        op.execute(f"ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {constraint}")
+
+    # The partition key must be NOT NULL for range routing.
+    op.execute("UPDATE orders SET order_time = now() WHERE order_time IS NULL")
+
+    op.execute("ALTER TABLE orders RENAME TO orders_unpartitioned")
+    op.execute("ALTER INDEX IF EXISTS orders_pkey RENAME TO orders_unpartitioned_pkey")
+    op.execute("DROP INDEX IF EXISTS ix_orders_id")
+    op.execute(
+        "CREATE TABLE orders (LIKE orders_unpartitioned INCLUDING DEFAULTS) "
+        "PARTITION BY RANGE (order_time)"
+    )
+    op.execute("ALTER TABLE orders ALTER COLUMN order_time SET NOT NULL")
+    op.execute("ALTER TABLE orders ADD PRIMARY KEY (id, order_time)")
+    op.execute("ALTER TABLE orders ADD FOREIGN KEY (user_id) REFERENCES users (id)")
+    op.execute("ALTER TABLE orders ADD FOREIGN KEY (canteen_id) REFERENCES canteens (id)")
+
+    # Monthly partitions covering existing history plus a few months ahead,
+    # and a default partition so out-of-range rows never fail an insert.
+    oldest = conn.execute(sa.text("SELECT min(order_time) FROM orders_unpartitioned")).scalar()
+    today = date.today()
+    start = oldest.date() if oldest is not None else today
+    _create_month_partitions(conn, start, _add_months(today, MONTHS_AHEAD))
+    op.execute("CREATE TABLE IF NOT EXISTS orders_default PARTITION OF orders DEFAULT")
+
+    op.execute("INSERT INTO orders SELECT * FROM orders_unpartitioned")
+
+    # Keep the id sequence alive when the old table is dropped.
+    op.execute("ALTER SEQUENCE orders_id_seq OWNED BY NONE")
+    op.execute("DROP TABLE orders_unpartitioned")
+    op.execute("ALTER SEQUENCE orders_id_seq OWNED BY orders.id")
+
+    # Indexes on the partitioned parent cascade to every partition.
+    op.execute("CREATE INDEX IF NOT EXISTS ix_orders_id ON orders (id)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_orders_canteen_time ON orders (canteen_id, order_time DESC)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_orders_user_time ON orders (user_id, order_time DESC)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_order_items_order_id ON order_items (order_id)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_order_steps_order_id ON order_steps (order_id)")
+
+    # Cold storage for archived orders. Rows are append-only, so pack pages fully.
+    op.execute("CREATE TABLE IF NOT EXISTS orders_archive (LIKE orders) WITH (fillfactor = 100)")
+    op.execute("ALTER TABLE orders_archive ADD PRIMARY KEY (id)")
+    op.execute("CREATE TABLE IF NOT EXISTS order_items_archive (LIKE order_items) WITH (fillfactor = 100)")
+    op.execute("ALTER TABLE order_items_archive ADD PRIMARY KEY (id)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_order_items_archive_order_id ON order_items_archive (order_id)")
+    op.execute("CREATE TABLE IF NOT EXISTS order_steps_archive (LIKE order_steps) WITH (fillfactor = 100)")
+    op.execute("ALTER TABLE order_steps_archive ADD PRIMARY KEY (id)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_order_steps_archive_order_id ON order_steps_archive (order_id)")
+
+
+def downgrade() -> None:
+    conn = op.get_bind()
+    if conn.dialect.name != 'postgresql':
+        return
+
+    relkind = conn.execute(sa.text("SELECT relkind FROM pg_class WHERE relname = 'orders'")).scalar()
+    if relkind != 'p':
+        return
+
+    # Bring archived rows back into the live tables before collapsing partitions.
+    op.execute("INSERT INTO orders SELECT * FROM orders_archive")
+    op.execute("INSERT INTO order_items SELECT * FROM order_items_archive")
+    op.execute("INSERT INTO order_steps SELECT * FROM order_steps_archive")
+    op.execute("DROP TABLE IF EXISTS order_steps_archive")
+    op.execute("DROP TABLE IF EXISTS order_items_archive")
+    op.execute("DROP TABLE IF EXISTS orders_archive")
+
+    op.execute("CREATE TABLE orders_unpartitioned (LIKE orders INCLUDING DEFAULTS)")
+    op.execute("INSERT INTO orders_unpartitioned SELECT * FROM orders")
+    op.execute("ALTER SEQUENCE orders_id_seq OWNED BY NONE")
+    op.execute("DROP TABLE orders CASCADE")
+    op.execute("ALTER TABLE orders_unpartitioned RENAME TO orders")
+    op.execute("ALTER SEQUENCE orders_id_seq OWNED BY orders.id")
+    op.execute("ALTER TABLE orders ALTER COLUMN order_time DROP NOT NULL")
+    op.execute("ALTER TABLE orders ADD PRIMARY KEY (id)")
+    op.execute("ALTER TABLE orders ADD FOREIGN KEY (user_id) REFERENCES users (id)")
+    op.execute("ALTER TABLE orders ADD FOREIGN KEY (canteen_id) REFERENCES canteens (id)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_orders_id ON orders (id)")
+
+    for table, constraint in CHILD_FKS:
+        op.execute(
+            f"ALTER TABLE {table} ADD CONSTRAINT {constraint} "
+            f"FOREIGN KEY (order_id) REFERENCES orders (id)"
+        )
@@ -0,0 +1,28 @@
+"""index payments.order_id for per-order payment lookups (order exports)
+
+Revision ID: 0005_index_payments_order_id
+Revises: 0004_add_canteen_sales_rollups
+Create Date: 2026-10-19 00:00:00.000000
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0005_index_payments_order_id'
+down_revision = '0004_add_canteen_sales_rollups'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    try:
+        op.create_index('ix_payments_order_id_created', 'payments', ['order_id', 'created_at'])
+    except Exception:
+        # Index may already exist if it was created by Base.metadata.create_all
+        pass
+
+
+def downgrade() -> None:
+    try:
+        op.drop_index('ix_payments_order_id_created', table_name='payments')
+    except Exception:
+        pass
@@ -0,0 +1,34 @@
+"""partial index for the complaint escalation job
+
+Revision ID: 0006_add_complaint_escalation_index
+Revises: 0005_index_payments_order_id
+Create Date: 2026-10-19 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0006_add_complaint_escalation_index'
+down_revision = '0005_index_payments_order_id'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    try:
+        op.create_index(
+            'ix_complaints_pending_escalation',
+            'complaints',
+            ['created_at'],
+            postgresql_where=sa.text("status <> 'resolved' AND NOT is_escalated"),
+        )
+    except Exception:
+        # Index may already exist if it was created by Base.metadata.create_all
+        pass
+
+
+def downgrade() -> None:
+    try:
+        op.drop_index('ix_complaints_pending_escalation', table_name='complaints')
+    except Exception:
+        pass
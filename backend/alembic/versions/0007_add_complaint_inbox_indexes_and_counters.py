@@ -0,0 +1,65 @@
+"""complaint inbox: keyset indexes and complaint_counters badge table
+
+Revision ID: 0007_complaint_inbox
+Revises: 0006_add_complaint_escalation_index
+Create Date: 2026-10-19 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0007_complaint_inbox'
+down_revision = '0006_add_complaint_escalation_index'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_complaints_created_id', ['created_at', 'id']),
+    ('ix_complaints_status_created_id', ['status', 'created_at', 'id']),
+    ('ix_complaints_escalated_created_id', ['is_escalated', 'created_at', 'id']),
+    ('ix_complaints_type_created_id', ['complaint_type', 'created_at', 'id']),
+    ('ix_complaints_order_id', ['order_id']),
+]
+
+
+def upgrade() -> None:
+    for name, columns in INDEXES:
+        try:
+            op.create_index(name, 'complaints', columns)
+        except Exception:
+            # Index may already exist if it was created by Base.metadata.create_all
+            pass
+
+    try:
+        op.create_table(
+            'complaint_counters',
+            sa.Column('status', sa.String(), primary_key=True),
+            sa.Column('is_escalated', sa.Boolean(), primary_key=True),
+            sa.Column('count', sa.Integer(), nullable=False, server_default=sa.text('0')),
+        )
+    except Exception:
+        pass
+
+    # Backfill from existing complaints (same SQL as rebuild_complaint_counters,
+    # inlined so the migration does not depend on app code or commit mid-run).
+    op.execute("DELETE FROM complaint_counters")
+    op.execute(
+        """
+        INSERT INTO complaint_counters (status, is_escalated, count)
+        SELECT coalesce(status, 'pending'), coalesce(is_escalated, false), count(*)
+        FROM complaints
+        GROUP BY 1, 2
+        """
+    )
+
+
+def downgrade() -> None:
+    try:
+        op.drop_table('complaint_counters')
+    except Exception:
+        pass
+    for name, _ in INDEXES:
+        try:
+            op.drop_index(name, table_name='complaints')
+        except Exception:
+            pass
@@ -0,0 +1,51 @@
+"""add payment_webhook_events queue table
+
+Revision ID: 0008_add_payment_webhook_events
+Revises: 0007_complaint_inbox
+Create Date: 2026-10-19 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0008_add_payment_webhook_events'
+down_revision = '0007_complaint_inbox'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    try:
+        op.create_table(
+            'payment_webhook_events',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('event_id', sa.String(), nullable=True, unique=True),
+            sa.Column('event_type', sa.String(), nullable=False),
+            sa.Column('razorpay_order_id', sa.String(), nullable=True),
+            sa.Column('razorpay_payment_id', sa.String(), nullable=True),
+            sa.Column('payload', sa.JSON(), nullable=False),
+            sa.Column('status', sa.String(), nullable=False, server_default='pending'),
+            sa.Column('attempts', sa.Integer(), nullable=False, server_default=sa.text('0')),
+            sa.Column('last_error', sa.String(), nullable=True),
+            sa.Column('available_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+            sa.Column('locked_at', sa.DateTime(timezone=True), nullable=True),
+            sa.Column('received_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+            sa.Column('processed_at', sa.DateTime(timezone=True), nullable=True),
+        )
+        op.create_index(
+            'ix_payment_webhook_events_queue',
+            'payment_webhook_events',
+            ['available_at', 'id'],
+            postgresql_where=sa.text("status IN ('pending', 'processing')"),
+        )
+    except Exception:
+        # Table may already exist if it was created by Base.metadata.create_all
+        pass
+
+
+def downgrade() -> None:
+    try:
+        op.drop_index('ix_payment_webhook_events_queue', table_name='payment_webhook_events')
+        op.drop_table('payment_webhook_events')
+    except Exception:
+        pass
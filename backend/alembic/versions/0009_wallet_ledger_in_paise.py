@@ -0,0 +1,87 @@
+"""wallet ledger: integer paise, ledger entry kinds/idempotency keys, balance snapshots
+
+Revision ID: 0009_wallet_ledger_in_paise
+Revises: 0008_add_payment_webhook_events
+Create Date: 2026-10-19 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0009_wallet_ledger_in_paise'
+down_revision = '0008_add_payment_webhook_events'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    try:
+        # Rupee floats -> integer paise.
+        op.execute("ALTER TABLE user_wallets ALTER COLUMN balance TYPE BIGINT USING round(coalesce(balance, 0) * 100)::bigint")
+        op.execute("ALTER TABLE user_wallets RENAME COLUMN balance TO balance_paise")
+        op.execute("ALTER TABLE user_wallets ALTER COLUMN credit_limit TYPE BIGINT USING round(coalesce(credit_limit, 0) * 100)::bigint")
+        op.execute("ALTER TABLE user_wallets RENAME COLUMN credit_limit TO credit_limit_paise")
+        for column in ('balance_paise', 'credit_limit_paise'):
+            op.alter_column('user_wallets', column, nullable=False, server_default=sa.text('0'))
+        op.create_check_constraint(
+            'ck_user_wallets_within_credit_limit', 'user_wallets', 'balance_paise + credit_limit_paise >= 0'
+        )
+
+        op.execute("ALTER TABLE wallet_transactions ALTER COLUMN amount TYPE BIGINT USING round(amount * 100)::bigint")
+        op.execute("ALTER TABLE wallet_transactions RENAME COLUMN amount TO amount_paise")
+        op.add_column('wallet_transactions', sa.Column('kind', sa.String(), nullable=True))
+        op.execute("UPDATE wallet_transactions SET kind = CASE WHEN amount_paise < 0 THEN 'debit' ELSE 'credit' END")
+        op.alter_column('wallet_transactions', 'kind', nullable=False)
+        op.add_column('wallet_transactions', sa.Column('idempotency_key', sa.String(), nullable=True, unique=True))
+        op.create_index('ix_wallet_transactions_wallet_id_id', 'wallet_transactions', ['wallet_id', 'id'])
+
+        # Balances were never backed by ledger rows; open each wallet's ledger
+        # with the difference so that balance == sum(entries) from here on.
+        op.execute(
+            """
+            INSERT INTO wallet_transactions (wallet_id, amount_paise, kind, description, created_at)
+            SELECT w.id, w.balance_paise - coalesce(sum(t.amount_paise), 0), 'adjustment', 'Opening balance', now()
+            FROM user_wallets w LEFT JOIN wallet_transactions t ON t.wallet_id = w.id
+            GROUP BY w.id, w.balance_paise
+            HAVING w.balance_paise <> coalesce(sum(t.amount_paise), 0)
+            """
+        )
+    except Exception:
+        # Columns may already be in the new shape if created by Base.metadata.create_all
+        pass
+
+    try:
+        op.create_table(
+            'wallet_balance_snapshots',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('wallet_id', sa.Integer(), sa.ForeignKey('user_wallets.id', ondelete='CASCADE'), nullable=False),
+            sa.Column('balance_paise', sa.BigInteger(), nullable=False),
+            sa.Column('last_entry_id', sa.Integer(), nullable=False),
+            sa.Column('taken_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        )
+        op.create_index(
+            'ix_wallet_balance_snapshots_wallet_taken', 'wallet_balance_snapshots', ['wallet_id', 'taken_at']
+        )
+    except Exception:
+        pass
+
+
+def downgrade() -> None:
+    try:
+        op.drop_index('ix_wallet_balance_snapshots_wallet_taken', table_name='wallet_balance_snapshots')
+        op.drop_table('wallet_balance_snapshots')
+    except Exception:
+        pass
+    try:
+        op.drop_index('ix_wallet_transactions_wallet_id_id', table_name='wallet_transactions')
+        op.drop_column('wallet_transactions', 'idempotency_key')
+        op.drop_column('wallet_transactions', 'kind')
+        op.execute("ALTER TABLE wallet_transactions RENAME COLUMN amount_paise TO amount")
+        op.execute("ALTER TABLE wallet_transactions ALTER COLUMN amount TYPE DOUBLE PRECISION USING amount / 100.0")
+        op.drop_constraint('ck_user_wallets_within_credit_limit', 'user_wallets', type_='check')
+        op.execute("ALTER TABLE user_wallets RENAME COLUMN balance_paise TO balance")
+        op.execute("ALTER TABLE user_wallets ALTER COLUMN balance TYPE DOUBLE PRECISION USING balance / 100.0")
+        op.execute("ALTER TABLE user_wallets RENAME COLUMN credit_limit_paise TO credit_limit")
+        op.execute("ALTER TABLE user_wallets ALTER COLUMN credit_limit TYPE DOUBLE PRECISION USING credit_limit / 100.0")
+    except Exception:
+        pass
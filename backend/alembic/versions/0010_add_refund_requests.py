@@ -0,0 +1,56 @@
+"""add refund_requests queue table
+
+Revision ID: 0010_add_refund_requests
+Revises: 0009_wallet_ledger_in_paise
+Create Date: 2026-10-19 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '0010_add_refund_requests'
+down_revision = '0009_wallet_ledger_in_paise'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    try:
+        op.create_table(
+            'refund_requests',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('payment_id', sa.Integer(), sa.ForeignKey('payments.id'), nullable=False, unique=True),
+            sa.Column('order_id', sa.Integer(), nullable=False),
+            sa.Column('merchant_id', sa.Integer(), sa.ForeignKey('merchants.id'), nullable=False),
+            # Reuses the enum type created for payments.payment_method.
+            sa.Column('payment_method', postgresql.ENUM(name='paymentmethod', create_type=False), nullable=False),
+            sa.Column('amount_paise', sa.BigInteger(), nullable=False),
+            sa.Column('reason', sa.String(), nullable=True),
+            sa.Column('requested_by', sa.String(), nullable=True),
+            sa.Column('status', sa.String(), nullable=False, server_default='pending'),
+            sa.Column('attempts', sa.Integer(), nullable=False, server_default=sa.text('0')),
+            sa.Column('last_error', sa.String(), nullable=True),
+            sa.Column('processor_refund_id', sa.String(), nullable=True),
+            sa.Column('available_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+            sa.Column('locked_at', sa.DateTime(timezone=True), nullable=True),
+            sa.Column('created_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+            sa.Column('processed_at', sa.DateTime(timezone=True), nullable=True),
+        )
+        op.create_index(
+            'ix_refund_requests_queue',
+            'refund_requests',
+            ['available_at', 'id'],
+            postgresql_where=sa.text("status IN ('pending', 'processing')"),
+        )
+    except Exception:
+        # Table may already exist if it was created by Base.metadata.create_all
+        pass
+
+
+def downgrade() -> None:
+    try:
+        op.drop_index('ix_refund_requests_queue', table_name='refund_requests')
+        op.drop_table('refund_requests')
+    except Exception:
+        pass
@@ -0,0 +1,43 @@
+"""add refresh_token_families for refresh-token rotation
+
+Revision ID: 0011_refresh_token_families
+Revises: 0010_add_refund_requests
+Create Date: 2026-10-19 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0011_refresh_token_families'
+down_revision = '0010_add_refund_requests'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    try:
+        op.create_table(
+            'refresh_token_families',
+            sa.Column('id', sa.String(length=32), primary_key=True),
+            sa.Column('user_id', sa.String(), sa.ForeignKey('users.id', ondelete='CASCADE'), nullable=False),
+            sa.Column('current_jti', sa.String(length=32), nullable=False),
+            sa.Column('previous_jti', sa.String(length=32), nullable=True),
+            sa.Column('created_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+            sa.Column('rotated_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+            sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+            sa.Column('revoked_at', sa.DateTime(timezone=True), nullable=True),
+        )
+        op.create_index('ix_refresh_token_families_user_id', 'refresh_token_families', ['user_id'])
+        op.create_index('ix_refresh_token_families_expires_at', 'refresh_token_families', ['expires_at'])
+    except Exception:
+        # Table may already exist if it was created by Base.metadata.create_all
+        pass
+
+
+def downgrade() -> None:
+    try:
+        op.drop_index('ix_refresh_token_families_expires_at', table_name='refresh_token_families')
+        op.drop_index('ix_refresh_token_families_user_id', table_name='refresh_token_families')
+        op.drop_table('refresh_token_families')
+    except Exception:
+        pass
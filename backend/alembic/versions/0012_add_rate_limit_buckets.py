@@ -0,0 +1,37 @@
+"""add rate_limit_buckets for the shared rate limiter backend
+
+Revision ID: 0012_rate_limit_buckets
+Revises: 0011_refresh_token_families
+Create Date: 2026-10-19 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0012_rate_limit_buckets'
+down_revision = '0011_refresh_token_families'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    try:
+        op.create_table(
+            'rate_limit_buckets',
+            sa.Column('key', sa.String(), primary_key=True),
+            sa.Column('tokens', sa.Float(), nullable=False),
+            sa.Column('allowed', sa.Boolean(), nullable=False, server_default=sa.true()),
+            sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        )
+        op.create_index('ix_rate_limit_buckets_updated_at', 'rate_limit_buckets', ['updated_at'])
+    except Exception:
+        # Table may already exist if it was created by Base.metadata.create_all
+        pass
+
+
+def downgrade() -> None:
+    try:
+        op.drop_index('ix_rate_limit_buckets_updated_at', table_name='rate_limit_buckets')
+        op.drop_table('rate_limit_buckets')
+    except Exception:
+        pass
@@ -0,0 +1,25 @@
+"""backfill complaints.created_at for rows created before it had a default
+
+Revision ID: 0013_complaint_created_at
+Revises: 0012_rate_limit_buckets
+Create Date: 2026-10-19 00:00:00.000000
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0013_complaint_created_at'
+down_revision = '0012_rate_limit_buckets'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # The inbox skips complaints without a creation time; give legacy rows the best one available.
+    op.execute(
+        "UPDATE complaints SET created_at = coalesce(updated_at, now()) WHERE created_at IS NULL"
+    )
+
+
+def downgrade() -> None:
+    # The original NULLs are not recorded; nothing to undo.
+    pass
@@ -0,0 +1,103 @@
+"""partition order_items by month alongside orders
+
+Revision ID: 0014_partition_order_items
+Revises: 0013_complaint_created_at
+Create Date: 2026-10-19 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0014_partition_order_items'
+down_revision = '0013_complaint_created_at'
+branch_labels = None
+depends_on = None
+
+
+def _relkind(conn, table: str):
+    return conn.execute(sa.text("SELECT relkind FROM pg_class WHERE relname = :t"), {"t": table}).scalar()
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    if conn.dialect.name != 'postgresql':
+        # Declarative partitioning is Postgres-only; other dialects keep the plain table.
+        return
+    if _relkind(conn, 'orders') != 'p' or _relkind(conn, 'order_items') == 'p':
+        # Orders not partitioned (0003 skipped) or items already converted.
+        return
+
+    # Items are partitioned on a copy of their order's order_time, with the
+    # same monthly bounds as orders, so both move and drop month by month.
+    op.execute("ALTER TABLE order_items RENAME TO order_items_unpartitioned")
+    op.execute("ALTER INDEX IF EXISTS order_items_pkey RENAME TO order_items_unpartitioned_pkey")
+    op.execute("DROP INDEX IF EXISTS ix_order_items_id")
+    op.execute("DROP INDEX IF EXISTS ix_order_items_order_id")
+    op.execute(
+        "CREATE TABLE order_items (LIKE order_items_unpartitioned INCLUDING DEFAULTS, "
+        "order_time timestamptz NOT NULL) PARTITION BY RANGE (order_time)"
+    )
+    op.execute("ALTER TABLE order_items ADD PRIMARY KEY (id, order_time)")
+    op.execute("ALTER TABLE order_items ADD FOREIGN KEY (item_id) REFERENCES menu_items (id)")
+
+    # Mirror every partition of orders (monthly ones and the default).
+    partitions = conn.execute(sa.text(
+        "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = 'orders'"
+    )).all()
+    for name, bound in partitions:
+        if not name.startswith('orders_'):
+            continue
+        op.execute(f"CREATE TABLE IF NOT EXISTS order_items_{name[len('orders_'):]} PARTITION OF order_items {bound}")
+
+    # Lines whose order no longer exists keep a timestamp so they still route.
+    op.execute(
+        "INSERT INTO order_items "
+        "SELECT oi.*, coalesce(o.order_time, now()) FROM order_items_unpartitioned oi "
+        "LEFT JOIN orders o ON o.id = oi.order_id"
+    )
+
+    # Keep the id sequence alive when the old table is dropped.
+    op.execute("ALTER SEQUENCE order_items_id_seq OWNED BY NONE")
+    op.execute("DROP TABLE order_items_unpartitioned")
+    op.execute("ALTER SEQUENCE order_items_id_seq OWNED BY order_items.id")
+
+    op.execute("CREATE INDEX IF NOT EXISTS ix_order_items_id ON order_items (id)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_order_items_order_id ON order_items (order_id)")
+
+    # Archived lines carry the same column so the archive move stays a plain copy.
+    op.execute("ALTER TABLE order_items_archive ADD COLUMN IF NOT EXISTS order_time timestamptz")
+    op.execute(
+        "UPDATE order_items_archive oi SET order_time = o.order_time "
+        "FROM orders_archive o WHERE o.id = oi.order_id AND oi.order_time IS NULL"
+    )
+
+
+def downgrade() -> None:
+    conn = op.get_bind()
+    if conn.dialect.name != 'postgresql':
+        return
+    if _relkind(conn, 'order_items') != 'p':
+        return
+
+    op.execute("ALTER TABLE order_items_archive DROP COLUMN IF EXISTS order_time")
+
+    op.execute("CREATE TABLE order_items_unpartitioned (LIKE order_items INCLUDING DEFAULTS)")
+    op.execute("ALTER TABLE order_items_unpartitioned DROP COLUMN order_time")
+    cols = ", ".join(
+        row[0] for row in conn.execute(sa.text(
+            "SELECT column_name FROM information_schema.columns "
+            "WHERE table_name = 'order_items_unpartitioned' ORDER BY ordinal_position"
+        ))
+    )
+    op.execute(f"INSERT INTO order_items_unpartitioned ({cols}) SELECT {cols} FROM order_items")
+    op.execute("ALTER SEQUENCE order_items_id_seq OWNED BY NONE")
+    op.execute("DROP TABLE order_items CASCADE")
+    op.execute("ALTER TABLE order_items_unpartitioned RENAME TO order_items")
+    op.execute("ALTER SEQUENCE order_items_id_seq OWNED BY order_items.id")
+    op.execute("ALTER TABLE order_items ADD PRIMARY KEY (id)")
+    op.execute("ALTER TABLE order_items ADD FOREIGN KEY (item_id) REFERENCES menu_items (id)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_order_items_id ON order_items (id)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_order_items_order_id ON order_items (order_id)")
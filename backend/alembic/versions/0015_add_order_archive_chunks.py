@@ -0,0 +1,82 @@
+"""add compressed order_archive_chunks cold tier
+
+Revision ID: 0015_order_archive_chunks
+Revises: 0014_partition_order_items
+Create Date: 2026-10-19 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0015_order_archive_chunks'
+down_revision = '0014_partition_order_items'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    if conn.dialect.name != 'postgresql':
+        # Chunks rely on jsonb, integer[] and GIN; other dialects skip the cold tier.
+        return
+
+    # One row per (canteen, month, slice) of frozen orders: the orders with
+    # their items and steps as a single jsonb array, which TOAST stores
+    # compressed, plus the order ids for point lookups. Each element is an
+    # orders_archive row (with "items" and "steps" arrays of archive rows), so
+    # readers decode it with jsonb_populate_record(NULL::orders_archive, ...).
+    # Append-only.
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS order_archive_chunks (
+            id bigserial PRIMARY KEY,
+            canteen_id integer NOT NULL,
+            month_start timestamptz NOT NULL,
+            month_end timestamptz NOT NULL,
+            order_count integer NOT NULL,
+            order_ids integer[] NOT NULL,
+            orders jsonb NOT NULL
+        ) WITH (fillfactor = 100)
+        """
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_order_archive_chunks_canteen_month "
+        "ON order_archive_chunks (canteen_id, month_start)"
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_order_archive_chunks_order_ids "
+        "ON order_archive_chunks USING gin (order_ids)"
+    )
+
+    # lz4 compresses and decompresses much faster than the default pglz; use
+    # it when the server was built with it (Postgres 14+).
+    has_lz4 = conn.execute(sa.text(
+        "SELECT 'lz4' = ANY(enumvals) FROM pg_settings WHERE name = 'default_toast_compression'"
+    )).scalar()
+    if has_lz4:
+        op.execute("ALTER TABLE order_archive_chunks ALTER COLUMN orders SET COMPRESSION lz4")
+
+
+def downgrade() -> None:
+    conn = op.get_bind()
+    if conn.dialect.name != 'postgresql':
+        return
+
+    # Thaw frozen orders back into the archive tables before dropping the tier.
+    frozen = (
+        "FROM order_archive_chunks c "
+        "CROSS JOIN LATERAL jsonb_array_elements(c.orders) d "
+    )
+    op.execute(
+        "INSERT INTO orders_archive SELECT o.* " + frozen +
+        "CROSS JOIN LATERAL jsonb_populate_record(NULL::orders_archive, d) o"
+    )
+    op.execute(
+        "INSERT INTO order_items_archive SELECT i.* " + frozen +
+        "CROSS JOIN LATERAL jsonb_populate_recordset(NULL::order_items_archive, d->'items') i"
+    )
+    op.execute(
+        "INSERT INTO order_steps_archive SELECT s.* " + frozen +
+        "CROSS JOIN LATERAL jsonb_populate_recordset(NULL::order_steps_archive, d->'steps') s"
+    )
+    op.execute("DROP TABLE IF EXISTS order_archive_chunks")
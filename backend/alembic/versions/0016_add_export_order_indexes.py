@@ -0,0 +1,31 @@
+"""index order_time on orders and orders_archive for ordered export scans
+
+Revision ID: 0016_export_order_indexes
+Revises: 0015_order_archive_chunks
+Create Date: 2026-10-19 00:00:00.000000
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0016_export_order_indexes'
+down_revision = '0015_order_archive_chunks'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Exports read each tier in order_time order; these let the archive (and
+    # the all-canteens live scan) walk an index instead of sorting the range.
+    # ix_orders_canteen_time already covers per-canteen live exports.
+    op.execute("CREATE INDEX IF NOT EXISTS ix_orders_time ON orders (order_time, id)")
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_orders_archive_canteen_time "
+        "ON orders_archive (canteen_id, order_time)"
+    )
+    op.execute("CREATE INDEX IF NOT EXISTS ix_orders_archive_time ON orders_archive (order_time, id)")
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_orders_archive_time")
+    op.execute("DROP INDEX IF EXISTS ix_orders_archive_canteen_time")
+    op.execute("DROP INDEX IF EXISTS ix_orders_time")
@@ -0,0 +1,25 @@
+"""require an event id on payment_webhook_events
+
+Revision ID: 0017_webhook_event_id
+Revises: 0016_export_order_indexes
+Create Date: 2026-10-19 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0017_webhook_event_id'
+down_revision = '0016_export_order_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # NULLs never conflict, so id-less events slipped past deduplication.
+    # Give any already queued ones a unique placeholder before tightening.
+    op.execute("UPDATE payment_webhook_events SET event_id = 'missing_' || id WHERE event_id IS NULL")
+    op.alter_column('payment_webhook_events', 'event_id', existing_type=sa.String(), nullable=False)
+
+
+def downgrade() -> None:
+    op.alter_column('payment_webhook_events', 'event_id', existing_type=sa.String(), nullable=True)
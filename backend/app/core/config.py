@@ -9,8 +9,24 @@ SECRET_KEY = os.getenv("SECRET_KEY", "28e51044f4a9cbae2bbd3d8a9d8c902ad1455d4220
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "15"))
 REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "7"))
+# How long the refresh token rotated away last stays usable (concurrent refreshes from one browser)
+REFRESH_REUSE_GRACE_SECONDS = int(os.getenv("REFRESH_REUSE_GRACE_SECONDS", "30"))
+# Verified tokens kept in memory per worker (see decode_token)
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "4096"))
+# How long other workers may keep a stale canteen ownership/staff index (see app/helpers/authz.py)
+AUTHZ_CACHE_TTL_SECONDS = float(os.getenv("AUTHZ_CACHE_TTL_SECONDS", "60"))
+
+# CAS ticket validation (see app/helpers/cas_auth.py)
+CAS_POOL_SIZE = int(os.getenv("CAS_POOL_SIZE", "16"))
+CAS_CONNECT_TIMEOUT_SECONDS = float(os.getenv("CAS_CONNECT_TIMEOUT_SECONDS", "3"))
+CAS_READ_TIMEOUT_SECONDS = float(os.getenv("CAS_READ_TIMEOUT_SECONDS", "5"))
 JWT_SECRET = os.getenv("JWT_SECRET", "a31fe9656fc8d3a459e623dc8204e6d0268f8df56d734dac3ca3262edb5db883")
 
+# Password hashing (see app/helpers/passwords.py)
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(2, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", str(max(1, PASSWORD_HASH_WORKERS) * 16)))
+
 # Database Configuration
 DATABASE_URL = os.getenv("DATABASE_URL")
 DB_USER = os.getenv("DB_USER")
@@ -24,3 +40,47 @@ ENVIRONMENT = os.getenv("ENVIRONMENT", "development")
 
 # CORS
 FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:5173")
+
+# GraphQL rate limiting and admission control (see app/helpers/rate_limit.py)
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() not in ("0", "false", "no")
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")  # memory | postgres
+RATE_LIMIT_CAPACITY = float(os.getenv("RATE_LIMIT_CAPACITY", "60"))
+RATE_LIMIT_REFILL_PER_SECOND = float(os.getenv("RATE_LIMIT_REFILL_PER_SECOND", "2"))
+# Behind nginx every request comes from the proxy, which sets X-Real-IP to the
+# client address. The header is only believed from these peers (comma-separated
+# addresses or CIDRs, e.g. the proxy's network); by default it is ignored, as
+# anyone reaching the API directly could set it.
+RATE_LIMIT_TRUSTED_PROXIES = [p.strip() for p in os.getenv("RATE_LIMIT_TRUSTED_PROXIES", "").split(",") if p.strip()]
+# The DB pool holds 7 connections (pool_size=5, max_overflow=2); keep one spare.
+GRAPHQL_MAX_CONCURRENCY = int(os.getenv("GRAPHQL_MAX_CONCURRENCY", "6"))
+GRAPHQL_MAX_QUEUED = int(os.getenv("GRAPHQL_MAX_QUEUED", "32"))
+GRAPHQL_QUEUE_TIMEOUT_SECONDS = float(os.getenv("GRAPHQL_QUEUE_TIMEOUT_SECONDS", "2"))
+
+# GraphQL query cost and depth limits (see app/helpers/query_cost.py)
+GRAPHQL_MAX_DEPTH = int(os.getenv("GRAPHQL_MAX_DEPTH", "8"))
+QUERY_COST_LIMIT = float(os.getenv("QUERY_COST_LIMIT", "20000"))
+QUERY_COST_THROTTLE_THRESHOLD = float(os.getenv("QUERY_COST_THROTTLE_THRESHOLD", "8000"))
+QUERY_COST_PER_TOKEN = float(os.getenv("QUERY_COST_PER_TOKEN", "1000"))
+QUERY_COST_LOG_THRESHOLD = float(os.getenv("QUERY_COST_LOG_THRESHOLD", "8000"))
+
+# Prometheus metrics at /metrics (see app/helpers/metrics.py)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() not in ("0", "false", "no")
+# Per metric; label values beyond this (e.g. client-chosen operation names) are recorded as "other".
+METRICS_MAX_SERIES = int(os.getenv("METRICS_MAX_SERIES", "200"))
+
+# Persisted GraphQL queries (see app/helpers/persisted_queries.py)
+PERSISTED_QUERIES_MANIFEST = os.getenv(
+    "PERSISTED_QUERIES_MANIFEST",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "persisted_queries.json"),
+)
+PERSISTED_QUERIES_APQ_ENABLED = os.getenv("PERSISTED_QUERIES_APQ_ENABLED", "true").lower() not in ("0", "false", "no")
+PERSISTED_QUERIES_APQ_SIZE = int(os.getenv("PERSISTED_QUERIES_APQ_SIZE", "1000"))
+GRAPHQL_DOCUMENT_CACHE_SIZE = int(os.getenv("GRAPHQL_DOCUMENT_CACHE_SIZE", "512"))
+# How long nginx and browsers may reuse public persisted GET responses (canteen and menu listings).
+PUBLIC_QUERY_MAX_AGE_SECONDS = int(os.getenv("PUBLIC_QUERY_MAX_AGE_SECONDS", "30"))
+# Serialized public catalog responses (see app/helpers/response_cache.py)
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "512"))
+# Bounds how stale other workers may be after a canteen or menu mutation.
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "30"))
+# Most operations accepted in one array-batched POST to /api/graphql.
+GRAPHQL_BATCH_MAX_OPERATIONS = int(os.getenv("GRAPHQL_BATCH_MAX_OPERATIONS", "10"))
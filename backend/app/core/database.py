@@ -1,11 +1,15 @@
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 import time
 import logging
 import os
 from dotenv import load_dotenv
 
+from app.core.config import METRICS_ENABLED
+from app.helpers.metrics import InstrumentedQueuePool, instrument_engine
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -34,6 +38,10 @@ if not os.getenv("DATABASE_URL"):
 
 logger.info(f"Connecting to database at: {SQLALCHEMY_DATABASE_URL.split('@')[1] if '@' in SQLALCHEMY_DATABASE_URL else 'unknown'}")
 
+# With metrics on, the pool also records checkout waits for /metrics; with
+# metrics off it is a plain QueuePool, and nothing is instrumented.
+poolclass = InstrumentedQueuePool if METRICS_ENABLED else QueuePool
+
 # Create SQLAlchemy engine with connection pooling optimized for Supabase
 # Supabase free tier has connection limits, so we use conservative pool settings
 engine = create_engine(
@@ -42,12 +50,16 @@ engine = create_engine(
     pool_recycle=300,    # Recycle connections after 5 minutes (important for Supabase)
     pool_size=5,         # Maximum number of connections to keep in pool (conservative for free tier)
     max_overflow=2,      # Allow up to 2 connections beyond pool_size if needed
+    poolclass=poolclass,
     connect_args={
         "connect_timeout": 10,  # 10 second connection timeout
         "options": "-c timezone=utc"  # Set timezone to UTC
     }
 )
 
+if METRICS_ENABLED:
+    instrument_engine(engine)
+
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -0,0 +1,267 @@
+"""
+Vectorized sales analytics over order lines.
+
+Order lines are streamed from Postgres with a server-side cursor in fixed-size
+chunks, turned into NumPy column arrays and folded into a `SalesAccumulator`.
+The accumulator only keeps fixed-size state (per-item totals, a 7x24 heatmap,
+a per-bucket series and a log-spaced basket histogram), so memory use depends
+on the chunk size and the menu, not on how many lines are scanned.
+
+A synthetic benchmark with a memory budget (no database needed) lives in
+bench/analytics.py.
+"""
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.helpers.partitions import FROZEN_ITEMS_JOIN, FROZEN_ORDERS_FROM
+
+# IST is a fixed UTC+05:30 offset (no DST), so local buckets are plain arithmetic.
+IST_OFFSET_SECONDS = 5 * 3600 + 30 * 60
+GRANULARITY_SECONDS = {"hour": 3600, "day": 86400}
+MAX_SERIES_BUCKETS = 24 * 400
+DEFAULT_CHUNK_SIZE = 50_000
+
+# Basket values are histogrammed into log-spaced bins between 1 and 100,000 rupees.
+# Adjacent edges differ by ~1.1%, which bounds the percentile error.
+BASKET_BIN_EDGES = np.geomspace(1.0, 100_000.0, 1025)
+
+# Columns streamed per order line, in this order. Rows are sorted by order id so
+# every order's lines are contiguous (an order may straddle two chunks). The
+# live branch filters on both tables' `order_time` so both prune partitions;
+# the frozen branch skips chunks of other canteens and months.
+_ORDER_LINES_SQL = """
+    SELECT oi.order_id,
+           oi.item_id,
+           oi.quantity,
+           (coalesce(oi.snapshot_price, mi.price, 0) * oi.quantity)::float8 AS line_total,
+           extract(epoch FROM o.order_time)::bigint AS order_epoch
+    FROM order_items oi
+    JOIN orders o ON o.id = oi.order_id
+    LEFT JOIN menu_items mi ON mi.id = oi.item_id
+    WHERE o.canteen_id = :canteen_id
+      AND o.order_time >= :start AND o.order_time < :end
+      AND oi.order_time >= :start AND oi.order_time < :end
+      AND o.status <> 'cancelled'
+    UNION ALL
+    SELECT oi.order_id,
+           oi.item_id,
+           oi.quantity,
+           (coalesce(oi.snapshot_price, 0) * oi.quantity)::float8,
+           extract(epoch FROM o.order_time)::bigint
+    FROM order_items_archive oi
+    JOIN orders_archive o ON o.id = oi.order_id
+    WHERE o.canteen_id = :canteen_id
+      AND o.order_time >= :start AND o.order_time < :end
+      AND o.status <> 'cancelled'
+    UNION ALL
+    SELECT oi.order_id,
+           oi.item_id,
+           oi.quantity,
+           (coalesce(oi.snapshot_price, 0) * oi.quantity)::float8,
+           extract(epoch FROM o.order_time)::bigint
+    FROM """ + FROZEN_ORDERS_FROM + """
+    CROSS JOIN """ + FROZEN_ITEMS_JOIN + """
+    WHERE c.canteen_id = :canteen_id
+      AND c.month_end > :start AND c.month_start < :end
+      AND o.order_time >= :start AND o.order_time < :end
+      AND o.status <> 'cancelled'
+    ORDER BY 1
+"""
+
+
+@dataclass
+class SalesSummary:
+    """Plain result of a `SalesAccumulator`, converted to GraphQL types by the resolver."""
+    total_orders: int
+    total_items: int
+    gross_revenue: float
+    average_basket_value: float
+    average_basket_size: float
+    basket_percentiles: Dict[str, float]
+    top_items: List[Tuple[int, int, float]]  # (item_id, quantity, revenue)
+    heatmap: List[List[int]]
+    series: List[Tuple[datetime, int, int, float]]  # (bucket_start, orders, items, revenue)
+
+
+@dataclass
+class SalesAccumulator:
+    """
+    Folds chunks of order-line columns into fixed-size aggregates.
+
+    Chunks must arrive sorted by order id. The trailing order of each chunk is
+    held back and prepended to the next one so per-order totals (basket value
+    and size) are never split.
+    """
+    start_epoch: int
+    end_epoch: int
+    granularity: str = "day"
+    top_n: int = 10
+
+    total_orders: int = field(default=0, init=False)
+    total_items: int = field(default=0, init=False)
+    gross_revenue: float = field(default=0.0, init=False)
+    _item_totals: Dict[int, List[float]] = field(default_factory=dict, init=False)
+    _heatmap: np.ndarray = field(default_factory=lambda: np.zeros(7 * 24, dtype=np.int64), init=False)
+    _basket_hist: np.ndarray = field(default_factory=lambda: np.zeros(len(BASKET_BIN_EDGES) + 1, dtype=np.int64), init=False)
+    _carry: Optional[Tuple[np.ndarray, ...]] = field(default=None, init=False)
+
+    def __post_init__(self):
+        if self.granularity not in GRANULARITY_SECONDS:
+            raise ValueError("granularity must be 'hour' or 'day'.")
+        self._bucket_size = GRANULARITY_SECONDS[self.granularity]
+        local_start = self.start_epoch + IST_OFFSET_SECONDS
+        self._series_origin = local_start - (local_start % self._bucket_size)
+        n_buckets = -(-(self.end_epoch + IST_OFFSET_SECONDS - self._series_origin) // self._bucket_size)
+        if n_buckets > MAX_SERIES_BUCKETS:
+            raise ValueError(f"Range too large for '{self.granularity}' granularity ({n_buckets} buckets).")
+        self._series_orders = np.zeros(max(n_buckets, 1), dtype=np.int64)
+        self._series_items = np.zeros(max(n_buckets, 1), dtype=np.int64)
+        self._series_revenue = np.zeros(max(n_buckets, 1), dtype=np.float64)
+
+    def add_chunk(
+        self,
+        order_ids: np.ndarray,
+        item_ids: np.ndarray,
+        quantities: np.ndarray,
+        line_totals: np.ndarray,
+        order_epochs: np.ndarray,
+    ) -> None:
+        """Adds one chunk of order lines (parallel 1-D arrays, sorted by order id)."""
+        if self._carry is not None:
+            order_ids, item_ids, quantities, line_totals, order_epochs = (
+                np.concatenate((c, a)) for c, a in zip(self._carry, (order_ids, item_ids, quantities, line_totals, order_epochs))
+            )
+            self._carry = None
+        if len(order_ids) == 0:
+            return
+
+        # Hold back the last order; its remaining lines may be in the next chunk.
+        cut = int(np.searchsorted(order_ids, order_ids[-1], side="left"))
+        self._carry = (order_ids[cut:], item_ids[cut:], quantities[cut:], line_totals[cut:], order_epochs[cut:])
+        if cut:
+            self._fold(order_ids[:cut], item_ids[:cut], quantities[:cut], line_totals[:cut], order_epochs[:cut])
+
+    def finish(self) -> SalesSummary:
+        """Flushes the held-back order and returns the aggregated summary."""
+        if self._carry is not None and len(self._carry[0]):
+            self._fold(*self._carry)
+        self._carry = None
+
+        orders = self.total_orders
+        top = sorted(self._item_totals.items(), key=lambda kv: kv[1][0], reverse=True)[: self.top_n]
+        series = [
+            (
+                datetime.fromtimestamp(int(self._series_origin + i * self._bucket_size - IST_OFFSET_SECONDS), tz=timezone.utc),
+                int(self._series_orders[i]),
+                int(self._series_items[i]),
+                float(self._series_revenue[i]),
+            )
+            for i in range(len(self._series_orders))
+        ]
+        return SalesSummary(
+            total_orders=orders,
+            total_items=self.total_items,
+            gross_revenue=self.gross_revenue,
+            average_basket_value=self.gross_revenue / orders if orders else 0.0,
+            average_basket_size=self.total_items / orders if orders else 0.0,
+            basket_percentiles={q: self._basket_percentile(p) for q, p in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99))},
+            top_items=[(item_id, int(qty), float(rev)) for item_id, (qty, rev) in top],
+            heatmap=self._heatmap.reshape(7, 24).tolist(),
+            series=series,
+        )
+
+    def _fold(self, order_ids, item_ids, quantities, line_totals, order_epochs) -> None:
+        quantities = quantities.astype(np.int64, copy=False)
+        self.total_items += int(quantities.sum())
+        self.gross_revenue += float(line_totals.sum())
+
+        # Per-item totals: group within the chunk, then merge into the (menu-sized) dict.
+        uniq_items, inverse = np.unique(item_ids, return_inverse=True)
+        item_qty = np.bincount(inverse, weights=quantities)
+        item_rev = np.bincount(inverse, weights=line_totals)
+        for item_id, qty, rev in zip(uniq_items.tolist(), item_qty.tolist(), item_rev.tolist()):
+            totals = self._item_totals.setdefault(item_id, [0.0, 0.0])
+            totals[0] += qty
+            totals[1] += rev
+
+        # Weekday x hour heatmap in IST. 1970-01-01 was a Thursday (Mon=0 -> 3).
+        local = order_epochs + IST_OFFSET_SECONDS
+        slot = ((local // 86400 + 3) % 7) * 24 + (local // 3600) % 24
+        self._heatmap += np.bincount(slot, weights=quantities, minlength=7 * 24).astype(np.int64)
+
+        # Per-order totals: lines of an order are contiguous, so reduce at boundaries.
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(order_ids)) + 1))
+        basket_values = np.add.reduceat(line_totals, starts)
+        basket_items = np.add.reduceat(quantities, starts)
+        self.total_orders += len(starts)
+        self._basket_hist += np.bincount(
+            np.searchsorted(BASKET_BIN_EDGES, basket_values, side="right"),
+            minlength=len(self._basket_hist),
+        )
+
+        bucket = (local[starts] - self._series_origin) // self._bucket_size
+        bucket = np.clip(bucket, 0, len(self._series_orders) - 1)
+        n = len(self._series_orders)
+        self._series_orders += np.bincount(bucket, minlength=n)
+        self._series_items += np.bincount(bucket, weights=basket_items, minlength=n).astype(np.int64)
+        self._series_revenue += np.bincount(bucket, weights=basket_values, minlength=n)
+
+    def _basket_percentile(self, q: float) -> float:
+        total = int(self._basket_hist.sum())
+        if total == 0:
+            return 0.0
+        idx = int(np.searchsorted(np.cumsum(self._basket_hist), q * total, side="left"))
+        # Bin i holds values in [edges[i-1], edges[i]); report the upper edge.
+        idx = min(max(idx, 0), len(BASKET_BIN_EDGES) - 1)
+        return float(BASKET_BIN_EDGES[idx]) if idx > 0 else 0.0
+
+
+def stream_order_line_chunks(
+    db: Session,
+    canteen_id: int,
+    start: datetime,
+    end: datetime,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Iterator[Tuple[np.ndarray, ...]]:
+    """
+    Yields (order_ids, item_ids, quantities, line_totals, order_epochs) column
+    arrays for non-cancelled orders of a canteen in [start, end), covering
+    live, archived and frozen orders, using a server-side cursor.
+    """
+    result = db.execute(
+        text(_ORDER_LINES_SQL).execution_options(stream_results=True, yield_per=chunk_size),
+        {"canteen_id": canteen_id, "start": start, "end": end},
+    )
+    for rows in result.partitions():
+        block = np.array(rows, dtype=np.float64)
+        yield (
+            block[:, 0].astype(np.int64),
+            block[:, 1].astype(np.int64),
+            block[:, 2].astype(np.int64),
+            block[:, 3],
+            block[:, 4].astype(np.int64),
+        )
+
+
+def compute_sales_analytics(
+    db: Session,
+    canteen_id: int,
+    start: datetime,
+    end: datetime,
+    granularity: str = "day",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> SalesSummary:
+    """Streams a canteen's order lines for [start, end) and returns the aggregated summary."""
+    acc = SalesAccumulator(
+        start_epoch=int(start.timestamp()),
+        end_epoch=int(end.timestamp()),
+        granularity=granularity,
+    )
+    for chunk in stream_order_line_chunks(db, canteen_id, start, end, chunk_size):
+        acc.add_chunk(*chunk)
+    return acc.finish()
@@ -1,9 +1,12 @@
+import hashlib
 import os
+import time
 from datetime import datetime, timedelta
 from typing import Dict, Any, Optional
 
+import jwt
 from fastapi import Response
-from jose import jwt, JWTError, ExpiredSignatureError
+from jwt import ExpiredSignatureError, InvalidTokenError
 
 # It's excellent practice to keep all configuration constants in a central file.
 from app.core.config import (
@@ -11,7 +14,14 @@ from app.core.config import (
     ALGORITHM,
     ACCESS_TOKEN_EXPIRE_MINUTES,
     REFRESH_TOKEN_EXPIRE_DAYS,
+    TOKEN_CACHE_SIZE,
 )
+from app.helpers.cache import TTLCache
+
+# Decoded payloads of verified tokens, keyed by a digest of the token and kept
+# until the token's own `exp`. The same cookie arrives on every request for its
+# whole lifetime, so most requests skip the HMAC check and JSON parsing.
+_token_cache = TTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=ACCESS_TOKEN_EXPIRE_MINUTES * 60)
 
 # ===================================================================
 # INTERNAL HELPER FUNCTION
@@ -38,27 +48,20 @@ def _create_token(data: Dict[str, Any], expires_delta: timedelta) -> str:
 # PUBLIC UTILITY FUNCTIONS
 # ===================================================================
 
-def create_and_set_tokens(response: Response, user_id: str, username: str, role: str):
+def set_access_token(response: Response, user_id: str, username: str, role: str):
     """
-    Generates access and refresh tokens, and sets them as secure, httpOnly cookies.
+    Generates a short-lived access token and sets it as a secure, httpOnly cookie.
 
     Args:
-        response: The FastAPI response object to which cookies will be attached.
+        response: The FastAPI response object to which the cookie will be attached.
         user_id: The ID of the user (will be the token's subject).
         username: The username of the user.
         role: The role of the user.
     """
-    # 1. Create Access Token
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token_payload = {"sub": user_id, "username": username, "role": role}
+    access_token_payload = {"sub": user_id, "username": username, "role": role, "typ": "access"}
     access_token = _create_token(access_token_payload, access_token_expires)
 
-    # 2. Create Refresh Token (with a minimal payload)
-    refresh_token_expires = timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
-    refresh_token_payload = {"sub": user_id}
-    refresh_token = _create_token(refresh_token_payload, refresh_token_expires)
-
-    # 3. Set Access Token Cookie
     response.set_cookie(
         key="access_token",
         value=access_token,
@@ -68,7 +71,37 @@ def create_and_set_tokens(response: Response, user_id: str, username: str, role:
         max_age=ACCESS_TOKEN_EXPIRE_MINUTES * 60,
     )
 
-    # 4. Set Refresh Token Cookie
+
+def create_and_set_tokens(
+    response: Response,
+    user_id: str,
+    username: str,
+    role: str,
+    family_id: Optional[str] = None,
+    jti: Optional[str] = None,
+):
+    """
+    Generates access and refresh tokens, and sets them as secure, httpOnly cookies.
+
+    Args:
+        response: The FastAPI response object to which cookies will be attached.
+        user_id: The ID of the user (will be the token's subject).
+        username: The username of the user.
+        role: The role of the user.
+        family_id: The refresh token family (session) the refresh token belongs to.
+        jti: The refresh token's id within its family; rotated on every refresh.
+    """
+    # 1. Create and set the Access Token
+    set_access_token(response, user_id, username, role)
+
+    # 2. Create Refresh Token (with a minimal payload)
+    refresh_token_expires = timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    refresh_token_payload = {"sub": user_id, "typ": "refresh"}
+    if family_id:
+        refresh_token_payload.update({"fam": family_id, "jti": jti})
+    refresh_token = _create_token(refresh_token_payload, refresh_token_expires)
+
+    # 3. Set Refresh Token Cookie
     response.set_cookie(
         key="refresh_token",
         value=refresh_token,
@@ -79,6 +112,12 @@ def create_and_set_tokens(response: Response, user_id: str, username: str, role:
     )
 
 
+def clear_tokens(response: Response):
+    """Deletes both session cookies."""
+    response.delete_cookie("access_token")
+    response.delete_cookie("refresh_token")
+
+
 def decode_token(token: str) -> Optional[Dict[str, Any]]:
     """
     Safely decodes a JWT, handling potential errors.
@@ -89,12 +128,29 @@ def decode_token(token: str) -> Optional[Dict[str, Any]]:
     Returns:
         The decoded payload as a dictionary if the token is valid, otherwise None.
     """
+    key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+    cached = _token_cache.get(key)
+    if cached is not None:
+        # A copy, so callers can't alter the cached payload
+        return dict(cached)
+
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=[ALGORITHM])
-        return payload
     except ExpiredSignatureError:
         # Token has expired
         return None
-    except JWTError:
+    except InvalidTokenError:
         # Any other JWT error (e.g., invalid signature, malformed token)
-        return None
\ No newline at end of file
+        return None
+
+    # Only valid tokens are cached, and never past their expiry.
+    exp = payload.get("exp")
+    ttl = exp - time.time() if isinstance(exp, (int, float)) else None
+    if ttl is None or ttl > 0:
+        _token_cache.set(key, payload, ttl)
+    return dict(payload)
+
+
+def token_cache_stats() -> Dict[str, int]:
+    """Hit/miss counters of the verified-token cache."""
+    return _token_cache.stats()
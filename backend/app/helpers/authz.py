@@ -0,0 +1,81 @@
+"""
+Canteen authorization index.
+
+Maps a user id to the canteens they own (`canteens.user_id`) and the
+canteens they are staff at (`canteen_staff_association`). Both are loaded in
+one query and cached per process, so vendor checks are set lookups. They no
+longer fetch the Canteen row just to compare `user_id`.
+
+Mutations that change ownership or staff membership call `invalidate` for
+the users involved, which updates this worker immediately. Other workers keep
+their copy for at most AUTHZ_CACHE_TTL_SECONDS.
+
+Owners manage a canteen: its details, menu, refunds, analytics and exports.
+Staff operate it, e.g. they move orders through their statuses.
+"""
+from dataclasses import dataclass
+from typing import FrozenSet, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.config import AUTHZ_CACHE_TTL_SECONDS
+from app.helpers.cache import TTLCache
+
+_index = TTLCache(maxsize=10000, ttl=AUTHZ_CACHE_TTL_SECONDS)
+
+_ACCESS_SQL = text(
+    """
+    SELECT id, true AS owner FROM canteens WHERE user_id = :user_id
+    UNION ALL
+    SELECT canteen_id, false AS owner FROM canteen_staff_association WHERE user_id = :user_id
+    """
+)
+
+
+@dataclass(frozen=True)
+class CanteenAccess:
+    owned: FrozenSet[int]
+    staffed: FrozenSet[int]
+
+    def owns(self, canteen_id: Optional[int]) -> bool:
+        return canteen_id is not None and int(canteen_id) in self.owned
+
+    def can_operate(self, canteen_id: Optional[int]) -> bool:
+        """True for the canteen's owner and its staff."""
+        return canteen_id is not None and (int(canteen_id) in self.owned or int(canteen_id) in self.staffed)
+
+
+def canteen_access(db: Session, user_id) -> CanteenAccess:
+    """The canteens `user_id` owns and staffs, from the per-process index."""
+    def load() -> CanteenAccess:
+        rows = db.execute(_ACCESS_SQL, {"user_id": str(user_id)}).all()
+        return CanteenAccess(
+            owned=frozenset(r.id for r in rows if r.owner),
+            staffed=frozenset(r.id for r in rows if not r.owner),
+        )
+
+    return _index.get_or_set(str(user_id), load)
+
+
+def owns_canteen(db: Session, user, canteen_id: Optional[int]) -> bool:
+    return user is not None and canteen_access(db, user.id).owns(canteen_id)
+
+
+def can_operate_canteen(db: Session, user, canteen_id: Optional[int]) -> bool:
+    return user is not None and canteen_access(db, user.id).can_operate(canteen_id)
+
+
+def invalidate(*user_ids) -> None:
+    """Drops the cached entries of users whose ownership or staff membership changed."""
+    for user_id in user_ids:
+        if user_id is not None:
+            _index.invalidate(str(user_id))
+
+
+def invalidate_all() -> None:
+    _index.clear()
+
+
+def stats() -> dict:
+    return _index.stats()
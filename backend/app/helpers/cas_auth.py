@@ -0,0 +1,125 @@
+"""
+CAS ticket validation off the event loop.
+
+`cas_client.verify_ticket` makes a blocking HTTPS request to the CAS server.
+Called from a resolver, it holds the event loop for the whole round trip.
+`CasValidator` makes validation awaitable:
+
+- A single `requests.Session`, whose connection pool holds up to
+  CAS_POOL_SIZE keep-alive connections, is shared by every login. Requests
+  run on a dedicated thread pool of the same size, so at most that many
+  validations are in flight per worker. There is no new HTTP dependency.
+- Connect and read timeouts are always set. A slow or unreachable CAS
+  server raises `CasUnavailableError` instead of hanging the login.
+- CAS tickets are single-use. Tickets that were already validated, or that
+  the server rejected, go into a small negative cache, so replays (a
+  refreshed redirect page, double submits) are answered without a round trip.
+
+`provision_user` creates the local user for a CAS login with a single
+`INSERT ... ON CONFLICT (email)`, so concurrent first logins can't race.
+
+A local CAS stub server and a concurrency benchmark live in bench/cas_auth.py.
+"""
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Optional
+from urllib.parse import urljoin
+from xml.etree.ElementTree import ParseError
+
+import requests
+from requests.adapters import HTTPAdapter
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.core.config import CAS_CONNECT_TIMEOUT_SECONDS, CAS_POOL_SIZE, CAS_READ_TIMEOUT_SECONDS
+from app.helpers.cache import TTLCache
+from app.helpers.exceptions import CasUnavailableError
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class CasIdentity:
+    user: str
+    attributes: Dict[str, object]
+
+
+class CasValidator:
+    """Validates service tickets for one CAS client (server URL, service URL and response format)."""
+
+    def __init__(
+        self,
+        cas_client,
+        pool_size: int = CAS_POOL_SIZE,
+        timeout=(CAS_CONNECT_TIMEOUT_SECONDS, CAS_READ_TIMEOUT_SECONDS),
+        negative_cache_size: int = 10000,
+        negative_cache_ttl: float = 600.0,
+    ):
+        self.cas_client = cas_client
+        self.timeout = timeout
+        self.validate_url = urljoin(cas_client.server_url, cas_client.url_suffix)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="cas")
+        # Tickets that must not be sent to the server again (used or rejected).
+        self._spent_tickets = TTLCache(maxsize=negative_cache_size, ttl=negative_cache_ttl)
+
+    def _fetch(self, ticket: str) -> bytes:
+        try:
+            response = self.session.get(
+                self.validate_url,
+                params={"ticket": ticket, "service": self.cas_client.service_url},
+                verify=self.cas_client.verify_ssl_certificate,
+                timeout=self.timeout,
+            )
+        except requests.RequestException as e:
+            raise CasUnavailableError(f"CAS server unreachable: {e}") from e
+        with response:
+            if response.status_code != 200:
+                raise CasUnavailableError(f"CAS server returned HTTP {response.status_code}.")
+            return response.content
+
+    async def validate(self, ticket: str) -> Optional[CasIdentity]:
+        """
+        Returns the authenticated identity for `ticket`, or None if the ticket is
+        invalid, expired or already used. Raises CasUnavailableError when the
+        server can't give an answer.
+        """
+        if not ticket or self._spent_tickets.get(ticket):
+            return None
+
+        body = await asyncio.get_running_loop().run_in_executor(self._executor, self._fetch, ticket)
+        try:
+            user, attributes, _ = self.cas_client.verify_response(body)
+        except (ParseError, IndexError) as e:
+            raise CasUnavailableError("CAS server returned an unreadable response.") from e
+
+        # Valid or not, the server will never accept this ticket again.
+        self._spent_tickets.set(ticket, True)
+        if not user:
+            return None
+        return CasIdentity(user=user, attributes=attributes or {})
+
+    def stats(self) -> dict:
+        return {"negativeCache": self._spent_tickets.stats()}
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+        self.session.close()
+
+
+def provision_user(db: Session, uid: str, email: str, name: str) -> User:
+    """
+    Returns the local user for a CAS identity, creating it on first login.
+    Matches on email, as before. Does not commit.
+    """
+    stmt = pg_insert(User).values(id=str(uid), name=name, email=str(email), role="student")
+    # A no-op update (rather than DO NOTHING) so RETURNING also yields existing rows.
+    stmt = stmt.on_conflict_do_update(index_elements=[User.email], set_={"email": stmt.excluded.email})
+    user_id = db.execute(stmt.returning(User.id)).scalar_one()
+    return db.get(User, user_id, populate_existing=True)
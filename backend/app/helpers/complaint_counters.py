@@ -0,0 +1,84 @@
+"""
+Transactional maintenance of `complaint_counters`.
+
+Every code path that creates a complaint or changes its status or escalation
+flag calls `record_complaint_change` (or `apply_counter_deltas` for bulk
+updates) *before* committing, using the same session, so the badge counts
+commit atomically with the complaint change.
+
+`rebuild_complaint_counters` recomputes the table from `complaints`:
+
+    python -m app.helpers.complaint_counters
+"""
+import logging
+from collections import Counter
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.models.complaints import ComplaintCounter
+
+logger = logging.getLogger(__name__)
+
+# (status, is_escalated)
+CounterKey = Tuple[str, bool]
+
+
+def counter_key(status: Optional[str], is_escalated: Optional[bool]) -> CounterKey:
+    return (status or "pending", bool(is_escalated))
+
+
+def apply_counter_deltas(db: Session, deltas: Dict[CounterKey, int]) -> None:
+    """Adds each delta to its (status, is_escalated) counter. Does not commit."""
+    table = ComplaintCounter.__table__
+    for (status, is_escalated), delta in deltas.items():
+        if not delta:
+            continue
+        stmt = pg_insert(table).values(status=status, is_escalated=is_escalated, count=delta)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.status, table.c.is_escalated],
+            set_={"count": table.c.count + stmt.excluded.count},
+        )
+        db.execute(stmt)
+
+
+def record_complaint_change(db: Session, old: Optional[CounterKey], new: Optional[CounterKey]) -> None:
+    """
+    Moves one complaint from its `old` counter to its `new` one. Pass `old=None`
+    for a new complaint. Call before committing.
+    """
+    if old == new:
+        return
+    deltas: Counter = Counter()
+    if old is not None:
+        deltas[old] -= 1
+    if new is not None:
+        deltas[new] += 1
+    apply_counter_deltas(db, deltas)
+
+
+def rebuild_complaint_counters(db: Session) -> None:
+    """Recomputes all counters from `complaints` in a single transaction."""
+    db.execute(text("DELETE FROM complaint_counters"))
+    db.execute(text(
+        """
+        INSERT INTO complaint_counters (status, is_escalated, count)
+        SELECT coalesce(status, 'pending'), coalesce(is_escalated, false), count(*)
+        FROM complaints
+        GROUP BY 1, 2
+        """
+    ))
+    db.commit()
+    logger.info("Rebuilt complaint counters.")
+
+
+if __name__ == "__main__":
+    from app.core.database import SessionLocal
+
+    session = SessionLocal()
+    try:
+        rebuild_complaint_counters(session)
+    finally:
+        session.close()
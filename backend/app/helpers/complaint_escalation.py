@@ -0,0 +1,78 @@
+"""
+Escalation of stale, unresolved complaints.
+
+`escalate_stale_complaints` flags every complaint older than the cutoff in a
+single `UPDATE ... RETURNING` (served by the partial index
+`ix_complaints_pending_escalation`) and then notifies listeners once with the
+whole batch of escalated ids. It runs periodically from the job runner in
+app/helpers/jobs.py and can also be triggered by admins through the
+`escalateStaleComplaints` mutation.
+"""
+import logging
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Callable, List
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.helpers.complaint_counters import apply_counter_deltas, counter_key
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ESCALATION_AGE = timedelta(days=7)
+
+# Callables invoked once per run with the list of newly escalated complaint ids,
+# after the update has been committed.
+EscalationListener = Callable[[List[int]], None]
+_listeners: List[EscalationListener] = []
+
+
+def add_escalation_listener(listener: EscalationListener) -> None:
+    """Registers a callable to receive each batch of escalated complaint ids."""
+    _listeners.append(listener)
+
+
+def _log_escalations(complaint_ids: List[int]) -> None:
+    logger.info("Escalated %d stale complaint(s): %s", len(complaint_ids), complaint_ids[:50])
+
+
+add_escalation_listener(_log_escalations)
+
+
+def escalate_stale_complaints(db: Session, older_than: timedelta = DEFAULT_ESCALATION_AGE) -> List[int]:
+    """
+    Marks unresolved, unescalated complaints created before `now - older_than`
+    as escalated in one statement, commits, and emits one event for the batch.
+    Returns the escalated complaint ids.
+    """
+    now = datetime.now(timezone.utc)
+    rows = db.execute(
+        text(
+            """
+            UPDATE complaints
+            SET is_escalated = true, updated_at = :now
+            WHERE created_at < :cutoff
+              AND status <> 'resolved'
+              AND NOT is_escalated
+            RETURNING id, status
+            """
+        ),
+        {"now": now, "cutoff": now - older_than},
+    ).fetchall()
+    # Move the escalated complaints between badge counters in the same transaction.
+    deltas: Counter = Counter()
+    for _, status in rows:
+        deltas[counter_key(status, False)] -= 1
+        deltas[counter_key(status, True)] += 1
+    apply_counter_deltas(db, deltas)
+    db.commit()
+
+    escalated = [r[0] for r in rows]
+    if escalated:
+        for listener in _listeners:
+            try:
+                listener(escalated)
+            except Exception:
+                logger.exception("Complaint escalation listener %r failed", listener)
+    return escalated
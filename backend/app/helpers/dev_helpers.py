@@ -21,7 +21,7 @@ async def create_demo_order(db: Session = Depends(get_db), user_id: str | None =
     db.flush()
 
     # Add one OrderItem referencing menu_item 101 if available
-    db.add(OrderItem(order_id=order.id, item_id=101, quantity=1))
+    db.add(OrderItem(order_id=order.id, item_id=101, quantity=1, order_time=order.order_time))
     db.commit()
     db.refresh(order)
 
@@ -26,4 +26,21 @@ class PaymentVerificationError(ServiceError):
 
 class RefundError(ServiceError):
     """Raised when refunding a payment with the processor fails."""
-    pass
\ No newline at end of file
+    pass
+
+# Wallet ledger exceptions
+class WalletNotFoundError(ServiceError):
+    pass
+
+class InsufficientFundsError(ServiceError):
+    """Raised when a wallet debit would exceed the balance plus credit limit."""
+    pass
+
+# Authentication
+class PasswordHasherBusyError(ServiceError):
+    """Raised when too many password hashes are already queued on this worker."""
+    pass
+
+class CasUnavailableError(ServiceError):
+    """Raised when the CAS server cannot be reached or returns an unusable response."""
+    pass
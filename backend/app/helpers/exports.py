@@ -0,0 +1,308 @@
+"""
+Streaming order exports for finance.
+
+`GET /api/exports/orders` returns one row per order line (live, archived and
+frozen orders) together with the order's totals and its latest payment. Rows
+are read with a server-side cursor in fixed-size chunks and encoded
+incrementally, as CSV (optionally gzipped) or Parquet (one row group per chunk), so memory use
+depends on the chunk size, not on how many rows are exported.
+
+A synthetic encoder benchmark (no database needed) lives in bench/exports.py.
+"""
+import csv
+import io
+import zlib
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Iterator, List, Optional, Sequence
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.database import SessionLocal, get_db
+from app.helpers.time_utils import to_ist_iso
+from app.helpers.authz import owns_canteen
+from app.helpers.partitions import FROZEN_ITEMS_JOIN, FROZEN_ORDERS_FROM
+
+DEFAULT_CHUNK_SIZE = 20_000
+MAX_EXPORT_RANGE = timedelta(days=366)
+
+# Exported columns, in order, with their Arrow type names for Parquet.
+EXPORT_COLUMNS = [
+    ("order_id", "int64"),
+    ("order_time", "timestamp"),
+    ("canteen_id", "int64"),
+    ("user_id", "string"),
+    ("order_status", "string"),
+    ("subtotal", "float64"),
+    ("tax", "float64"),
+    ("discount", "float64"),
+    ("order_total", "float64"),
+    ("order_payment_method", "string"),
+    ("order_payment_status", "string"),
+    ("line_id", "int64"),
+    ("item_id", "int64"),
+    ("item_name", "string"),
+    ("quantity", "int64"),
+    ("unit_price", "float64"),
+    ("line_total", "float64"),
+    ("payment_id", "int64"),
+    ("payment_status", "string"),
+    ("payment_amount", "float64"),
+    ("razorpay_payment_id", "string"),
+]
+_TIMESTAMP_COLUMNS = {i for i, (_, kind) in enumerate(EXPORT_COLUMNS) if kind == "timestamp"}
+
+# `{orders}`/`{items}` are filled with the live, archive or frozen sources
+# (aliased `o`/`oi`); archived and frozen lines have no menu join because they
+# always carry snapshots. Live lines also repeat the range on their own
+# `order_time` so Postgres prunes `order_items` partitions, not just `orders`
+# ones, and frozen lines skip whole chunks outside the range or canteen.
+_LINES_SELECT = """
+    SELECT o.id, o.order_time, o.canteen_id, o.user_id, o.status,
+           o.subtotal, o.tax, o.discount, o.total_amount,
+           o.payment_method, o.payment_status,
+           oi.id, oi.item_id, {item_name}, oi.quantity,
+           {unit_price}, ({unit_price} * oi.quantity)::float8,
+           p.id, p.payment_status::text, p.amount, p.razorpay_payment_id
+    FROM {orders}
+    JOIN {items} ON oi.order_id = o.id{item_range}
+    {menu_join}
+    LEFT JOIN LATERAL (
+        SELECT id, payment_status, amount, razorpay_payment_id
+        FROM payments
+        WHERE order_id = o.id
+        ORDER BY created_at DESC, id DESC
+        LIMIT 1
+    ) p ON true
+    WHERE {where}
+"""
+
+
+def _export_queries(canteen_id: Optional[int]) -> List[str]:
+    """
+    The export as three statements, oldest tier first: frozen, archived, live.
+    Each is ordered by an indexed key so rows stream as the scan produces them,
+    with no server-side sort of the whole export.
+    """
+    where = "o.order_time >= :start AND o.order_time < :end"
+    chunk_where = "c.month_end > :start AND c.month_start < :end"
+    if canteen_id is not None:
+        where += " AND o.canteen_id = :canteen_id"
+        chunk_where += " AND c.canteen_id = :canteen_id"
+    frozen = _LINES_SELECT.format(
+        orders=FROZEN_ORDERS_FROM, items=FROZEN_ITEMS_JOIN, where=f"{chunk_where} AND {where}",
+        item_name="oi.snapshot_name",
+        unit_price="coalesce(oi.snapshot_price, 0)",
+        menu_join="",
+        item_range="",
+    )
+    archived = _LINES_SELECT.format(
+        orders="orders_archive o", items="order_items_archive oi", where=where,
+        item_name="oi.snapshot_name",
+        unit_price="coalesce(oi.snapshot_price, 0)",
+        menu_join="",
+        item_range="",
+    )
+    live = _LINES_SELECT.format(
+        orders="orders o", items="order_items oi", where=where,
+        item_name="coalesce(oi.snapshot_name, mi.name)",
+        unit_price="coalesce(oi.snapshot_price, mi.price, 0)",
+        menu_join="LEFT JOIN menu_items mi ON mi.id = oi.item_id",
+        item_range=" AND oi.order_time >= :start AND oi.order_time < :end",
+    )
+    # Chunks come in month order from ix_order_archive_chunks_canteen_month,
+    # so Postgres only sorts one month at a time (incremental sort); the
+    # archive and live tiers follow their (canteen_id,) order_time indexes.
+    return [
+        f"{frozen} ORDER BY c.month_start, o.order_time, o.id, oi.id",
+        f"{archived} ORDER BY o.order_time, o.id, oi.id",
+        f"{live} ORDER BY o.order_time, o.id, oi.id",
+    ]
+
+
+def stream_order_export_rows(
+    db: Session,
+    start: datetime,
+    end: datetime,
+    canteen_id: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Iterator[List[tuple]]:
+    """
+    Yields lists of export rows (tuples in `EXPORT_COLUMNS` order) using a
+    server-side cursor per tier. Rows are in time order within each tier, and
+    tiers are emitted oldest first.
+    """
+    params = {"start": start, "end": end}
+    if canteen_id is not None:
+        params["canteen_id"] = canteen_id
+    for sql in _export_queries(canteen_id):
+        result = db.execute(
+            text(sql).execution_options(stream_results=True, yield_per=chunk_size),
+            params,
+        )
+        for rows in result.partitions():
+            yield [tuple(r) for r in rows]
+
+
+def encode_csv(chunks: Iterable[Sequence[tuple]], compress: bool = False) -> Iterator[bytes]:
+    """Encodes row chunks as CSV with a header line, yielding one (optionally gzipped) block per chunk."""
+    gz = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+
+    def _drain() -> bytes:
+        data = buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate()
+        return gz.compress(data) if gz else data
+
+    writer.writerow([name for name, _ in EXPORT_COLUMNS])
+    for rows in chunks:
+        if _TIMESTAMP_COLUMNS:
+            rows = [
+                tuple(to_ist_iso(v) if i in _TIMESTAMP_COLUMNS else v for i, v in enumerate(r))
+                for r in rows
+            ]
+        writer.writerows(rows)
+        block = _drain()
+        if block:
+            yield block
+    tail = _drain()
+    if gz:
+        tail += gz.flush()
+    if tail:
+        yield tail
+
+
+class _ChunkSink(io.RawIOBase):
+    """A write-only file object that hands buffered bytes back to the caller on demand."""
+
+    def __init__(self):
+        self._parts: List[bytes] = []
+        self._pos = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        data = bytes(b)
+        self._parts.append(data)
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def take(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def encode_parquet(chunks: Iterable[Sequence[tuple]], compression: str = "snappy") -> Iterator[bytes]:
+    """Encodes row chunks as a Parquet file, writing one row group per chunk."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    arrow_types = {
+        "int64": pa.int64(),
+        "float64": pa.float64(),
+        "string": pa.string(),
+        "timestamp": pa.timestamp("us", tz="UTC"),
+    }
+    schema = pa.schema([(name, arrow_types[kind]) for name, kind in EXPORT_COLUMNS])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression=compression)
+    try:
+        for rows in chunks:
+            if not rows:
+                continue
+            columns = list(zip(*rows))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(col, type=field.type) for col, field in zip(columns, schema)],
+                schema=schema,
+            ))
+            block = sink.take()
+            if block:
+                yield block
+    finally:
+        writer.close()
+    tail = sink.take()
+    if tail:
+        yield tail
+
+
+def _parse_iso(value: str) -> datetime:
+    """Parses an ISO 8601 timestamp, treating naive values as UTC."""
+    dt = datetime.fromisoformat(value)
+    return dt if dt.tzinfo is not None else dt.replace(tzinfo=timezone.utc)
+
+
+router = APIRouter(prefix="/api/exports", tags=["Exports"])
+
+
+@router.get("/orders")
+def export_orders(
+    request: Request,
+    from_: str = Query(..., alias="from"),
+    to: str = Query(...),
+    canteen_id: Optional[int] = None,
+    format: str = "csv",
+    gzip: bool = False,
+    db: Session = Depends(get_db),
+):
+    """
+    Streams order lines placed in [from, to) as CSV or Parquet. Admins may
+    export every canteen; canteen owners must pass their own `canteen_id`.
+    `gzip` compresses CSV output and selects the gzip codec for Parquet.
+    """
+    user = request.scope.get("user")
+    if not user:
+        raise HTTPException(status_code=401, detail="Authentication required.")
+    if user.role != "admin":
+        if not owns_canteen(db, user, canteen_id):
+            raise HTTPException(status_code=403, detail="Only admins or the canteen owner can export orders.")
+
+    if format not in ("csv", "parquet"):
+        raise HTTPException(status_code=400, detail="format must be 'csv' or 'parquet'.")
+    try:
+        start, end = _parse_iso(from_), _parse_iso(to)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid time format. Please use ISO 8601.")
+    if end <= start:
+        raise HTTPException(status_code=400, detail="'to' must be after 'from'.")
+    if end - start > MAX_EXPORT_RANGE:
+        raise HTTPException(status_code=400, detail="Export range must not exceed one year.")
+    if format == "parquet":
+        try:
+            import pyarrow.parquet  # noqa: F401
+        except ImportError:
+            raise HTTPException(status_code=501, detail="Parquet export is not available on this server.")
+
+    def _body() -> Iterator[bytes]:
+        # Request-scoped sessions are closed before a streamed body is sent,
+        # so the export holds its own session for the lifetime of the stream.
+        session = SessionLocal()
+        try:
+            chunks = stream_order_export_rows(session, start, end, canteen_id)
+            if format == "parquet":
+                yield from encode_parquet(chunks, compression="gzip" if gzip else "snappy")
+            else:
+                yield from encode_csv(chunks, compress=gzip)
+        finally:
+            session.close()
+
+    name = f"orders_{canteen_id if canteen_id is not None else 'all'}_{start:%Y%m%d}_{end:%Y%m%d}"
+    if format == "parquet":
+        media_type, filename = "application/vnd.apache.parquet", f"{name}.parquet"
+    elif gzip:
+        media_type, filename = "application/gzip", f"{name}.csv.gz"
+    else:
+        media_type, filename = "text/csv; charset=utf-8", f"{name}.csv"
+    return StreamingResponse(
+        _body(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
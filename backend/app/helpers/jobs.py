@@ -0,0 +1,243 @@
+"""
+Periodic background jobs with leader election.
+
+One API worker at a time is the job leader. Leadership is a session-level
+Postgres advisory lock (`pg_try_advisory_lock`) held on a dedicated
+connection for as long as the worker lives. Only the leader runs jobs, so
+each job runs once per interval however many workers there are. Because the
+lock belongs to the connection, not a transaction, jobs that commit
+part-way (claiming a batch, escalating complaints) stay exclusive while they
+run.
+
+The other workers retry the lock every JOBS_LEADER_CHECK_SECONDS. The
+leader checks its connection on the same schedule. If the leader exits or
+its connection drops, Postgres releases the lock and another worker takes
+over at its next check.
+
+Jobs are started from the FastAPI startup hook in app/main.py and can be
+disabled with `BACKGROUND_JOBS_ENABLED=false`. A single run of every job
+(if no other process is the leader) can be done by hand with:
+
+    python -m app.helpers.jobs
+"""
+import asyncio
+import logging
+import os
+import zlib
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Callable, List, Optional
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+
+from app.core.database import SessionLocal, engine
+
+logger = logging.getLogger(__name__)
+
+# How often followers try to become the leader, and the leader checks its connection.
+JOBS_LEADER_CHECK_SECONDS = float(os.getenv("JOBS_LEADER_CHECK_SECONDS", "15"))
+# Stable across processes (unlike hash()), and within Postgres' bigint range.
+LEADER_LOCK_KEY = zlib.crc32(b"jobs:leader")
+
+
+class LeaderLease:
+    """
+    Job leadership for this process: a session-level advisory lock on a
+    connection of its own, outside the request pool, held until `release`.
+    """
+
+    def __init__(self, key: int = LEADER_LOCK_KEY):
+        self.key = key
+        self._engine = None
+        self._conn = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self._conn is not None
+
+    def refresh(self) -> bool:
+        """Checks that leadership is still held, or tries to take it. Returns whether this process leads."""
+        if self._conn is not None:
+            try:
+                self._conn.execute(text("SELECT 1"))
+                self._conn.commit()
+                return True
+            except Exception:
+                # The lock went with the connection; another worker may hold it now.
+                logger.warning("Lost the connection holding background job leadership.")
+                self._discard()
+
+        if self._engine is None:
+            self._engine = create_engine(engine.url, poolclass=NullPool, connect_args={"connect_timeout": 10})
+        conn = None
+        try:
+            conn = self._engine.connect()
+            acquired = conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": self.key}).scalar()
+            # Session-level locks outlive the transaction; don't sit idle in one.
+            conn.commit()
+        except Exception:
+            logger.exception("Could not try for background job leadership")
+            if conn is not None:
+                conn.close()
+            return False
+        if not acquired:
+            conn.close()
+            return False
+        self._conn = conn
+        logger.info("This worker is now the background job leader.")
+        return True
+
+    def release(self) -> None:
+        if self._conn is None:
+            return
+        try:
+            self._conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": self.key})
+            self._conn.commit()
+        except Exception:
+            logger.warning("Could not release background job leadership; closing its connection instead.")
+        self._discard()
+
+    def _discard(self) -> None:
+        conn, self._conn = self._conn, None
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+@dataclass
+class PeriodicJob:
+    """A function of a DB session run every `interval` by the job leader."""
+    name: str
+    interval: timedelta
+    func: Callable[[Session], object]
+
+    def run_once(self) -> bool:
+        """Runs the job in a fresh session and commits. Returns whether it succeeded."""
+        db = SessionLocal()
+        try:
+            self.func(db)
+            # Commit whatever the job left open.
+            db.commit()
+            return True
+        except Exception:
+            db.rollback()
+            logger.exception("Background job %s failed", self.name)
+            return False
+        finally:
+            db.close()
+
+
+def _escalate_stale_complaints(db: Session) -> None:
+    from app.helpers.complaint_escalation import escalate_stale_complaints
+
+    escalate_stale_complaints(db)
+
+
+def _drain_payment_webhooks(db: Session) -> None:
+    from app.helpers.payment_webhooks import drain_queue
+
+    drain_queue(db)
+
+
+def _snapshot_wallet_balances(db: Session) -> None:
+    from app.helpers.wallet_ledger import snapshot_wallet_balances
+
+    snapshot_wallet_balances(db)
+
+
+def _process_refunds(db: Session) -> None:
+    from app.helpers.refunds import drain_refunds
+
+    drain_refunds(db)
+
+
+def _purge_refresh_token_families(db: Session) -> None:
+    from app.helpers.refresh_tokens import purge_expired_families
+
+    purge_expired_families(db)
+
+
+def _maintain_order_partitions(db: Session) -> None:
+    from app.helpers.partitions import maintain_partitions
+
+    maintain_partitions(db)
+
+
+def _purge_rate_limit_buckets(db: Session) -> None:
+    from app.core.config import RATE_LIMIT_BACKEND
+    from app.helpers.rate_limit import purge_idle_buckets
+
+    # Only the shared backend keeps buckets in Postgres.
+    if RATE_LIMIT_BACKEND == "postgres":
+        purge_idle_buckets(db)
+
+
+JOBS: List[PeriodicJob] = [
+    PeriodicJob("escalate_stale_complaints", timedelta(minutes=15), _escalate_stale_complaints),
+    # Fallback drain for API workers; dedicated webhook workers can run alongside it.
+    PeriodicJob("drain_payment_webhooks", timedelta(seconds=5), _drain_payment_webhooks),
+    PeriodicJob("snapshot_wallet_balances", timedelta(hours=6), _snapshot_wallet_balances),
+    PeriodicJob("process_refunds", timedelta(seconds=10), _process_refunds),
+    PeriodicJob("purge_refresh_token_families", timedelta(hours=1), _purge_refresh_token_families),
+    PeriodicJob("purge_rate_limit_buckets", timedelta(minutes=10), _purge_rate_limit_buckets),
+    # Pre-creates monthly partitions, archives finished orders and freezes old
+    # archives into compressed chunks; all three are idempotent.
+    PeriodicJob("maintain_order_partitions", timedelta(hours=6), _maintain_order_partitions),
+]
+
+_tasks: List[asyncio.Task] = []
+_lease = LeaderLease()
+
+
+async def _hold_leadership(lease: LeaderLease) -> None:
+    while True:
+        await asyncio.to_thread(lease.refresh)
+        await asyncio.sleep(JOBS_LEADER_CHECK_SECONDS)
+
+
+async def _run_periodically(job: PeriodicJob, lease: LeaderLease) -> None:
+    while True:
+        if lease.is_leader:
+            await asyncio.to_thread(job.run_once)
+            await asyncio.sleep(job.interval.total_seconds())
+        else:
+            # Start soon after this worker is elected rather than a full interval later.
+            await asyncio.sleep(min(job.interval.total_seconds(), JOBS_LEADER_CHECK_SECONDS))
+
+
+def jobs_enabled() -> bool:
+    return os.getenv("BACKGROUND_JOBS_ENABLED", "true").lower() not in ("0", "false", "no")
+
+
+def start_jobs(jobs: Optional[List[PeriodicJob]] = None) -> None:
+    """Starts competing for leadership and schedules every job on the running event loop."""
+    _tasks.append(asyncio.create_task(_hold_leadership(_lease), name="jobs:leader"))
+    for job in jobs if jobs is not None else JOBS:
+        _tasks.append(asyncio.create_task(_run_periodically(job, _lease), name=f"job:{job.name}"))
+    logger.info("Started %d background job(s).", len(_tasks) - 1)
+
+
+async def stop_jobs() -> None:
+    """Cancels all scheduled jobs, waits for them to finish and gives up leadership."""
+    for task in _tasks:
+        task.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
+    _tasks.clear()
+    await asyncio.to_thread(_lease.release)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    lease = LeaderLease()
+    if not lease.refresh():
+        logger.warning("Another process is the job leader (or the database is unreachable); nothing run.")
+    else:
+        try:
+            for job in JOBS:
+                if job.run_once():
+                    logger.info("Job %s ran.", job.name)
+        finally:
+            lease.release()
@@ -0,0 +1,348 @@
+"""
+Prometheus metrics, served at GET /metrics.
+
+What is recorded:
+
+- graphql_operation_seconds{operation,type,status}: wall time of each
+  GraphQL operation (parse, validate, execute).
+- graphql_resolver_seconds{field}: time spent in each root Query/Mutation
+  resolver. Resolvers here build their whole result eagerly, so root fields
+  are where the time goes. Nested fields are not timed, which keeps the
+  per-field overhead to one attribute check.
+- graphql_request_sql_statements / graphql_request_sql_seconds: SQL
+  statements executed per GraphQL request, and the time spent in them.
+- db_statement_seconds{statement}: every statement on the main engine, by
+  verb (SELECT, INSERT, ...). db_errors_total counts failed statements.
+- db_pool_checkout_seconds: how long requests wait for a connection from
+  the pool, plus gauges of what the pool currently holds.
+- cache_hits_total / cache_misses_total / cache_entries{cache}: read from the
+  caches' own counters when scraped, so they cost nothing per request.
+
+Everything is in-process and per worker; Prometheus sums across workers.
+Histograms have fixed buckets, and each series keeps its bucket counts in a
+preallocated list, so an observation is a bisect and two additions under a
+lock. The number of series per metric is capped (operation names come from
+clients); anything past the cap is recorded under the label value "other".
+
+There is no client-library dependency. The text exposition format is simple
+enough to write directly. The per-observation overhead check lives in
+bench/metrics.py.
+"""
+import logging
+import math
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from inspect import isawaitable
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+from strawberry.extensions import SchemaExtension
+
+from app.core.config import METRICS_MAX_SERIES
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+_OVERFLOW = "other"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (), max_series: int = METRICS_MAX_SERIES):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self.max_series = max_series
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[str, ...], object] = {}
+
+    def _new_series(self):
+        raise NotImplementedError
+
+    def _get_series(self, values: Tuple[str, ...]):
+        # Lock held by the caller.
+        series = self._series.get(values)
+        if series is None:
+            if len(self._series) >= self.max_series:
+                values = tuple(_OVERFLOW for _ in values)
+                series = self._series.get(values)
+            if series is None:
+                series = self._series[values] = self._new_series()
+        return series
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_series(self):
+        return [0.0]
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._get_series(labels)[0] += amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            samples = [(values, series[0]) for values, series in self._series.items()]
+        lines = self.header()
+        for values, value in samples:
+            lines.append(f"{self.name}{_format_labels(self.label_names, values)} {_format_value(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS,
+                 max_series: int = METRICS_MAX_SERIES):
+        super().__init__(name, help_text, labels, max_series)
+        self.buckets = tuple(buckets)
+
+    def _new_series(self):
+        # [count per bucket..., count above the last bucket, sum]
+        return [0] * (len(self.buckets) + 1) + [0.0]
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._get_series(labels)
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            samples = [(values, list(series)) for values, series in self._series.items()]
+        lines = self.header()
+        for values, series in samples:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), series[:-1]):
+                cumulative += count
+                le = f'le="{_format_value(float(bound))}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, values, le)} {cumulative}")
+            labels = _format_labels(self.label_names, values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class CallbackMetric:
+    """A gauge or counter whose samples are read from `collect()` at scrape time."""
+
+    def __init__(self, name: str, help_text: str, kind: str, labels: Sequence[str],
+                 collect: Callable[[], Dict[Tuple[str, ...], float]]):
+        self.name = name
+        self.help = help_text
+        self.kind = kind
+        self.label_names = tuple(labels)
+        self.collect = collect
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        try:
+            samples = self.collect()
+        except Exception:
+            logger.exception("Collecting metric %s failed", self.name)
+            return lines
+        for values, value in samples.items():
+            lines.append(f"{self.name}{_format_labels(self.label_names, values)} {_format_value(value)}")
+        return lines
+
+
+_registry: List[object] = []
+
+
+def _register(metric):
+    _registry.append(metric)
+    return metric
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+    lines: List[str] = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# ===================================================================
+# Metrics
+# ===================================================================
+
+operation_seconds = _register(Histogram(
+    "graphql_operation_seconds", "GraphQL operation latency.", ("operation", "type", "status")))
+resolver_seconds = _register(Histogram(
+    "graphql_resolver_seconds", "Root resolver latency.", ("field",)))
+request_sql_statements = _register(Histogram(
+    "graphql_request_sql_statements", "SQL statements executed per GraphQL request.", buckets=COUNT_BUCKETS))
+request_sql_seconds = _register(Histogram(
+    "graphql_request_sql_seconds", "Time spent in SQL per GraphQL request.", buckets=SQL_BUCKETS))
+statement_seconds = _register(Histogram(
+    "db_statement_seconds", "SQL statement latency on the main engine.", ("statement",), buckets=SQL_BUCKETS))
+db_errors = _register(Counter("db_errors_total", "SQL statements that raised.", ("statement",)))
+pool_checkout_seconds = _register(Histogram(
+    "db_pool_checkout_seconds", "Wait for a connection from the main pool.", buckets=SQL_BUCKETS))
+
+
+def register_pool_gauges(pool) -> None:
+    _register(CallbackMetric(
+        "db_pool_connections", "Connections held by the main pool.", "gauge", ("state",),
+        lambda: {("checked_out",): pool.checkedout(), ("idle",): pool.checkedin(), ("overflow",): max(0, pool.overflow())},
+    ))
+
+
+_caches: Dict[str, Callable[[], dict]] = {}
+
+
+def register_cache(name: str, stats: Callable[[], dict]) -> None:
+    """Exposes a cache's hits, misses and size (as reported by `stats()`) with cache="<name>"."""
+    _caches[name] = stats
+
+
+def _cache_samples(field: str) -> Callable[[], Dict[Tuple[str, ...], float]]:
+    def collect() -> Dict[Tuple[str, ...], float]:
+        samples = {}
+        for name, stats in _caches.items():
+            value = stats().get(field)
+            if value is not None:
+                samples[(name,)] = value
+        return samples
+    return collect
+
+
+_register(CallbackMetric("cache_hits_total", "Cache hits.", "counter", ("cache",), _cache_samples("hits")))
+_register(CallbackMetric("cache_misses_total", "Cache misses.", "counter", ("cache",), _cache_samples("misses")))
+_register(CallbackMetric("cache_entries", "Entries currently cached.", "gauge", ("cache",), _cache_samples("size")))
+
+# ===================================================================
+# SQL
+# ===================================================================
+
+# [statements, seconds] for the GraphQL request running in this context.
+_request_sql: ContextVar[Optional[list]] = ContextVar("request_sql", default=None)
+_VERBS = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+
+def _verb(statement: str) -> str:
+    head = statement.lstrip()[:6].upper()
+    for verb in _VERBS:
+        if head.startswith(verb):
+            return verb
+    return "OTHER"
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited (including connecting)."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_checkout_seconds.observe(time.perf_counter() - started)
+
+
+def instrument_engine(engine) -> None:
+    """Times every statement on `engine` and attributes it to the current GraphQL request."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info["metrics_started"] = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info.pop("metrics_started", time.perf_counter())
+        statement_seconds.observe(elapsed, _verb(statement))
+        current = _request_sql.get()
+        if current is not None:
+            current[0] += 1
+            current[1] += elapsed
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        conn = exception_context.connection
+        if conn is not None:
+            conn.info.pop("metrics_started", None)
+        db_errors.inc(_verb(exception_context.statement or ""))
+
+    if isinstance(engine.pool, QueuePool):
+        register_pool_gauges(engine.pool)
+
+
+# ===================================================================
+# Strawberry extension
+# ===================================================================
+
+class MetricsExtension(SchemaExtension):
+    """Records operation and root-resolver latency, and SQL per request."""
+
+    def on_operation(self) -> Iterator[None]:
+        # The instance is shared by concurrent requests; keep our own reference.
+        execution_context = self.execution_context
+        sql = [0, 0.0]
+        token = _request_sql.set(sql)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            _request_sql.reset(token)
+            try:
+                operation_type = execution_context.operation_type.value
+            except Exception:
+                # No parsable document.
+                operation_type = "unknown"
+            result = execution_context.result
+            status = "error" if execution_context.errors or (result is not None and result.errors) else "ok"
+            operation_seconds.observe(elapsed, execution_context.operation_name or "anonymous", operation_type, status)
+            request_sql_statements.observe(sql[0])
+            request_sql_seconds.observe(sql[1])
+
+    def resolve(self, _next, root, info, *args, **kwargs):
+        if info.path.prev is not None:
+            return _next(root, info, *args, **kwargs)
+
+        field = f"{info.parent_type.name}.{info.field_name}"
+        started = time.perf_counter()
+        result = _next(root, info, *args, **kwargs)
+        if isawaitable(result):
+            return self._timed(result, field, started)
+        resolver_seconds.observe(time.perf_counter() - started, field)
+        return result
+
+    @staticmethod
+    async def _timed(awaitable, field: str, started: float):
+        try:
+            return await awaitable
+        finally:
+            resolver_seconds.observe(time.perf_counter() - started, field)
+
+
+metrics_extension = MetricsExtension()
@@ -1,11 +1,15 @@
+import json
+import math
 from starlette.middleware.base import BaseHTTPMiddleware
 from typing import Callable
 from starlette.requests import Request
-from starlette.responses import Response
+from starlette.responses import JSONResponse, Response
 from sqlalchemy.orm import Session
 
 # Import the centralized utility for decoding tokens
 from app.helpers.auth_utils import decode_token
+from app.helpers import persisted_queries, rate_limit
+from app.helpers.rate_limit import client_key, operation_cost
 
 # Import dependencies for database access
 from app.core.database import get_db
@@ -38,8 +42,9 @@ class AuthMiddleware(BaseHTTPMiddleware):
         if token:
             # 1. Use our centralized utility to decode the token.
             payload = decode_token(token)
-            
-            if payload:
+
+            # A refresh token is not a valid access token, even if it is placed in that cookie.
+            if payload and payload.get("typ") != "refresh":
                 user_id: str = payload.get("sub")
                 
                 # 2. CRITICAL: Manage the database session lifecycle manually.
@@ -60,4 +65,54 @@ class AuthMiddleware(BaseHTTPMiddleware):
 
         # Proceed to the next middleware or the actual GraphQL router.
         response = await call_next(request)
-        return response
\ No newline at end of file
+        return response
+
+class RateLimitMiddleware(BaseHTTPMiddleware):
+    """
+    Applies per-client token buckets and the global concurrency gate to
+    /api/graphql (see app/helpers/rate_limit.py). Runs outside
+    AuthMiddleware, keying signed-in clients on their access token, so
+    rejected and shed requests never cost a user lookup. Rejected requests
+    get a 429 with a GraphQL-shaped error body and a Retry-After header.
+    """
+    def __init__(self, app, limiter=None, gate=None, path: str = "/api/graphql"):
+        super().__init__(app)
+        self.limiter = limiter or rate_limit.limiter
+        self.gate = gate or rate_limit.gate
+        self.path = path
+
+    async def dispatch(
+        self, request: Request, call_next: Callable[[Request], Response]
+    ) -> Response:
+        if request.method == "OPTIONS" or not request.url.path.startswith(self.path):
+            return await call_next(request)
+
+        # 1. Per-client token bucket, charged by the operations requested.
+        if request.method == "POST":
+            try:
+                payload = json.loads(await request.body() or b"null")
+            except ValueError:
+                payload = None
+        else:
+            payload = dict(request.query_params)
+        # Persisted-query requests are charged for the document their hash names.
+        payload = persisted_queries.expand(payload)
+        decision = await self.limiter.check(client_key(request), operation_cost(payload))
+        if not decision.allowed:
+            return _too_many_requests("Rate limit exceeded. Please slow down.", decision.retry_after)
+
+        # 2. Global concurrency gate, so the DB pool is never oversubscribed.
+        if not await self.gate.acquire():
+            return _too_many_requests("Server is busy. Please retry shortly.", 1)
+        try:
+            return await call_next(request)
+        finally:
+            self.gate.release()
+
+
+def _too_many_requests(message: str, retry_after: float) -> Response:
+    return JSONResponse(
+        {"data": None, "errors": [{"message": message, "extensions": {"code": "RATE_LIMITED"}}]},
+        status_code=429,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
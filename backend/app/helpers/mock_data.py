@@ -1,7 +1,6 @@
 import datetime
 from sqlalchemy.orm import Session
 from sqlalchemy import text
-from passlib.context import CryptContext
 
 # It's crucial to adjust the import paths if this script is in a 'scripts' directory
 # You may need to add the project root to the PYTHONPATH
@@ -16,11 +15,12 @@ from app.models.user import User, user_favorite_canteen_association
 from app.models.cart import Cart, CartItem
 from app.models.order import Order, OrderItem, OrderStep
 from app.models.payment import Merchant, Payment, UserWallet
+from app.helpers import wallet_ledger
+from app.helpers.passwords import hash_passwords
 # FIX: Import the missing Complaint model
 from app.models.complaints import Complaint
-
-# Use the same password context as the application
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from app.helpers.sales_rollups import rebuild_sales_rollups
+from app.helpers.complaint_counters import rebuild_complaint_counters
 
 # Developer-friendly passwords (override with environment variables in dev)
 DEV_STUDENT_PASSWORD = os.getenv("DEV_STUDENT_PASSWORD", "password123")
@@ -37,9 +37,10 @@ def add_mock_users(db: Session):
         {"id": "d4e5f6a7-b8c9-0123-def1-234567890123", "name": "Vendor North", "email": "dileepkumar.adari@students.iiit.ac.in", "password": DEV_VENDOR_PASSWORD, "role": "vendor"},
     ]
     
-    for user_data in users_data:
+    # Hash all passwords in parallel through the same pool the API uses.
+    hashed_passwords = hash_passwords([u["password"] for u in users_data])
+    for user_data, hashed_password in zip(users_data, hashed_passwords):
         existing_user = db.query(User).filter(User.id == user_data["id"]).first()
-        hashed_password = pwd_context.hash(user_data["password"])
         if not existing_user:
             db.add(User(**{k:v for k,v in user_data.items() if k != 'password'}, password=hashed_password))
         else:
@@ -53,8 +54,12 @@ def add_mock_users(db: Session):
     for user_data in users_data:
         uid = user_data["id"]
         if not db.query(UserWallet).filter(UserWallet.user_id == uid).first():
-            balance = 250.0 if user_data["role"] == "student" else 1000.0
-            db.add(UserWallet(user_id=uid, balance=balance))
+            wallet = UserWallet(user_id=uid)
+            db.add(wallet)
+            db.flush()
+            # Opening balances go through the ledger so balance == sum(entries).
+            balance_paise = 25000 if user_data["role"] == "student" else 100000
+            wallet_ledger.credit(db, wallet.id, balance_paise, "Opening balance", kind=wallet_ledger.ADJUSTMENT)
     db.commit()
     print("✅ Users and wallets seeded.")
     # Print developer credentials to make local login easier (only in dev)
@@ -368,7 +373,7 @@ def add_mock_orders_and_complaints(db: Session):
         db.flush()
 
         for item_data in items_data:
-            db.add(OrderItem(order_id=order.id, **item_data))
+            db.add(OrderItem(order_id=order.id, order_time=order.order_time, **item_data))
         
         if complaint_data:
             db.add(Complaint(user_id=order.user_id, order_id=order.id, **complaint_data))
@@ -417,6 +422,8 @@ def initialize_mock_data():
         add_mock_carts(db)
         add_mock_orders_and_complaints(db)
         add_mock_merchants(db)
+        rebuild_sales_rollups(db)
+        rebuild_complaint_counters(db)
         
         print("\n✅ All mock data seeded successfully!")
     except Exception as e:
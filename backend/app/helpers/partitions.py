@@ -0,0 +1,382 @@
+"""
+Partition maintenance and archival for the `orders` and `order_items` tables.
+
+`orders` is range-partitioned by month on `order_time` (alembic revision 0003),
+and `order_items` by month on a copy of its order's `order_time` (revision
+0014), with the same monthly bounds. This module keeps a rolling window of
+future partitions available for both and moves old, finished orders (with
+their items and steps) into the `*_archive` tables so the live partitions
+only hold recent history.
+
+Archived orders older than the freeze window are then packed into
+`order_archive_chunks` (revision 0015): one compressed jsonb array per
+canteen and month, so the oldest history costs a fraction of its row-store
+size while staying queryable from SQL. Readers decode chunks with the
+`FROZEN_*` fragments below.
+
+The background job runner (app/helpers/jobs.py) runs `maintain_partitions`
+every few hours on the job leader. It can also be run by hand:
+
+    python -m app.helpers.partitions            # create partitions + archive
+    python -m app.helpers.partitions 12         # archive orders older than 12 months
+    python -m app.helpers.partitions 12 36      # ... and freeze archives older than 36 months
+"""
+import logging
+import re
+import sys
+from datetime import date, datetime, timezone
+from types import SimpleNamespace
+from typing import List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.models.order import ArchivedOrder, ArchivedOrderItem, ArchivedOrderStep
+
+logger = logging.getLogger(__name__)
+
+# Orders in these statuses never change again and are safe to archive.
+ARCHIVABLE_ORDER_STATUSES = ["delivered", "completed", "cancelled"]
+
+DEFAULT_MONTHS_AHEAD = 3
+DEFAULT_ARCHIVE_AFTER_MONTHS = 6
+DEFAULT_ARCHIVE_BATCH_SIZE = 1000
+DEFAULT_FREEZE_AFTER_MONTHS = 24
+# Orders per chunk. A point lookup decompresses the whole chunk, so keep it modest.
+DEFAULT_FREEZE_CHUNK_ORDERS = 500
+
+# Partitioned tables, each with monthly partitions named `<table>_yYYYYmMM`.
+PARTITIONED_TABLES = ("orders", "order_items")
+
+# Frozen orders decoded as `orders_archive` rows aliased `o` (chunk `c`, raw
+# element `d`), and their lines as `order_items_archive` rows aliased `oi`.
+# Filter on c.canteen_id / c.month_start / c.month_end to skip whole chunks.
+FROZEN_ORDERS_FROM = (
+    "order_archive_chunks c "
+    "CROSS JOIN LATERAL jsonb_array_elements(c.orders) d "
+    "CROSS JOIN LATERAL jsonb_populate_record(NULL::orders_archive, d) o"
+)
+FROZEN_ITEMS_JOIN = "LATERAL jsonb_populate_recordset(NULL::order_items_archive, d->'items') oi"
+
+
+def _add_months(d: date, months: int) -> date:
+    """Returns the first day of the month `months` after the month of `d`."""
+    month_index = d.month - 1 + months
+    return date(d.year + month_index // 12, month_index % 12 + 1, 1)
+
+
+def partition_name(month_start: date, table: str = "orders") -> str:
+    """Returns the partition table name of `table` for the month starting at `month_start`."""
+    return f"{table}_y{month_start.year:04d}m{month_start.month:02d}"
+
+
+def is_partitioned(db: Session, table: str = "orders") -> bool:
+    """True when `table` is a partitioned parent (i.e. its partitioning migration has run)."""
+    relkind = db.execute(text("SELECT relkind FROM pg_class WHERE relname = :table"), {"table": table}).scalar()
+    return relkind == "p"
+
+
+def _monthly_partitions(db: Session, table: str = "orders") -> List[Tuple[date, str]]:
+    """(month start, name) of every monthly partition of `table`, oldest first."""
+    names = db.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = :table"
+    ), {"table": table}).scalars()
+    pattern = re.compile(rf"^{table}_y(\d{{4}})m(\d{{2}})$")
+    partitions = []
+    for name in names:
+        match = pattern.match(name)
+        if match:
+            partitions.append((date(int(match.group(1)), int(match.group(2)), 1), name))
+    return sorted(partitions)
+
+
+def ensure_order_partitions(db: Session, months_ahead: int = DEFAULT_MONTHS_AHEAD) -> List[str]:
+    """
+    Creates monthly partitions of every partitioned table from the current
+    month up to `months_ahead` months in the future. Existing partitions are
+    left untouched.
+
+    Returns:
+        The names of the partitions that were newly created.
+    """
+    created = []
+    for table in PARTITIONED_TABLES:
+        if not is_partitioned(db, table):
+            logger.info("%s is not partitioned; skipping partition maintenance.", table)
+            continue
+
+        existing = {name for _, name in _monthly_partitions(db, table)}
+        month = date.today().replace(day=1)
+        for _ in range(months_ahead + 1):
+            name = partition_name(month, table)
+            if name not in existing:
+                upper = _add_months(month, 1)
+                try:
+                    db.execute(text(
+                        f"CREATE TABLE {name} PARTITION OF {table} "
+                        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{upper.isoformat()}')"
+                    ))
+                    db.commit()
+                    created.append(name)
+                except Exception as e:
+                    # Usually means the default partition already holds rows for this
+                    # range; those need a manual split, so log and keep going.
+                    db.rollback()
+                    logger.warning("Could not create partition %s: %s", name, e)
+            month = _add_months(month, 1)
+
+    if created:
+        logger.info("Created partitions: %s", ", ".join(created))
+    return created
+
+
+def archive_orders(
+    db: Session,
+    older_than_months: int = DEFAULT_ARCHIVE_AFTER_MONTHS,
+    batch_size: int = DEFAULT_ARCHIVE_BATCH_SIZE,
+) -> int:
+    """
+    Moves finished orders older than `older_than_months` (plus their items and
+    steps) into the archive tables, `batch_size` orders per transaction.
+
+    Each batch is a single statement, so an order and its children are always
+    moved together.
+
+    Returns:
+        The total number of orders archived.
+    """
+    cutoff = datetime.combine(
+        _add_months(date.today().replace(day=1), -older_than_months),
+        datetime.min.time(),
+        tzinfo=timezone.utc,
+    )
+    # Explicit column lists: the physical column order of the live tables
+    # depends on migration history, so `SELECT *` is not safe here.
+    order_cols = ", ".join(c.name for c in ArchivedOrder.__table__.columns)
+    item_cols = ", ".join(c.name for c in ArchivedOrderItem.__table__.columns)
+    step_cols = ", ".join(c.name for c in ArchivedOrderStep.__table__.columns)
+    move_batch = text(
+        f"""
+        WITH batch AS (
+            SELECT id FROM orders
+            WHERE order_time < :cutoff AND status = ANY(:statuses)
+            ORDER BY order_time
+            LIMIT :batch_size
+        ),
+        moved_items AS (
+            DELETE FROM order_items
+            WHERE order_id IN (SELECT id FROM batch) AND order_time < :cutoff
+            RETURNING {item_cols}
+        ),
+        archived_items AS (
+            INSERT INTO order_items_archive ({item_cols}) SELECT {item_cols} FROM moved_items
+        ),
+        moved_steps AS (
+            DELETE FROM order_steps WHERE order_id IN (SELECT id FROM batch) RETURNING {step_cols}
+        ),
+        archived_steps AS (
+            INSERT INTO order_steps_archive ({step_cols}) SELECT {step_cols} FROM moved_steps
+        ),
+        moved_orders AS (
+            DELETE FROM orders
+            WHERE id IN (SELECT id FROM batch) AND order_time < :cutoff
+            RETURNING {order_cols}
+        ),
+        archived_orders AS (
+            INSERT INTO orders_archive ({order_cols}) SELECT {order_cols} FROM moved_orders RETURNING id
+        )
+        SELECT count(*) FROM archived_orders
+        """
+    )
+
+    total = 0
+    while True:
+        try:
+            moved = db.execute(move_batch, {
+                "cutoff": cutoff,
+                "statuses": ARCHIVABLE_ORDER_STATUSES,
+                "batch_size": batch_size,
+            }).scalar() or 0
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        total += moved
+        if moved < batch_size:
+            break
+
+    logger.info("Archived %d orders older than %s", total, cutoff.date())
+    for table in PARTITIONED_TABLES:
+        if is_partitioned(db, table):
+            drop_empty_partitions(db, before=cutoff.date(), table=table)
+    return total
+
+
+def drop_empty_partitions(db: Session, before: date, table: str = "orders") -> List[str]:
+    """
+    Detaches and drops monthly partitions of `table` that end on or before
+    `before` and no longer contain any rows (everything in them has been
+    archived). Every such partition is checked, including ones older than a
+    gap in the monthly sequence.
+
+    Returns:
+        The names of the dropped partitions.
+    """
+    dropped = []
+    for month, name in _monthly_partitions(db, table):
+        if _add_months(month, 1) > before:
+            break
+        has_rows = db.execute(text(f"SELECT EXISTS (SELECT 1 FROM {name})")).scalar()
+        if has_rows:
+            continue
+        db.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+        db.execute(text(f"DROP TABLE {name}"))
+        db.commit()
+        dropped.append(name)
+
+    if dropped:
+        logger.info("Dropped empty %s partitions: %s", table, ", ".join(dropped))
+    return dropped
+
+
+def freeze_archive(
+    db: Session,
+    older_than_months: int = DEFAULT_FREEZE_AFTER_MONTHS,
+    chunk_orders: int = DEFAULT_FREEZE_CHUNK_ORDERS,
+) -> int:
+    """
+    Moves archived orders older than `older_than_months` (plus their items and
+    steps) into compressed `order_archive_chunks`, one month per transaction.
+    Each month becomes one chunk per canteen and `chunk_orders` orders.
+
+    Returns:
+        The total number of orders frozen.
+    """
+    if not db.execute(text("SELECT to_regclass('order_archive_chunks') IS NOT NULL")).scalar():
+        logger.info("order_archive_chunks does not exist; skipping freeze.")
+        return 0
+
+    cutoff = _add_months(date.today().replace(day=1), -older_than_months)
+    oldest = db.execute(
+        text("SELECT min(order_time) FROM orders_archive WHERE order_time < :cutoff"),
+        {"cutoff": datetime.combine(cutoff, datetime.min.time(), tzinfo=timezone.utc)},
+    ).scalar()
+    if oldest is None:
+        return 0
+
+    # All three archive tables are drained and the chunks written in one
+    # statement, so an order is never half frozen.
+    freeze_month = text(
+        """
+        WITH picked AS (
+            SELECT id, canteen_id,
+                   (row_number() OVER (PARTITION BY canteen_id ORDER BY id) - 1) / :chunk_orders AS slice
+            FROM orders_archive
+            WHERE order_time >= :month_start AND order_time < :month_end
+        ),
+        moved_orders AS (
+            DELETE FROM orders_archive WHERE id IN (SELECT id FROM picked) RETURNING *
+        ),
+        moved_items AS (
+            DELETE FROM order_items_archive WHERE order_id IN (SELECT id FROM picked) RETURNING *
+        ),
+        moved_steps AS (
+            DELETE FROM order_steps_archive WHERE order_id IN (SELECT id FROM picked) RETURNING *
+        ),
+        item_docs AS (
+            SELECT order_id, jsonb_agg(to_jsonb(i) ORDER BY i.id) AS items FROM moved_items i GROUP BY order_id
+        ),
+        step_docs AS (
+            SELECT order_id, jsonb_agg(to_jsonb(s) ORDER BY s.id) AS steps FROM moved_steps s GROUP BY order_id
+        ),
+        chunks AS (
+            INSERT INTO order_archive_chunks (canteen_id, month_start, month_end, order_count, order_ids, orders)
+            SELECT p.canteen_id, :month_start, :month_end, count(*),
+                   array_agg(o.id ORDER BY o.id),
+                   jsonb_agg(
+                       to_jsonb(o) || jsonb_build_object(
+                           'items', coalesce(i.items, '[]'::jsonb),
+                           'steps', coalesce(s.steps, '[]'::jsonb)
+                       )
+                       ORDER BY o.id
+                   )
+            FROM moved_orders o
+            JOIN picked p ON p.id = o.id
+            LEFT JOIN item_docs i ON i.order_id = o.id
+            LEFT JOIN step_docs s ON s.order_id = o.id
+            GROUP BY p.canteen_id, p.slice
+            RETURNING order_count
+        )
+        SELECT coalesce(sum(order_count), 0) FROM chunks
+        """
+    )
+
+    total = 0
+    month = oldest.astimezone(timezone.utc).date().replace(day=1)
+    while month < cutoff:
+        upper = _add_months(month, 1)
+        try:
+            frozen = db.execute(freeze_month, {
+                "month_start": datetime.combine(month, datetime.min.time(), tzinfo=timezone.utc),
+                "month_end": datetime.combine(upper, datetime.min.time(), tzinfo=timezone.utc),
+                "chunk_orders": chunk_orders,
+            }).scalar() or 0
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        total += frozen
+        month = upper
+
+    logger.info("Froze %d archived orders older than %s", total, cutoff)
+    return total
+
+
+def find_frozen_order(db: Session, order_id: int) -> Optional[SimpleNamespace]:
+    """
+    Looks an order up in `order_archive_chunks`. Returns an object with the
+    `ArchivedOrder` attributes plus `items` (a list of archive item dicts), or
+    None when the order is not frozen.
+    """
+    row = db.execute(
+        text(
+            f"SELECT o.*, d->'items' AS items FROM {FROZEN_ORDERS_FROM} "
+            "WHERE c.order_ids @> ARRAY[CAST(:order_id AS integer)] AND o.id = :order_id"
+        ),
+        {"order_id": order_id},
+    ).mappings().first()
+    return SimpleNamespace(**row) if row else None
+
+
+def maintain_partitions(
+    db: Session,
+    older_than_months: int = DEFAULT_ARCHIVE_AFTER_MONTHS,
+    freeze_after_months: int = DEFAULT_FREEZE_AFTER_MONTHS,
+) -> None:
+    """Creates upcoming partitions, archives old orders and freezes old archives. Commits as it goes."""
+    ensure_order_partitions(db)
+    archive_orders(db, older_than_months=older_than_months)
+    freeze_archive(db, older_than_months=max(freeze_after_months, older_than_months))
+
+
+def run_maintenance(
+    older_than_months: int = DEFAULT_ARCHIVE_AFTER_MONTHS,
+    freeze_after_months: int = DEFAULT_FREEZE_AFTER_MONTHS,
+) -> None:
+    """`maintain_partitions` in a fresh session."""
+    from app.core.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        maintain_partitions(db, older_than_months=older_than_months, freeze_after_months=freeze_after_months)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    months = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ARCHIVE_AFTER_MONTHS
+    freeze_months = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_FREEZE_AFTER_MONTHS
+    run_maintenance(older_than_months=months, freeze_after_months=freeze_months)
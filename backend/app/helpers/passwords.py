@@ -0,0 +1,215 @@
+"""
+Password hashing off the event loop.
+
+bcrypt is slow on purpose (~250 ms per hash at cost 12). Called inline from an
+async resolver, it blocks the worker's event loop for that long, so a wave of
+logins stalls every other request on the worker. All hashing and verification
+therefore goes through a small process pool:
+
+- `hash_password` / `verify_password` are awaitable and run bcrypt in one of
+  `PASSWORD_HASH_WORKERS` processes, so the loop keeps serving other requests.
+- Admission control: at most `PASSWORD_HASH_MAX_PENDING` operations may be
+  queued or running per API worker. Beyond that `PasswordHasherBusyError` is
+  raised straight away instead of letting the queue, and login latency, grow
+  without bound.
+- `verify_password` also returns a replacement hash when the stored one was
+  made with fewer rounds than `BCRYPT_ROUNDS`, so callers can rehash on login.
+- `stats()` reports queue depth, peak depth, rejections and time spent.
+
+With `PASSWORD_HASH_WORKERS=0` the work runs on the event loop's default
+thread pool instead (bcrypt releases the GIL), for hosts that cannot spawn
+processes.
+
+A load test (non-auth request latency during a login burst, inline vs pool)
+lives in bench/passwords.py.
+"""
+import asyncio
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple
+
+from passlib.context import CryptContext
+
+from app.core.config import BCRYPT_ROUNDS, PASSWORD_HASH_MAX_PENDING, PASSWORD_HASH_WORKERS
+from app.helpers.exceptions import PasswordHasherBusyError
+
+logger = logging.getLogger(__name__)
+
+# Hashes below the configured cost are reported as needing an update, so raising
+# BCRYPT_ROUNDS upgrades users as they log in. Lowering it never weakens hashes.
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+)
+
+
+# These run inside the pool's worker processes and must stay module-level.
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    try:
+        return pwd_context.verify_and_update(password, hashed)
+    except (TypeError, ValueError):
+        # Malformed or foreign hash; treat it like a wrong password.
+        return False, None
+
+
+def _noop() -> None:
+    return None
+
+
+@dataclass
+class PasswordHasherStats:
+    workers: int
+    max_pending: int
+    # Operations queued or running right now, and the highest that has been seen.
+    pending: int
+    peak_pending: int
+    completed: int
+    rejected: int
+    # Wall time from admission to result, summed over completed operations.
+    total_seconds: float
+
+
+class PasswordHasher:
+    """A bounded pool for bcrypt work, shared by every request on this process."""
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_pending: int = PASSWORD_HASH_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._peak_pending = 0
+        self._completed = 0
+        self._rejected = 0
+        self._total_seconds = 0.0
+
+    def _get_executor(self) -> Optional[Executor]:
+        if self.workers <= 0:
+            return None
+        with self._lock:
+            if self._executor is None:
+                # spawn rather than fork: the API process runs threads (DB pool,
+                # background jobs) that a forked child must not inherit.
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    def _admit(self) -> float:
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                raise PasswordHasherBusyError("Too many sign-ins in progress. Please try again shortly.")
+            self._pending += 1
+            self._peak_pending = max(self._peak_pending, self._pending)
+        return time.perf_counter()
+
+    def _release(self, started: float) -> None:
+        with self._lock:
+            self._pending -= 1
+            self._completed += 1
+            self._total_seconds += time.perf_counter() - started
+
+    def _reset_broken_pool(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            logger.error("Password hashing pool broke (worker died); starting a new one.")
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, func: Callable, *args):
+        """Runs `func(*args)` in the pool without blocking the event loop."""
+        started = self._admit()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), func, *args)
+        except BrokenProcessPool:
+            self._reset_broken_pool()
+            raise
+        finally:
+            self._release(started)
+
+    def run_sync(self, func: Callable, *args):
+        """Blocking variant of `run` for scripts and sync code paths."""
+        started = self._admit()
+        try:
+            executor = self._get_executor()
+            return executor.submit(func, *args).result() if executor else func(*args)
+        except BrokenProcessPool:
+            self._reset_broken_pool()
+            raise
+        finally:
+            self._release(started)
+
+    def warm_up(self) -> None:
+        """Starts the worker processes now, so the first logins don't pay for spawning them."""
+        executor = self._get_executor()
+        if executor is not None:
+            for _ in range(self.workers):
+                executor.submit(_noop)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def stats(self) -> PasswordHasherStats:
+        with self._lock:
+            return PasswordHasherStats(
+                workers=self.workers,
+                max_pending=self.max_pending,
+                pending=self._pending,
+                peak_pending=self._peak_pending,
+                completed=self._completed,
+                rejected=self._rejected,
+                total_seconds=round(self._total_seconds, 3),
+            )
+
+
+_hasher = PasswordHasher()
+
+
+async def hash_password(password: str) -> str:
+    return await _hasher.run(_hash, password)
+
+
+async def verify_password(password: str, hashed: Optional[str]) -> Tuple[bool, Optional[str]]:
+    """
+    Checks `password` against a stored hash. Returns (matches, new_hash), where
+    `new_hash` is set when the stored hash should be replaced (cost changed).
+    """
+    if not hashed:
+        # Accounts created through CAS have no local password.
+        return False, None
+    return await _hasher.run(_verify, password, hashed)
+
+
+def hash_passwords(passwords: List[str]) -> List[str]:
+    """Hashes several passwords in parallel across the pool (e.g. when seeding users)."""
+    executor = _hasher._get_executor()
+    if executor is None:
+        return [_hash(p) for p in passwords]
+    return list(executor.map(_hash, passwords))
+
+
+def warm_up() -> None:
+    _hasher.warm_up()
+
+
+def shutdown() -> None:
+    _hasher.shutdown()
+
+
+def stats() -> PasswordHasherStats:
+    return _hasher.stats()
@@ -1,7 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Header
 from sqlalchemy.orm import Session
 import logging
-import traceback
 
 from app.core.database import get_db
 from app.helpers.payment_service import PaymentService
@@ -9,6 +8,7 @@ from app.models.payment import Merchant, PaymentMethod
 from sqlalchemy import text
 from app.models.order import Order
 from app.helpers.exceptions import ServiceError, PaymentVerificationError
+from app.helpers.payment_webhooks import verify_signature, enqueue_event
 from pydantic import BaseModel
 from typing import Any, Dict, Optional
 
@@ -124,9 +124,6 @@ async def initiate_payment_for_order(
     except Exception as e:
         # Log the full traceback for debugging in dev environments, then return a generic 500 to the client.
         logging.exception("Unexpected error in initiate_payment_for_order: %s", e)
-        traceback_str = traceback.format_exc()
-        # Also print the traceback to stdout so it appears in container logs immediately.
-        print(traceback_str)
         raise HTTPException(status_code=500, detail="An unexpected error occurred while initiating payment.")
 
 @router.post("/verify", response_model=VerifyPaymentResponse)
@@ -156,4 +153,25 @@ async def verify_razorpay_payment(
     except ServiceError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail="An unexpected error occurred during payment verification.")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="An unexpected error occurred during payment verification.")
+
+@router.post("/webhook")
+async def receive_payment_webhook(
+    request: Request,
+    x_razorpay_signature: Optional[str] = Header(None),
+    x_razorpay_event_id: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Receives payment gateway webhooks. The event is only verified and queued
+    here; webhook workers apply it to payments and orders asynchronously, so
+    orders are confirmed even if the customer's browser never calls /verify.
+    """
+    body = await request.body()
+    if not verify_signature(body, x_razorpay_signature):
+        raise HTTPException(status_code=400, detail="Invalid webhook signature.")
+    try:
+        queued = enqueue_event(db, body, x_razorpay_event_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"status": "queued" if queued else "duplicate"}
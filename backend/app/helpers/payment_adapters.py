@@ -6,9 +6,14 @@ from sqlalchemy.orm import Session
 from pydantic import BaseModel
 
 # It's good practice to have a central place for your custom exceptions
-from app.helpers.exceptions import PaymentProcessingError, PaymentVerificationError, RefundError
+from app.helpers.exceptions import PaymentProcessingError, PaymentVerificationError, RefundError, ServiceError
 from app.models.payment import PaymentMethod # Assuming you have a PaymentMethod enum
 from app.helpers.payment_repository import WalletRepository
+from app.helpers.payment_clients import gateway_clients
+from app.helpers.wallet_ledger import REFUND, to_paise
+
+# Prefix of the processor payment id recorded for wallet payments.
+WALLET_TXN_PREFIX = "wallet_txn_"
 
 # ===================================================================
 # 1. STANDARDIZED DATA CONTRACTS (PYDANTIC MODELS)
@@ -52,12 +57,17 @@ class PaymentProcessor:
     def verify_payment(self, verification_data: Dict[str, Any]) -> VerifyPaymentOutput:
         raise NotImplementedError
 
-    def refund_payment(self, payment_id: str, amount: float) -> RefundOutput:
+    def refund_payment(self, payment_id: str, amount: float, reference: Optional[str] = None) -> RefundOutput:
+        """`reference` identifies the refund on our side (e.g. the refund request) and makes retries safe where supported."""
         raise NotImplementedError
 
 
 class RazorpayAdapter(PaymentProcessor):
-    def __init__(self, key_id: str, key_secret: str):
+    def __init__(self, key_id: str, key_secret: str, client: Optional[razorpay.Client] = None):
+        if client is not None:
+            # Shared, pooled client from the process-wide registry.
+            self.client = client
+            return
         try:
             self.client = razorpay.Client(auth=(key_id, key_secret))
         except Exception as e:
@@ -99,10 +109,12 @@ class RazorpayAdapter(PaymentProcessor):
         except Exception as e:
             raise PaymentVerificationError(f"Razorpay signature verification failed: {e}")
 
-    def refund_payment(self, payment_id: str, amount: float) -> RefundOutput:
+    def refund_payment(self, payment_id: str, amount: float, reference: Optional[str] = None) -> RefundOutput:
         try:
-            amount_in_paise = int(amount * 100)
-            refund = self.client.payment.refund(payment_id, {"amount": amount_in_paise})
+            data = {"amount": to_paise(amount)}
+            if reference:
+                data["receipt"] = reference
+            refund = self.client.payment.refund(payment_id, data)
             return RefundOutput(
                 processor_refund_id=refund["id"],
                 status=refund["status"],
@@ -130,24 +142,30 @@ class MockRazorpayAdapter(PaymentProcessor):
         proc_payment_id = verification_data.get("razorpay_payment_id") or f"mock_payment_{uuid.uuid4().hex[:8]}"
         return VerifyPaymentOutput(processor_payment_id=proc_payment_id, full_response={"status": "captured"})
 
-    def refund_payment(self, payment_id: str, amount: float) -> RefundOutput:
+    def refund_payment(self, payment_id: str, amount: float, reference: Optional[str] = None) -> RefundOutput:
         return RefundOutput(processor_refund_id=f"mock_refund_{uuid.uuid4().hex[:8]}", status="completed", full_response={"status": "completed"})
 
 
 class WalletAdapter(PaymentProcessor):
-    def __init__(self, db: Session):
-        self.wallet_repo = WalletRepository(db)
+    """
+    Pays from the buyer's wallet through the ledger engine. Verification data
+    is supplied by PaymentService from the payment record, never by the client:
+    {"payment_id", "user_id", "amount"}.
+    """
+    def __init__(self, db: Session, wallet_repo: Optional[WalletRepository] = None):
+        # Pass a unit of work's repository to make wallet writes part of its transaction.
+        self.wallet_repo = wallet_repo or WalletRepository(db)
 
     def process_payment(self, payment_data: Dict[str, Any]) -> ProcessPaymentOutput:
         user_id = payment_data["user_id"]
         amount = payment_data["amount"]
         
-        # Repository methods use different names; use the available API.
         wallet = self.wallet_repo.get_by_user_id(user_id)
         if not wallet:
             wallet = self.wallet_repo.create(user_id)
 
-        if wallet.balance < amount:
+        # Early, advisory check only; the debit itself re-checks atomically.
+        if wallet.balance_paise + wallet.credit_limit_paise < to_paise(amount):
             raise PaymentProcessingError("Insufficient balance in wallet.")
 
         # For wallet, the "order" is just a temporary transaction ID
@@ -158,44 +176,61 @@ class WalletAdapter(PaymentProcessor):
         )
 
     def verify_payment(self, verification_data: Dict[str, Any]) -> VerifyPaymentOutput:
-        wallet_id = verification_data["wallet_id"]
-        amount = verification_data["amount"]
-        
+        payment_id = verification_data["payment_id"]
+        wallet = self.wallet_repo.get_by_user_id(verification_data["user_id"])
+        if not wallet:
+            raise PaymentVerificationError("Wallet not found for this user.")
+
         try:
-            # Deduct balance and create a transaction record
-            # update_balance returns the wallet after modification
-            updated_wallet = self.wallet_repo.update_balance(wallet_id, -amount)
-            # We don't have a transaction DTO handy here; return a synthetic id for demo purposes
-            txn_id = f"wallet_txn_{uuid.uuid4().hex[:10]}"
-            return VerifyPaymentOutput(
-                processor_payment_id=txn_id,
-                full_response={"status": "success", "balance_deducted": amount, "wallet_id": getattr(updated_wallet, 'id', wallet_id)}
+            # Keyed on the payment, so verifying the same payment twice debits once.
+            entry = self.wallet_repo.debit(
+                wallet.id,
+                to_paise(verification_data["amount"]),
+                f"Payment {payment_id}",
+                payment_id=payment_id,
+                idempotency_key=f"payment:{payment_id}:debit",
             )
-        except Exception as e:
-            # This could happen if the wallet is not found or DB fails
+        except ServiceError as e:
             raise PaymentVerificationError(f"Failed to verify wallet payment: {e}")
+        return VerifyPaymentOutput(
+            processor_payment_id=f"{WALLET_TXN_PREFIX}{entry.entry_id}",
+            full_response={
+                "status": "success",
+                "wallet_id": wallet.id,
+                "balance_deducted_paise": -entry.amount_paise,
+                "balance_paise": entry.balance_paise,
+            },
+        )
 
-    def refund_payment(self, payment_id: str, amount: float) -> RefundOutput:
-        # Here, payment_id would be our internal WalletTransaction ID
+    def refund_payment(self, payment_id: str, amount: float, reference: Optional[str] = None) -> RefundOutput:
+        # payment_id is the processor payment id returned by verify_payment ("wallet_txn_<ledger id>").
         try:
-            transaction = self.wallet_repo.get_transaction_by_id(int(payment_id))
-            if not transaction:
-                raise RefundError("Original wallet transaction not found.")
-
-            # Add the amount back to the wallet
-            self.wallet_repo.update_wallet_balance(transaction.wallet_id, amount)
-            refund_transaction = self.wallet_repo.add_transaction(
-                wallet_id=transaction.wallet_id,
-                amount=amount, # Positive amount for refund
-                description=f"Refund for transaction {payment_id}"
-            )
-            return RefundOutput(
-                processor_refund_id=str(refund_transaction.id),
-                status="completed",
-                full_response={"status": "success", "balance_credited": amount}
+            transaction = self.wallet_repo.get_transaction_by_id(int(str(payment_id).replace(WALLET_TXN_PREFIX, "")))
+        except ValueError:
+            transaction = None
+        if not transaction or transaction.amount_paise >= 0:
+            raise RefundError("Original wallet debit not found.")
+
+        amount_paise = to_paise(amount)
+        if amount_paise <= 0 or amount_paise > -transaction.amount_paise:
+            raise RefundError("Refund amount must be positive and at most the original debit.")
+        try:
+            entry = self.wallet_repo.credit(
+                transaction.wallet_id,
+                amount_paise,
+                f"Refund for wallet transaction {transaction.id}",
+                kind=REFUND,
+                payment_id=transaction.payment_id,
+                # Retrying the same refund reference credits once.
+                idempotency_key=f"refund:{reference}" if reference else None,
             )
-        except Exception as e:
+        except ServiceError as e:
             raise RefundError(f"Wallet refund failed: {e}")
+        return RefundOutput(
+            processor_refund_id=str(entry.entry_id),
+            status="completed",
+            full_response={"status": "success", "balance_credited_paise": amount_paise, "balance_paise": entry.balance_paise}
+        )
 
 
 # ===================================================================
@@ -205,7 +240,8 @@ class WalletAdapter(PaymentProcessor):
 def get_payment_processor(
     method: PaymentMethod,
     db: Session,
-    merchant_info: Optional[Dict[str, Any]] = None
+    merchant_info: Optional[Dict[str, Any]] = None,
+    wallet_repo: Optional[WalletRepository] = None,
 ) -> PaymentProcessor:
     """
     Factory function to get the correct payment processor instance.
@@ -214,12 +250,13 @@ def get_payment_processor(
         method: The payment method enum (e.g., PaymentMethod.UPI).
         db: The SQLAlchemy database session.
         merchant_info: A dictionary with merchant credentials if required.
+        wallet_repo: Optional wallet repository (e.g. from a UnitOfWork) for wallet payments.
 
     Returns:
         An instance of a PaymentProcessor.
     """
     if method == PaymentMethod.WALLET:
-        return WalletAdapter(db)
+        return WalletAdapter(db, wallet_repo)
     
     if method == PaymentMethod.UPI:
         # If merchant credentials are missing or obviously placeholder values (seeded test values),
@@ -233,7 +270,8 @@ def get_payment_processor(
         ):
             return MockRazorpayAdapter()
 
-        return RazorpayAdapter(key_id=merchant_info["key_id"], key_secret=merchant_info["key_secret"]) 
+        key_id, key_secret = merchant_info["key_id"], merchant_info["key_secret"]
+        return RazorpayAdapter(key_id=key_id, key_secret=key_secret, client=gateway_clients.get(key_id, key_secret))
     
     # Add other payment methods like PAY_LATER here
     
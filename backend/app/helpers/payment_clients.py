@@ -0,0 +1,204 @@
+"""
+Process-wide registry of payment gateway clients and merchant credentials.
+
+Building a `razorpay.Client` per request costs a fresh `requests.Session` (and
+so a new TCP + TLS handshake per call) plus a `pkg_resources` lookup on every
+request for the User-Agent. `GatewayClientRegistry` keeps one client per set of
+merchant credentials, each backed by a keep-alive connection pool with default
+timeouts and retry with exponential backoff. The registry is bounded (LRU);
+evicted clients have their pools closed.
+
+Clients are keyed by (key_id, hash of key_secret), so rotated keys never reuse
+a stale client. Merchant credentials are cached briefly per canteen/merchant,
+and both caches are invalidated whenever a `Merchant` row is updated or deleted
+in this process.
+
+A benchmark against a local HTTP stub of the gateway lives in
+bench/payment_clients.py.
+"""
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import razorpay
+import requests
+from requests.adapters import HTTPAdapter
+from sqlalchemy import event, inspect as sa_inspect
+from sqlalchemy.orm import Session
+from urllib3.util.retry import Retry
+
+from app.helpers.cache import TTLCache
+from app.models.payment import Merchant
+
+logger = logging.getLogger(__name__)
+
+# (connect, read) seconds
+GATEWAY_TIMEOUT = (3.05, 15.0)
+GATEWAY_POOL_SIZE = int(os.getenv("PAYMENT_GATEWAY_POOL_SIZE", "10"))
+MAX_GATEWAY_CLIENTS = 64
+MERCHANT_CACHE_TTL = 300.0
+
+
+class _GatewaySession(requests.Session):
+    """A requests session that applies a default timeout to every request."""
+
+    def __init__(self, timeout=GATEWAY_TIMEOUT):
+        super().__init__()
+        self._default_timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self._default_timeout)
+        return super().request(method, url, **kwargs)
+
+
+def _build_session(pool_size: int = GATEWAY_POOL_SIZE) -> requests.Session:
+    # Connection failures are retried for every method (nothing reached the
+    # gateway). Read errors and 429/5xx responses are only retried for
+    # idempotent methods, so an order is never created twice.
+    retry = Retry(
+        total=3,
+        connect=3,
+        read=2,
+        status=2,
+        backoff_factor=0.2,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({"GET", "HEAD", "OPTIONS"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+    session = _GatewaySession()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def build_gateway_client(key_id: str, key_secret: str, base_url: Optional[str] = None) -> razorpay.Client:
+    """Creates a Razorpay client on a pooled, retrying session."""
+    options = {}
+    base_url = base_url or os.getenv("RAZORPAY_BASE_URL")
+    if base_url:
+        options["base_url"] = base_url
+    client = razorpay.Client(session=_build_session(), auth=(key_id, key_secret), **options)
+    # The SDK resolves its own version through pkg_resources on every request.
+    version = client._get_version()
+    client._get_version = lambda: version
+    return client
+
+
+class GatewayClientRegistry:
+    """A bounded, thread-safe LRU of gateway clients keyed by merchant credentials."""
+
+    def __init__(self, maxsize: int = MAX_GATEWAY_CLIENTS):
+        self.maxsize = maxsize
+        self._clients: "OrderedDict[Tuple[str, str], razorpay.Client]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(key_id: str, key_secret: str) -> Tuple[str, str]:
+        return key_id, hashlib.sha256(key_secret.encode()).hexdigest()
+
+    def get(self, key_id: str, key_secret: str) -> razorpay.Client:
+        key = self._key(key_id, key_secret)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self._clients.move_to_end(key)
+                return client
+        client = build_gateway_client(key_id, key_secret)
+        evicted = []
+        with self._lock:
+            existing = self._clients.get(key)
+            if existing is not None:
+                # Another thread built one first; keep theirs.
+                evicted.append(client)
+                client = existing
+            else:
+                self._clients[key] = client
+            while len(self._clients) > self.maxsize:
+                evicted.append(self._clients.popitem(last=False)[1])
+        for stale in evicted:
+            stale.session.close()
+        return client
+
+    def invalidate(self, key_id: Optional[str] = None) -> None:
+        """Drops (and closes) clients for `key_id`, or all clients when omitted."""
+        with self._lock:
+            keys = [k for k in self._clients if key_id is None or k[0] == key_id]
+            stale = [self._clients.pop(k) for k in keys]
+        for client in stale:
+            client.session.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._clients)
+
+
+gateway_clients = GatewayClientRegistry()
+
+
+# ===================================================================
+# Merchant credentials
+# ===================================================================
+
+@dataclass(frozen=True)
+class MerchantCredentials:
+    merchant_id: int
+    canteen_id: int
+    key_id: str
+    key_secret: str
+
+    def as_merchant_info(self) -> dict:
+        return {"key_id": self.key_id, "key_secret": self.key_secret}
+
+
+_merchant_cache = TTLCache(maxsize=1024, ttl=MERCHANT_CACHE_TTL)
+
+
+def _to_credentials(merchant: Optional[Merchant]) -> Optional[MerchantCredentials]:
+    if merchant is None:
+        return None
+    return MerchantCredentials(
+        merchant_id=merchant.id,
+        canteen_id=merchant.canteen_id,
+        key_id=merchant.razorpay_key_id,
+        key_secret=merchant.razorpay_key_secret,
+    )
+
+
+def get_merchant_credentials(
+    db: Session, canteen_id: Optional[int] = None, merchant_id: Optional[int] = None
+) -> Optional[MerchantCredentials]:
+    """Returns a canteen's (or a merchant's) gateway credentials, cached for a few minutes."""
+    if canteen_id is not None:
+        key, column, value = ("canteen", canteen_id), Merchant.canteen_id, canteen_id
+    elif merchant_id is not None:
+        key, column, value = ("merchant", merchant_id), Merchant.id, merchant_id
+    else:
+        return None
+    creds = _merchant_cache.get(key)
+    if creds is None:
+        creds = _to_credentials(db.query(Merchant).filter(column == value).first())
+        if creds is not None:
+            _merchant_cache.set(key, creds)
+    return creds
+
+
+def invalidate_merchant(merchant: Merchant) -> None:
+    """Forgets cached credentials and gateway clients for a merchant."""
+    _merchant_cache.invalidate(("merchant", merchant.id))
+    _merchant_cache.invalidate(("canteen", merchant.canteen_id))
+    gateway_clients.invalidate(merchant.razorpay_key_id)
+    # During a flush the previous key id (if it changed) is still in the attribute history.
+    for old_key_id in sa_inspect(merchant).attrs.razorpay_key_id.history.deleted or ():
+        gateway_clients.invalidate(old_key_id)
+
+
+@event.listens_for(Merchant, "after_update")
+@event.listens_for(Merchant, "after_delete")
+def _invalidate_on_merchant_change(mapper, connection, target) -> None:
+    invalidate_merchant(target)
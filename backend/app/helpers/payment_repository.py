@@ -5,25 +5,49 @@ from app.models.payment import Payment, Merchant, UserWallet, WalletTransaction
 from app.models.payment_dtos import (
     PaymentCreateDTO, PaymentUpdateDTO,
     MerchantCreateDTO, MerchantUpdateDTO,
-    WalletTransactionCreateDTO,
 )
+from app.helpers import wallet_ledger
+from app.helpers.wallet_ledger import LedgerEntry
+
+class _Repository:
+    """
+    Base for repositories. Standalone repositories commit each write; inside a
+    `UnitOfWork` they only flush, and the unit of work commits once.
+    """
+    def __init__(self, db: Session, auto_commit: bool = True):
+        self.db = db
+        self.auto_commit = auto_commit
+
+    def _save(self, *instances) -> None:
+        """Commits (or, inside a unit of work, flushes) and refreshes the given instances."""
+        if self.auto_commit:
+            self.db.commit()
+            for instance in instances:
+                self.db.refresh(instance)
+        else:
+            self.db.flush()
 
-class PaymentRepository:
+
+class PaymentRepository(_Repository):
     """Repository class for all Payment-related database operations."""
-    def __init__(self, db: Session):
-        self.db = db
 
     def create(self, payment_data: PaymentCreateDTO) -> Payment:
         """Creates a new payment record using a type-safe DTO."""
         db_payment = Payment(**payment_data.dict())
         self.db.add(db_payment)
-        self.db.commit()
-        self.db.refresh(db_payment)
+        self._save(db_payment)
         return db_payment
 
-    def get_by_id(self, payment_id: int) -> Optional[Payment]:
-        """Gets a payment by its primary key."""
-        return self.db.query(Payment).filter(Payment.id == payment_id).first()
+    def get_by_id(self, payment_id: int, for_update: bool = False) -> Optional[Payment]:
+        """
+        Gets a payment by its primary key, optionally locking the row. A locked
+        read reloads the row, so an instance already in the session picks up
+        whatever a concurrent transaction committed before the lock was granted.
+        """
+        q = self.db.query(Payment).filter(Payment.id == payment_id)
+        if for_update:
+            q = q.with_for_update().populate_existing()
+        return q.first()
 
     def get_by_order_id(self, order_id: int) -> List[Payment]:
         """Gets all payments associated with a specific order ID."""
@@ -44,22 +68,18 @@ class PaymentRepository:
             # exclude_unset=True ensures we only update fields that were actually provided.
             for key, value in update_data.dict(exclude_unset=True).items():
                 setattr(payment, key, value)
-            self.db.commit()
-            self.db.refresh(payment)
+            self._save(payment)
         return payment
 
 
-class MerchantRepository:
+class MerchantRepository(_Repository):
     """Repository class for Merchant-related database operations."""
-    def __init__(self, db: Session):
-        self.db = db
 
     def create(self, merchant_data: MerchantCreateDTO) -> Merchant:
         """Creates a new merchant from a type-safe DTO."""
         db_merchant = Merchant(**merchant_data.dict())
         self.db.add(db_merchant)
-        self.db.commit()
-        self.db.refresh(db_merchant)
+        self._save(db_merchant)
         return db_merchant
 
     def get_by_id(self, merchant_id: int) -> Optional[Merchant]:
@@ -71,38 +91,67 @@ class MerchantRepository:
         return self.db.query(Merchant).filter(Merchant.canteen_id == canteen_id).first()
 
 
-class WalletRepository:
+class WalletRepository(_Repository):
     """Repository for all UserWallet and WalletTransaction database operations."""
-    def __init__(self, db: Session):
-        self.db = db
 
     def get_by_user_id(self, user_id: str) -> Optional[UserWallet]:
         """Gets a user's wallet by their user ID."""
         return self.db.query(UserWallet).filter(UserWallet.user_id == user_id).first()
 
-    def create(self, user_id: str, is_privileged: bool = False, credit_limit: float = 0.0) -> UserWallet:
-        """Creates a new wallet for a user."""
-        wallet = UserWallet(user_id=user_id, is_privileged=is_privileged, credit_limit=credit_limit)
+    def create(self, user_id: str, is_privileged: bool = False, credit_limit_paise: int = 0) -> UserWallet:
+        """Creates a new, empty wallet for a user."""
+        wallet = UserWallet(user_id=user_id, is_privileged=is_privileged, credit_limit_paise=credit_limit_paise)
         self.db.add(wallet)
-        self.db.commit()
-        self.db.refresh(wallet)
+        self._save(wallet)
         return wallet
 
-    def update_balance(self, wallet_id: int, amount_change: float) -> Optional[UserWallet]:
+    def get_transaction_by_id(self, transaction_id: int) -> Optional[WalletTransaction]:
+        """Gets a wallet ledger entry by its primary key."""
+        return self.db.query(WalletTransaction).filter(WalletTransaction.id == transaction_id).first()
+
+    def debit(self, wallet_id: int, amount_paise: int, description: str, **kwargs) -> LedgerEntry:
         """
-        Updates a wallet's balance safely using a database lock to prevent race conditions.
+        Atomically debits a wallet and records the ledger entry; raises
+        InsufficientFundsError if the balance plus credit limit does not cover it.
         """
-        wallet = self.db.query(UserWallet).filter(UserWallet.id == wallet_id).with_for_update().first()
-        if wallet:
-            wallet.balance += amount_change
-            self.db.commit()
-            self.db.refresh(wallet)
-        return wallet
+        entry = wallet_ledger.debit(self.db, wallet_id, amount_paise, description, **kwargs)
+        self._save()
+        return entry
+
+    def credit(self, wallet_id: int, amount_paise: int, description: str, **kwargs) -> LedgerEntry:
+        """Atomically credits a wallet and records the ledger entry."""
+        entry = wallet_ledger.credit(self.db, wallet_id, amount_paise, description, **kwargs)
+        self._save()
+        return entry
+
+
+class UnitOfWork:
+    """
+    Groups repository writes into a single transaction.
+
+        with UnitOfWork(db) as uow:
+            uow.payments.update(...)
+            ...
+            uow.commit()
+
+    Repositories obtained from the unit of work flush instead of committing.
+    Leaving the block without calling `commit()` (or with an exception)
+    rolls everything back.
+    """
+    def __init__(self, db: Session):
+        self.db = db
+        self.payments = PaymentRepository(db, auto_commit=False)
+        self.merchants = MerchantRepository(db, auto_commit=False)
+        self.wallets = WalletRepository(db, auto_commit=False)
+        self._committed = False
+
+    def __enter__(self) -> "UnitOfWork":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is not None or not self._committed:
+            self.db.rollback()
 
-    def add_transaction(self, transaction_data: WalletTransactionCreateDTO) -> WalletTransaction:
-        """Adds a new transaction record to a wallet's history."""
-        transaction = WalletTransaction(**transaction_data.dict())
-        self.db.add(transaction)
+    def commit(self) -> None:
         self.db.commit()
-        self.db.refresh(transaction)
-        return transaction
\ No newline at end of file
+        self._committed = True
@@ -1,11 +1,15 @@
+from datetime import datetime, timezone
 from sqlalchemy.orm import Session
 from typing import Dict, Any, Optional, List
 
-from app.helpers.payment_repository import PaymentRepository, MerchantRepository
+from app.helpers.payment_repository import PaymentRepository, MerchantRepository, UnitOfWork
 from app.helpers.payment_adapters import get_payment_processor, PaymentVerificationError
+from app.helpers.payment_clients import get_merchant_credentials
 from app.models.payment import Payment, PaymentMethod, PaymentStatus
-from app.models.order import Order # Assuming you have an Order model to get details
+from app.models.order import Order, OrderStep
+from app.models.cart import Cart
 from app.models.payment_dtos import PaymentCreateDTO, PaymentUpdateDTO
+from app.helpers.sales_rollups import record_order_status_change
 from app.helpers.exceptions import (
     OrderNotFoundError, PaymentAlreadyCompletedError,
     UnsupportedPaymentMethodError, MerchantNotFoundError, ServiceError
@@ -45,13 +49,11 @@ class PaymentService:
         if any(p.payment_status == PaymentStatus.COMPLETED for p in existing_payments):
             raise PaymentAlreadyCompletedError("This order has already been paid for.")
 
-        # 3. Get Merchant Info if needed
-        merchant_info = None
-        if payment_method == PaymentMethod.UPI:
-            merchant = self.merchant_repo.get_by_canteen_id(order.canteen_id)
-            if not merchant:
-                raise MerchantNotFoundError("No active merchant found for this canteen.")
-            merchant_info = {"key_id": merchant.razorpay_key_id, "key_secret": merchant.razorpay_key_secret}
+        # 3. Get Merchant Info (every payment, wallet included, is recorded against the canteen's merchant)
+        merchant = get_merchant_credentials(self.db, canteen_id=order.canteen_id)
+        if not merchant:
+            raise MerchantNotFoundError("No active merchant found for this canteen.")
+        merchant_info = merchant.as_merchant_info() if payment_method == PaymentMethod.UPI else None
 
         # 4. Get the correct payment processor from the factory
         try:
@@ -67,7 +69,7 @@ class PaymentService:
         payment_dto = PaymentCreateDTO(
             order_id=order_id,
             user_id=user_id,
-            merchant_id=merchant.id if merchant else None,
+            merchant_id=merchant.merchant_id,
             amount=order.total_amount,
             payment_method=payment_method,
             razorpay_order_id=processor_response.processor_order_id,
@@ -81,72 +83,87 @@ class PaymentService:
 
     def verify_payment(self, razorpay_order_id: str, verification_data: Dict[str, Any]) -> Payment:
         """
-        Verifies a payment with the payment gateway and updates its status.
+        Verifies a payment with the payment gateway and, in a single transaction,
+        completes the payment, confirms its order, records an order step and
+        clears the buyer's cart. Either all of it commits or none of it does.
         """
         payment = self.payment_repo.get_by_razorpay_order_id(razorpay_order_id)
         if not payment:
             raise ServiceError("Payment record not found for this Razorpay order ID.")
+        if payment.payment_status == PaymentStatus.COMPLETED:
+            # Already applied (e.g. by the payment webhook); verification is idempotent.
+            return payment
 
-        merchant = self.merchant_repo.get_by_id(payment.merchant_id)
-        merchant_info = {"key_id": merchant.razorpay_key_id, "key_secret": merchant.razorpay_key_secret}
-        processor = get_payment_processor(payment.payment_method, self.db, merchant_info)
+        merchant = get_merchant_credentials(self.db, merchant_id=payment.merchant_id)
+        merchant_info = merchant.as_merchant_info() if merchant else None
 
-        try:
-            # The adapter will raise PaymentVerificationError on failure
-            verified_payment = processor.verify_payment(verification_data)
-            
-            # If successful, update our database record to 'completed'
-            update_dto = PaymentUpdateDTO(
+        if payment.payment_method == PaymentMethod.WALLET:
+            # Wallet payments are settled from our own records, never client-supplied amounts.
+            verification_data = {"payment_id": payment.id, "user_id": payment.user_id, "amount": payment.amount}
+
+        with UnitOfWork(self.db) as uow:
+            processor = get_payment_processor(payment.payment_method, self.db, merchant_info, wallet_repo=uow.wallets)
+            verification_error = None
+            try:
+                # The adapter will raise PaymentVerificationError on failure
+                verified_payment = processor.verify_payment(verification_data)
+            except PaymentVerificationError as e:
+                verification_error = e
+
+            # Lock the payment row so a concurrent webhook cannot apply it twice
+            # (or be overwritten by a failed verification).
+            payment = uow.payments.get_by_id(payment.id, for_update=True)
+            if payment.payment_status == PaymentStatus.COMPLETED:
+                uow.commit()
+                return payment
+
+            if verification_error is not None:
+                # If verification fails, update our record to 'failed'
+                uow.payments.update(payment.id, PaymentUpdateDTO(
+                    payment_status=PaymentStatus.FAILED,
+                    payment_response=str(verification_error),
+                ))
+                uow.commit()
+                # Re-raise the exception for the API layer to handle
+                raise verification_error
+
+            updated_payment = uow.payments.update(payment.id, PaymentUpdateDTO(
                 payment_status=PaymentStatus.COMPLETED,
                 razorpay_payment_id=verified_payment.processor_payment_id,
                 transaction_id=verified_payment.processor_payment_id, # Can use the same for Razorpay
                 payment_response=str(verified_payment.full_response),
-            )
-            updated_payment = self.payment_repo.update(payment.id, update_dto)
-
-            # Also mark the associated Order as paid/confirmed so the frontend
-            # sees the order as completed. Use DB column names to avoid
-            # write-to-property AttributeErrors.
-            try:
-                order = self.db.query(Order).filter(Order.id == updated_payment.order_id).first()
-                if order and order.status not in ["delivered", "cancelled", "confirmed"]:
-                    order.payment_status = "Paid"
-                    order.status = "confirmed"
-                    from datetime import datetime, timezone
-
-                    order.confirmed_time = datetime.now(timezone.utc)
-                    self.db.add(order)
-                    self.db.commit()
-                    self.db.refresh(order)
-                    # Clear the user's cart as payment has completed successfully.
-                    try:
-                        from app.models.cart import Cart
-
-                        cart = self.db.query(Cart).filter(Cart.user_id == order.user_id).first()
-                        if cart:
-                            # deleting the cart will cascade-delete items (per model cascade)
-                            self.db.delete(cart)
-                            self.db.commit()
-                    except Exception:
-                        # best-effort: if clearing cart fails, swallow the error (will be visible in logs)
-                        pass
-            except Exception:
-                # Best-effort: if marking the order fails, we don't want to lose the
-                # payment record update — log and continue raising the verification result.
-                pass
-
-            return updated_payment
-
-        except PaymentVerificationError as e:
-            # If verification fails, update our record to 'failed'
-            update_dto = PaymentUpdateDTO(
-                payment_status=PaymentStatus.FAILED,
-                payment_response=str(e),
-            )
-            self.payment_repo.update(payment.id, update_dto)
-            # Re-raise the exception for the API layer to handle
-            raise e
+            ))
+
+            # Mark the associated Order as paid/confirmed so the frontend sees it
+            # as completed. Use DB column names to avoid write-to-property errors.
+            order = self.db.query(Order).filter(Order.id == updated_payment.order_id).with_for_update().first()
+            if order and order.status not in ["delivered", "cancelled", "confirmed"]:
+                now = datetime.now(timezone.utc)
+                old_status = order.status
+                order.payment_status = "Paid"
+                order.status = "confirmed"
+                order.confirmed_time = now
+                record_order_status_change(self.db, order, old_status)
+
+                self.db.query(OrderStep).filter(OrderStep.order_id == order.id, OrderStep.current == True).update(
+                    {"current": False}, synchronize_session=False
+                )
+                self.db.add(OrderStep(
+                    order_id=order.id, status="confirmed", description="Payment received, order confirmed",
+                    completed=True, current=True,
+                ))
+
+                # Clear the user's cart as payment has completed successfully
+                # (deleting the cart cascade-deletes its items).
+                cart = self.db.query(Cart).filter(Cart.user_id == order.user_id).first()
+                if cart:
+                    self.db.delete(cart)
+
+            uow.commit()
+
+        self.db.refresh(updated_payment)
+        return updated_payment
 
     def get_user_payment_history(self, user_id: str) -> List[Payment]:
         """Retrieves a user's payment history."""
-        return self.payment_repo.get_all_by_user_id(user_id)
\ No newline at end of file
+        return self.payment_repo.get_all_by_user_id(user_id)
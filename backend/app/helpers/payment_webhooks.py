@@ -0,0 +1,295 @@
+"""
+Asynchronous ingestion of payment gateway webhooks.
+
+`POST /api/payment/webhook` (see app/helpers/payment.py) only verifies the
+signature and inserts the event into `payment_webhook_events`, so it
+acknowledges within milliseconds and a gateway redelivery (same event id) is
+dropped at insert time.
+
+Workers claim batches with `FOR UPDATE SKIP LOCKED`, so any number of threads
+and processes can drain the queue concurrently. Each batch is applied in one
+transaction. The batch is idempotent per `razorpay_payment_id`: a payment that
+is already completed is left alone, and a capture always wins over a failure
+for the same payment. A capture whose amount differs from the payment's is
+parked as failed for review, and a capture for an order that was cancelled in
+the meantime is recorded and queued for refund. When a batch fails, its events
+are retried one by one, and each failing event is re-queued with exponential
+backoff until it runs out of attempts.
+
+    python -m app.helpers.payment_webhooks worker [threads]
+
+A load generator for the webhook endpoint lives in bench/payment_webhooks.py.
+"""
+import hashlib
+import hmac
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.core.database import SessionLocal
+from app.models.order import Order
+from app.models.payment import Payment, PaymentStatus, PaymentWebhookEvent
+from app.helpers.refunds import queue_payment_refunds
+from app.helpers.sales_rollups import record_order_status_change
+from app.helpers.wallet_ledger import to_paise
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_SECRET_ENV = "RAZORPAY_WEBHOOK_SECRET"
+DEFAULT_BATCH_SIZE = 200
+MAX_ATTEMPTS = 8
+STALE_CLAIM_AFTER = timedelta(minutes=5)
+
+CAPTURE_EVENTS = {"payment.captured", "order.paid"}
+FAILURE_EVENTS = {"payment.failed"}
+
+
+def verify_signature(body: bytes, signature: Optional[str], secret: Optional[str] = None) -> bool:
+    """Checks the X-Razorpay-Signature header (hex HMAC-SHA256 of the raw body)."""
+    secret = secret or os.getenv(WEBHOOK_SECRET_ENV)
+    if not secret or not signature:
+        return False
+    expected = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+def enqueue_event(db: Session, body: bytes, event_id: Optional[str]) -> bool:
+    """
+    Durably queues a verified webhook body. Returns False if an event with the
+    same id was already queued. Raises ValueError for malformed payloads and
+    for events without an id, which could not be deduplicated.
+    """
+    if not event_id:
+        raise ValueError("Missing webhook event id.")
+    try:
+        payload = json.loads(body)
+        event_type = payload["event"]
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Malformed webhook payload.")
+    payment = _payment_entity(payload)
+
+    stmt = pg_insert(PaymentWebhookEvent.__table__).values(
+        event_id=event_id,
+        event_type=event_type,
+        razorpay_order_id=payment.get("order_id"),
+        razorpay_payment_id=payment.get("id"),
+        payload=payload,
+        status="pending",
+        attempts=0,
+    ).on_conflict_do_nothing(index_elements=["event_id"])
+    inserted = db.execute(stmt).rowcount
+    db.commit()
+    return bool(inserted)
+
+
+def claim_batch(db: Session, batch_size: int = DEFAULT_BATCH_SIZE) -> List:
+    """Claims up to `batch_size` due events (including stale claims) and commits the claim."""
+    rows = db.execute(
+        text(
+            """
+            UPDATE payment_webhook_events
+            SET status = 'processing', locked_at = now(), attempts = attempts + 1
+            WHERE id IN (
+                SELECT id FROM payment_webhook_events
+                WHERE (status = 'pending' AND available_at <= now())
+                   OR (status = 'processing' AND locked_at < now() - make_interval(secs => :stale))
+                ORDER BY available_at, id
+                LIMIT :n
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING id, event_type, razorpay_order_id, razorpay_payment_id, payload, attempts
+            """
+        ),
+        {"n": batch_size, "stale": STALE_CLAIM_AFTER.total_seconds()},
+    ).fetchall()
+    db.commit()
+    return rows
+
+
+def _payment_entity(payload) -> dict:
+    return ((payload.get("payload") or {}).get("payment") or {}).get("entity") or {}
+
+
+def _decisive_events(events: Sequence) -> Dict[str, object]:
+    """One event per razorpay_payment_id: a capture beats a failure; otherwise the latest wins."""
+    chosen: Dict[str, object] = {}
+    for e in events:
+        if not e.razorpay_payment_id or e.event_type not in CAPTURE_EVENTS | FAILURE_EVENTS:
+            continue
+        current = chosen.get(e.razorpay_payment_id)
+        if current is None or current.event_type not in CAPTURE_EVENTS or e.event_type in CAPTURE_EVENTS:
+            chosen[e.razorpay_payment_id] = e
+    return chosen
+
+
+def apply_batch(db: Session, events: Sequence) -> None:
+    """Applies a batch of claimed events and marks them done, in one transaction."""
+    chosen = _decisive_events(events)
+    now = datetime.now(timezone.utc)
+    rejected: Dict[int, str] = {}
+
+    if chosen:
+        order_refs = {e.razorpay_order_id for e in chosen.values() if e.razorpay_order_id}
+        payments = {
+            p.razorpay_order_id: p
+            for p in db.query(Payment).filter(Payment.razorpay_order_id.in_(order_refs)).with_for_update().all()
+        } if order_refs else {}
+        already_recorded = {
+            pid for (pid,) in db.query(Payment.razorpay_payment_id).filter(Payment.razorpay_payment_id.in_(list(chosen)))
+        }
+
+        captured: Dict[int, Payment] = {}
+        for payment_id, e in chosen.items():
+            payment = payments.get(e.razorpay_order_id)
+            if payment is None:
+                logger.warning("Webhook %s for unknown gateway order %s ignored", e.event_type, e.razorpay_order_id)
+                continue
+            if payment.payment_status == PaymentStatus.COMPLETED or payment_id in already_recorded:
+                continue  # Already applied (by /verify or an earlier event).
+            if e.event_type in CAPTURE_EVENTS:
+                amount_paise = _payment_entity(e.payload).get("amount")
+                if amount_paise != to_paise(payment.amount):
+                    logger.error("Webhook %s for payment %s captured %s paise, expected %s",
+                                 e.event_type, payment.id, amount_paise, to_paise(payment.amount))
+                    rejected[e.id] = (f"Captured amount {amount_paise} does not match "
+                                      f"payment {payment.id} ({to_paise(payment.amount)} paise).")
+                    continue
+                payment.payment_status = PaymentStatus.COMPLETED
+                payment.razorpay_payment_id = payment_id
+                payment.transaction_id = payment_id
+                payment.payment_response = json.dumps(e.payload)
+                captured[payment.order_id] = payment
+            elif payment.payment_status == PaymentStatus.PENDING:
+                payment.payment_status = PaymentStatus.FAILED
+                payment.payment_response = json.dumps(e.payload)
+
+        if captured:
+            from app.models.cart import Cart
+
+            orders = db.query(Order).filter(Order.id.in_(list(captured))).all()
+            paid_users = set()
+            late_payment_ids = []
+            for order in orders:
+                if order.status == "cancelled":
+                    # Paid after the order was cancelled: keep the capture and refund it.
+                    order.payment_status = "Refund Pending"
+                    late_payment_ids.append(captured[order.id].id)
+                    continue
+                if order.status in ("delivered", "confirmed"):
+                    continue
+                old_status = order.status
+                order.payment_status = "Paid"
+                order.status = "confirmed"
+                order.confirmed_time = now
+                record_order_status_change(db, order, old_status)
+                paid_users.add(order.user_id)
+            # Payment completed: clear the buyers' carts, as /verify does.
+            for cart in db.query(Cart).filter(Cart.user_id.in_(paid_users)).all() if paid_users else []:
+                db.delete(cart)
+            if late_payment_ids:
+                db.flush()
+                queue_payment_refunds(db, late_payment_ids, reason="Payment captured after the order was cancelled.")
+
+    for event_id, error in rejected.items():
+        db.query(PaymentWebhookEvent).filter(PaymentWebhookEvent.id == event_id).update(
+            {"status": "failed", "processed_at": now, "last_error": error}, synchronize_session=False
+        )
+    done = [e.id for e in events if e.id not in rejected]
+    db.query(PaymentWebhookEvent).filter(PaymentWebhookEvent.id.in_(done)).update(
+        {"status": "done", "processed_at": now, "last_error": None}, synchronize_session=False
+    )
+    db.commit()
+
+
+def _reschedule(db: Session, event, error: Exception) -> None:
+    """Re-queues a failed event with exponential backoff, or parks it after MAX_ATTEMPTS."""
+    give_up = event.attempts >= MAX_ATTEMPTS
+    db.query(PaymentWebhookEvent).filter(PaymentWebhookEvent.id == event.id).update(
+        {
+            "status": "failed" if give_up else "pending",
+            "last_error": str(error)[:1000],
+            "available_at": datetime.now(timezone.utc) + timedelta(seconds=min(2 ** event.attempts, 3600)),
+        },
+        synchronize_session=False,
+    )
+    db.commit()
+    if give_up:
+        logger.error("Webhook event %s failed permanently: %s", event.id, error)
+
+
+def process_batch(db: Session, batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """Claims and applies one batch. Returns the number of events claimed."""
+    events = claim_batch(db, batch_size)
+    if not events:
+        return 0
+    try:
+        apply_batch(db, events)
+    except Exception:
+        db.rollback()
+        logger.exception("Webhook batch of %d failed; retrying events individually", len(events))
+        for event in events:
+            try:
+                apply_batch(db, [event])
+            except Exception as e:
+                db.rollback()
+                _reschedule(db, event, e)
+    return len(events)
+
+
+def drain_queue(db: Session, batch_size: int = DEFAULT_BATCH_SIZE, max_batches: int = 50) -> int:
+    """Processes batches until the queue is empty (or `max_batches`). Used by the periodic job."""
+    total = 0
+    for _ in range(max_batches):
+        n = process_batch(db, batch_size)
+        total += n
+        if n < batch_size:
+            break
+    return total
+
+
+def run_worker_pool(threads: int = 4, batch_size: int = DEFAULT_BATCH_SIZE, idle_sleep: float = 0.5,
+                    stop: Optional[threading.Event] = None) -> None:
+    """Runs `threads` workers that drain the queue until `stop` is set."""
+    stop = stop or threading.Event()
+
+    def _worker() -> None:
+        db = SessionLocal()
+        try:
+            while not stop.is_set():
+                try:
+                    if process_batch(db, batch_size) == 0:
+                        stop.wait(idle_sleep)
+                except Exception:
+                    db.rollback()
+                    logger.exception("Webhook worker error")
+                    stop.wait(idle_sleep)
+        finally:
+            db.close()
+
+    workers = [threading.Thread(target=_worker, name=f"webhook-worker-{i}", daemon=True) for i in range(threads)]
+    for w in workers:
+        w.start()
+    try:
+        while any(w.is_alive() for w in workers):
+            time.sleep(1.0)
+    except KeyboardInterrupt:
+        stop.set()
+    for w in workers:
+        w.join()
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "worker"
+    if command == "worker":
+        run_worker_pool(int(sys.argv[2]) if len(sys.argv) > 2 else 4)
+    else:
+        raise SystemExit("usage: python -m app.helpers.payment_webhooks worker [threads]")
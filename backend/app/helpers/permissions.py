@@ -3,6 +3,8 @@ from strawberry.permission import BasePermission
 from strawberry.types import Info
 from sqlalchemy.orm import Session
 
+from app.helpers.authz import can_operate_canteen, owns_canteen
+
 # You might need your models for more complex checks
 # from app.models.user import User
 
@@ -78,4 +80,37 @@ class IsAdminOrSelf(IsAuthenticated):
             return True
         
         # If neither condition is met, deny permission.
-        return False
\ No newline at end of file
+        return False
+
+class IsAdminOrCanteenOwner(IsAuthenticated):
+    """
+    Checks if a user is an admin OR owns the canteen named by the resolver's
+    `canteen_id` argument. Ownership comes from the cached authorization index
+    (app/helpers/authz.py), so the check is a set lookup.
+    """
+    message = "Only admins or the canteen owner can perform this action."
+
+    def has_permission(self, source: Any, info: Info, **kwargs) -> bool:
+        if not super().has_permission(source, info, **kwargs):
+            return False
+
+        user = info.context["user"]
+        if user.role == "admin":
+            return True
+        return owns_canteen(info.context["db"], user, kwargs.get("canteen_id"))
+
+
+class IsAdminOrCanteenStaff(IsAuthenticated):
+    """
+    Like IsAdminOrCanteenOwner, but also lets the canteen's staff through.
+    """
+    message = "Only admins or the canteen's owner and staff can perform this action."
+
+    def has_permission(self, source: Any, info: Info, **kwargs) -> bool:
+        if not super().has_permission(source, info, **kwargs):
+            return False
+
+        user = info.context["user"]
+        if user.role == "admin":
+            return True
+        return can_operate_canteen(info.context["db"], user, kwargs.get("canteen_id"))
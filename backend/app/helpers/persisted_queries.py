@@ -0,0 +1,631 @@
+"""
+Persisted GraphQL queries and a cache of parsed, validated documents.
+
+The frontend sends the same few dozen documents over and over. Shipping each
+document on every request, then parsing and validating it again, is wasted
+work. Three pieces remove it:
+
+- A registry of sha256 hash -> document, built from the frontend's `gql`
+  documents at deploy time (`build` below) and shipped as
+  app/persisted_queries.json. A client sends
+  `extensions.persistedQuery.sha256Hash` instead of the query text.
+- Automatic persisted queries (APQ, the Apollo protocol) for hashes the
+  registry doesn't know: the server answers `PersistedQueryNotFound`, the
+  client retries once with the full query, and the document is kept in a
+  per-worker LRU for later requests.
+- `DocumentCache`, a schema extension that keeps an LRU of parsed
+  `DocumentNode`s, keyed on the query text. A document that passed validation
+  once is not validated again. This helps persisted and plain requests alike.
+
+`PersistedQueryRouter` is the GraphQLRouter that resolves the hashes. It also
+serves persisted queries over GET. A GET whose root fields are all in
+PUBLIC_QUERY_FIELDS (canteen and menu listings, which are the same for every
+user) is answered with `Cache-Control: public`, so nginx can cache it. Any
+other persisted GET gets `no-store`. Mutations are never allowed over GET.
+Successful public operations, over GET or POST, are also answered from the
+response cache with ETags (app/helpers/response_cache.py).
+
+The router also accepts a JSON array of operations in one POST (Apollo's
+BatchHttpLink). The whole batch goes through AuthMiddleware and the rate
+limiter once, and its operations run in order against one context: the same
+user, the same DB session. At most GRAPHQL_BATCH_MAX_OPERATIONS operations
+are accepted per batch. The answer is an array of results in request order.
+
+Regenerate the registry after frontend changes:
+
+    python -m app.helpers.persisted_queries build [FRONTEND_SRC]
+
+The benchmark of what the document cache saves per request lives in
+bench/persisted_queries.py.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional
+
+from graphql import (
+    FieldNode,
+    GraphQLError,
+    NameNode,
+    OperationDefinitionNode,
+    SelectionSetNode,
+    Visitor,
+    parse,
+    print_ast,
+    visit,
+)
+from strawberry.extensions import SchemaExtension
+from strawberry.fastapi import GraphQLRouter
+from strawberry.schema.exceptions import InvalidOperationTypeError
+from strawberry.http import GraphQLRequestData
+from strawberry.http.exceptions import HTTPException
+from starlette.responses import Response
+from strawberry.types import ExecutionResult
+from strawberry.types.graphql import OperationType
+from strawberry.types.unset import UNSET
+
+from app.core.config import (
+    GRAPHQL_BATCH_MAX_OPERATIONS,
+    GRAPHQL_DOCUMENT_CACHE_SIZE,
+    PERSISTED_QUERIES_APQ_ENABLED,
+    PERSISTED_QUERIES_APQ_SIZE,
+    PERSISTED_QUERIES_MANIFEST,
+    PUBLIC_QUERY_MAX_AGE_SECONDS,
+)
+from app.helpers.cache import TTLCache
+from app.helpers.rate_limit import root_fields
+from app.helpers.response_cache import response_cache
+
+logger = logging.getLogger(__name__)
+
+# Root query fields whose result does not depend on who is asking. Only
+# persisted GETs that select nothing else may be cached by nginx.
+PUBLIC_QUERY_FIELDS = frozenset({
+    "getAllCanteens",
+    "getCanteenById",
+    "getOpenCanteens",
+    "searchCanteens",
+    "getMenuItems",
+    "getMenuItemsByCanteen",
+    "getFeaturedMenuItems",
+    "getPopularMenuItems",
+    "searchMenuItems",
+})
+
+# Entries live until evicted; the registry never changes while a worker runs.
+_FOREVER = 10 * 365 * 86400.0
+
+
+class PersistedQueryError(Exception):
+    """A persisted-query request that can't be served; returned as a GraphQL error."""
+
+    def __init__(self, message: str, code: str):
+        super().__init__(message)
+        self.message = message
+        self.code = code
+
+
+def sha256_hex(query: str) -> str:
+    return hashlib.sha256(query.encode("utf-8")).hexdigest()
+
+
+# ===================================================================
+# Registry
+# ===================================================================
+
+class PersistedQueryRegistry:
+    """
+    Hash -> document lookup. Documents from the deploy-time manifest are
+    always known. Documents registered through APQ sit in an LRU.
+    """
+
+    def __init__(
+        self,
+        manifest_path: Optional[str] = PERSISTED_QUERIES_MANIFEST,
+        apq_enabled: bool = PERSISTED_QUERIES_APQ_ENABLED,
+        apq_size: int = PERSISTED_QUERIES_APQ_SIZE,
+    ):
+        self.manifest_path = manifest_path
+        self.apq_enabled = apq_enabled
+        self._documents: Dict[str, str] = load_manifest(manifest_path) if manifest_path else {}
+        self._apq = TTLCache(maxsize=apq_size, ttl=_FOREVER)
+        self.registered = 0
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def get(self, query_hash: str) -> Optional[str]:
+        query = self._documents.get(query_hash)
+        if query is None and self.apq_enabled:
+            query = self._apq.get(query_hash)
+        return query
+
+    def register(self, query_hash: str, query: str) -> None:
+        """Remembers an APQ document. The hash must already have been checked against the query."""
+        if self.apq_enabled and query_hash not in self._documents:
+            self._apq.set(query_hash, query)
+            self.registered += 1
+
+    def stats(self) -> dict:
+        return {
+            "manifestDocuments": len(self._documents),
+            "apqEnabled": self.apq_enabled,
+            "apqRegistered": self.registered,
+            "apqCache": self._apq.stats(),
+        }
+
+
+def load_manifest(path: str) -> Dict[str, str]:
+    """
+    Reads an Apollo persisted-query manifest ({"operations": [{"id", "body"}, ...]})
+    or a plain {hash: query} mapping. Entries whose hash doesn't match are dropped.
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        logger.info("No persisted query manifest at %s; only APQ is available.", path)
+        return {}
+    except (OSError, ValueError) as e:
+        logger.error("Could not read persisted query manifest %s: %s", path, e)
+        return {}
+
+    if isinstance(manifest, dict) and isinstance(manifest.get("operations"), list):
+        entries = [(op.get("id"), op.get("body")) for op in manifest["operations"] if isinstance(op, dict)]
+    elif isinstance(manifest, dict):
+        entries = list(manifest.items())
+    else:
+        entries = []
+
+    documents = {}
+    for query_hash, query in entries:
+        if isinstance(query, str) and query_hash == sha256_hex(query):
+            documents[query_hash] = query
+        else:
+            logger.warning("Skipping persisted query %s: hash does not match its document.", query_hash)
+    return documents
+
+
+registry = PersistedQueryRegistry()
+
+
+def _persisted_query_extension(data: dict) -> Optional[dict]:
+    extensions = data.get("extensions")
+    if isinstance(extensions, str):
+        # GET requests carry it JSON-encoded in the query string.
+        try:
+            extensions = json.loads(extensions)
+        except ValueError:
+            return None
+    if not isinstance(extensions, dict):
+        return None
+    persisted = extensions.get("persistedQuery")
+    return persisted if isinstance(persisted, dict) else None
+
+
+def resolve(data: dict) -> Optional[str]:
+    """
+    Fills in data["query"] for a persisted-query request and returns its hash,
+    or returns None for a plain request. A full query sent along with its hash
+    (the APQ retry) is checked and registered. Raises PersistedQueryError.
+    """
+    persisted = _persisted_query_extension(data)
+    if persisted is None:
+        return None
+    if persisted.get("version") != 1:
+        raise PersistedQueryError("Unsupported persisted query version.", "PERSISTED_QUERY_NOT_SUPPORTED")
+    query_hash = persisted.get("sha256Hash")
+    if not isinstance(query_hash, str):
+        raise PersistedQueryError("persistedQuery.sha256Hash is required.", "BAD_REQUEST")
+
+    query = data.get("query")
+    if isinstance(query, str) and query:
+        if sha256_hex(query) != query_hash:
+            raise PersistedQueryError("provided sha does not match query", "BAD_REQUEST")
+        if registry.get(query_hash) is None:
+            registry.register(query_hash, query)
+        return query_hash
+
+    query = registry.get(query_hash)
+    if query is None:
+        # The exact message is what Apollo clients look for before retrying.
+        raise PersistedQueryError("PersistedQueryNotFound", "PERSISTED_QUERY_NOT_FOUND")
+    data["query"] = query
+    return query_hash
+
+
+def expand(payload):
+    """
+    Like `resolve`, but never raises or registers anything: returns the payload
+    with the query filled in when its hash is known. Used by the rate limiter,
+    which runs before the router.
+    """
+    if isinstance(payload, list):
+        return [expand(p) for p in payload]
+    if not isinstance(payload, dict) or isinstance(payload.get("query"), str):
+        return payload
+    persisted = _persisted_query_extension(payload)
+    query = registry.get(persisted.get("sha256Hash")) if persisted and isinstance(persisted.get("sha256Hash"), str) else None
+    return {**payload, "query": query} if query else payload
+
+
+def is_public(query: str, operation_name: Optional[str]) -> bool:
+    fields = root_fields(query, operation_name)
+    return bool(fields) and all(f in PUBLIC_QUERY_FIELDS for f in fields)
+
+
+# ===================================================================
+# Parsed and validated documents
+# ===================================================================
+
+@dataclass
+class _CachedDocument:
+    document: object
+    validated: bool = False
+
+
+class DocumentCache(SchemaExtension):
+    """
+    LRU of parsed documents keyed on the query text, remembering which ones
+    already passed validation. Parse and validation errors are not cached.
+    The schema and its validation rules are fixed for the life of the worker,
+    so a document that was valid once stays valid.
+    """
+
+    def __init__(self, maxsize: int = GRAPHQL_DOCUMENT_CACHE_SIZE):
+        self._documents = TTLCache(maxsize=maxsize, ttl=_FOREVER)
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._parse_seconds = 0.0
+        self._parses = 0
+        self._validate_seconds = 0.0
+        self._validations = 0
+        self._validations_skipped = 0
+
+    def on_parse(self) -> Iterator[None]:
+        execution_context = self.execution_context
+        query = execution_context.query
+        cached = self._documents.get(query) if query else None
+        if cached is not None:
+            execution_context.graphql_document = cached.document
+            with self._lock:
+                self._hits += 1
+            yield
+            return
+
+        started = time.perf_counter()
+        yield
+        elapsed = time.perf_counter() - started
+        if execution_context.graphql_document is not None:
+            self._documents.set(query, _CachedDocument(execution_context.graphql_document))
+            with self._lock:
+                self._parse_seconds += elapsed
+                self._parses += 1
+
+    def on_validate(self) -> Iterator[None]:
+        execution_context = self.execution_context
+        # Not counted as a hit or miss; on_parse already did.
+        cached = self._documents.peek(execution_context.query) if execution_context.query else None
+        if cached is not None and cached.validated and cached.document is execution_context.graphql_document:
+            # Strawberry skips its own validation when errors are already set.
+            execution_context.errors = []
+            with self._lock:
+                self._validations_skipped += 1
+            yield
+            return
+
+        started = time.perf_counter()
+        yield
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._validate_seconds += elapsed
+            self._validations += 1
+        if cached is not None and not execution_context.errors:
+            cached.validated = True
+
+    def stats(self) -> dict:
+        with self._lock:
+            mean_parse = self._parse_seconds / self._parses if self._parses else 0.0
+            mean_validate = self._validate_seconds / self._validations if self._validations else 0.0
+            return {
+                "size": len(self._documents),
+                "hits": self._hits,
+                "misses": self._parses,
+                "meanParseMs": round(mean_parse * 1000, 3),
+                "meanValidateMs": round(mean_validate * 1000, 3),
+                "validationsSkipped": self._validations_skipped,
+                # What the hits would have cost without the cache.
+                "estimatedSecondsSaved": round(
+                    self._hits * mean_parse + self._validations_skipped * mean_validate, 3
+                ),
+            }
+
+
+document_cache = DocumentCache()
+
+
+def stats() -> dict:
+    return {"registry": registry.stats(), "documents": document_cache.stats()}
+
+
+# ===================================================================
+# Router
+# ===================================================================
+
+_SCOPE_KEY = "persisted_query"
+_CACHEABLE_KEY = "persisted_query_cacheable"
+
+
+class PersistedQueryRouter(GraphQLRouter):
+    """
+    GraphQLRouter that accepts persisted-query hashes over POST and GET,
+    serves public catalog operations from the response cache (see
+    app/helpers/response_cache.py), and runs array-batched POSTs.
+    """
+
+    async def run(self, request, context=UNSET, root_value=UNSET):
+        if not self.is_websocket_request(request) and await self._is_batch(request):
+            return await self._run_batch(request, context, root_value)
+        cache_key = None if self.is_websocket_request(request) else await self._response_cache_key(request)
+        if cache_key is None:
+            return await super().run(request, context, root_value)
+
+        entry = response_cache.get(cache_key)
+        if entry is None:
+            response = await super().run(request, context, root_value)
+            if response.status_code != 200 or not request.scope.get(_CACHEABLE_KEY):
+                return response
+            entry = response_cache.store(cache_key, response.body)
+
+        headers = {"ETag": entry.etag}
+        if request.method == "GET":
+            headers["Cache-Control"] = f"public, max-age={PUBLIC_QUERY_MAX_AGE_SECONDS}"
+        if response_cache.matches(entry, request.headers.get("if-none-match")):
+            return Response(status_code=304, headers=headers)
+        return Response(entry.body, media_type="application/json", headers=headers)
+
+    async def _response_cache_key(self, request):
+        """The response cache key for a persisted public operation, else None."""
+        if request.method == "GET":
+            data = dict(request.query_params)
+        elif request.method == "POST" and "application/json" in request.headers.get("content-type", ""):
+            body = await request.body()
+            if b"persistedQuery" not in body:
+                return None
+            try:
+                data = json.loads(body)
+            except ValueError:
+                return None
+        else:
+            return None
+        return self._operation_cache_key(data)
+
+    @staticmethod
+    def _operation_cache_key(data):
+        """The response cache key for one operation's request data, else None."""
+        if not isinstance(data, dict):
+            return None
+
+        persisted = _persisted_query_extension(data)
+        query_hash = persisted.get("sha256Hash") if persisted else None
+        query = registry.get(query_hash) if isinstance(query_hash, str) else None
+        if query is None or not is_public(query, data.get("operationName")):
+            return None
+        variables = data.get("variables")
+        if isinstance(variables, str):
+            try:
+                variables = json.loads(variables)
+            except ValueError:
+                return None
+        return response_cache.key(query_hash, data.get("operationName"), variables)
+
+    async def _is_batch(self, request) -> bool:
+        if request.method != "POST" or "application/json" not in request.headers.get("content-type", ""):
+            return False
+        return (await request.body()).lstrip()[:1] == b"["
+
+    async def _run_batch(self, request, context, root_value):
+        try:
+            operations = json.loads(await request.body())
+        except ValueError as e:
+            raise HTTPException(400, "Unable to parse request body as JSON") from e
+        if not operations or not all(isinstance(data, dict) for data in operations):
+            raise HTTPException(400, "A batch must be a non-empty list of operations.")
+        if len(operations) > GRAPHQL_BATCH_MAX_OPERATIONS:
+            raise HTTPException(400, f"Too many operations in one batch (at most {GRAPHQL_BATCH_MAX_OPERATIONS}).")
+
+        root_value = await self.get_root_value(request) if root_value is UNSET else root_value
+        sub_response = await self.get_sub_response(request)
+        # One at a time: the operations share the context's DB session.
+        bodies = [await self._run_batched_operation(request, data, context, root_value) for data in operations]
+
+        response = Response(
+            b"[" + b",".join(bodies) + b"]",
+            media_type="application/json",
+            status_code=sub_response.status_code or 200,
+        )
+        response.headers.raw.extend(sub_response.headers.raw)
+        return response
+
+    async def _run_batched_operation(self, request, data, context, root_value) -> bytes:
+        """Encoded result of one operation in a batch. Public catalog results come from the response cache."""
+        cache_key = self._operation_cache_key(data)
+        entry = response_cache.get(cache_key) if cache_key is not None else None
+        if entry is not None:
+            return entry.body
+
+        try:
+            resolve(data)
+            if not data.get("query"):
+                raise PersistedQueryError("No GraphQL query found in the request", "BAD_REQUEST")
+            variables = data.get("variables")
+            if variables is not None and not isinstance(variables, dict):
+                raise PersistedQueryError("Variables must be an object.", "BAD_REQUEST")
+            result = await self.schema.execute(
+                data["query"],
+                variable_values=variables,
+                context_value=context,
+                root_value=root_value,
+                operation_name=data.get("operationName"),
+                allowed_operation_types={OperationType.QUERY, OperationType.MUTATION},
+            )
+        except PersistedQueryError as e:
+            result = ExecutionResult(data=None, errors=[GraphQLError(e.message, extensions={"code": e.code})])
+        except InvalidOperationTypeError as e:
+            result = ExecutionResult(data=None, errors=[GraphQLError(e.as_http_error_reason("POST"))])
+
+        if result.errors and context.get("db") is not None:
+            # Don't leave a failed transaction behind for the next operation.
+            context["db"].rollback()
+        response_data = await self.process_result(request=request, result=result)
+        if result.errors:
+            self._handle_errors(result.errors, response_data)
+        body = self.encode_json(response_data).encode()
+        if cache_key is not None and not result.errors:
+            response_cache.store(cache_key, body)
+        return body
+
+    def should_render_graphql_ide(self, request) -> bool:
+        # A persisted GET has no `query` parameter but is not a browser visit.
+        return "extensions" not in request.query_params and super().should_render_graphql_ide(request)
+
+    async def parse_http_body(self, request) -> GraphQLRequestData:
+        content_type = (request.content_type or "").split(";")[0].strip()
+        if request.method == "GET":
+            data = self.parse_query_params(request.query_params)
+        elif content_type == "application/json":
+            data = self.parse_json(await request.get_body())
+        else:
+            return await super().parse_http_body(request)
+        if not isinstance(data, dict):
+            return await super().parse_http_body(request)
+
+        query_hash = resolve(data)
+        if query_hash is not None:
+            request.request.scope[_SCOPE_KEY] = query_hash
+        return GraphQLRequestData(
+            query=data.get("query"),
+            variables=data.get("variables"),
+            operation_name=data.get("operationName"),
+        )
+
+    async def execute_operation(self, request, context, root_value):
+        try:
+            result = await super().execute_operation(request, context, root_value)
+        except PersistedQueryError as e:
+            return ExecutionResult(data=None, errors=[GraphQLError(e.message, extensions={"code": e.code})])
+
+        query_hash = request.scope.get(_SCOPE_KEY)
+        request.scope[_CACHEABLE_KEY] = query_hash is not None and not result.errors
+        if request.method == "GET" and query_hash is not None:
+            query = registry.get(query_hash)
+            public = (
+                not result.errors
+                and query is not None
+                and is_public(query, request.query_params.get("operationName"))
+            )
+            context["response"].headers["Cache-Control"] = (
+                f"public, max-age={PUBLIC_QUERY_MAX_AGE_SECONDS}" if public else "no-store"
+            )
+        return result
+
+
+# ===================================================================
+# Manifest builder
+# ===================================================================
+
+_GQL_TEMPLATE = re.compile(r"gql\s*`(.*?)`", re.DOTALL)
+_SOURCE_SUFFIXES = (".ts", ".tsx", ".js", ".jsx")
+_TYPENAME_FIELD = FieldNode(name=NameNode(value="__typename"), arguments=(), directives=())
+
+
+class _AddTypename(Visitor):
+    """Port of Apollo Client's addTypenameToDocument, which runs before documents are hashed."""
+
+    def enter_selection_set(self, node, key, parent, path, ancestors):
+        if isinstance(parent, OperationDefinitionNode):
+            return None
+        if any(isinstance(s, FieldNode) and s.name.value.startswith("__") for s in node.selections):
+            return None
+        if isinstance(parent, FieldNode) and any(d.name.value == "export" for d in parent.directives or ()):
+            return None
+        return SelectionSetNode(selections=(*node.selections, _TYPENAME_FIELD))
+
+
+def client_document(source: str) -> str:
+    """The document text an Apollo client sends (and hashes) for a `gql` template."""
+    return print_ast(visit(parse(source), _AddTypename()))
+
+
+def extract_documents(src_dir: str) -> List[str]:
+    documents = []
+    for root, dirs, files in os.walk(src_dir):
+        dirs[:] = [d for d in dirs if d != "node_modules"]
+        for name in sorted(files):
+            if not name.endswith(_SOURCE_SUFFIXES):
+                continue
+            path = os.path.join(root, name)
+            with open(path, encoding="utf-8") as f:
+                source = f.read()
+            for template in _GQL_TEMPLATE.findall(source):
+                if "${" in template:
+                    # Interpolated fragments are only known at runtime; APQ covers them.
+                    logger.warning("Skipping interpolated gql template in %s", path)
+                    continue
+                try:
+                    documents.append(client_document(template))
+                except GraphQLError as e:
+                    logger.warning("Skipping unparsable gql template in %s: %s", path, e.message)
+    return documents
+
+
+def build_manifest(src_dir: str, out_path: str = PERSISTED_QUERIES_MANIFEST) -> int:
+    from app.schema import schema
+    from strawberry.schema.schema import validate_document
+    from graphql import specified_rules
+
+    operations = {}
+    for document in extract_documents(src_dir):
+        node = parse(document)
+        definitions = [d for d in node.definitions if isinstance(d, OperationDefinitionNode)]
+        if not definitions:
+            # Fragments and type definitions are never sent on their own.
+            continue
+        errors = validate_document(schema._schema, node, tuple(specified_rules))
+        if errors:
+            # Still persisted: the server reports the same errors either way.
+            logger.warning("Document does not validate against the schema: %s", errors[0].message)
+        query_hash = sha256_hex(document)
+        operations[query_hash] = {
+            "id": query_hash,
+            "name": definitions[0].name.value if definitions[0].name else None,
+            "type": definitions[0].operation.value,
+            "body": document,
+        }
+
+    manifest = {
+        "format": "apollo-persisted-query-manifest",
+        "version": 1,
+        "operations": sorted(operations.values(), key=lambda op: (op["name"] or "", op["id"])),
+    }
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+        f.write("\n")
+    return len(operations)
+
+
+if __name__ == "__main__":
+    import sys
+
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) >= 2 and sys.argv[1] == "build":
+        src = sys.argv[2] if len(sys.argv) > 2 else os.path.join("..", "frontend", "src")
+        count = build_manifest(src)
+        logger.info("Wrote %d documents to %s", count, PERSISTED_QUERIES_MANIFEST)
+    else:
+        raise SystemExit("usage: python -m app.helpers.persisted_queries build [FRONTEND_SRC]")
@@ -0,0 +1,300 @@
+"""
+Static cost analysis for GraphQL operations.
+
+Resolvers load whatever a query selects, so one request can ask for every
+order of every canteen. `QueryCostLimiter` estimates an operation's cost
+from the document and its variables before anything executes:
+
+    cost(field) = size * (weight + sum(cost(child) for child in selection))
+
+- weight: FIELD_WEIGHTS["Type.field"]. Otherwise 1 for fields that return
+  objects and 0 for scalars.
+- size: 1 for single values. A list's size comes from its pagination
+  argument when there is one (PAGE_SIZE_ARGS: `first`, `menuLimit`, ...,
+  from the request or the argument's default). Otherwise it is the expected
+  row count in LIST_SIZES, or DEFAULT_LIST_SIZE.
+
+An operation costing more than QUERY_COST_LIMIT is rejected. One costing more
+than QUERY_COST_THROTTLE_THRESHOLD also spends extra tokens from the caller's
+rate-limit bucket (one per QUERY_COST_PER_TOKEN over the threshold), so
+repeating heavy queries runs into the rate limiter much sooner. Operations
+over QUERY_COST_LOG_THRESHOLD are logged, and the costliest ones seen are
+listed in /api/health.
+
+Nesting depth is capped separately by Strawberry's QueryDepthLimiter
+(GRAPHQL_MAX_DEPTH, see app/schema.py).
+
+bench/query_cost.py reports the cost of every Query field at full selection,
+and of the frontend documents. tests/test_query_cost.py pins those per-field
+costs, so changing a weight or list size is a deliberate, reviewed change.
+"""
+import logging
+import math
+import threading
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+from graphql import (
+    FieldNode,
+    FragmentDefinitionNode,
+    FragmentSpreadNode,
+    GraphQLError,
+    GraphQLList,
+    GraphQLSchema,
+    InlineFragmentNode,
+    OperationDefinitionNode,
+    OperationType,
+    get_named_type,
+    get_nullable_type,
+    is_composite_type,
+    value_from_ast,
+)
+from graphql.execution import ExecutionResult as GraphQLExecutionResult
+from graphql.pyutils import Undefined
+from strawberry.extensions import SchemaExtension
+
+from app.core.config import (
+    QUERY_COST_LIMIT,
+    QUERY_COST_LOG_THRESHOLD,
+    QUERY_COST_PER_TOKEN,
+    QUERY_COST_THROTTLE_THRESHOLD,
+    RATE_LIMIT_ENABLED,
+)
+from app.helpers import rate_limit
+
+logger = logging.getLogger(__name__)
+
+# Fields that cost more than the plain row fetch: aggregates and scans.
+FIELD_WEIGHTS: Dict[str, float] = {
+    "Query.searchMenuItems": 10,
+    "Query.searchCanteens": 5,
+    "Query.searchUsers": 10,
+    "Query.getCanteenStats": 20,
+    "Query.getCanteenSalesStats": 10,
+    "Query.salesAnalytics": 25,
+    "Query.getCanteenDetail": 5,
+    "ComplaintConnection.counts": 5,
+}
+
+# Expected rows for list fields without a pagination argument.
+LIST_SIZES: Dict[str, int] = {
+    "Query.getAllCanteens": 20,
+    "Query.getOpenCanteens": 20,
+    "Query.searchCanteens": 20,
+    "Query.getAllComplaints": 500,
+    "Query.getComplaintsByUserId": 20,
+    "Query.getComplaintsByOrderId": 5,
+    "Query.getMenuItems": 300,
+    "Query.getMenuItemsByCanteen": 50,
+    "Query.getFeaturedMenuItems": 20,
+    "Query.getPopularMenuItems": 20,
+    "Query.searchMenuItems": 50,
+    "Query.getAllOrders": 100,
+    "Query.getActiveOrders": 10,
+    "Query.getCanteenOrders": 1000,
+    "Query.getCanteenActiveOrders": 50,
+    "Query.getUsersByRole": 500,
+    "Query.searchUsers": 50,
+    "Query.getUserPaymentHistory": 100,
+    "Query.getCanteenStats": 20,
+    "Query.getCanteenSalesStats": 100,
+    "CartType.items": 10,
+    "OrderType.items": 5,
+    "OrderType.steps": 5,
+    "ComplaintCountsType.byStatus": 5,
+    "SalesAnalyticsType.topItems": 10,
+    "SalesAnalyticsType.series": 100,
+}
+DEFAULT_LIST_SIZE = 10
+
+# List fields sized by a pagination argument on themselves or an enclosing field.
+PAGE_SIZE_ARGS: Dict[str, str] = {
+    "ComplaintConnection.edges": "first",
+    "CanteenDetailType.menuItems": "menuLimit",
+    "CanteenDetailType.complaints": "complaintLimit",
+}
+
+
+class _CostWalker:
+    def __init__(self, schema: GraphQLSchema, fragments: Dict[str, FragmentDefinitionNode], variables: dict):
+        self.schema = schema
+        self.fragments = fragments
+        self.variables = variables or {}
+
+    def selection_cost(self, selection_set, parent_type, args: dict) -> float:
+        total = 0.0
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                total += self.field_cost(selection, parent_type, args)
+            elif isinstance(selection, InlineFragmentNode):
+                fragment_type = (
+                    self.schema.get_type(selection.type_condition.name.value)
+                    if selection.type_condition else parent_type
+                )
+                total += self.selection_cost(selection.selection_set, fragment_type, args)
+            elif isinstance(selection, FragmentSpreadNode):
+                fragment = self.fragments.get(selection.name.value)
+                if fragment is not None:
+                    fragment_type = self.schema.get_type(fragment.type_condition.name.value)
+                    total += self.selection_cost(fragment.selection_set, fragment_type, args)
+        return total
+
+    def field_cost(self, node: FieldNode, parent_type, args: dict) -> float:
+        name = node.name.value
+        if name.startswith("__"):
+            return 0.0
+        field = getattr(parent_type, "fields", {}).get(name)
+        if field is None:
+            # Validation already rejected unknown fields.
+            return 0.0
+
+        key = f"{parent_type.name}.{name}"
+        field_args = dict(args)
+        for arg_node in node.arguments or ():
+            arg_def = field.args.get(arg_node.name.value)
+            if arg_def is not None:
+                value = value_from_ast(arg_node.value, arg_def.type, self.variables)
+                # An omitted variable leaves the argument to its default below.
+                if value is not Undefined:
+                    field_args[arg_node.name.value] = value
+        for arg_name, arg_def in field.args.items():
+            if arg_name not in field_args and arg_def.default_value is not Undefined:
+                field_args[arg_name] = arg_def.default_value
+
+        named_type = get_named_type(field.type)
+        weight = FIELD_WEIGHTS.get(key, 1.0 if is_composite_type(named_type) else 0.0)
+        children = self.selection_cost(node.selection_set, named_type, field_args) if node.selection_set else 0.0
+        return self.list_size(key, field, field_args) * (weight + children)
+
+    @staticmethod
+    def list_size(key: str, field, args: dict) -> float:
+        if not isinstance(get_nullable_type(field.type), GraphQLList):
+            return 1.0
+        page_arg = PAGE_SIZE_ARGS.get(key)
+        if page_arg is not None and isinstance(args.get(page_arg), int):
+            return max(1.0, float(args[page_arg]))
+        return float(LIST_SIZES.get(key, DEFAULT_LIST_SIZE))
+
+
+def operation_cost(schema: GraphQLSchema, document, operation_name: Optional[str] = None,
+                   variables: Optional[dict] = None) -> Tuple[Optional[str], float]:
+    """Returns (operation name, estimated cost) for the operation that would run."""
+    fragments = {}
+    operations = []
+    for definition in document.definitions:
+        if isinstance(definition, FragmentDefinitionNode):
+            fragments[definition.name.value] = definition
+        elif isinstance(definition, OperationDefinitionNode):
+            operations.append(definition)
+    if operation_name:
+        operations = [o for o in operations if o.name and o.name.value == operation_name]
+    if not operations:
+        return operation_name, 0.0
+
+    operation = operations[0]
+    root_type = {
+        OperationType.QUERY: schema.query_type,
+        OperationType.MUTATION: schema.mutation_type,
+        OperationType.SUBSCRIPTION: schema.subscription_type,
+    }[operation.operation]
+    walker = _CostWalker(schema, fragments, variables)
+    name = operation.name.value if operation.name else None
+    return name, walker.selection_cost(operation.selection_set, root_type, {})
+
+
+class QueryCostLimiter(SchemaExtension):
+    """Rejects, throttles and logs operations by their estimated cost (see the module docstring)."""
+
+    def __init__(
+        self,
+        limit: float = QUERY_COST_LIMIT,
+        throttle_threshold: float = QUERY_COST_THROTTLE_THRESHOLD,
+        cost_per_token: float = QUERY_COST_PER_TOKEN,
+        log_threshold: float = QUERY_COST_LOG_THRESHOLD,
+        top_size: int = 10,
+    ):
+        self.limit = limit
+        self.throttle_threshold = throttle_threshold
+        self.cost_per_token = cost_per_token
+        self.log_threshold = log_threshold
+        self.top_size = top_size
+        self._lock = threading.Lock()
+        self._rejected = 0
+        self._throttled = 0
+        # Operation name -> highest cost seen, trimmed to the top `top_size`.
+        self._costliest: Dict[str, float] = {}
+
+    async def on_execute(self) -> AsyncIterator[None]:
+        # The extension instance is shared by concurrent requests; keep our own
+        # reference before the first await.
+        execution_context = self.execution_context
+        if execution_context.graphql_document is None:
+            yield
+            return
+
+        name, cost = operation_cost(
+            execution_context.schema._schema,
+            execution_context.graphql_document,
+            execution_context.operation_name,
+            execution_context.variables,
+        )
+        self._record(name or "<anonymous>", cost)
+        request = (execution_context.context or {}).get("request") if isinstance(execution_context.context, dict) else None
+
+        if cost > self.log_threshold:
+            logger.warning(
+                "Costly GraphQL operation %s: cost %.0f (client %s)",
+                name or "<anonymous>", cost, rate_limit.client_key(request) if request else "?",
+            )
+
+        error = None
+        if cost > self.limit:
+            with self._lock:
+                self._rejected += 1
+            error = GraphQLError(
+                f"Query is too expensive (estimated cost {cost:.0f}, limit {self.limit:.0f}). "
+                "Select fewer fields or request smaller pages.",
+                extensions={"code": "QUERY_TOO_EXPENSIVE", "cost": round(cost), "limit": round(self.limit)},
+            )
+        elif cost > self.throttle_threshold and request is not None and RATE_LIMIT_ENABLED:
+            tokens = math.ceil((cost - self.throttle_threshold) / self.cost_per_token)
+            decision = await rate_limit.limiter.check(rate_limit.client_key(request), tokens)
+            if not decision.allowed:
+                with self._lock:
+                    self._throttled += 1
+                error = GraphQLError(
+                    "Too many expensive queries. Please slow down.",
+                    extensions={"code": "RATE_LIMITED", "retryAfter": math.ceil(decision.retry_after)},
+                )
+
+        if error is not None:
+            # Strawberry skips execution when a result is already set.
+            execution_context.result = GraphQLExecutionResult(data=None, errors=[error])
+        yield
+
+    def _record(self, name: str, cost: float) -> None:
+        with self._lock:
+            if cost <= self._costliest.get(name, 0.0):
+                return
+            self._costliest[name] = cost
+            if len(self._costliest) > self.top_size:
+                del self._costliest[min(self._costliest, key=self._costliest.get)]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "limit": self.limit,
+                "throttleThreshold": self.throttle_threshold,
+                "rejected": self._rejected,
+                "throttled": self._throttled,
+                "costliest": [
+                    {"operation": name, "cost": round(cost)}
+                    for name, cost in sorted(self._costliest.items(), key=lambda item: -item[1])
+                ],
+            }
+
+
+query_cost_limiter = QueryCostLimiter()
+
+
+def stats() -> dict:
+    return query_cost_limiter.stats()
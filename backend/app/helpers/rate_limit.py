@@ -0,0 +1,309 @@
+"""
+Rate limiting and admission control for /api/graphql.
+
+Two independent checks run in `RateLimitMiddleware` (app/helpers/middleware.py),
+ahead of AuthMiddleware, so a rejected request never reaches its user lookup:
+
+1. A token bucket per client: "user:<id>" for a valid access token (verified
+   with the cached `decode_token`, no database), otherwise "ip:<address>",
+   where X-Real-IP counts only from RATE_LIMIT_TRUSTED_PROXIES. Each request spends the summed cost of the root fields it
+   selects (OPERATION_COSTS; unlisted fields cost 1), so a client looping on
+   searchMenuItems or getAllOrders runs dry far sooner than one browsing
+   menus. Buckets hold RATE_LIMIT_CAPACITY tokens and refill at
+   RATE_LIMIT_REFILL_PER_SECOND. Two backends:
+     - memory   (default) per worker, an LRU-bounded dict;
+     - postgres shared by every replica, one atomic upsert per request on
+                `rate_limit_buckets`, over its own two-connection engine so
+                it never competes with request handlers for the main pool.
+   Both fail open: a limiter error lets the request through.
+
+2. A global concurrency gate per worker. At most GRAPHQL_MAX_CONCURRENCY
+   requests execute at once, which keeps them within the 7-connection DB pool.
+   Up to GRAPHQL_MAX_QUEUED more wait up to GRAPHQL_QUEUE_TIMEOUT_SECONDS for a
+   slot. Everything beyond that is shed straight away with a 429, instead of
+   piling up on the pool's 30 s checkout timeout.
+
+A local load test (one flooding client against well-behaved ones) lives in
+bench/rate_limit.py.
+"""
+import asyncio
+import hashlib
+import ipaddress
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from graphql import GraphQLError, OperationDefinitionNode, parse
+from sqlalchemy import create_engine, text
+from starlette.requests import Request
+
+from app.core.config import (
+    GRAPHQL_MAX_CONCURRENCY,
+    GRAPHQL_MAX_QUEUED,
+    GRAPHQL_QUEUE_TIMEOUT_SECONDS,
+    RATE_LIMIT_BACKEND,
+    RATE_LIMIT_CAPACITY,
+    RATE_LIMIT_REFILL_PER_SECOND,
+    RATE_LIMIT_TRUSTED_PROXIES,
+)
+from app.helpers.auth_utils import decode_token
+from app.helpers.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Tokens spent per root field. Anything not listed costs 1.
+OPERATION_COSTS: Dict[str, float] = {
+    # Unbounded or full-text scans
+    "searchMenuItems": 5,
+    "searchCanteens": 3,
+    "searchUsers": 5,
+    "getAllOrders": 10,
+    "getAllComplaints": 5,
+    "getCanteenOrders": 5,
+    "getCanteenStats": 5,
+    "getUserPaymentHistory": 3,
+    # bcrypt or a round trip to the CAS server
+    "login": 5,
+    "signup": 5,
+    "verifyCasTicket": 3,
+}
+DEFAULT_COST = 1.0
+
+
+@dataclass(frozen=True)
+class Decision:
+    allowed: bool
+    # Seconds until the bucket holds enough tokens for this request.
+    retry_after: float = 0.0
+
+
+# ===================================================================
+# Operation cost
+# ===================================================================
+
+# Clients send the same handful of query strings over and over, so the root
+# fields of each (query, operation) pair are parsed once and remembered.
+_root_field_cache = TTLCache(maxsize=1024, ttl=3600)
+
+
+def root_fields(query: str, operation_name: Optional[str]) -> Tuple[str, ...]:
+    key = (hashlib.blake2b(query.encode(), digest_size=16).digest(), operation_name)
+    fields = _root_field_cache.get(key)
+    if fields is None:
+        try:
+            document = parse(query)
+        except GraphQLError:
+            # Strawberry rejects it anyway; charge the default.
+            fields = ()
+        else:
+            operations = [d for d in document.definitions if isinstance(d, OperationDefinitionNode)]
+            if operation_name:
+                operations = [o for o in operations if o.name and o.name.value == operation_name]
+            fields = tuple(
+                selection.name.value
+                for operation in operations[:1]
+                for selection in operation.selection_set.selections
+                if hasattr(selection, "name")
+            )
+        _root_field_cache.set(key, fields)
+    return fields
+
+
+def operation_cost(payload) -> float:
+    """Cost of a GraphQL request body (a single operation or a list of them)."""
+    if isinstance(payload, list):
+        return sum(operation_cost(p) for p in payload) or DEFAULT_COST
+    if not isinstance(payload, dict) or not isinstance(payload.get("query"), str):
+        return DEFAULT_COST
+    fields = root_fields(payload["query"], payload.get("operationName"))
+    return sum(OPERATION_COSTS.get(f, DEFAULT_COST) for f in fields) or DEFAULT_COST
+
+
+trusted_proxies = [ipaddress.ip_network(p, strict=False) for p in RATE_LIMIT_TRUSTED_PROXIES]
+
+
+def _is_trusted_proxy(host: Optional[str]) -> bool:
+    try:
+        address = ipaddress.ip_address(host or "")
+    except ValueError:
+        return False
+    return any(address in network for network in trusted_proxies)
+
+
+def client_key(request: Request) -> str:
+    token = request.cookies.get("access_token")
+    payload = decode_token(token) if token else None
+    if payload and payload.get("typ") != "refresh" and payload.get("sub"):
+        return f"user:{payload['sub']}"
+    peer = request.client.host if request.client else None
+    if request.headers.get("x-real-ip") and _is_trusted_proxy(peer):
+        return f"ip:{request.headers['x-real-ip']}"
+    return f"ip:{peer or 'unknown'}"
+
+
+# ===================================================================
+# Bucket stores
+# ===================================================================
+
+class MemoryBucketStore:
+    """Token buckets for this worker only. The least recently used bucket is dropped past `maxsize`."""
+    blocking = False
+
+    def __init__(self, maxsize: int = 100_000):
+        self.maxsize = maxsize
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, cost: float, capacity: float, rate: float) -> Decision:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return Decision(allowed, 0.0 if allowed else (cost - tokens) / rate)
+
+
+_TAKE_SQL = text(
+    """
+    INSERT INTO rate_limit_buckets AS b (key, tokens, allowed, updated_at)
+    VALUES (:key, :capacity - :cost, true, now())
+    ON CONFLICT (key) DO UPDATE SET
+        allowed = least(:capacity, b.tokens + extract(epoch FROM now() - b.updated_at) * :rate) >= :cost,
+        tokens = least(:capacity, b.tokens + extract(epoch FROM now() - b.updated_at) * :rate)
+                 - CASE WHEN least(:capacity, b.tokens + extract(epoch FROM now() - b.updated_at) * :rate) >= :cost
+                        THEN :cost ELSE 0 END,
+        updated_at = now()
+    RETURNING allowed, tokens
+    """
+)
+
+
+class PostgresBucketStore:
+    """Token buckets shared across replicas, refilled and spent in one upsert."""
+    blocking = True
+
+    def __init__(self, database_url: Optional[str] = None):
+        from app.core.database import SQLALCHEMY_DATABASE_URL
+
+        # A separate, tiny pool: the limiter must keep working while the
+        # request pool is saturated, and must never take connections from it.
+        self.engine = create_engine(
+            database_url or SQLALCHEMY_DATABASE_URL,
+            pool_size=2,
+            max_overflow=0,
+            pool_timeout=0.5,
+            pool_pre_ping=True,
+            pool_recycle=300,
+        )
+
+    def take(self, key: str, cost: float, capacity: float, rate: float) -> Decision:
+        with self.engine.begin() as conn:
+            allowed, tokens = conn.execute(
+                _TAKE_SQL, {"key": key, "cost": cost, "capacity": capacity, "rate": rate}
+            ).one()
+        return Decision(allowed, 0.0 if allowed else (cost - tokens) / rate)
+
+
+def purge_idle_buckets(db) -> int:
+    """Deletes shared buckets untouched long enough to have refilled completely."""
+    idle_seconds = RATE_LIMIT_CAPACITY / RATE_LIMIT_REFILL_PER_SECOND + 60
+    result = db.execute(
+        text("DELETE FROM rate_limit_buckets WHERE updated_at < now() - make_interval(secs => :secs)"),
+        {"secs": idle_seconds},
+    )
+    db.commit()
+    return result.rowcount
+
+
+# ===================================================================
+# Limiter and concurrency gate
+# ===================================================================
+
+class RateLimiter:
+    def __init__(self, store, capacity: float = RATE_LIMIT_CAPACITY, rate: float = RATE_LIMIT_REFILL_PER_SECOND):
+        self.store = store
+        self.capacity = capacity
+        self.rate = rate
+        self.limited = 0
+
+    async def check(self, key: str, cost: float) -> Decision:
+        # A request dearer than the whole bucket would never pass; cap it.
+        cost = min(cost, self.capacity)
+        try:
+            if self.store.blocking:
+                decision = await asyncio.to_thread(self.store.take, key, cost, self.capacity, self.rate)
+            else:
+                decision = self.store.take(key, cost, self.capacity, self.rate)
+        except Exception:
+            logger.exception("Rate limiter backend failed; letting the request through")
+            return Decision(True)
+        if not decision.allowed:
+            self.limited += 1
+        return decision
+
+
+class ConcurrencyGate:
+    """Bounds in-flight requests per worker, with a short bounded queue in front."""
+
+    def __init__(
+        self,
+        limit: int = GRAPHQL_MAX_CONCURRENCY,
+        max_queued: int = GRAPHQL_MAX_QUEUED,
+        queue_timeout: float = GRAPHQL_QUEUE_TIMEOUT_SECONDS,
+    ):
+        self.limit = limit
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(limit)
+        self.in_flight = 0
+        self.queued = 0
+        self.shed = 0
+
+    async def acquire(self) -> bool:
+        """Takes a slot, waiting briefly if needed. Returns False if the request should be shed."""
+        if self._semaphore.locked():
+            if self.queued >= self.max_queued:
+                self.shed += 1
+                return False
+            self.queued += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.shed += 1
+                return False
+            finally:
+                self.queued -= 1
+        else:
+            await self._semaphore.acquire()
+        self.in_flight += 1
+        return True
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._semaphore.release()
+
+
+def build_store(backend: str = RATE_LIMIT_BACKEND):
+    return PostgresBucketStore() if backend == "postgres" else MemoryBucketStore()
+
+
+limiter = RateLimiter(build_store())
+gate = ConcurrencyGate()
+
+
+def stats() -> dict:
+    return {
+        "backend": RATE_LIMIT_BACKEND,
+        "limited": limiter.limited,
+        "inFlight": gate.in_flight,
+        "queued": gate.queued,
+        "shed": gate.shed,
+    }
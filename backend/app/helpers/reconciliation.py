@@ -0,0 +1,378 @@
+"""
+Offline reconciliation of `payments` against gateway settlement reports.
+
+A settlement file (CSV or JSON Lines, optionally gzipped) is streamed in
+fixed-size chunks. Each chunk is matched against `payments` with two indexed
+lookups (`razorpay_payment_id = ANY(...)` and `razorpay_order_id = ANY(...)`,
+both unique columns), compared row by row, and every discrepancy is written to
+a CSV report as soon as it is found, so memory does not grow with the file.
+
+Discrepancies:
+  unknown_payment      settled at the gateway, no matching payment here
+  not_captured         settled at the gateway, still pending/failed here (fixable)
+  amount_mismatch      settled amount differs from the payment amount
+  payment_id_mismatch  the gateway order was paid by a different payment id
+  refund_not_recorded  refunded at the gateway, not marked refunded here
+  stuck_pending        gateway payment pending here for too long, not in the report (fixable)
+
+With `fix`, not-captured payments are queued as synthetic `payment.captured`
+webhook events (event id `recon:<payment id>`), so the webhook workers confirm
+them and their orders exactly like a live capture; stuck pending payments are
+marked failed.
+
+Settlement columns (amounts in paise, as in the gateway's reports):
+    entity_id,type,order_id,amount,fee,tax,settlement_id,settled_at
+
+    python -m app.helpers.reconciliation reconcile FILE [--fix] [--report=OUT.csv]
+
+A settlement generator and benchmark live in bench/reconciliation.py.
+"""
+import csv
+import gzip
+import json
+import logging
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, TextIO, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.helpers.wallet_ledger import to_paise
+from app.models.payment import PaymentWebhookEvent
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 5_000
+DEFAULT_STUCK_AFTER = timedelta(days=3)
+
+UNKNOWN_PAYMENT = "unknown_payment"
+NOT_CAPTURED = "not_captured"
+AMOUNT_MISMATCH = "amount_mismatch"
+PAYMENT_ID_MISMATCH = "payment_id_mismatch"
+REFUND_NOT_RECORDED = "refund_not_recorded"
+STUCK_PENDING = "stuck_pending"
+
+SETTLEMENT_COLUMNS = ["entity_id", "type", "order_id", "amount", "fee", "tax", "settlement_id", "settled_at"]
+REPORT_COLUMNS = ["kind", "payment_id", "razorpay_order_id", "razorpay_payment_id",
+                  "expected", "actual", "settlement_id", "fixed"]
+
+
+@dataclass
+class SettlementRow:
+    entity_id: str
+    type: str
+    order_id: Optional[str]
+    amount_paise: int
+    settlement_id: Optional[str] = None
+
+
+@dataclass
+class PaymentRecord:
+    id: int
+    razorpay_order_id: Optional[str]
+    razorpay_payment_id: Optional[str]
+    amount_paise: int
+    status: str
+
+
+@dataclass
+class Discrepancy:
+    kind: str
+    payment_id: Optional[int]
+    razorpay_order_id: Optional[str]
+    razorpay_payment_id: Optional[str]
+    expected: Optional[str] = None
+    actual: Optional[str] = None
+    settlement_id: Optional[str] = None
+    fixed: bool = False
+
+    def as_row(self) -> list:
+        return [self.kind, self.payment_id, self.razorpay_order_id, self.razorpay_payment_id,
+                self.expected, self.actual, self.settlement_id, "yes" if self.fixed else ""]
+
+
+@dataclass
+class ReconciliationSummary:
+    rows: int = 0
+    matched: int = 0
+    discrepancies: Counter = field(default_factory=Counter)
+    fixed: int = 0
+    elapsed: float = 0.0
+
+    def __str__(self) -> str:
+        rate = self.rows / self.elapsed if self.elapsed else 0.0
+        kinds = ", ".join(f"{k}={v:,}" for k, v in sorted(self.discrepancies.items())) or "none"
+        return (f"rows={self.rows:,} matched={self.matched:,} fixed={self.fixed:,} "
+                f"elapsed={self.elapsed:.2f}s ({rate:,.0f} rows/s)\ndiscrepancies: {kinds}")
+
+
+# ===================================================================
+# Reading settlement files
+# ===================================================================
+
+def _open_text(path: str) -> TextIO:
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, "r", encoding="utf-8", newline="")
+
+
+def _to_row(record: dict) -> SettlementRow:
+    return SettlementRow(
+        entity_id=str(record["entity_id"]),
+        type=(record.get("type") or "payment").lower(),
+        order_id=record.get("order_id") or None,
+        amount_paise=int(record["amount"]),
+        settlement_id=record.get("settlement_id") or None,
+    )
+
+
+def iter_settlement_rows(stream: TextIO, fmt: str = "csv") -> Iterator[SettlementRow]:
+    """Yields settlement rows from CSV (with header) or JSON Lines, one at a time."""
+    if fmt == "csv":
+        records = csv.DictReader(stream)
+    elif fmt in ("json", "jsonl", "ndjson"):
+        records = (json.loads(line) for line in stream if line.strip())
+    else:
+        raise ValueError(f"Unsupported settlement format: {fmt}")
+    for record in records:
+        yield _to_row(record)
+
+
+def _format_of(path: str) -> str:
+    name = path[:-3] if path.endswith(".gz") else path
+    return "csv" if name.endswith(".csv") else "jsonl"
+
+
+def _chunked(rows: Iterable[SettlementRow], size: int) -> Iterator[List[SettlementRow]]:
+    chunk: List[SettlementRow] = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# ===================================================================
+# Matching
+# ===================================================================
+
+class DbPaymentLookup:
+    """Finds payments for a chunk of settlement rows with two indexed ANY() lookups."""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def fetch(self, payment_ids: Sequence[str], order_ids: Sequence[str]) -> Tuple[Dict[str, PaymentRecord], Dict[str, PaymentRecord]]:
+        rows = self.db.execute(
+            text(
+                """
+                SELECT id, razorpay_order_id, razorpay_payment_id, amount, payment_status::text
+                FROM payments WHERE razorpay_payment_id = ANY(:payment_ids)
+                UNION
+                SELECT id, razorpay_order_id, razorpay_payment_id, amount, payment_status::text
+                FROM payments WHERE razorpay_order_id = ANY(:order_ids)
+                """
+            ),
+            {"payment_ids": list(payment_ids), "order_ids": list(order_ids)},
+        )
+        by_payment, by_order = {}, {}
+        for pid, order_ref, payment_ref, amount, status in rows:
+            record = PaymentRecord(pid, order_ref, payment_ref, to_paise(amount), status.lower())
+            if payment_ref:
+                by_payment[payment_ref] = record
+            if order_ref:
+                by_order[order_ref] = record
+        return by_payment, by_order
+
+
+def compare(row: SettlementRow, by_payment: Dict[str, PaymentRecord],
+            by_order: Dict[str, PaymentRecord]) -> Tuple[Optional[PaymentRecord], List[Discrepancy]]:
+    """Compares one settlement row with our payment; returns the payment (if found) and its discrepancies."""
+    payment = by_payment.get(row.entity_id) if row.type == "payment" else None
+    if payment is None and row.order_id:
+        payment = by_order.get(row.order_id)
+    if payment is None:
+        if row.type != "payment":
+            # Refund/adjustment rows reference refund ids; without an order id they cannot be matched.
+            return None, []
+        return None, [Discrepancy(UNKNOWN_PAYMENT, None, row.order_id, row.entity_id,
+                                  actual=str(row.amount_paise), settlement_id=row.settlement_id)]
+
+    found: List[Discrepancy] = []
+
+    def add(kind: str, expected, actual) -> None:
+        found.append(Discrepancy(kind, payment.id, payment.razorpay_order_id, row.entity_id,
+                                 expected=str(expected), actual=str(actual), settlement_id=row.settlement_id))
+
+    if row.type == "refund":
+        if payment.status != "refunded":
+            add(REFUND_NOT_RECORDED, "refunded", payment.status)
+        return payment, found
+
+    if payment.razorpay_payment_id and payment.razorpay_payment_id != row.entity_id:
+        add(PAYMENT_ID_MISMATCH, payment.razorpay_payment_id, row.entity_id)
+    elif payment.status != "completed":
+        add(NOT_CAPTURED, "completed", payment.status)
+    if payment.amount_paise != row.amount_paise:
+        add(AMOUNT_MISMATCH, payment.amount_paise, row.amount_paise)
+    return payment, found
+
+
+# ===================================================================
+# Fixes
+# ===================================================================
+
+def _queue_captures(db: Session, fixes: List[Tuple[Discrepancy, SettlementRow]]) -> int:
+    """Queues synthetic capture webhooks for settled-but-not-captured payments. Returns how many were new."""
+    values = [
+        {
+            "event_id": f"recon:{row.entity_id}",
+            "event_type": "payment.captured",
+            "razorpay_order_id": d.razorpay_order_id,
+            "razorpay_payment_id": row.entity_id,
+            "payload": {
+                "event": "payment.captured",
+                "source": "reconciliation",
+                "settlement_id": row.settlement_id,
+                "payload": {"payment": {"entity": {
+                    "id": row.entity_id, "order_id": d.razorpay_order_id,
+                    "amount": row.amount_paise, "status": "captured",
+                }}},
+            },
+            "status": "pending",
+            "attempts": 0,
+        }
+        for d, row in fixes
+    ]
+    stmt = pg_insert(PaymentWebhookEvent.__table__).values(values).on_conflict_do_nothing(index_elements=["event_id"])
+    inserted = db.execute(stmt).rowcount
+    db.commit()
+    return inserted
+
+
+def _stuck_pending(db: Session, stuck_after: timedelta, exclude: set, fix: bool) -> Iterator[Discrepancy]:
+    """Gateway payments pending since before the cutoff that the report did not settle."""
+    cutoff = datetime.now(timezone.utc) - stuck_after
+    rows = db.execute(
+        text(
+            """
+            SELECT id, razorpay_order_id, razorpay_payment_id, amount FROM payments
+            WHERE payment_status = 'PENDING' AND payment_method = 'UPI' AND created_at < :cutoff
+            ORDER BY id
+            """
+        ),
+        {"cutoff": cutoff},
+    ).fetchall()
+    stuck = [r for r in rows if r[0] not in exclude]
+    if fix and stuck:
+        db.execute(
+            text(
+                """
+                UPDATE payments SET payment_status = 'FAILED', updated_at = now(),
+                    payment_response = 'Marked failed by reconciliation: not settled by the gateway'
+                WHERE id = ANY(:ids) AND payment_status = 'PENDING'
+                """
+            ),
+            {"ids": [r[0] for r in stuck]},
+        )
+        db.commit()
+    for pid, order_ref, payment_ref, amount in stuck:
+        yield Discrepancy(STUCK_PENDING, pid, order_ref, payment_ref, expected="settled",
+                          actual=f"pending since before {cutoff:%Y-%m-%d}", fixed=fix)
+
+
+# ===================================================================
+# Engine
+# ===================================================================
+
+def reconcile(
+    rows: Iterable[SettlementRow],
+    lookup,
+    report: Optional[TextIO] = None,
+    db: Optional[Session] = None,
+    fix: bool = False,
+    stuck_after: Optional[timedelta] = DEFAULT_STUCK_AFTER,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> ReconciliationSummary:
+    """
+    Streams settlement rows through `lookup`, writes discrepancies to `report`
+    (CSV) and returns a summary. Fixes and the stuck-pending pass need `db`.
+    """
+    began = time.perf_counter()
+    summary = ReconciliationSummary()
+    writer = csv.writer(report) if report is not None else None
+    if writer is not None:
+        writer.writerow(REPORT_COLUMNS)
+    flagged_pending: set = set()
+
+    for chunk in _chunked(rows, chunk_size):
+        payment_ids = [r.entity_id for r in chunk if r.type == "payment"]
+        order_ids = [r.order_id for r in chunk if r.order_id]
+        by_payment, by_order = lookup.fetch(payment_ids, order_ids)
+
+        found: List[Discrepancy] = []
+        to_capture: List[Tuple[Discrepancy, SettlementRow]] = []
+        for row in chunk:
+            payment, discrepancies = compare(row, by_payment, by_order)
+            if payment is not None:
+                summary.matched += 1
+            for d in discrepancies:
+                if d.kind == NOT_CAPTURED:
+                    flagged_pending.add(d.payment_id)
+                    if fix:
+                        to_capture.append((d, row))
+                        d.fixed = True
+            found.extend(discrepancies)
+        summary.rows += len(chunk)
+
+        if to_capture:
+            _queue_captures(db, to_capture)
+            summary.fixed += len(to_capture)
+        for d in found:
+            summary.discrepancies[d.kind] += 1
+            if writer is not None:
+                writer.writerow(d.as_row())
+
+    if db is not None and stuck_after is not None:
+        for d in _stuck_pending(db, stuck_after, flagged_pending, fix):
+            summary.discrepancies[d.kind] += 1
+            summary.fixed += int(d.fixed)
+            if writer is not None:
+                writer.writerow(d.as_row())
+
+    summary.elapsed = time.perf_counter() - began
+    return summary
+
+
+def reconcile_file(db: Session, path: str, report_path: Optional[str] = None, fix: bool = False,
+                   chunk_size: int = DEFAULT_CHUNK_SIZE) -> ReconciliationSummary:
+    """Reconciles a settlement file against the database and writes the report next to it by default."""
+    report_path = report_path or f"{path.rsplit('.', 1)[0]}.discrepancies.csv"
+    with _open_text(path) as stream, open(report_path, "w", newline="", encoding="utf-8") as report:
+        summary = reconcile(iter_settlement_rows(stream, _format_of(path)), DbPaymentLookup(db),
+                            report=report, db=db, fix=fix, chunk_size=chunk_size)
+    logger.info("Reconciled %s: %s (report: %s)", path, summary, report_path)
+    return summary
+
+
+if __name__ == "__main__":
+    from app.core.database import SessionLocal
+
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    flags = {a for a in sys.argv[1:] if a.startswith("--")}
+    if len(args) != 2 or args[0] != "reconcile":
+        raise SystemExit("usage: python -m app.helpers.reconciliation reconcile FILE [--fix] [--report=OUT.csv]")
+
+    session = SessionLocal()
+    try:
+        report_arg = next((a.split("=", 1)[1] for a in flags if a.startswith("--report=")), None)
+        reconcile_file(session, args[1], report_arg, fix="--fix" in flags)
+    finally:
+        session.close()
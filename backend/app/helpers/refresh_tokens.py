@@ -0,0 +1,188 @@
+"""
+Refresh-token rotation with reuse detection.
+
+Every login starts a token *family*: one row in `refresh_token_families`. The
+refresh cookie carries the family id (`fam`) and a token id (`jti`). The
+`refreshSession` mutation trades a refresh token for a new access token and a
+new refresh token. It rotates the family's jti in one conditional UPDATE, with
+no bcrypt and no user lookup by name or email.
+
+Presenting a jti that is no longer current means an old copy of the token was
+replayed (a stolen cookie, or a client that kept an old token). The whole
+family is then revoked, so both holders have to log in again. The jti rotated
+away last stays valid for REFRESH_REUSE_GRACE_SECONDS. That way two tabs
+refreshing at the same moment don't look like theft. The tab that loses the
+race gets a new access token only, and keeps the refresh cookie the winner set.
+
+Refresh tokens issued before rotation existed carry no family. The first use
+records the token as a family (keyed by a digest of the token) and rotates
+it; a second use of the same token is reuse, exactly as above.
+
+The store stays compact: one row per session, however often it is rotated.
+The purge_refresh_token_families job deletes expired and revoked families.
+A load model of logins per hour with and without refresh lives in
+bench/refresh_tokens.py.
+"""
+import hashlib
+import logging
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from fastapi import Response
+from sqlalchemy import and_, delete, or_, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.core.config import REFRESH_REUSE_GRACE_SECONDS, REFRESH_TOKEN_EXPIRE_DAYS
+from app.helpers.auth_utils import create_and_set_tokens, decode_token
+from app.models.user import RefreshTokenFamily, User
+
+logger = logging.getLogger(__name__)
+
+ROTATED = "rotated"
+# The previous jti was presented within the grace window (concurrent refresh).
+GRACE = "grace"
+REUSED = "reused"
+INVALID = "invalid"
+
+# Stands in for the jti of refresh tokens issued before rotation existed.
+LEGACY_JTI = "legacy"
+
+
+@dataclass(frozen=True)
+class RotationResult:
+    status: str
+    user_id: Optional[str] = None
+    family_id: Optional[str] = None
+    # The new jti when status == ROTATED.
+    jti: Optional[str] = None
+
+
+def _new_id() -> str:
+    return uuid.uuid4().hex
+
+
+def _legacy_family_id(refresh_token: str) -> str:
+    return hashlib.blake2b(refresh_token.encode(), digest_size=16).hexdigest()
+
+
+def _expiry(now: datetime) -> datetime:
+    return now + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+
+
+def start_session(db: Session, response: Response, user: User) -> None:
+    """Starts a new token family for `user` and sets both session cookies. Commits."""
+    family_id, jti = _start_family(db, user.id)
+    db.commit()
+    create_and_set_tokens(response, user.id, user.name, user.role, family_id, jti)
+
+
+def _start_family(db: Session, user_id: str):
+    family_id, jti = _new_id(), _new_id()
+    db.add(
+        RefreshTokenFamily(
+            id=family_id,
+            user_id=str(user_id),
+            current_jti=jti,
+            expires_at=_expiry(datetime.now(timezone.utc)),
+        )
+    )
+    return family_id, jti
+
+
+def rotate(db: Session, refresh_token: Optional[str]) -> RotationResult:
+    """
+    Validates a refresh token and rotates its family's jti. Revokes the family
+    when an already-rotated jti is replayed outside the grace window. Commits.
+    """
+    payload = decode_token(refresh_token) if refresh_token else None
+    if not payload or payload.get("typ", "refresh") != "refresh" or not payload.get("sub"):
+        return RotationResult(INVALID)
+
+    now = datetime.now(timezone.utc)
+    family_id, jti = payload.get("fam"), payload.get("jti")
+    if not family_id:
+        if "role" in payload or "exp" not in payload:
+            # An access token without a type claim, or a token that never expires.
+            return RotationResult(INVALID)
+        # Refresh tokens issued before rotation existed. Each is recorded as a
+        # family keyed by a digest of the token, whose current jti is
+        # LEGACY_JTI, and then rotated like any other: a second use of the same
+        # legacy token presents a rotated-away jti and counts as reuse.
+        family_id, jti = _legacy_family_id(refresh_token), LEGACY_JTI
+        db.execute(
+            pg_insert(RefreshTokenFamily)
+            .values(id=family_id, user_id=str(payload["sub"]), current_jti=jti, expires_at=_expiry(now))
+            .on_conflict_do_nothing(index_elements=["id"])
+        )
+
+    new_jti = _new_id()
+    rotated = db.execute(
+        update(RefreshTokenFamily)
+        .where(
+            RefreshTokenFamily.id == family_id,
+            RefreshTokenFamily.current_jti == jti,
+            RefreshTokenFamily.revoked_at.is_(None),
+            RefreshTokenFamily.expires_at > now,
+        )
+        .values(previous_jti=jti, current_jti=new_jti, rotated_at=now, expires_at=_expiry(now))
+        .returning(RefreshTokenFamily.user_id)
+    ).first()
+    if rotated is not None:
+        db.commit()
+        return RotationResult(ROTATED, rotated.user_id, family_id, new_jti)
+
+    family = db.get(RefreshTokenFamily, family_id)
+    if family is None or family.revoked_at is not None or family.expires_at <= now:
+        db.rollback()
+        return RotationResult(INVALID)
+    if family.previous_jti == jti and family.rotated_at > now - timedelta(seconds=REFRESH_REUSE_GRACE_SECONDS):
+        db.rollback()
+        return RotationResult(GRACE, family.user_id, family_id)
+
+    family.revoked_at = now
+    db.commit()
+    logger.warning("Refresh token reuse detected for user %s; revoked session %s.", family.user_id, family_id)
+    return RotationResult(REUSED, family.user_id, family_id)
+
+
+def revoke(db: Session, refresh_token: Optional[str]) -> None:
+    """Revokes the family of a refresh token (e.g. on logout). Commits."""
+    payload = decode_token(refresh_token) if refresh_token else None
+    if not payload or not payload.get("fam"):
+        return
+    db.execute(
+        update(RefreshTokenFamily)
+        .where(RefreshTokenFamily.id == payload["fam"], RefreshTokenFamily.revoked_at.is_(None))
+        .values(revoked_at=datetime.now(timezone.utc))
+    )
+    db.commit()
+
+
+def purge_expired_families(db: Session) -> int:
+    """
+    Deletes families that have expired, or were revoked over a day ago.
+    Returns how many.
+
+    A revoked family is kept until it is REFRESH_TOKEN_EXPIRE_DAYS old. Until
+    then, a legacy token it was recorded from may still be live, and deleting
+    the row would let that token start a new family.
+    """
+    now = datetime.now(timezone.utc)
+    result = db.execute(
+        delete(RefreshTokenFamily).where(
+            or_(
+                RefreshTokenFamily.expires_at <= now,
+                and_(
+                    RefreshTokenFamily.revoked_at.is_not(None),
+                    RefreshTokenFamily.revoked_at <= now - timedelta(days=1),
+                    RefreshTokenFamily.created_at <= now - timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+                ),
+            )
+        )
+    )
+    db.commit()
+    logger.info("Purged %d refresh token famil(ies).", result.rowcount)
+    return result.rowcount
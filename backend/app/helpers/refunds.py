@@ -0,0 +1,347 @@
+"""
+Refunds for cancelled orders.
+
+`request_refunds` cancels a set of orders and queues one `refund_requests` row
+per completed gateway/wallet payment, all in one transaction with set-based
+statements (used by `cancelOrder` for a single paid order and by
+`refundCanteenOrders` when a canteen closes early).
+
+The refund worker claims due requests with `FOR UPDATE SKIP LOCKED`, groups
+them by merchant and sends gateway refunds through the merchant's pooled
+adapter on a thread pool, with a global and a per-merchant concurrency limit.
+Wallet refunds are credited to the buyer's ledger inside the same transaction
+that records the batch's results (keyed on the request, so a retry credits
+once). Payments, orders and sales rollups are then updated in bulk; failed
+requests are retried with exponential backoff until they run out of attempts.
+
+    python -m app.helpers.refunds worker
+"""
+import logging
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import text, update
+from sqlalchemy.orm import Session
+
+from app.helpers.exceptions import RefundError
+from app.helpers.payment_adapters import RefundOutput, WalletAdapter, get_payment_processor
+from app.helpers.payment_clients import get_merchant_credentials
+from app.helpers.payment_repository import WalletRepository
+from app.helpers.sales_rollups import RollupBatch
+from app.helpers.wallet_ledger import from_paise
+from app.models.order import Order
+from app.models.payment import Payment, PaymentMethod, PaymentStatus, RefundRequest
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 100
+MAX_CONCURRENCY = 8
+PER_MERCHANT_CONCURRENCY = 4
+MAX_ATTEMPTS = 6
+STALE_CLAIM_AFTER = timedelta(minutes=10)
+
+# Orders in these states can still be cancelled (and refunded) in bulk.
+REFUNDABLE_ORDER_STATUSES = ("pending", "scheduled", "confirmed", "preparing", "ready")
+
+
+# One refund request per completed UPI/wallet payment matching `{where}`.
+_QUEUE_REFUNDS_SQL = """
+    INSERT INTO refund_requests
+        (payment_id, order_id, merchant_id, payment_method, amount_paise, reason, requested_by,
+         status, attempts, available_at, created_at)
+    SELECT p.id, p.order_id, p.merchant_id, p.payment_method, round(p.amount * 100)::bigint,
+           :reason, :requested_by, 'pending', 0, now(), now()
+    FROM payments p
+    WHERE {where}
+      AND p.payment_status = 'COMPLETED'
+      AND p.payment_method IN ('UPI', 'WALLET')
+    ON CONFLICT (payment_id) DO NOTHING
+"""
+
+
+@dataclass
+class RefundBatchResult:
+    cancelled: int
+    refunds_requested: int
+
+
+def request_refunds(
+    db: Session, order_ids: Sequence[int], reason: Optional[str] = None, requested_by: Optional[str] = None
+) -> RefundBatchResult:
+    """
+    Cancels the given (still active) orders and queues refunds for their
+    completed UPI/wallet payments. Does not commit.
+    """
+    if not order_ids:
+        return RefundBatchResult(0, 0)
+    orders = db.execute(
+        text(
+            """
+            SELECT id, canteen_id, order_time, status, total_amount, tax FROM orders
+            WHERE id = ANY(:ids) AND status = ANY(:statuses)
+            ORDER BY id FOR UPDATE
+            """
+        ),
+        {"ids": list(order_ids), "statuses": list(REFUNDABLE_ORDER_STATUSES)},
+    ).fetchall()
+    if not orders:
+        return RefundBatchResult(0, 0)
+    ids = [o.id for o in orders]
+
+    db.execute(
+        text(
+            """
+            UPDATE orders
+            SET status = 'cancelled', cancelled_time = :now, cancellation_reason = :reason,
+                payment_status = CASE WHEN payment_status = 'Paid' THEN 'Refund Pending' ELSE payment_status END
+            WHERE id = ANY(:ids)
+            """
+        ),
+        {"ids": ids, "now": datetime.now(timezone.utc), "reason": reason},
+    )
+    rollups = RollupBatch()
+    for o in orders:
+        rollups.status_change(o, o.status, "cancelled")
+    rollups.flush(db)
+
+    queued = db.execute(
+        text(_QUEUE_REFUNDS_SQL.format(where="p.order_id = ANY(:ids)")),
+        {"ids": ids, "reason": reason, "requested_by": requested_by},
+    ).rowcount
+    logger.info("Cancelled %d order(s) and queued %d refund(s).", len(ids), queued)
+    return RefundBatchResult(len(ids), queued)
+
+
+def queue_payment_refunds(
+    db: Session, payment_ids: Sequence[int], reason: Optional[str] = None, requested_by: Optional[str] = None
+) -> int:
+    """
+    Queues refunds for specific completed UPI/wallet payments without touching
+    their orders (e.g. a capture that arrived after the order was cancelled).
+    Returns the number queued. Does not commit.
+    """
+    if not payment_ids:
+        return 0
+    return db.execute(
+        text(_QUEUE_REFUNDS_SQL.format(where="p.id = ANY(:ids)")),
+        {"ids": list(payment_ids), "reason": reason, "requested_by": requested_by},
+    ).rowcount
+
+
+def request_canteen_refunds(
+    db: Session, canteen_id: int, reason: Optional[str] = None, requested_by: Optional[str] = None
+) -> RefundBatchResult:
+    """Cancels and refunds every active order of a canteen (e.g. it closes early). Does not commit."""
+    order_ids = [
+        oid for (oid,) in db.query(Order.id).filter(
+            Order.canteen_id == canteen_id, Order.status.in_(REFUNDABLE_ORDER_STATUSES)
+        )
+    ]
+    return request_refunds(db, order_ids, reason, requested_by)
+
+
+# ===================================================================
+# Worker
+# ===================================================================
+
+def claim_batch(db: Session, batch_size: int = DEFAULT_BATCH_SIZE) -> List:
+    """Claims up to `batch_size` due refund requests (including stale claims) and commits the claim."""
+    rows = db.execute(
+        text(
+            """
+            UPDATE refund_requests
+            SET status = 'processing', locked_at = now(), attempts = attempts + 1
+            WHERE id IN (
+                SELECT id FROM refund_requests
+                WHERE (status = 'pending' AND available_at <= now())
+                   OR (status = 'processing' AND locked_at < now() - make_interval(secs => :stale))
+                ORDER BY available_at, id
+                LIMIT :n
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING id, payment_id, order_id, merchant_id, payment_method, amount_paise, attempts
+            """
+        ),
+        {"n": batch_size, "stale": STALE_CLAIM_AFTER.total_seconds()},
+    ).fetchall()
+    db.commit()
+    return rows
+
+
+def _gateway_refunds(db: Session, requests: List, payments: Dict[int, Any],
+                     concurrency: int, per_merchant: int) -> Dict[int, object]:
+    """
+    Sends gateway refunds on a thread pool, bounded globally and per merchant.
+    Returns request id -> RefundOutput or the exception raised.
+    """
+    by_merchant: Dict[int, List] = defaultdict(list)
+    for r in requests:
+        by_merchant[r.merchant_id].append(r)
+
+    results: Dict[int, object] = {}
+    calls = []
+    for merchant_id, group in by_merchant.items():
+        creds = get_merchant_credentials(db, merchant_id=merchant_id)
+        try:
+            if creds is None:
+                raise RefundError(f"Merchant {merchant_id} not found.")
+            # One adapter (and pooled gateway client) per merchant for the whole batch.
+            processor = get_payment_processor(PaymentMethod.UPI, db, creds.as_merchant_info())
+        except Exception as e:
+            for r in group:
+                results[r.id] = e
+            continue
+        gate = threading.BoundedSemaphore(per_merchant)
+        for r in group:
+            calls.append((r, processor, gate))
+
+    def _refund(call) -> Tuple[int, object]:
+        r, processor, gate = call
+        payment = payments.get(r.payment_id)
+        with gate:
+            try:
+                if payment is None or not payment.razorpay_payment_id:
+                    raise RefundError("Payment has no gateway payment id.")
+                return r.id, processor.refund_payment(
+                    payment.razorpay_payment_id, from_paise(r.amount_paise), reference=f"refund_request_{r.id}"
+                )
+            except Exception as e:
+                return r.id, e
+
+    if calls:
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(calls))) as pool:
+            results.update(pool.map(_refund, calls))
+    return results
+
+
+def _backoff(attempts: int) -> timedelta:
+    return timedelta(seconds=min(3600, 10 * 2 ** max(0, attempts - 1)))
+
+
+def apply_results(db: Session, requests: List, payments: Dict[int, Any], results: Dict[int, object]) -> Tuple[int, int]:
+    """
+    Credits wallet refunds and records every outcome of a claimed batch in one
+    transaction. Returns (succeeded, failed-or-rescheduled).
+    """
+    now = datetime.now(timezone.utc)
+    wallet = WalletAdapter(db, WalletRepository(db, auto_commit=False))
+    for r in requests:
+        # Claimed rows carry the enum's database label.
+        if r.payment_method == PaymentMethod.WALLET.name:
+            payment = payments.get(r.payment_id)
+            try:
+                if payment is None or not payment.transaction_id:
+                    raise RefundError("Payment has no wallet transaction.")
+                results[r.id] = wallet.refund_payment(
+                    payment.transaction_id, from_paise(r.amount_paise), reference=f"refund_request_{r.id}"
+                )
+            except Exception as e:
+                results[r.id] = e
+
+    succeeded = [r for r in requests if isinstance(results.get(r.id), RefundOutput)]
+    failed = [r for r in requests if not isinstance(results.get(r.id), RefundOutput)]
+
+    changes = [
+        {"id": r.id, "status": "succeeded", "processor_refund_id": results[r.id].processor_refund_id,
+         "processed_at": now, "last_error": None}
+        for r in succeeded
+    ]
+    for r in failed:
+        error = results.get(r.id) or RefundError("No result.")
+        logger.warning("Refund request %s failed (attempt %d): %s", r.id, r.attempts, error)
+        final = r.attempts >= MAX_ATTEMPTS or isinstance(error, NotImplementedError)
+        changes.append({
+            "id": r.id,
+            "status": "failed" if final else "pending",
+            "last_error": str(error)[:1000],
+            "available_at": now if final else now + _backoff(r.attempts),
+            "processed_at": now if final else None,
+        })
+    # Rows with different key sets are grouped into separate executemany batches.
+    if changes:
+        db.execute(update(RefundRequest), changes)
+
+    if succeeded:
+        refunded_payment_ids = [r.payment_id for r in succeeded]
+        db.query(Payment).filter(Payment.id.in_(refunded_payment_ids)).update(
+            {"payment_status": PaymentStatus.REFUNDED}, synchronize_session=False
+        )
+        order_ids = {r.order_id for r in succeeded}
+        db.query(Order).filter(Order.id.in_(order_ids)).update(
+            {"payment_status": "Refunded"}, synchronize_session=False
+        )
+        orders = {
+            o.id: o for o in db.execute(
+                text("SELECT id, canteen_id, order_time, status FROM orders WHERE id = ANY(:ids)"),
+                {"ids": list(order_ids)},
+            )
+        }
+        rollups = RollupBatch()
+        for r in succeeded:
+            if r.order_id in orders:
+                rollups.refund(orders[r.order_id], from_paise(r.amount_paise))
+        rollups.flush(db)
+
+    db.commit()
+    return len(succeeded), len(failed)
+
+
+def process_batch(db: Session, batch_size: int = DEFAULT_BATCH_SIZE, concurrency: int = MAX_CONCURRENCY,
+                  per_merchant: int = PER_MERCHANT_CONCURRENCY) -> int:
+    """Claims, refunds and records one batch. Returns the number of requests handled."""
+    requests = claim_batch(db, batch_size)
+    if not requests:
+        return 0
+    # Plain rows, so they stay usable across the commits below.
+    payments = {
+        p.id: p for p in db.query(Payment.id, Payment.razorpay_payment_id, Payment.transaction_id)
+        .filter(Payment.id.in_([r.payment_id for r in requests]))
+    }
+    gateway = [r for r in requests if r.payment_method == PaymentMethod.UPI.name]
+    results = _gateway_refunds(db, gateway, payments, concurrency, per_merchant)
+    # Sending refunds took a while; don't keep the read transaction open.
+    db.commit()
+    try:
+        succeeded, failed = apply_results(db, requests, payments, results)
+    except Exception:
+        db.rollback()
+        # Leave the claim in place; the requests are re-claimed once the claim goes stale.
+        logger.exception("Recording refund batch results failed")
+        raise
+    logger.info("Refund batch: %d succeeded, %d failed or rescheduled.", succeeded, failed)
+    return len(requests)
+
+
+def drain_refunds(db: Session, batch_size: int = DEFAULT_BATCH_SIZE, max_batches: int = 20) -> int:
+    """Processes batches until the queue has nothing due (or `max_batches` is reached)."""
+    handled = 0
+    for _ in range(max_batches):
+        n = process_batch(db, batch_size)
+        handled += n
+        if n < batch_size:
+            break
+    return handled
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "worker"
+    if command == "worker":
+        from app.core.database import SessionLocal
+
+        session = SessionLocal()
+        try:
+            while True:
+                if drain_refunds(session) == 0:
+                    time.sleep(1.0)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            session.close()
+    else:
+        raise SystemExit(__doc__)
@@ -0,0 +1,100 @@
+"""
+Cache of serialized GraphQL responses for the public catalog.
+
+Canteen and menu listings (PUBLIC_QUERY_FIELDS in persisted_queries.py)
+are the same for every student. Yet each call ran the resolvers against
+Postgres, rebuilt the Strawberry objects and encoded the JSON again.
+PersistedQueryRouter now keeps the encoded body of those operations, keyed
+by persisted-query hash, operation name and variables:
+
+- A hit is served without touching the schema or the database.
+- Every body carries an ETag, a digest of its bytes. A request whose
+  If-None-Match matches gets an empty 304. The digest depends only on the
+  content, so any worker can answer a revalidation, not just the one that
+  produced the body.
+- Entries belong to a catalog version. The canteen and menu mutations call
+  `invalidate()` after committing. That bumps the version and drops every
+  entry on this worker, and responses still being built under the old
+  version are never stored. Other workers, and data that changes without
+  a catalog mutation (stock, ratings, opening hours), are bounded by
+  RESPONSE_CACHE_TTL_SECONDS.
+"""
+import hashlib
+import json
+import threading
+from dataclasses import dataclass
+from typing import Hashable, Optional
+
+from app.core.config import RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL_SECONDS
+from app.helpers.cache import TTLCache
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    body: bytes
+    etag: str
+
+
+class ResponseCache:
+    def __init__(self, maxsize: int = RESPONSE_CACHE_SIZE, ttl: float = RESPONSE_CACHE_TTL_SECONDS):
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self._version = 0
+        self.not_modified = 0
+        self.invalidations = 0
+
+    def key(self, query_hash: str, operation_name: Optional[str], variables) -> Hashable:
+        """Cache key for an operation. Captures the current catalog version."""
+        canonical = json.dumps(variables or {}, sort_keys=True, separators=(",", ":"))
+        with self._lock:
+            version = self._version
+        return (version, query_hash, operation_name or "", canonical)
+
+    def get(self, key: Hashable) -> Optional[CachedResponse]:
+        return self._entries.get(key)
+
+    def store(self, key: Hashable, body: bytes) -> CachedResponse:
+        entry = CachedResponse(body=body, etag=f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"')
+        with self._lock:
+            stale = key[0] != self._version
+        # A body built before an invalidation is served once but never stored.
+        if not stale:
+            self._entries.set(key, entry)
+        return entry
+
+    def matches(self, entry: CachedResponse, if_none_match: Optional[str]) -> bool:
+        if not if_none_match:
+            return False
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if entry.etag in tags or "*" in tags:
+            with self._lock:
+                self.not_modified += 1
+            return True
+        return False
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._version += 1
+            self.invalidations += 1
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **self._entries.stats(),
+                "version": self._version,
+                "notModified": self.not_modified,
+                "invalidations": self.invalidations,
+            }
+
+
+response_cache = ResponseCache()
+
+
+def invalidate() -> None:
+    """Drops cached catalog responses. Call after committing a canteen or menu change."""
+    response_cache.invalidate()
+
+
+def stats() -> dict:
+    return response_cache.stats()
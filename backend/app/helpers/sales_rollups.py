@@ -0,0 +1,266 @@
+"""
+Transactional maintenance of `canteen_sales_rollups`.
+
+Every code path that creates an order or changes its status calls one of the
+`record_*` functions *before* committing, using the same session. The rollup
+upsert therefore commits (or rolls back) atomically with the order change, and
+the stats resolvers can read totals without touching `orders`.
+
+`rebuild_sales_rollups` recomputes everything from scratch and is used for the
+initial backfill and after bulk data changes (e.g. seeding):
+
+    python -m app.helpers.sales_rollups
+"""
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Optional
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import case, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.helpers.partitions import FROZEN_ORDERS_FROM
+from app.models.sales import CanteenSalesRollup
+
+logger = logging.getLogger(__name__)
+
+IST = ZoneInfo("Asia/Kolkata")
+GRANULARITIES = ("hour", "day", "all")
+ALL_TIME_BUCKET = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# How raw order statuses are grouped when rollups are exposed through the API.
+PENDING_STATUSES = {"pending", "scheduled"}
+ACTIVE_STATUSES = {"confirmed", "preparing", "ready"}
+DELIVERED_STATUSES = {"delivered", "completed"}
+CANCELLED_STATUSES = {"cancelled"}
+
+# Net revenue of a rollup row; wrap in func.sum(). Refunds are filed under the
+# order's status at refund time, which is normally "cancelled", and cancelled
+# gross is already excluded, so those refunds must not be subtracted again.
+# Refunds recorded against live orders (partial refunds) reduce their gross.
+net_revenue = case(
+    (CanteenSalesRollup.status.in_(CANCELLED_STATUSES), 0.0),
+    else_=CanteenSalesRollup.gross_amount - CanteenSalesRollup.refund_amount,
+)
+
+
+def bucket_starts(order_time: Optional[datetime]) -> Dict[str, datetime]:
+    """Returns the start of the hour/day/all-time bucket an order falls into (IST boundaries)."""
+    if order_time is None:
+        order_time = datetime.now(timezone.utc)
+    if order_time.tzinfo is None:
+        order_time = order_time.replace(tzinfo=timezone.utc)
+    local = order_time.astimezone(IST)
+    return {
+        "hour": local.replace(minute=0, second=0, microsecond=0),
+        "day": local.replace(hour=0, minute=0, second=0, microsecond=0),
+        "all": ALL_TIME_BUCKET,
+    }
+
+
+def _apply_delta(
+    db: Session,
+    canteen_id: int,
+    order_time: Optional[datetime],
+    status: str,
+    count: int = 0,
+    gross: float = 0.0,
+    tax: float = 0.0,
+    refunds: float = 0.0,
+) -> None:
+    """Adds the given deltas to every grain's bucket for (canteen, status). Does not commit."""
+    table = CanteenSalesRollup.__table__
+    for granularity, start in bucket_starts(order_time).items():
+        stmt = pg_insert(table).values(
+            canteen_id=canteen_id,
+            granularity=granularity,
+            bucket_start=start,
+            status=status or "pending",
+            order_count=count,
+            gross_amount=gross,
+            tax_amount=tax,
+            refund_amount=refunds,
+        )
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_canteen_sales_rollup_bucket",
+            set_={
+                "order_count": table.c.order_count + stmt.excluded.order_count,
+                "gross_amount": table.c.gross_amount + stmt.excluded.gross_amount,
+                "tax_amount": table.c.tax_amount + stmt.excluded.tax_amount,
+                "refund_amount": table.c.refund_amount + stmt.excluded.refund_amount,
+            },
+        )
+        db.execute(stmt)
+
+
+def record_order_created(db: Session, order) -> None:
+    """Counts a newly created order in its canteen's rollups. Call before committing."""
+    _apply_delta(
+        db, order.canteen_id, order.order_time, order.status,
+        count=1,
+        gross=float(order.total_amount or 0.0),
+        tax=float(order.tax or 0.0),
+    )
+
+
+def record_order_status_change(db: Session, order, old_status: Optional[str]) -> None:
+    """
+    Moves an order's totals from its previous status bucket to its current one.
+    Call after setting `order.status` and before committing.
+    """
+    new_status = order.status
+    if old_status == new_status:
+        return
+    gross = float(order.total_amount or 0.0)
+    tax = float(order.tax or 0.0)
+    _apply_delta(db, order.canteen_id, order.order_time, old_status, count=-1, gross=-gross, tax=-tax)
+    _apply_delta(db, order.canteen_id, order.order_time, new_status, count=1, gross=gross, tax=tax)
+
+
+def record_refund(db: Session, order, amount: float) -> None:
+    """Adds a refunded amount to the order's current status bucket. Call before committing."""
+    _apply_delta(db, order.canteen_id, order.order_time, order.status, refunds=float(amount or 0.0))
+
+
+class RollupBatch:
+    """
+    Accumulates rollup deltas for many orders (bulk cancellations, refund
+    batches) and writes them with one multi-row upsert per `flush`.
+    """
+
+    def __init__(self):
+        # (canteen_id, granularity, bucket_start, status) -> [count, gross, tax, refunds]
+        self._deltas: Dict[tuple, list] = {}
+
+    def _add(self, canteen_id: int, order_time: Optional[datetime], status: Optional[str],
+             count: int = 0, gross: float = 0.0, tax: float = 0.0, refunds: float = 0.0) -> None:
+        for granularity, start in bucket_starts(order_time).items():
+            delta = self._deltas.setdefault((canteen_id, granularity, start, status or "pending"), [0, 0.0, 0.0, 0.0])
+            delta[0] += count
+            delta[1] += gross
+            delta[2] += tax
+            delta[3] += refunds
+
+    def status_change(self, order, old_status: Optional[str], new_status: Optional[str] = None) -> None:
+        """
+        Same as `record_order_status_change`, batched. `order` may be any row
+        with the order's columns; pass `new_status` if it does not carry it yet.
+        """
+        new_status = new_status or order.status
+        if old_status == new_status:
+            return
+        gross = float(order.total_amount or 0.0)
+        tax = float(order.tax or 0.0)
+        self._add(order.canteen_id, order.order_time, old_status, count=-1, gross=-gross, tax=-tax)
+        self._add(order.canteen_id, order.order_time, new_status, count=1, gross=gross, tax=tax)
+
+    def removed(self, order) -> None:
+        """Takes a deleted order's totals out of its current status bucket."""
+        self._add(
+            order.canteen_id, order.order_time, order.status,
+            count=-1, gross=-float(order.total_amount or 0.0), tax=-float(order.tax or 0.0),
+        )
+
+    def refund(self, order, amount: float) -> None:
+        """Same as `record_refund`, batched."""
+        self._add(order.canteen_id, order.order_time, order.status, refunds=float(amount or 0.0))
+
+    def flush(self, db: Session) -> None:
+        """Writes the accumulated deltas. Does not commit."""
+        if not self._deltas:
+            return
+        table = CanteenSalesRollup.__table__
+        stmt = pg_insert(table).values([
+            {
+                "canteen_id": canteen_id, "granularity": granularity, "bucket_start": start, "status": status,
+                "order_count": count, "gross_amount": gross, "tax_amount": tax, "refund_amount": refunds,
+            }
+            for (canteen_id, granularity, start, status), (count, gross, tax, refunds) in self._deltas.items()
+        ])
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_canteen_sales_rollup_bucket",
+            set_={
+                "order_count": table.c.order_count + stmt.excluded.order_count,
+                "gross_amount": table.c.gross_amount + stmt.excluded.gross_amount,
+                "tax_amount": table.c.tax_amount + stmt.excluded.tax_amount,
+                "refund_amount": table.c.refund_amount + stmt.excluded.refund_amount,
+            },
+        )
+        db.execute(stmt)
+        self._deltas.clear()
+
+
+def rebuild_sales_rollups(db: Session) -> None:
+    """
+    Recomputes all rollups from live, archived and frozen orders plus refunded
+    `payments`. Hour buckets are aggregated from orders; day and all-time
+    buckets from the hour rows.
+    Runs in a single transaction so readers never see a half-built table.
+    """
+    db.execute(text("DELETE FROM canteen_sales_rollups"))
+    db.execute(text(
+        """
+        INSERT INTO canteen_sales_rollups
+            (canteen_id, granularity, bucket_start, status, order_count, gross_amount, tax_amount, refund_amount)
+        SELECT o.canteen_id,
+               'hour',
+               date_trunc('hour', o.order_time AT TIME ZONE 'Asia/Kolkata') AT TIME ZONE 'Asia/Kolkata',
+               coalesce(o.status, 'pending'),
+               count(*),
+               coalesce(sum(o.total_amount), 0),
+               coalesce(sum(o.tax), 0),
+               coalesce(sum(r.refunded), 0)
+        FROM (
+            SELECT id, canteen_id, order_time, status, total_amount, tax FROM orders
+            UNION ALL
+            SELECT id, canteen_id, order_time, status, total_amount, tax FROM orders_archive
+            UNION ALL
+            SELECT o.id, o.canteen_id, o.order_time, o.status, o.total_amount, o.tax FROM """ + FROZEN_ORDERS_FROM + """
+        ) o
+        LEFT JOIN (
+            SELECT order_id, sum(amount) AS refunded
+            FROM payments
+            WHERE payment_status = 'REFUNDED'
+            GROUP BY order_id
+        ) r ON r.order_id = o.id
+        GROUP BY 1, 2, 3, 4
+        """
+    ))
+    db.execute(text(
+        """
+        INSERT INTO canteen_sales_rollups
+            (canteen_id, granularity, bucket_start, status, order_count, gross_amount, tax_amount, refund_amount)
+        SELECT canteen_id,
+               'day',
+               date_trunc('day', bucket_start AT TIME ZONE 'Asia/Kolkata') AT TIME ZONE 'Asia/Kolkata',
+               status,
+               sum(order_count), sum(gross_amount), sum(tax_amount), sum(refund_amount)
+        FROM canteen_sales_rollups
+        WHERE granularity = 'hour'
+        GROUP BY 1, 2, 3, 4
+        """
+    ))
+    db.execute(text(
+        """
+        INSERT INTO canteen_sales_rollups
+            (canteen_id, granularity, bucket_start, status, order_count, gross_amount, tax_amount, refund_amount)
+        SELECT canteen_id, 'all', :epoch, status,
+               sum(order_count), sum(gross_amount), sum(tax_amount), sum(refund_amount)
+        FROM canteen_sales_rollups
+        WHERE granularity = 'day'
+        GROUP BY canteen_id, status
+        """
+    ), {"epoch": ALL_TIME_BUCKET})
+    db.commit()
+    logger.info("Rebuilt canteen sales rollups.")
+
+
+if __name__ == "__main__":
+    from app.core.database import SessionLocal
+
+    session = SessionLocal()
+    try:
+        rebuild_sales_rollups(session)
+    finally:
+        session.close()
@@ -0,0 +1,279 @@
+"""
+Bulk wallet credits for admins (campus events, refunds of cancelled events, ...).
+
+A batch of credits is `COPY`-ed into a temporary staging table, users are
+resolved (by id or email) and missing wallets created set-based, and then a
+single statement applies every credit: wallet balances are bumped once per
+wallet by the sum of its rows, and one `wallet_transactions` ledger row is
+appended per input row. Each row's ledger entry carries the idempotency key
+`bulk:<batch_id>:<row>`, so re-submitting a batch id never credits twice.
+
+Exposed as the `bulkCreditWallets` GraphQL mutation and as a CSV upload:
+
+    POST /api/wallets/bulk-credit?batch_id=...   (Content-Type: text/csv)
+
+    user,amount,description
+    john@example.com,50,Fest volunteer credit
+
+A benchmark against serial ledger credits lives in bench/wallet_bulk.py.
+"""
+import csv
+import io
+import logging
+import uuid
+from dataclasses import asdict, dataclass
+from typing import Iterable, List, Optional, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.database import get_db
+from app.helpers.wallet_ledger import CREDIT, to_paise
+
+logger = logging.getLogger(__name__)
+
+MAX_BULK_CREDIT_ROWS = 50_000
+MAX_CSV_BYTES = 8 * 1024 * 1024
+DEFAULT_DESCRIPTION = "Bulk credit"
+
+# Row statuses
+CREDITED = "credited"
+ALREADY_APPLIED = "already_applied"
+UNKNOWN_USER = "unknown_user"
+INVALID = "invalid"
+
+
+@dataclass
+class CreditRequest:
+    row_number: int
+    user_ref: str
+    amount_paise: int
+    description: str
+
+
+@dataclass
+class BulkCreditRow:
+    row_number: int
+    user_ref: str
+    status: str
+    amount_paise: int = 0
+    wallet_id: Optional[int] = None
+    entry_id: Optional[int] = None
+    message: Optional[str] = None
+
+
+@dataclass
+class BulkCreditSummary:
+    batch_id: str
+    credited: int
+    credited_paise: int
+    failed: int
+    rows: List[BulkCreditRow]
+
+
+def build_credit_request(row_number: int, user_ref, amount, description=None) -> Tuple[Optional[CreditRequest], Optional[BulkCreditRow]]:
+    """Validates one input row; returns either a credit request or an `invalid` result row."""
+    user_ref = (user_ref or "").strip()
+    try:
+        amount_paise = to_paise(amount)
+    except Exception:
+        amount_paise = None
+    if not user_ref:
+        return None, BulkCreditRow(row_number, user_ref, INVALID, message="Missing user.")
+    if amount_paise is None or amount_paise <= 0:
+        return None, BulkCreditRow(row_number, user_ref, INVALID, message="Amount must be a positive number.")
+    return CreditRequest(row_number, user_ref, amount_paise, (description or "").strip() or DEFAULT_DESCRIPTION), None
+
+
+def parse_credit_csv(lines: Iterable[str]) -> Tuple[List[CreditRequest], List[BulkCreditRow]]:
+    """
+    Parses `user,amount[,description]` CSV (with a header row; `user` may also be
+    called `user_id` or `email`). Returns the valid requests and the rejected rows.
+    """
+    reader = csv.DictReader(lines)
+    fields = {name.strip().lower(): name for name in reader.fieldnames or []}
+    user_col = next((fields[k] for k in ("user", "user_id", "email") if k in fields), None)
+    amount_col = fields.get("amount")
+    if user_col is None or amount_col is None:
+        raise ValueError("CSV header must contain 'user' (or 'user_id'/'email') and 'amount' columns.")
+    desc_col = fields.get("description")
+
+    requests, rejected = [], []
+    # Row numbers are 1-based data rows (the header is not counted).
+    for row_number, row in enumerate(reader, start=1):
+        req, bad = build_credit_request(row_number, row.get(user_col), row.get(amount_col), row.get(desc_col) if desc_col else None)
+        if req is not None:
+            requests.append(req)
+        else:
+            rejected.append(bad)
+    return requests, rejected
+
+
+def _copy_to_staging(db: Session, requests: List[CreditRequest]) -> None:
+    db.execute(text(
+        """
+        CREATE TEMP TABLE IF NOT EXISTS wallet_credit_staging (
+            row_no integer PRIMARY KEY,
+            user_ref text NOT NULL,
+            amount_paise bigint NOT NULL,
+            description text NOT NULL,
+            user_id text,
+            wallet_id integer,
+            status text NOT NULL DEFAULT 'pending',
+            entry_id integer
+        ) ON COMMIT DROP
+        """
+    ))
+    db.execute(text("TRUNCATE wallet_credit_staging"))
+
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for r in requests:
+        writer.writerow((r.row_number, r.user_ref, r.amount_paise, r.description))
+    buf.seek(0)
+    # COPY through the session's own connection, inside its transaction.
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            "COPY wallet_credit_staging (row_no, user_ref, amount_paise, description) FROM STDIN WITH (FORMAT csv)",
+            buf,
+        )
+    finally:
+        cursor.close()
+
+
+def bulk_credit(db: Session, requests: List[CreditRequest], batch_id: Optional[str] = None) -> BulkCreditSummary:
+    """
+    Applies a batch of wallet credits set-based and returns a per-row result.
+    Does not commit; the staging table is dropped when the caller commits.
+    """
+    batch_id = batch_id or uuid.uuid4().hex
+    key_prefix = f"bulk:{batch_id}:"
+    if len(requests) > MAX_BULK_CREDIT_ROWS:
+        raise ValueError(f"A batch may contain at most {MAX_BULK_CREDIT_ROWS} credits.")
+    if not requests:
+        return BulkCreditSummary(batch_id, 0, 0, 0, [])
+
+    _copy_to_staging(db, requests)
+    db.execute(text("ANALYZE wallet_credit_staging"))
+
+    # Resolve users by id, then by email; create wallets for users that have none.
+    db.execute(text("UPDATE wallet_credit_staging s SET user_id = u.id FROM users u WHERE u.id = s.user_ref"))
+    db.execute(text(
+        "UPDATE wallet_credit_staging s SET user_id = u.id FROM users u WHERE s.user_id IS NULL AND u.email = s.user_ref"
+    ))
+    db.execute(text("UPDATE wallet_credit_staging SET status = :status WHERE user_id IS NULL"), {"status": UNKNOWN_USER})
+    db.execute(text(
+        """
+        INSERT INTO user_wallets (user_id, balance_paise, credit_limit_paise, is_privileged, created_at, updated_at)
+        SELECT DISTINCT user_id, 0, 0, false, now(), now() FROM wallet_credit_staging WHERE user_id IS NOT NULL
+        ON CONFLICT (user_id) DO NOTHING
+        """
+    ))
+    db.execute(text("UPDATE wallet_credit_staging s SET wallet_id = w.id FROM user_wallets w WHERE w.user_id = s.user_id"))
+
+    # Rows of a re-submitted batch that were already credited.
+    db.execute(
+        text(
+            """
+            UPDATE wallet_credit_staging s SET status = :status, entry_id = t.id
+            FROM wallet_transactions t
+            WHERE s.status = 'pending' AND t.idempotency_key = :prefix || s.row_no
+            """
+        ),
+        {"status": ALREADY_APPLIED, "prefix": key_prefix},
+    )
+
+    # Lock the affected wallets in id order so concurrent batches cannot deadlock.
+    db.execute(text(
+        """
+        SELECT id FROM user_wallets
+        WHERE id IN (SELECT wallet_id FROM wallet_credit_staging WHERE status = 'pending')
+        ORDER BY id FOR UPDATE
+        """
+    ))
+    db.execute(
+        text(
+            """
+            WITH pending AS (
+                SELECT row_no, wallet_id, amount_paise, description
+                FROM wallet_credit_staging WHERE status = 'pending'
+            ), totals AS (
+                SELECT wallet_id, sum(amount_paise) AS total FROM pending GROUP BY wallet_id
+            ), moved AS (
+                UPDATE user_wallets w
+                SET balance_paise = w.balance_paise + t.total, updated_at = now()
+                FROM totals t WHERE w.id = t.wallet_id
+                RETURNING w.id
+            ), entries AS (
+                INSERT INTO wallet_transactions (wallet_id, amount_paise, kind, description, idempotency_key, created_at)
+                SELECT wallet_id, amount_paise, :kind, description, :prefix || row_no, now()
+                FROM pending ORDER BY row_no
+                RETURNING id, idempotency_key
+            )
+            UPDATE wallet_credit_staging s SET status = :status, entry_id = e.id
+            FROM entries e WHERE e.idempotency_key = :prefix || s.row_no
+            """
+        ),
+        {"kind": CREDIT, "prefix": key_prefix, "status": CREDITED},
+    )
+
+    rows = [
+        BulkCreditRow(row_no, user_ref, status, amount_paise, wallet_id, entry_id,
+                      "User not found." if status == UNKNOWN_USER else None)
+        for row_no, user_ref, status, amount_paise, wallet_id, entry_id in db.execute(text(
+            """
+            SELECT row_no, user_ref, status, amount_paise, wallet_id, entry_id
+            FROM wallet_credit_staging ORDER BY row_no
+            """
+        ))
+    ]
+    credited = [r for r in rows if r.status == CREDITED]
+    summary = BulkCreditSummary(
+        batch_id=batch_id,
+        credited=len(credited),
+        credited_paise=sum(r.amount_paise for r in credited),
+        failed=sum(1 for r in rows if r.status == UNKNOWN_USER),
+        rows=rows,
+    )
+    logger.info("Bulk credit %s: %d credited (%d paise), %d failed.",
+                batch_id, summary.credited, summary.credited_paise, summary.failed)
+    return summary
+
+
+def merge_rejected(summary: BulkCreditSummary, rejected: List[BulkCreditRow]) -> BulkCreditSummary:
+    """Adds rows rejected before staging (invalid input) to a summary, keeping input order."""
+    if rejected:
+        summary.rows = sorted(summary.rows + rejected, key=lambda r: r.row_number)
+        summary.failed += len(rejected)
+    return summary
+
+
+router = APIRouter(prefix="/api/wallets", tags=["Wallets"])
+
+
+@router.post("/bulk-credit")
+async def upload_bulk_credit(request: Request, batch_id: Optional[str] = None, db: Session = Depends(get_db)):
+    """
+    Admin-only: credits wallets from a CSV body (`user,amount[,description]`,
+    amounts in rupees). Re-posting the same `batch_id` is a no-op for rows
+    that were already credited.
+    """
+    user = request.scope.get("user")
+    if not user:
+        raise HTTPException(status_code=401, detail="Authentication required.")
+    if user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin privileges are required.")
+
+    body = await request.body()
+    if len(body) > MAX_CSV_BYTES:
+        raise HTTPException(status_code=413, detail="CSV is too large.")
+    try:
+        requests, rejected = parse_credit_csv(io.StringIO(body.decode("utf-8-sig")))
+        summary = bulk_credit(db, requests, batch_id)
+        db.commit()
+    except (ValueError, UnicodeDecodeError) as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    return asdict(merge_rejected(summary, rejected))
@@ -0,0 +1,253 @@
+"""
+Wallet ledger engine.
+
+Wallet amounts are integer paise. Every balance change is a single statement
+that updates `user_wallets` and appends the matching `wallet_transactions` row
+together:
+
+    WITH moved AS (
+        UPDATE user_wallets SET balance_paise = balance_paise + :delta
+        WHERE id = :wallet_id AND balance_paise + credit_limit_paise + :delta >= 0
+        RETURNING id, balance_paise
+    ), entry AS (
+        INSERT INTO wallet_transactions (...) SELECT ... FROM moved RETURNING id
+    )
+    SELECT ...
+
+The funds check is part of the UPDATE's WHERE clause, so concurrent debits
+never read-modify-write a balance in Python, and a debit that would overdraw
+simply matches no row. Postings may carry an idempotency key (unique in the
+ledger); re-posting the same key returns the original entry instead of moving
+money twice.
+
+Because each posting takes the wallet's row lock before allocating its ledger
+id, entry ids increase in commit order per wallet. `snapshot_wallet_balances`
+checkpoints (balance, last entry id) periodically, and `balance_at` /
+`wallet_statement` start from the nearest snapshot instead of summing the
+whole ledger.
+
+Postings never commit; callers commit (or the repository / unit of work does).
+A snapshot of every changed wallet can be taken by hand with:
+
+    python -m app.helpers.wallet_ledger
+"""
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
+from typing import List, Optional, Union
+
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.helpers.exceptions import InsufficientFundsError, WalletNotFoundError
+from app.models.payment import WalletTransaction
+
+logger = logging.getLogger(__name__)
+
+DEBIT = "debit"
+CREDIT = "credit"
+REFUND = "refund"
+ADJUSTMENT = "adjustment"
+
+
+def to_paise(amount: Union[float, int, str, Decimal]) -> int:
+    """Converts a rupee amount to integer paise, rounding half up."""
+    return int((Decimal(str(amount)) * 100).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+
+
+def from_paise(paise: int) -> float:
+    return paise / 100
+
+
+@dataclass(frozen=True)
+class LedgerEntry:
+    """The outcome of a posting: the ledger row and the wallet balance right after it."""
+    entry_id: int
+    wallet_id: int
+    amount_paise: int
+    balance_paise: int
+    # False when an earlier posting with the same idempotency key was returned.
+    created: bool = True
+
+
+_POST_SQL = text(
+    """
+    WITH moved AS (
+        UPDATE user_wallets
+        SET balance_paise = balance_paise + :delta, updated_at = now()
+        WHERE id = :wallet_id
+          AND (:check_funds = false OR balance_paise + credit_limit_paise + :delta >= 0)
+        RETURNING id, balance_paise
+    ), entry AS (
+        INSERT INTO wallet_transactions (wallet_id, amount_paise, kind, description, payment_id, idempotency_key, created_at)
+        SELECT id, :delta, :kind, :description, :payment_id, :idempotency_key, now() FROM moved
+        RETURNING id
+    )
+    SELECT entry.id, moved.balance_paise FROM entry, moved
+    """
+)
+
+
+def _existing_posting(db: Session, idempotency_key: str) -> Optional[LedgerEntry]:
+    row = db.execute(
+        text(
+            """
+            SELECT t.id, t.wallet_id, t.amount_paise, w.balance_paise
+            FROM wallet_transactions t JOIN user_wallets w ON w.id = t.wallet_id
+            WHERE t.idempotency_key = :key
+            """
+        ),
+        {"key": idempotency_key},
+    ).first()
+    if row is None:
+        return None
+    return LedgerEntry(row[0], row[1], row[2], row[3], created=False)
+
+
+def post(
+    db: Session,
+    wallet_id: int,
+    amount_paise: int,
+    kind: str,
+    description: str,
+    payment_id: Optional[int] = None,
+    idempotency_key: Optional[str] = None,
+) -> LedgerEntry:
+    """
+    Applies a signed amount to a wallet and appends its ledger entry in one
+    statement. Debits (negative amounts) only succeed while the balance plus
+    credit limit covers them; otherwise `InsufficientFundsError` is raised and
+    nothing changes. Does not commit.
+    """
+    params = {
+        "wallet_id": wallet_id,
+        "delta": amount_paise,
+        "check_funds": amount_paise < 0,
+        "kind": kind,
+        "description": description,
+        "payment_id": payment_id,
+        "idempotency_key": idempotency_key,
+    }
+    if idempotency_key is None:
+        row = db.execute(_POST_SQL, params).first()
+    else:
+        # A duplicate key fails the INSERT, which rolls back the UPDATE in the
+        # same statement; the savepoint keeps the caller's transaction usable.
+        try:
+            with db.begin_nested():
+                row = db.execute(_POST_SQL, params).first()
+        except IntegrityError:
+            existing = _existing_posting(db, idempotency_key)
+            if existing is None:
+                raise
+            return existing
+
+    if row is None:
+        exists = db.execute(text("SELECT 1 FROM user_wallets WHERE id = :id"), {"id": wallet_id}).first()
+        if exists is None:
+            raise WalletNotFoundError(f"Wallet {wallet_id} not found.")
+        raise InsufficientFundsError("Insufficient balance in wallet.")
+    return LedgerEntry(entry_id=row[0], wallet_id=wallet_id, amount_paise=amount_paise, balance_paise=row[1])
+
+
+def debit(db: Session, wallet_id: int, amount_paise: int, description: str, **kwargs) -> LedgerEntry:
+    """Takes `amount_paise` (> 0) out of a wallet. See `post`."""
+    if amount_paise <= 0:
+        raise ValueError("Debit amount must be positive.")
+    return post(db, wallet_id, -amount_paise, kwargs.pop("kind", DEBIT), description, **kwargs)
+
+
+def credit(db: Session, wallet_id: int, amount_paise: int, description: str, **kwargs) -> LedgerEntry:
+    """Adds `amount_paise` (> 0) to a wallet. See `post`."""
+    if amount_paise <= 0:
+        raise ValueError("Credit amount must be positive.")
+    return post(db, wallet_id, amount_paise, kwargs.pop("kind", CREDIT), description, **kwargs)
+
+
+# ===================================================================
+# Snapshots and history
+# ===================================================================
+
+def snapshot_wallet_balances(db: Session) -> int:
+    """
+    Records a balance snapshot for every wallet with ledger activity since its
+    last snapshot. Balance and last entry id are read in one statement, so each
+    snapshot is consistent with the ledger. Returns the number of snapshots.
+    """
+    result = db.execute(
+        text(
+            """
+            INSERT INTO wallet_balance_snapshots (wallet_id, balance_paise, last_entry_id, taken_at)
+            SELECT w.id, w.balance_paise, latest.last_entry_id, now()
+            FROM user_wallets w
+            CROSS JOIN LATERAL (
+                SELECT max(t.id) AS last_entry_id FROM wallet_transactions t WHERE t.wallet_id = w.id
+            ) latest
+            WHERE latest.last_entry_id IS NOT NULL
+              AND latest.last_entry_id > coalesce(
+                  (SELECT max(s.last_entry_id) FROM wallet_balance_snapshots s WHERE s.wallet_id = w.id), 0
+              )
+            """
+        )
+    )
+    db.commit()
+    logger.info("Took %d wallet balance snapshot(s).", result.rowcount)
+    return result.rowcount
+
+
+def balance_at(db: Session, wallet_id: int, at: datetime) -> int:
+    """Returns a wallet's balance in paise as of `at`, starting from the nearest earlier snapshot."""
+    return db.execute(
+        text(
+            """
+            WITH base AS (
+                SELECT balance_paise, last_entry_id FROM wallet_balance_snapshots
+                WHERE wallet_id = :wallet_id AND taken_at <= :at
+                ORDER BY taken_at DESC LIMIT 1
+            )
+            SELECT coalesce((SELECT balance_paise FROM base), 0) + coalesce(sum(t.amount_paise), 0)
+            FROM wallet_transactions t
+            WHERE t.wallet_id = :wallet_id
+              AND t.id > coalesce((SELECT last_entry_id FROM base), 0)
+              AND t.created_at <= :at
+            """
+        ),
+        {"wallet_id": wallet_id, "at": at},
+    ).scalar()
+
+
+@dataclass
+class WalletStatement:
+    wallet_id: int
+    opening_balance_paise: int
+    closing_balance_paise: int
+    entries: List[WalletTransaction]
+
+
+def wallet_statement(db: Session, wallet_id: int, start: datetime, end: datetime) -> WalletStatement:
+    """Returns the balance at `start`, the entries after it up to `end`, and the balance at `end`."""
+    opening = balance_at(db, wallet_id, start)
+    entries = (
+        db.query(WalletTransaction)
+        .filter(
+            WalletTransaction.wallet_id == wallet_id,
+            WalletTransaction.created_at > start,
+            WalletTransaction.created_at <= end,
+        )
+        .order_by(WalletTransaction.id)
+        .all()
+    )
+    closing = opening + sum(e.amount_paise for e in entries)
+    return WalletStatement(wallet_id, opening, closing, entries)
+
+
+if __name__ == "__main__":
+    from app.core.database import SessionLocal
+
+    session = SessionLocal()
+    try:
+        snapshot_wallet_balances(session)
+    finally:
+        session.close()
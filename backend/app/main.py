@@ -1,14 +1,17 @@
+import asyncio
 import os
 import uvicorn
+from dataclasses import asdict
 from fastapi import FastAPI, Request, Response, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from strawberry.fastapi import GraphQLRouter
 from sqlalchemy.orm import Session
 
 # Import the core components of your application
 from app.core.database import Base, engine, get_db
 from app.schema import schema
-from app.helpers.middleware import AuthMiddleware
+from app.helpers.middleware import AuthMiddleware, RateLimitMiddleware
+from app.helpers import authz, metrics, persisted_queries, query_cost, rate_limit, response_cache
+from app.helpers.persisted_queries import PersistedQueryRouter
 
 # Ensure all models are imported so SQLAlchemy mappers and Strawberry types are
 # registered before creating tables and building the GraphQL schema.
@@ -19,8 +22,16 @@ import app.models.menu_item
 import app.models.cart
 import app.models.payment
 import app.models.complaints
+import app.models.sales
+import app.models.rate_limit
 import app.helpers.payment as payment_helpers
 import app.helpers.dev_helpers as dev_helpers
+import app.helpers.exports as export_helpers
+import app.helpers.wallet_bulk as wallet_bulk_helpers
+from app.helpers.jobs import jobs_enabled, start_jobs, stop_jobs
+from app.helpers import passwords
+from app.helpers.auth_utils import token_cache_stats
+from app.core.config import METRICS_ENABLED, RATE_LIMIT_ENABLED
 
 # Best Practice Note: In a production application, you would typically use a migration
 # tool like Alembic to manage your database schema instead of `create_all`.
@@ -54,7 +65,9 @@ IS_PROD = os.getenv("ENV", "").lower() == "production"
 # - GraphiQL playground is disabled (graphiql=False)
 # - Introspection is disabled via schema config in schema.py (if supported by installed Strawberry version)
 # Set ENV=production in your process environment for deployment to enforce these hardening measures.
-graphql_app = GraphQLRouter(
+# PersistedQueryRouter accepts sha256 hashes of known documents in place of the
+# query text, over POST or GET (see app/helpers/persisted_queries.py).
+graphql_app = PersistedQueryRouter(
     schema=schema,
     context_getter=get_context,
     graphiql=not IS_PROD  # Disable GraphiQL playground in production
@@ -66,6 +79,12 @@ app = FastAPI()
 # Add your custom authentication middleware first to populate `request.scope["user"]`.
 app.add_middleware(AuthMiddleware)
 
+# Rate limiting and admission control for /api/graphql. Added after AuthMiddleware
+# so that it runs before it (the last middleware added is the outermost): floods
+# are rejected before the user lookup touches the database.
+if RATE_LIMIT_ENABLED:
+    app.add_middleware(RateLimitMiddleware)
+
 # Add CORS middleware to allow your frontend to communicate with the API.
 # Best Practice Note: In production, these origins should be loaded from environment variables.
 app.add_middleware(
@@ -77,7 +96,7 @@ app.add_middleware(
         "https://canteen-x-kappa.vercel.app",
     ],  # tighten wildcard domains in production; expand only if necessary
     allow_credentials=True,
-    allow_methods=["POST", "OPTIONS"],  # GraphQL typically needs only POST + preflight
+    allow_methods=["GET", "POST", "OPTIONS"],  # GET only for persisted queries; mutations are refused over GET
     allow_headers=["Authorization", "Content-Type"],
 )
 
@@ -87,6 +106,30 @@ app.include_router(graphql_app, prefix="/api/graphql")
 # Include REST payment endpoints (initiate/verify) used by the frontend demo checkout
 app.include_router(payment_helpers.router)
 app.include_router(dev_helpers.router)
+# Streaming order exports (CSV/Parquet) for finance
+app.include_router(export_helpers.router)
+# Admin bulk wallet credits (CSV upload)
+app.include_router(wallet_bulk_helpers.router)
+
+# Periodic background jobs (e.g. complaint escalation). Every worker competes for
+# a session-level advisory lock; only the worker holding it (the leader) runs them.
+@app.on_event("startup")
+async def start_background_jobs():
+    if jobs_enabled():
+        start_jobs()
+
+@app.on_event("shutdown")
+async def stop_background_jobs():
+    await stop_jobs()
+
+# bcrypt runs in a small process pool; spawn its workers before the first login.
+@app.on_event("startup")
+async def start_password_hasher():
+    passwords.warm_up()
+
+@app.on_event("shutdown")
+async def stop_password_hasher():
+    await asyncio.to_thread(passwords.shutdown)
 
 @app.get("/api/hello")
 async def read_root():
@@ -101,7 +144,27 @@ async def awake():
 @app.get("/api/health")
 async def health_check():
     """A simple health check endpoint."""
-    return {"status": "healthy"}
+    return {
+        "status": "healthy",
+        "passwordHashing": asdict(passwords.stats()),
+        "tokenCache": token_cache_stats(),
+        "rateLimit": rate_limit.stats(),
+        "persistedQueries": persisted_queries.stats(),
+        "queryCost": query_cost.stats(),
+        "responseCache": response_cache.stats(),
+    }
+
+if METRICS_ENABLED:
+    metrics.register_cache("token", token_cache_stats)
+    metrics.register_cache("authz", authz.stats)
+    metrics.register_cache("graphql_document", persisted_queries.document_cache.stats)
+    metrics.register_cache("apq", lambda: persisted_queries.registry.stats()["apqCache"])
+    metrics.register_cache("response", response_cache.stats)
+
+    @app.get("/metrics", include_in_schema=False)
+    async def prometheus_metrics():
+        """Prometheus scrape endpoint (see app/helpers/metrics.py). Counts are per worker."""
+        return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
 
 # Standard entrypoint for running the application with uvicorn.
 if __name__ == "__main__":
@@ -2,7 +2,7 @@ import strawberry
 from typing import Optional, List
 from datetime import datetime
 
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
@@ -27,6 +27,35 @@ class ComplaintType:
     createdAt: str  # Exposed as ISO 8601 string
     updatedAt: str  # Exposed as ISO 8601 string
 
+@strawberry.type
+class ComplaintEdge:
+    cursor: str
+    node: ComplaintType
+
+@strawberry.type
+class ComplaintPageInfo:
+    hasNextPage: bool
+    endCursor: Optional[str] = None
+
+@strawberry.type
+class ComplaintStatusCountType:
+    status: str
+    count: int
+
+@strawberry.type
+class ComplaintCountsType:
+    """Badge counts for the complaint inbox: system-wide from `complaint_counters`, or for one canteen."""
+    total: int
+    escalated: int
+    byStatus: List[ComplaintStatusCountType]
+
+@strawberry.type
+class ComplaintConnection:
+    """One keyset-paginated page of complaints, newest first."""
+    edges: List[ComplaintEdge]
+    pageInfo: ComplaintPageInfo
+    counts: ComplaintCountsType
+
 # ===================================================================
 # 2. STRAWBERRY GRAPHQL INPUT TYPES (for Mutations)
 # ===================================================================
@@ -47,6 +76,16 @@ class UpdateComplaintInput:
     status: Optional[str] = strawberry.UNSET
     response_text: Optional[str] = strawberry.UNSET
     is_escalated: Optional[bool] = strawberry.UNSET
+
+@strawberry.input
+class ComplaintFilterInput:
+    """Filters for the complaint inbox. Dates are ISO 8601 strings; `created_to` is exclusive."""
+    status: Optional[str] = None
+    is_escalated: Optional[bool] = None
+    canteen_id: Optional[int] = None
+    complaint_type: Optional[str] = None
+    created_from: Optional[str] = None
+    created_to: Optional[str] = None
     
 # ===================================================================
 # 3. STRAWBERRY MUTATION RESPONSE TYPE
@@ -94,4 +133,32 @@ class Complaint(Base):
     user = relationship("User", back_populates="complaints")
     
     # The `Order` model should have: `complaints = relationship("Complaint", back_populates="order")`
-    order = relationship("Order", back_populates="complaints")
\ No newline at end of file
+    order = relationship("Order", back_populates="complaints")
+
+    __table_args__ = (
+        # Partial index covering only complaints the escalation job still has to look at.
+        Index(
+            "ix_complaints_pending_escalation",
+            "created_at",
+            postgresql_where=text("status <> 'resolved' AND NOT is_escalated"),
+        ),
+        # Keyset pagination of the inbox (newest first), with and without filters.
+        Index("ix_complaints_created_id", "created_at", "id"),
+        Index("ix_complaints_status_created_id", "status", "created_at", "id"),
+        Index("ix_complaints_escalated_created_id", "is_escalated", "created_at", "id"),
+        Index("ix_complaints_type_created_id", "complaint_type", "created_at", "id"),
+        Index("ix_complaints_order_id", "order_id"),
+    )
+
+
+class ComplaintCounter(Base):
+    """
+    Number of complaints per (status, is_escalated), for inbox badge counts.
+    Kept in step with `complaints` by app/helpers/complaint_counters.py inside
+    the same transaction as every complaint change.
+    """
+    __tablename__ = "complaint_counters"
+
+    status = Column(String, primary_key=True)
+    is_escalated = Column(Boolean, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
\ No newline at end of file
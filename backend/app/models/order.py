@@ -3,7 +3,8 @@ from typing import Optional, List
 from datetime import datetime, timezone
 from zoneinfo import ZoneInfo
 
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey, JSON
+from sqlalchemy import Column, Integer, BigInteger, String, Float, DateTime, Boolean, ForeignKey, JSON
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
 from sqlalchemy.orm import relationship
 from app.core.database import Base
 from app.helpers.time_utils import to_ist_iso
@@ -126,6 +127,10 @@ class Order(Base):
     """
     The SQLAlchemy model for an Order.
     It does NOT store items directly; it uses a one-to-many relationship to OrderItem.
+
+    In Postgres the table is range-partitioned by month on `order_time`
+    (see alembic revision 0003), so the physical primary key is
+    (id, order_time). The ORM keeps `id` as its identity.
     """
     __tablename__ = "orders"
     
@@ -257,7 +262,13 @@ class Order(Base):
         return bool(getattr(self, "is_pre_order", False))
 
 class OrderItem(Base):
-    """The SQLAlchemy model for a single item within an order."""
+    """
+    The SQLAlchemy model for a single item within an order.
+
+    In Postgres the table is range-partitioned by month on `order_time`, a
+    copy of the parent order's `order_time` (see alembic revision 0014), so
+    an order and its items always live in the same month's partitions.
+    """
     __tablename__ = "order_items"
     
     id = Column(Integer, primary_key=True, index=True)
@@ -273,6 +284,9 @@ class OrderItem(Base):
     # Snapshot fields: store the name and unit price at the time of order
     snapshot_name = Column(String, nullable=True)
     snapshot_price = Column(Float, nullable=True)
+    # Partition key; always equal to the parent order's order_time. Callers
+    # set it from the order they already hold (no lookup per item).
+    order_time = Column(DateTime(timezone=True), nullable=False)
     
     # --- Relationships ---
     order = relationship("Order", back_populates="items")
@@ -330,3 +344,103 @@ class OrderStep(Base):
     def time(self) -> Optional[str]:
         raw = self.__dict__.get("time", None)
         return to_ist_iso(raw) if raw is not None else None
+
+# =_=_=_=_=_=_=_=_=_=_=_=_=_=_=_=_=_=_=_=_=_=_=_=_=_=_=_=_=_=_=_=_=_=_=
+# 5. ARCHIVE MODELS (cold storage for old, finished orders)
+# =_=_=_=_=_=_=_=_=_=_=_=_=_=_=_=_=_=_=_=_=_=_=_=_=_=_=_=_=_=_=_=_=_=_=
+
+class ArchivedOrder(Base):
+    """
+    Read-only mirror of `orders` for delivered/cancelled orders moved out of the
+    live partitions by `app.helpers.partitions.archive_orders`. Columns match
+    `Order` one-to-one; the archive job builds its column lists from this model.
+    """
+    __tablename__ = "orders_archive"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(String, nullable=False)
+    canteen_id = Column(Integer, nullable=False)
+
+    total_amount = Column(Float, nullable=False)
+    subtotal = Column(Float, default=0.0)
+    tax = Column(Float, default=0.0)
+    status = Column(String)
+
+    order_time = Column(DateTime(timezone=True), nullable=False)
+    confirmed_time = Column(DateTime(timezone=True), nullable=True)
+    preparing_time = Column(DateTime(timezone=True), nullable=True)
+    ready_time = Column(DateTime(timezone=True), nullable=True)
+    delivery_time = Column(DateTime(timezone=True), nullable=True)
+    cancelled_time = Column(DateTime(timezone=True), nullable=True)
+
+    payment_method = Column(String)
+    payment_status = Column(String)
+    customer_note = Column(String, nullable=True)
+    cancellation_reason = Column(String, nullable=True)
+    discount = Column(Float, default=0)
+    phone = Column(String)
+    pickup_time = Column(String, nullable=True)
+    is_pre_order = Column(Boolean, default=False)
+
+    items = relationship(
+        "ArchivedOrderItem",
+        primaryjoin="ArchivedOrder.id == foreign(ArchivedOrderItem.order_id)",
+        viewonly=True,
+    )
+
+
+class ArchivedOrderItem(Base):
+    """Read-only mirror of `order_items` for archived orders."""
+    __tablename__ = "order_items_archive"
+
+    id = Column(Integer, primary_key=True)
+    quantity = Column(Integer, default=1)
+    note = Column(String, nullable=True)
+    order_id = Column(Integer, nullable=False, index=True)
+    item_id = Column(Integer, nullable=False)
+    customizations = Column(JSON, nullable=True)
+    snapshot_name = Column(String, nullable=True)
+    snapshot_price = Column(Float, nullable=True)
+    order_time = Column(DateTime(timezone=True), nullable=True)
+
+    @property
+    def name(self) -> Optional[str]:
+        # Archived items never join back to menu_items; the snapshot is authoritative.
+        return self.snapshot_name
+
+    @property
+    def price(self) -> float:
+        return float(self.snapshot_price or 0.0)
+
+
+class ArchivedOrderStep(Base):
+    """Read-only mirror of `order_steps` for archived orders."""
+    __tablename__ = "order_steps_archive"
+
+    id = Column(Integer, primary_key=True)
+    order_id = Column(Integer, nullable=False, index=True)
+    status = Column(String, nullable=False)
+    description = Column(String, nullable=False)
+    time = Column(DateTime, nullable=True)
+    completed = Column(Boolean, default=False)
+    current = Column(Boolean, default=False)
+
+
+class ArchivedOrderChunk(Base):
+    """
+    Compressed cold tier below the archive tables (alembic revision 0015).
+
+    `app.helpers.partitions.freeze_archive` packs archived orders of one
+    canteen and month into a single jsonb array of `orders_archive` rows, each
+    carrying its `items` and `steps` as archive rows; Postgres stores it
+    compressed. `order_ids` (GIN-indexed) serves point lookups.
+    """
+    __tablename__ = "order_archive_chunks"
+
+    id = Column(BigInteger, primary_key=True)
+    canteen_id = Column(Integer, nullable=False)
+    month_start = Column(DateTime(timezone=True), nullable=False)
+    month_end = Column(DateTime(timezone=True), nullable=False)
+    order_count = Column(Integer, nullable=False)
+    order_ids = Column(ARRAY(Integer), nullable=False)
+    orders = Column(JSONB, nullable=False)
@@ -2,7 +2,10 @@ import strawberry
 from typing import Optional, List
 from enum import Enum as PyEnum
 
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Enum
+from sqlalchemy import (
+    Column, Integer, BigInteger, String, Float, DateTime, Boolean, ForeignKey, Enum, Index, JSON,
+    CheckConstraint, text,
+)
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
@@ -78,10 +81,38 @@ class WalletTransactionType:
     id: int
     walletId: int
     amount: float
+    kind: str
     description: str
     paymentId: Optional[int] = None
     createdAt: str
 
+@strawberry.type
+class BulkCreditRowType:
+    """Outcome of one row of a bulk wallet credit."""
+    rowNumber: int
+    userRef: str
+    status: str # credited | already_applied | unknown_user | invalid
+    amount: float
+    walletId: Optional[int] = None
+    entryId: Optional[int] = None
+    message: Optional[str] = None
+
+@strawberry.type
+class BulkCreditSummaryType:
+    """Result of a bulk wallet credit batch."""
+    batchId: str
+    credited: int
+    creditedAmount: float
+    failed: int
+    rows: List[BulkCreditRowType]
+
+@strawberry.input
+class WalletCreditInput:
+    """One credit of a bulk wallet credit; `user` is a user id or email, `amount` is in rupees."""
+    user: str
+    amount: float
+    description: Optional[str] = None
+
 # ===================================================================
 # 3. SQLAlchemy DATABASE MODELS
 # ===================================================================
@@ -114,6 +145,11 @@ class Payment(Base):
     user = relationship("User", back_populates="payments")
     merchant = relationship("Merchant", back_populates="merchant_payments")
 
+    __table_args__ = (
+        # Latest-payment-per-order lookups (order exports, reconciliation)
+        Index("ix_payments_order_id_created", "order_id", "created_at"),
+    )
+
 class Merchant(Base):
     """The SQLAlchemy model for a Merchant, typically a canteen that accepts payments."""
     __tablename__ = "merchants"
@@ -134,14 +170,19 @@ class Merchant(Base):
     merchant_payments = relationship("Payment", back_populates="merchant")
 
 class UserWallet(Base):
-    """The SQLAlchemy model for a User's wallet."""
+    """
+    The SQLAlchemy model for a User's wallet. Amounts are stored in integer
+    paise; the balance is only ever changed through the ledger engine in
+    app/helpers/wallet_ledger.py, which writes a `WalletTransaction` for every
+    change.
+    """
     __tablename__ = "user_wallets"
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(String, ForeignKey("users.id"), nullable=False, unique=True)
-    balance = Column(Float, default=0.0)
+    balance_paise = Column(BigInteger, nullable=False, default=0, server_default=text("0"))
     is_privileged = Column(Boolean, default=False)
-    credit_limit = Column(Float, default=0.0)
+    credit_limit_paise = Column(BigInteger, nullable=False, default=0, server_default=text("0"))
     
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
@@ -150,17 +191,130 @@ class UserWallet(Base):
     user = relationship("User", back_populates="wallet")
     transactions = relationship("WalletTransaction", back_populates="wallet", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        CheckConstraint("balance_paise + credit_limit_paise >= 0", name="ck_user_wallets_within_credit_limit"),
+    )
+
+    @property
+    def balance(self) -> float:
+        return self.balance_paise / 100
+
+    @property
+    def credit_limit(self) -> float:
+        return self.credit_limit_paise / 100
+
 class WalletTransaction(Base):
-    """The SQLAlchemy model for a transaction associated with a UserWallet."""
+    """
+    An append-only wallet ledger entry: `amount_paise` is positive for credits
+    and negative for debits. The sum of a wallet's entries equals its balance.
+    """
     __tablename__ = "wallet_transactions"
 
     id = Column(Integer, primary_key=True, index=True)
     wallet_id = Column(Integer, ForeignKey("user_wallets.id"), nullable=False)
-    amount = Column(Float, nullable=False) # Can be positive (credit) or negative (debit)
+    amount_paise = Column(BigInteger, nullable=False)
+    # debit | credit | refund | adjustment
+    kind = Column(String, nullable=False)
     description = Column(String, nullable=False)
     payment_id = Column(Integer, ForeignKey("payments.id"), nullable=True)
+    # Makes retried postings (e.g. verifying the same payment twice) no-ops.
+    idempotency_key = Column(String, nullable=True, unique=True)
     
     created_at = Column(DateTime, server_default=func.now())
 
     # --- Relationships ---
-    wallet = relationship("UserWallet", back_populates="transactions")
\ No newline at end of file
+    wallet = relationship("UserWallet", back_populates="transactions")
+
+    __table_args__ = (
+        Index("ix_wallet_transactions_wallet_id_id", "wallet_id", "id"),
+    )
+
+    @property
+    def amount(self) -> float:
+        return self.amount_paise / 100
+
+class WalletBalanceSnapshot(Base):
+    """
+    A periodic checkpoint of a wallet's balance: the balance after applying
+    every ledger entry up to and including `last_entry_id`. Historical
+    balances are computed from the nearest snapshot instead of the whole ledger.
+    """
+    __tablename__ = "wallet_balance_snapshots"
+
+    id = Column(Integer, primary_key=True)
+    wallet_id = Column(Integer, ForeignKey("user_wallets.id", ondelete="CASCADE"), nullable=False)
+    balance_paise = Column(BigInteger, nullable=False)
+    last_entry_id = Column(Integer, nullable=False)
+    taken_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_wallet_balance_snapshots_wallet_taken", "wallet_id", "taken_at"),
+    )
+
+class PaymentWebhookEvent(Base):
+    """
+    A payment gateway webhook event, queued durably on receipt and applied
+    asynchronously by the webhook workers (see app/helpers/payment_webhooks.py).
+    """
+    __tablename__ = "payment_webhook_events"
+
+    id = Column(Integer, primary_key=True)
+    # The gateway's event id (X-Razorpay-Event-Id); redeliveries are dropped at
+    # insert, so events without one are rejected.
+    event_id = Column(String, nullable=False, unique=True)
+    event_type = Column(String, nullable=False)
+    razorpay_order_id = Column(String, nullable=True)
+    razorpay_payment_id = Column(String, nullable=True)
+    payload = Column(JSON, nullable=False)
+
+    # pending -> processing -> done | failed (after too many attempts)
+    status = Column(String, nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(String, nullable=True)
+    available_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    locked_at = Column(DateTime(timezone=True), nullable=True)
+    received_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    processed_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        # Workers only ever scan the unfinished part of the queue.
+        Index(
+            "ix_payment_webhook_events_queue",
+            "available_at", "id",
+            postgresql_where=text("status IN ('pending', 'processing')"),
+        ),
+    )
+
+class RefundRequest(Base):
+    """
+    A queued refund of a completed payment, processed in per-merchant batches
+    by the refund worker (see app/helpers/refunds.py). One request per payment.
+    """
+    __tablename__ = "refund_requests"
+
+    id = Column(Integer, primary_key=True)
+    payment_id = Column(Integer, ForeignKey("payments.id"), nullable=False, unique=True)
+    order_id = Column(Integer, nullable=False)
+    merchant_id = Column(Integer, ForeignKey("merchants.id"), nullable=False)
+    payment_method = Column(Enum(PaymentMethod), nullable=False)
+    amount_paise = Column(BigInteger, nullable=False)
+    reason = Column(String, nullable=True)
+    requested_by = Column(String, nullable=True)
+
+    # pending -> processing -> succeeded | failed (after too many attempts)
+    status = Column(String, nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(String, nullable=True)
+    processor_refund_id = Column(String, nullable=True)
+    available_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    locked_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    processed_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index(
+            "ix_refund_requests_queue",
+            "available_at", "id",
+            postgresql_where=text("status IN ('pending', 'processing')"),
+        ),
+    )
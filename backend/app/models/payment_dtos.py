@@ -33,10 +33,3 @@ class MerchantUpdateDTO(BaseModel):
     razorpay_key_id: Optional[str] = None
     razorpay_key_secret: Optional[str] = None
     is_active: Optional[bool] = None
-
-# --- Wallet DTOs ---
-class WalletTransactionCreateDTO(BaseModel):
-    wallet_id: int
-    amount: float
-    description: str
-    payment_id: Optional[int] = None
\ No newline at end of file
@@ -0,0 +1,23 @@
+from sqlalchemy import Boolean, Column, DateTime, Float, Index, String, func
+
+from app.core.database import Base
+
+
+class RateLimitBucket(Base):
+    """
+    A token bucket shared by every API replica when RATE_LIMIT_BACKEND=postgres
+    (see app/helpers/rate_limit.py). Refilled lazily on each request.
+    """
+    __tablename__ = "rate_limit_buckets"
+
+    # "user:<id>" or "ip:<address>"
+    key = Column(String, primary_key=True)
+    tokens = Column(Float, nullable=False)
+    # Whether the request that last touched the bucket was let through.
+    allowed = Column(Boolean, nullable=False, default=True)
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        # Idle buckets are full again after a minute or so and get purged.
+        Index("ix_rate_limit_buckets_updated_at", "updated_at"),
+    )
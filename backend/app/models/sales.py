@@ -0,0 +1,102 @@
+import strawberry
+from typing import Optional, List
+
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, UniqueConstraint, Index
+from app.core.database import Base
+
+# ===================================================================
+# 1. STRAWBERRY GRAPHQL OUTPUT TYPES (for Queries)
+# ===================================================================
+
+@strawberry.type
+class SalesBucketType:
+    """Aggregated sales for one canteen over one time bucket (uses camelCase)."""
+    canteenId: int
+    bucketStart: str  # Exposed as ISO 8601 string (IST)
+    orderCount: int
+    pendingCount: int
+    activeCount: int
+    deliveredCount: int
+    cancelledCount: int
+    grossRevenue: float
+    tax: float
+    refunds: float
+    netRevenue: float
+
+@strawberry.type
+class ItemSalesType:
+    """Quantity sold and revenue for a single menu item."""
+    itemId: int
+    name: Optional[str] = None
+    quantity: int
+    revenue: float
+
+
+@strawberry.type
+class SalesSeriesPointType:
+    """Orders, items and revenue for one hour/day bucket of a sales analytics series."""
+    bucketStart: str  # Exposed as ISO 8601 string (IST)
+    orders: int
+    items: int
+    revenue: float
+
+
+@strawberry.type
+class BasketPercentilesType:
+    """Approximate basket (order value) percentiles, within ~1% relative error."""
+    p50: float
+    p90: float
+    p99: float
+
+
+@strawberry.type
+class SalesAnalyticsType:
+    """Item-level sales analytics for a canteen over a time range."""
+    canteenId: int
+    fromTime: str
+    toTime: str
+    granularity: str
+    totalOrders: int
+    totalItems: int
+    grossRevenue: float
+    averageBasketValue: float
+    averageBasketSize: float
+    basketValuePercentiles: BasketPercentilesType
+    topItems: List[ItemSalesType]
+    # 7 x 24 matrix of items sold, indexed [weekday (Mon=0)][IST hour]
+    hourlyHeatmap: List[List[int]]
+    series: List[SalesSeriesPointType]
+
+# ===================================================================
+# 2. SQLAlchemy DATABASE MODEL
+# ===================================================================
+
+class CanteenSalesRollup(Base):
+    """
+    Pre-aggregated order totals per canteen, time bucket and order status.
+
+    Rows are kept in step with `orders` inside the same transaction as every
+    status change (see app/helpers/sales_rollups.py), so admin stats never scan
+    the orders table. Each order contributes to three grains:
+
+    - `hour`: the IST hour the order was placed in
+    - `day`:  the IST calendar day the order was placed in
+    - `all`:  a single all-time bucket per canteen (bucket_start = epoch)
+    """
+    __tablename__ = "canteen_sales_rollups"
+
+    id = Column(Integer, primary_key=True)
+    canteen_id = Column(Integer, ForeignKey("canteens.id"), nullable=False)
+    granularity = Column(String, nullable=False)
+    bucket_start = Column(DateTime(timezone=True), nullable=False)
+    status = Column(String, nullable=False)
+
+    order_count = Column(Integer, nullable=False, default=0)
+    gross_amount = Column(Float, nullable=False, default=0.0)
+    tax_amount = Column(Float, nullable=False, default=0.0)
+    refund_amount = Column(Float, nullable=False, default=0.0)
+
+    __table_args__ = (
+        UniqueConstraint("canteen_id", "granularity", "bucket_start", "status", name="uq_canteen_sales_rollup_bucket"),
+        Index("ix_canteen_sales_rollups_grain_time", "granularity", "bucket_start"),
+    )
@@ -3,7 +3,7 @@ from __future__ import annotations
 import strawberry
 from typing import Optional, List
 
-from sqlalchemy import Column, String, JSON, Table, ForeignKey, Boolean, Integer
+from sqlalchemy import Column, String, JSON, Table, ForeignKey, Boolean, Integer, DateTime, Index, func
 from sqlalchemy.orm import relationship, object_session
 from app.core.database import Base
 from app.models.canteen import CanteenType, ScheduleType  # noqa: F401
@@ -222,4 +222,28 @@ class User(Base):
             sorted_orders = sorted(self.orders or [], key=lambda o: getattr(o, "order_time", None) or 0, reverse=True)
             return [getattr(o, "id") for o in sorted_orders if getattr(o, "id", None) is not None]
         except Exception:
-            return [getattr(o, "id") for o in list(self.orders or []) if getattr(o, "id", None) is not None]
\ No newline at end of file
+            return [getattr(o, "id") for o in list(self.orders or []) if getattr(o, "id", None) is not None]
+
+
+class RefreshTokenFamily(Base):
+    """
+    One row per login session. Each refresh rotates `current_jti`; presenting
+    an older jti means the refresh token was copied, and the whole family is
+    revoked (see app/helpers/refresh_tokens.py). Rows are purged once expired.
+    """
+    __tablename__ = "refresh_token_families"
+
+    id = Column(String(32), primary_key=True)
+    user_id = Column(String, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    current_jti = Column(String(32), nullable=False)
+    # The jti rotated away last; still accepted for a few seconds so that
+    # concurrent refreshes from the same browser don't look like theft.
+    previous_jti = Column(String(32), nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    rotated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    revoked_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index("ix_refresh_token_families_expires_at", "expires_at"),
+    )
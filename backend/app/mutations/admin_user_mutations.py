@@ -3,12 +3,12 @@ from strawberry.types import Info
 from sqlalchemy.orm import Session
 from graphql import GraphQLError
 import uuid
-from passlib.context import CryptContext
 from typing import List
 
 from app.models.user import User, UserType
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from app.helpers import authz
+from app.helpers.exceptions import PasswordHasherBusyError
+from app.helpers.passwords import hash_password
 
 
 def _ensure_admin(db: Session, user) -> None:
@@ -19,7 +19,7 @@ def _ensure_admin(db: Session, user) -> None:
 @strawberry.type
 class AdminUserMutations:
     @strawberry.mutation
-    def create_vendor(self, info: Info, name: str, email: str, password: str, role: str = "vendor") -> UserType:
+    async def create_vendor(self, info: Info, name: str, email: str, password: str, role: str = "vendor") -> UserType:
         """Admin-only: create a vendor or staff user with given role."""
         db: Session = info.context["db"]
         current_user = info.context.get("user")
@@ -29,7 +29,10 @@ class AdminUserMutations:
         if existing:
             raise GraphQLError("User with this email or name already exists.")
 
-        hashed = pwd_context.hash(password)
+        try:
+            hashed = await hash_password(password)
+        except PasswordHasherBusyError as e:
+            raise GraphQLError(str(e))
         new_user = User(id=str(uuid.uuid4()), name=name, email=email, password=hashed, role=role)
         try:
             db.add(new_user)
@@ -82,6 +85,7 @@ class AdminUserMutations:
         try:
             db.delete(user)
             db.commit()
+            authz.invalidate(user_id)
         except Exception as e:
             db.rollback()
             raise GraphQLError(f"Failed to delete user: {e}")
@@ -111,6 +115,7 @@ class AdminUserMutations:
 
         try:
             db.commit()
+            authz.invalidate(*user_ids)
         except Exception as e:
             db.rollback()
             raise GraphQLError(f"Failed to assign staff: {e}")
@@ -143,6 +148,7 @@ class AdminUserMutations:
 
         try:
             db.commit()
+            authz.invalidate(*user_ids)
         except Exception as e:
             db.rollback()
             raise GraphQLError(f"Failed to remove staff: {e}")
@@ -1,8 +1,8 @@
 import strawberry
+import logging
 import os
 import uuid
 from fastapi import Response
-from passlib.context import CryptContext
 from strawberry.types import Info
 from sqlalchemy.orm import Session
 from cas import CASClient
@@ -12,10 +12,13 @@ from graphql import GraphQLError
 from app.core.database import get_db
 from sqlalchemy import or_
 from app.models.user import User, AuthResponse
-from app.helpers.auth_utils import create_and_set_tokens
+from app.helpers.auth_utils import clear_tokens, create_and_set_tokens, set_access_token
+from app.helpers import refresh_tokens
+from app.helpers.cas_auth import CasValidator, provision_user
+from app.helpers.exceptions import CasUnavailableError, PasswordHasherBusyError
+from app.helpers.passwords import hash_password, verify_password
 
-# --- Password Hashing Setup ---
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+logger = logging.getLogger(__name__)
 
 # --- CAS Client Setup ---
 BASE_URL = os.getenv('BASE_URL', 'http://localhost')
@@ -29,6 +32,7 @@ cas_client = CASClient(
     service_url=f"{SERVICE_URL}?next={quote_plus(REDIRECT_URL)}",
     server_url=CAS_SERVER_URL,
 )
+cas_validator = CasValidator(cas_client)
 
 @strawberry.type
 class AuthMutations:
@@ -46,11 +50,22 @@ class AuthMutations:
         # Allow login using either name or email (frontend sends email as username)
         user = db.query(User).filter(or_(User.name == username, User.email == username)).first()
 
-        if not user or not pwd_context.verify(password, user.password):
+        # bcrypt runs in the password hashing pool, not on the event loop
+        try:
+            verified, new_hash = await verify_password(password, user.password if user else None)
+        except PasswordHasherBusyError as e:
+            return AuthResponse(success=False, message=str(e), role=None, user=None)
+
+        if not verified:
             # Return a typed AuthResponse indicating failure so clients can inspect `success`.
             return AuthResponse(success=False, message="Invalid username or password", role=None, user=None)
 
-        create_and_set_tokens(response, user.id, user.name, user.role)
+        if new_hash:
+            # Stored hash predates the current bcrypt cost; upgrade it transparently.
+            user.password = new_hash
+            db.commit()
+
+        refresh_tokens.start_session(db, response, user)
 
         return AuthResponse(success=True, message="Login successful", role=user.role, user=user)
 
@@ -64,7 +79,7 @@ class AuthMutations:
         return cas_client.get_login_url()
 
     @strawberry.mutation
-    def verify_cas_ticket(self, info: Info, ticket: str) -> AuthResponse:
+    async def verify_cas_ticket(self, info: Info, ticket: str) -> AuthResponse:
         """
         Verifies a CAS ticket after the user is redirected back. On success,
         creates the user if they don't exist, sets httpOnly cookies, and
@@ -74,10 +89,16 @@ class AuthMutations:
         db: Session = info.context["db"]
 
         try:
-            cas_user, attributes, _ = cas_client.verify_ticket(ticket)
+            # Validated on a pooled keep-alive client, off the event loop
+            identity = await cas_validator.validate(ticket)
+        except CasUnavailableError:
+            logger.exception("CAS ticket validation failed")
+            return AuthResponse(success=False, message="The CAS server is unavailable. Please try again.", role=None, user=None)
 
-            if not cas_user:
+        try:
+            if not identity:
                 return AuthResponse(success=False, message="Invalid or expired CAS ticket.", role=None, user=None)
+            attributes = identity.attributes
 
             # Extract user details from CAS attributes
             uid = attributes.get("uid")
@@ -87,18 +108,12 @@ class AuthMutations:
             if not uid or not email or not first_name:
                 raise GraphQLError("CAS ticket is missing required user attributes (uid, email, FirstName).")
 
-            # Find or create the user in our local database
+            # Find or create the user in our local database (one upsert on email)
             # Ensure uid is treated as a string (some CAS providers return numeric ids)
-            db_user = db.query(User).filter(User.email == str(email)).first()
-
-            if not db_user:
-                db_user = User(id=uid, name=first_name, email=email, role="student")
-                db.add(db_user)
-                db.commit()
-                db.refresh(db_user)
+            db_user = provision_user(db, str(uid), email, first_name)
 
-            # Create and set session tokens
-            create_and_set_tokens(response, db_user.id, db_user.name, db_user.role)
+            # Create and set session tokens (commits the new user too)
+            refresh_tokens.start_session(db, response, db_user)
 
             return AuthResponse(success=True, message="Login successful", role=db_user.role, user=db_user)
 
@@ -110,18 +125,47 @@ class AuthMutations:
 
     # --- Session Management ---
 
+    @strawberry.mutation
+    def refresh_session(self, info: Info) -> AuthResponse:
+        """
+        Exchanges the refresh token cookie for a new access token and a rotated
+        refresh token. Clients call this when the access token expires instead
+        of logging in again. Replaying an already-rotated refresh token revokes
+        the whole session.
+        """
+        request = info.context["request"]
+        response: Response = info.context["response"]
+        db: Session = info.context["db"]
+
+        result = refresh_tokens.rotate(db, request.cookies.get("refresh_token"))
+        if result.status == refresh_tokens.REUSED:
+            clear_tokens(response)
+            return AuthResponse(success=False, message="Session revoked. Please log in again.", role=None, user=None)
+        user = db.get(User, str(result.user_id)) if result.user_id else None
+        if result.status == refresh_tokens.INVALID or not user:
+            clear_tokens(response)
+            return AuthResponse(success=False, message="Session expired. Please log in again.", role=None, user=None)
+
+        if result.status == refresh_tokens.ROTATED:
+            create_and_set_tokens(response, user.id, user.name, user.role, result.family_id, result.jti)
+        else:
+            # Another request just rotated this session; it set the new refresh cookie.
+            set_access_token(response, user.id, user.name, user.role)
+        return AuthResponse(success=True, message="Session refreshed", role=user.role, user=user)
+
     @strawberry.mutation
     async def logout(self, info: Info) -> str:
         """
-        Logs out the current user by deleting their session cookies.
+        Logs out the current user by revoking their session and deleting their session cookies.
         """
+        request = info.context["request"]
         response: Response = info.context["response"]
-        response.delete_cookie("access_token")
-        response.delete_cookie("refresh_token")
+        refresh_tokens.revoke(info.context["db"], request.cookies.get("refresh_token"))
+        clear_tokens(response)
         return "Logout successful"
 
     @strawberry.mutation
-    def signup(self, info: Info, name: str, email: str, password: str) -> AuthResponse:
+    async def signup(self, info: Info, name: str, email: str, password: str) -> AuthResponse:
         """
         Simple signup endpoint for frontend clients that expect a `signup` mutation.
         Registers the user, sets session cookies, and returns an AuthResponse.
@@ -133,7 +177,10 @@ class AuthMutations:
         if db.query(User).filter(User.email == email).first():
             return AuthResponse(success=False, message="Email already registered", role=None, user=None)
 
-        hashed_password = pwd_context.hash(password)
+        try:
+            hashed_password = await hash_password(password)
+        except PasswordHasherBusyError as e:
+            return AuthResponse(success=False, message=str(e), role=None, user=None)
         new_user = User(id=str(uuid.uuid4()), name=name, email=email, password=hashed_password, role="student")
         try:
             db.add(new_user)
@@ -145,7 +192,7 @@ class AuthMutations:
 
         # Set tokens/cookies for the new user
         try:
-            create_and_set_tokens(response, new_user.id, new_user.name, new_user.role)
+            refresh_tokens.start_session(db, response, new_user)
         except Exception:
             # Token creation failure shouldn't block signup; return success but warn in message
             return AuthResponse(success=True, message="Signup succeeded but token setup failed", role=new_user.role, user=new_user)
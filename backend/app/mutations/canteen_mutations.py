@@ -7,6 +7,7 @@ from graphql import GraphQLError
 
 from app.models.canteen import Canteen, CreateCanteenInput, CanteenMutationResponse, UpdateCanteenInput
 from app.models.user import User
+from app.helpers import authz, response_cache
 
 def _get_and_verify_user_role(db: Session, user_id: str, expected_role: str):
     """Fetches a user and raises an error if they don't have the expected role."""
@@ -17,12 +18,13 @@ def _get_and_verify_user_role(db: Session, user_id: str, expected_role: str):
     return user
 
 def _get_and_verify_canteen_owner(db: Session, canteen_id: int, user_id: str):
-    """Fetches a canteen and raises an error if it's not found or the user is not the owner."""
+    """Fetches a canteen and raises an error if the user is not the owner or it's not found."""
+    # Ownership comes from the cached authorization index; only owners load the row.
+    if not authz.canteen_access(db, user_id).owns(canteen_id):
+        raise GraphQLError("Unauthorized: You are not the owner of this canteen.")
     canteen = db.query(Canteen).filter(Canteen.id == canteen_id).first()
     if not canteen:
         raise GraphQLError("Canteen not found.")
-    if canteen.userId != user_id:
-        raise GraphQLError("Unauthorized: You are not the owner of this canteen.")
     return canteen
 
 @strawberry.type
@@ -62,6 +64,8 @@ class CanteenMutations:
             db.add(new_canteen)
             db.commit()
             db.refresh(new_canteen)
+            authz.invalidate(input.user_id)
+            response_cache.invalidate()
         except IntegrityError:
             db.rollback()
             raise GraphQLError("A canteen with this phone number or email already exists.")
@@ -96,6 +100,7 @@ class CanteenMutations:
 
         try:
             db.commit()
+            response_cache.invalidate()
         except Exception as e:
             db.rollback()
             raise GraphQLError(f"Failed to update canteen: {e}")
@@ -117,10 +122,13 @@ class CanteenMutations:
         canteen = db.query(Canteen).filter(Canteen.id == canteen_id).first()
         if not canteen:
             raise GraphQLError("Canteen not found.")
+        affected_user_ids = [canteen.user_id] + [u.id for u in canteen.staff]
             
         try:
             db.delete(canteen)
             db.commit()
+            authz.invalidate(*affected_user_ids)
+            response_cache.invalidate()
         except Exception as e:
             db.rollback()
             raise GraphQLError(f"Failed to delete canteen: {e}")
@@ -141,6 +149,7 @@ class CanteenMutations:
         try:
             canteen.isOpen = is_open
             db.commit()
+            response_cache.invalidate()
         except Exception as e:
             db.rollback()
             raise GraphQLError(f"Failed to update canteen status: {e}")
@@ -7,7 +7,9 @@ from datetime import datetime, timezone
 from app.models.complaints import Complaint, ComplaintType, CreateComplaintInput, UpdateComplaintInput
 from app.models.user import User
 from datetime import timedelta
-from sqlalchemy import and_
+from app.helpers.complaint_escalation import escalate_stale_complaints
+from app.helpers.complaint_counters import record_complaint_change, counter_key
+from app.queries.complaint_queries import convert_complaint_model_to_type
 
 def _get_complaint_as_admin(db: Session, complaint_id: int, admin_user: User) -> Complaint:
     """
@@ -37,22 +39,23 @@ class ComplaintMutations:
         now = datetime.now(timezone.utc)
         
         new_complaint = Complaint(
-            userId=current_user.id,
-            orderId=input.order_id,
-            complaintText=input.complaint_text,
+            user_id=current_user.id,
+            order_id=input.order_id,
+            complaint_text=input.complaint_text,
             heading=input.heading,
-            complaintType=input.complaint_type,
+            complaint_type=input.complaint_type,
             status="pending", # Default status on creation
-            isEscalated=False,
-            createdAt=now,
-            updatedAt=now
+            is_escalated=False,
+            created_at=now,
+            updated_at=now
         )
         
         db.add(new_complaint)
+        record_complaint_change(db, None, counter_key(new_complaint.status, new_complaint.is_escalated))
         db.commit()
         db.refresh(new_complaint)
         
-        return new_complaint
+        return convert_complaint_model_to_type(new_complaint)
     
     @strawberry.mutation
     def update_complaint(self, info: Info, complaint_id: int, input: UpdateComplaintInput) -> ComplaintType:
@@ -69,17 +72,17 @@ class ComplaintMutations:
         if not update_data:
             raise strawberry.GraphQLError("No update data provided.")
 
+        old_key = counter_key(complaint.status, complaint.is_escalated)
+        # Input fields are snake_case and match the model's column names.
         for key, value in update_data.items():
-            # A simple mapping for snake_case input to camelCase model
-            model_key = key.replace('_', '')
-            model_key = model_key[0].lower() + ''.join(word.capitalize() for word in model_key[1:].split('_'))
-            setattr(complaint, model_key, value)
+            setattr(complaint, key, value)
         
-        complaint.updatedAt = datetime.now(timezone.utc)
+        complaint.updated_at = datetime.now(timezone.utc)
+        record_complaint_change(db, old_key, counter_key(complaint.status, complaint.is_escalated))
         db.commit()
         db.refresh(complaint)
         
-        return complaint
+        return convert_complaint_model_to_type(complaint)
     
     @strawberry.mutation
     def close_complaint(self, info: Info, complaint_id: int) -> ComplaintType:
@@ -91,13 +94,15 @@ class ComplaintMutations:
         
         complaint = _get_complaint_as_admin(db, complaint_id, current_user)
         
+        old_key = counter_key(complaint.status, complaint.is_escalated)
         complaint.status = "resolved"
-        complaint.updatedAt = datetime.now(timezone.utc)
+        complaint.updated_at = datetime.now(timezone.utc)
+        record_complaint_change(db, old_key, counter_key(complaint.status, complaint.is_escalated))
         
         db.commit()
         db.refresh(complaint)
         
-        return complaint
+        return convert_complaint_model_to_type(complaint)
     
     @strawberry.mutation
     def escalate_complaint(self, info: Info, complaint_id: int) -> ComplaintType:
@@ -110,13 +115,15 @@ class ComplaintMutations:
         
         complaint = _get_complaint_as_admin(db, complaint_id, current_user)
         
-        complaint.isEscalated = True
-        complaint.updatedAt = datetime.now(timezone.utc)
+        old_key = counter_key(complaint.status, complaint.is_escalated)
+        complaint.is_escalated = True
+        complaint.updated_at = datetime.now(timezone.utc)
+        record_complaint_change(db, old_key, counter_key(complaint.status, complaint.is_escalated))
         
         db.commit()
         db.refresh(complaint)
         
-        return complaint
+        return convert_complaint_model_to_type(complaint)
 
     @strawberry.mutation
     def escalate_stale_complaints(self, info: Info, days: int = 7) -> int:
@@ -126,15 +133,7 @@ class ComplaintMutations:
         if not current_user or current_user.role != 'admin':
             raise strawberry.GraphQLError("Unauthorized: admin privileges required.")
 
-        cutoff = datetime.now(timezone.utc) - timedelta(days=days)
-        stale = db.query(Complaint).filter(and_(Complaint.created_at < cutoff, Complaint.status != 'resolved', Complaint.is_escalated == False)).all()
-        count = 0
-        for c in stale:
-            c.is_escalated = True
-            c.updated_at = datetime.now(timezone.utc)
-            count += 1
+        if days < 0:
+            raise strawberry.GraphQLError("days must not be negative.")
 
-        if count > 0:
-            db.commit()
-
-        return count
\ No newline at end of file
+        return len(escalate_stale_complaints(db, older_than=timedelta(days=days)))
@@ -7,6 +7,8 @@ from sqlalchemy.orm import Session
 from app.models.menu_item import MenuItem, MenuItemType, CustomizationOptionsInput, CreateMenuItemInput, UpdateMenuItemInput
 from app.models.canteen import Canteen
 from app.models.user import User
+from app.helpers import response_cache
+from app.helpers.authz import owns_canteen
 
 def _get_item_and_verify_owner(db: Session, item_id: int, user: User):
     """
@@ -16,9 +18,8 @@ def _get_item_and_verify_owner(db: Session, item_id: int, user: User):
     item = db.query(MenuItem).filter(MenuItem.id == item_id).first()
     if not item:
         raise strawberry.GraphQLError("Menu item not found.")
-        
-    canteen = db.query(Canteen).filter(Canteen.id == item.canteenId).first()
-    if not canteen or canteen.userId != user.id:
+
+    if not owns_canteen(db, user, item.canteenId):
         raise strawberry.GraphQLError("Unauthorized: You do not have permission to modify this menu item.")
         
     return item
@@ -43,11 +44,11 @@ class MenuMutations:
         if not current_user:
             raise strawberry.GraphQLError("You must be logged in to create a menu item.")
 
+        if not owns_canteen(db, current_user, input.canteen_id):
+            raise strawberry.GraphQLError("Unauthorized: You can only add items to your own canteen.")
         canteen = db.query(Canteen).filter(Canteen.id == input.canteen_id).first()
         if not canteen:
             raise strawberry.GraphQLError("Canteen not found.")
-        if canteen.userId != current_user.id:
-            raise strawberry.GraphQLError("Unauthorized: You can only add items to your own canteen.")
 
         customization_dict = _convert_customizations_to_dict(input.customization_options)
         
@@ -70,6 +71,7 @@ class MenuMutations:
         
         db.add(new_item)
         db.commit()
+        response_cache.invalidate()
         db.refresh(new_item)
         return new_item
 
@@ -97,6 +99,7 @@ class MenuMutations:
                 setattr(item, model_key, value)
         
         db.commit()
+        response_cache.invalidate()
         db.refresh(item)
         return item
 
@@ -112,6 +115,7 @@ class MenuMutations:
         
         db.delete(item)
         db.commit()
+        response_cache.invalidate()
         return "Menu item deleted successfully."
 
     @strawberry.mutation
@@ -126,6 +130,7 @@ class MenuMutations:
         try:
             item.stock_count = int(stock_count)
             db.commit()
+            response_cache.invalidate()
             db.refresh(item)
             return item
         except Exception as e:
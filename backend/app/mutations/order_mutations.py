@@ -8,8 +8,11 @@ from graphql import GraphQLError
 
 from app.models.order import Order, OrderItem, OrderType, CreateOrderInput, OrderItemInput
 from app.models.menu_item import MenuItem
-from app.models.canteen import Canteen
 from app.models.user import User
+from app.helpers.sales_rollups import record_order_created, record_order_status_change
+from app.helpers.refunds import request_refunds, request_canteen_refunds
+from app.helpers.authz import can_operate_canteen
+from app.helpers.permissions import IsAdminOrCanteenOwner
 
 def _process_order_items_and_calculate_total(
     db: Session, items: List[OrderItemInput]
@@ -53,14 +56,13 @@ def _process_order_items_and_calculate_total(
 
 
 def _get_order_and_verify_vendor(db: Session, order_id: int, user: User):
-    """Fetches an order and verifies the user is the canteen vendor."""
+    """Fetches an order and verifies the user is the canteen's vendor or one of its staff."""
     order = db.query(Order).filter(Order.id == order_id).first()
     if not order:
         raise GraphQLError("Order not found.")
 
-    canteen = db.query(Canteen).filter(Canteen.id == order.canteenId).first()
-    if not canteen or canteen.userId != user.id:
-        raise GraphQLError("Unauthorized: Only the canteen vendor can perform this action.")
+    if not can_operate_canteen(db, user, order.canteenId):
+        raise GraphQLError("Unauthorized: Only the canteen vendor or its staff can perform this action.")
 
     return order
 
@@ -154,9 +156,11 @@ class OrderMutations:
                 note=pi.get("note"),
                 snapshot_name=pi.get("snapshot_name"),
                 snapshot_price=pi.get("snapshot_price"),
+                order_time=new_order.order_time,
             )
             db.add(oi)
 
+        record_order_created(db, new_order)
         db.commit()
         db.refresh(new_order)
 
@@ -164,7 +168,7 @@ class OrderMutations:
 
     @strawberry.mutation
     def update_order_status(self, info: Info, order_id: int, status: str) -> OrderType:
-        """Update order status. Requires canteen vendor privileges."""
+        """Update order status. Requires canteen vendor privileges. Cancelling a paid order queues its refund."""
         db: Session = info.context["db"]
         current_user = info.context.get("user")
         if not current_user:
@@ -172,18 +176,28 @@ class OrderMutations:
 
         order = _get_order_and_verify_vendor(db, order_id, current_user)
 
+        # Cancelling goes through the refund path so a paid order's payment is queued for a refund
+        if status == "cancelled":
+            result = request_refunds(db, [order.id], requested_by=str(current_user.id))
+            if not result.cancelled:
+                raise GraphQLError(f"Cannot cancel order with status: '{order.status}'.")
+            db.commit()
+            db.refresh(order)
+            return order
+
         # Update status and corresponding timestamp (use DB column names)
         now = datetime.now(timezone.utc)
+        old_status = order.status
         order.status = status
         timestamps = {
             "confirmed": "confirmed_time",
             "preparing": "preparing_time",
             "ready": "ready_time",
             "delivered": "delivery_time",
-            "cancelled": "cancelled_time",
         }
         if status in timestamps:
             setattr(order, timestamps[status], now)
+        record_order_status_change(db, order, old_status)
         db.commit()
         db.refresh(order)
         return order
@@ -219,26 +233,49 @@ class OrderMutations:
         if order.status in ["delivered", "cancelled"]:
             return OrderMutations.CancelOrderPayload(success=False, message=f"Cannot cancel order with status: '{order.status}'.", orderId=orderId)
 
-        # Disallow cancelling paid orders (require refund flow)
-        if getattr(order, 'payment_status', None) and str(order.payment_status).lower() in ["paid", "completed"]:
-            return OrderMutations.CancelOrderPayload(success=False, message="Cannot cancel an order that has been paid. Please request a refund.", orderId=orderId)
-
         # Allow cancellation only within a 5 minute window from order creation
         order_time = getattr(order, 'order_time', None)
         if order_time:
             now = datetime.now(timezone.utc)
             if now - order_time > timedelta(minutes=5):
                 return OrderMutations.CancelOrderPayload(success=False, message="Cancellation window (5 minutes) has expired.", orderId=orderId)
+
+        # Paid orders are cancelled and their payment queued for a refund
+        if getattr(order, 'payment_status', None) and str(order.payment_status).lower() in ["paid", "completed"]:
+            request_refunds(db, [order.id], reason=reason, requested_by=str(current_user.id))
+            db.commit()
+            return OrderMutations.CancelOrderPayload(success=True, message="Order cancelled. Your refund is being processed.", orderId=orderId)
+
         # Perform cancellation using underlying DB columns
+        old_status = order.status
         order.status = "cancelled"
         order.cancelled_time = datetime.now(timezone.utc)
         order.cancellation_reason = reason
+        record_order_status_change(db, order, old_status)
 
         db.commit()
         db.refresh(order)
 
         return OrderMutations.CancelOrderPayload(success=True, message="Order cancelled.", orderId=orderId)
 
+    @strawberry.type
+    class RefundOrdersPayload:
+        """Payload returned by refundCanteenOrders."""
+        cancelled: int
+        refundsRequested: int
+
+    @strawberry.mutation(permission_classes=[IsAdminOrCanteenOwner])
+    def refund_canteen_orders(self, info: Info, canteen_id: int, reason: Optional[str] = None) -> "OrderMutations.RefundOrdersPayload":
+        """
+        Cancels every active order of a canteen (e.g. it closes early) and queues
+        refunds for the paid ones. Admins or the canteen's vendor only.
+        """
+        db: Session = info.context["db"]
+        current_user = info.context["user"]
+        result = request_canteen_refunds(db, canteen_id, reason=reason, requested_by=str(current_user.id))
+        db.commit()
+        return OrderMutations.RefundOrdersPayload(cancelled=result.cancelled, refundsRequested=result.refunds_requested)
+
     @strawberry.mutation
     def mark_order_paid(self, info: Info, order_id: int, payment_reference: Optional[str] = None) -> OrderType:
         """Mark an order as paid. Only the customer who placed the order can call this."""
@@ -257,9 +294,11 @@ class OrderMutations:
             raise GraphQLError(f"Cannot update payment for order with status: '{order.status}'.")
 
         # Update payment status and confirm the order (use DB column names)
+        old_status = order.status
         order.payment_status = "Paid"
         order.status = "confirmed"
         order.confirmed_time = datetime.now(timezone.utc)
+        record_order_status_change(db, order, old_status)
 
         db.add(order)
         db.commit()
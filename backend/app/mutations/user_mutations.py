@@ -1,6 +1,5 @@
 import strawberry
 from typing import List, Optional
-from passlib.context import CryptContext
 import uuid
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
@@ -8,13 +7,14 @@ from strawberry.types import Info
 from graphql import GraphQLError
 
 from app.models.user import User, UserType, RegisterUserInput, UpdateUserProfileInput
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from app.helpers.exceptions import PasswordHasherBusyError
+from app.helpers.passwords import hash_password
+from app.helpers import authz
 
 @strawberry.type
 class UserMutations:
     @strawberry.mutation
-    def register_user(self, info: Info, input: RegisterUserInput) -> UserType:
+    async def register_user(self, info: Info, input: RegisterUserInput) -> UserType:
         """
         Registers a new user. The role is defaulted to 'student'.
         Raises an error if the username or email is already taken.
@@ -29,7 +29,10 @@ class UserMutations:
             raise GraphQLError("User with this email or username already exists.")
 
         # Always hash the password
-        hashed_password = pwd_context.hash(input.password)
+        try:
+            hashed_password = await hash_password(input.password)
+        except PasswordHasherBusyError as e:
+            raise GraphQLError(str(e))
         
         new_user = User(
             id=str(uuid.uuid4()),
@@ -50,7 +53,7 @@ class UserMutations:
         return new_user
 
     @strawberry.mutation
-    def update_user_profile(self, info: Info, input: UpdateUserProfileInput) -> UserType:
+    async def update_user_profile(self, info: Info, input: UpdateUserProfileInput) -> UserType:
         """Updates the profile of the currently authenticated user."""
         db: Session = info.context["db"]
         current_user = info.context.get("user")
@@ -69,7 +72,10 @@ class UserMutations:
                 current_user.email = value
             elif key == 'password':
                 # Always hash the new password
-                current_user.password = pwd_context.hash(value)
+                try:
+                    current_user.password = await hash_password(value)
+                except PasswordHasherBusyError as e:
+                    raise GraphQLError(str(e))
             else:
                 setattr(current_user, key, value)
         
@@ -100,6 +106,7 @@ class UserMutations:
             
         db.delete(current_user)
         db.commit()
+        authz.invalidate(current_user.id)
         return "User account deleted successfully."
 
 # Note: Admin-level mutations like deleting or updating *other* users
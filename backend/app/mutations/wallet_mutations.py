@@ -0,0 +1,56 @@
+import strawberry
+from strawberry.types import Info
+from sqlalchemy.orm import Session
+from graphql import GraphQLError
+from typing import List, Optional
+
+from app.helpers.permissions import IsAdmin
+from app.helpers.wallet_bulk import bulk_credit, build_credit_request, merge_rejected
+from app.helpers.wallet_ledger import from_paise
+from app.models.payment import BulkCreditRowType, BulkCreditSummaryType, WalletCreditInput
+
+
+@strawberry.type
+class WalletMutations:
+    @strawberry.mutation(permission_classes=[IsAdmin])
+    def bulk_credit_wallets(
+        self, info: Info, credits: List[WalletCreditInput], batch_id: Optional[str] = None
+    ) -> BulkCreditSummaryType:
+        """
+        Admin-only: credits many wallets in one set-based batch. Re-sending the
+        same `batchId` does not credit rows that were already applied.
+        """
+        db: Session = info.context["db"]
+        requests, rejected = [], []
+        for row_number, c in enumerate(credits, start=1):
+            req, bad = build_credit_request(row_number, c.user, c.amount, c.description)
+            if req is not None:
+                requests.append(req)
+            else:
+                rejected.append(bad)
+
+        try:
+            summary = merge_rejected(bulk_credit(db, requests, batch_id), rejected)
+            db.commit()
+        except ValueError as e:
+            db.rollback()
+            raise GraphQLError(str(e))
+
+        return BulkCreditSummaryType(
+            batchId=summary.batch_id,
+            credited=summary.credited,
+            creditedAmount=from_paise(summary.credited_paise),
+            failed=summary.failed,
+            rows=[
+                BulkCreditRowType(
+                    rowNumber=r.row_number,
+                    userRef=r.user_ref,
+                    status=r.status,
+                    amount=from_paise(r.amount_paise),
+                    walletId=r.wallet_id,
+                    entryId=r.entry_id,
+                    message=r.message,
+                )
+                for r in summary.rows
+            ],
+        )
@@ -2,13 +2,29 @@ import strawberry
 from typing import List, Optional
 from strawberry.types import Info
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, case, select, union_all
+from graphql import GraphQLError
+from datetime import datetime
 
-from app.models.canteen import Canteen, CanteenType
-from app.models.order import Order
+from app.helpers.permissions import IsAdminOrCanteenOwner
+from app.models.canteen import Canteen
+from app.models.order import Order, ArchivedOrder, ArchivedOrderChunk
 from app.models.menu_item import MenuItem, MenuItemType
 from app.models.user import User, UserType
 from app.models.complaints import Complaint, ComplaintType
+from app.models.sales import CanteenSalesRollup, SalesBucketType
+from app.queries.menu_queries import _convert_menu_item_to_type
+from app.helpers.cache import TTLCache
+from app.helpers.sales_rollups import (
+    PENDING_STATUSES, ACTIVE_STATUSES, DELIVERED_STATUSES, CANCELLED_STATUSES, net_revenue,
+)
+from app.helpers.time_utils import to_ist_iso
+
+MAX_DETAIL_PAGE_SIZE = 200
+
+# Summary counts for the canteen detail page. A few seconds of staleness is
+# fine there, and it saves the aggregate query on every page flip.
+_canteen_summary_cache = TTLCache(maxsize=512, ttl=30.0)
 
 
 @strawberry.type
@@ -20,25 +36,43 @@ class CanteenStatsType:
     isOpen: bool
 
 
-def _convert_menu_item_to_type(item: MenuItem) -> MenuItemType:
-    # reuse existing model converters pattern
-    return MenuItemType(
-        id=item.id,
-        name=item.name,
-        price=item.price,
-        category=item.category,
-        isPopular=bool(getattr(item, "is_popular", False)),
-        image=item.image,
-        description=item.description,
-        tags=item.tags or [],
-        preparationTime=getattr(item, "preparation_time", None),
-        rating=getattr(item, "rating", 0.0),
-        ratingCount=getattr(item, "rating_count", 0),
-        canteenId=item.canteen_id,
-        canteenName=getattr(item, "canteen_name", None),
-        isAvailable=getattr(item, "is_available", True),
-        stockCount=getattr(item, "stock_count", None),
-    )
+@strawberry.type
+class CanteenComplaintType(ComplaintType):
+    """A complaint as shown on the admin canteen detail page, with its author."""
+    user: Optional[UserType] = None
+
+
+@strawberry.type
+class CanteenDetailSummaryType:
+    orderCount: int
+    totalRevenue: float
+    menuItemCount: int
+    availableMenuItemCount: int
+    complaintCount: int
+    openComplaintCount: int
+    escalatedComplaintCount: int
+
+
+@strawberry.type
+class CanteenDetailType:
+    """Canteen detail for admins: canteen fields, owner, one page of menu items and complaints, and a summary."""
+    id: int
+    name: str
+    userId: str
+    isOpen: bool
+    image: Optional[str] = None
+    location: Optional[str] = None
+    rating: Optional[float] = 0.0
+    openTime: Optional[str] = None
+    closeTime: Optional[str] = None
+    description: Optional[str] = None
+    phone: Optional[str] = None
+    email: Optional[str] = None
+    tags: Optional[List[str]] = None
+    owner: Optional[UserType] = None
+    menuItems: List[MenuItemType]
+    complaints: List[CanteenComplaintType]
+    summary: CanteenDetailSummaryType
 
 
 def _convert_complaint_to_type(c: Complaint) -> ComplaintType:
@@ -66,19 +100,28 @@ def _convert_complaint_to_type(c: Complaint) -> ComplaintType:
 class AdminQueries:
     @strawberry.field
     def get_canteen_stats(self, info: Info) -> List[CanteenStatsType]:
-        """Returns basic stats (order count, revenue) per canteen."""
+        """Returns basic stats (order count, revenue) per canteen, served from the sales rollups."""
         db: Session = info.context["db"]
-        # Left join orders to canteens and aggregate
+        # All-time rollup rows: at most one per (canteen, status), independent of history size.
+        totals = (
+            db.query(
+                CanteenSalesRollup.canteen_id.label("cid"),
+                func.sum(CanteenSalesRollup.order_count).label("order_count"),
+                func.sum(net_revenue).label("revenue"),
+            )
+            .filter(CanteenSalesRollup.granularity == "all")
+            .group_by(CanteenSalesRollup.canteen_id)
+            .subquery()
+        )
         q = (
             db.query(
                 Canteen.id.label("cid"),
                 Canteen.name.label("name"),
-                func.count(Order.id).label("order_count"),
-                func.coalesce(func.sum(Order.total_amount), 0.0).label("revenue"),
+                func.coalesce(totals.c.order_count, 0).label("order_count"),
+                func.coalesce(totals.c.revenue, 0.0).label("revenue"),
                 Canteen.is_open.label("is_open"),
             )
-            .outerjoin(Order, Order.canteen_id == Canteen.id)
-            .group_by(Canteen.id)
+            .outerjoin(totals, totals.c.cid == Canteen.id)
         )
 
         results = q.all()
@@ -96,16 +139,135 @@ class AdminQueries:
 
         return stats
 
+    @strawberry.field(permission_classes=[IsAdminOrCanteenOwner])
+    def get_canteen_sales_stats(
+        self,
+        info: Info,
+        canteen_id: int,
+        from_time: str,
+        to_time: str,
+        granularity: str = "day",
+    ) -> List[SalesBucketType]:
+        """
+        Returns per-hour or per-day sales buckets for a canteen between two
+        ISO 8601 timestamps (from inclusive, to exclusive), read from the rollups.
+        """
+        db: Session = info.context["db"]
+        if granularity not in ("hour", "day"):
+            raise GraphQLError("granularity must be 'hour' or 'day'.")
+        try:
+            start = datetime.fromisoformat(from_time)
+            end = datetime.fromisoformat(to_time)
+        except ValueError:
+            raise GraphQLError("Invalid time format. Please use ISO 8601.")
+
+        def _count(statuses):
+            return func.sum(case((CanteenSalesRollup.status.in_(statuses), CanteenSalesRollup.order_count), else_=0))
+
+        rows = (
+            db.query(
+                CanteenSalesRollup.bucket_start.label("bucket_start"),
+                func.sum(CanteenSalesRollup.order_count).label("order_count"),
+                _count(PENDING_STATUSES).label("pending"),
+                _count(ACTIVE_STATUSES).label("active"),
+                _count(DELIVERED_STATUSES).label("delivered"),
+                _count(CANCELLED_STATUSES).label("cancelled"),
+                func.sum(
+                    case((CanteenSalesRollup.status.in_(CANCELLED_STATUSES), 0.0), else_=CanteenSalesRollup.gross_amount)
+                ).label("gross"),
+                func.sum(
+                    case((CanteenSalesRollup.status.in_(CANCELLED_STATUSES), 0.0), else_=CanteenSalesRollup.tax_amount)
+                ).label("tax"),
+                func.sum(CanteenSalesRollup.refund_amount).label("refunds"),
+                func.sum(net_revenue).label("net"),
+            )
+            .filter(
+                CanteenSalesRollup.canteen_id == canteen_id,
+                CanteenSalesRollup.granularity == granularity,
+                CanteenSalesRollup.bucket_start >= start,
+                CanteenSalesRollup.bucket_start < end,
+            )
+            .group_by(CanteenSalesRollup.bucket_start)
+            .order_by(CanteenSalesRollup.bucket_start)
+            .all()
+        )
+
+        return [
+            SalesBucketType(
+                canteenId=canteen_id,
+                bucketStart=to_ist_iso(r.bucket_start),
+                orderCount=int(r.order_count or 0),
+                pendingCount=int(r.pending or 0),
+                activeCount=int(r.active or 0),
+                deliveredCount=int(r.delivered or 0),
+                cancelledCount=int(r.cancelled or 0),
+                grossRevenue=float(r.gross or 0.0),
+                tax=float(r.tax or 0.0),
+                refunds=float(r.refunds or 0.0),
+                netRevenue=float(r.net or 0.0),
+            )
+            for r in rows
+        ]
+
     @strawberry.field
-    def get_canteen_detail(self, canteen_id: int, info: Info) -> Optional[CanteenType]:
-        """Return canteen detail with owner, menu items and complaints."""
+    def get_canteen_detail(
+        self,
+        canteen_id: int,
+        info: Info,
+        menu_limit: int = 50,
+        menu_offset: int = 0,
+        complaint_limit: int = 20,
+        complaint_offset: int = 0,
+    ) -> Optional[CanteenDetailType]:
+        """
+        Return canteen detail with owner, a page of menu items, a page of the
+        most recent complaints on the canteen's orders, and summary counts.
+        Runs at most four queries regardless of canteen size.
+        """
         db: Session = info.context["db"]
-        canteen = db.query(Canteen).filter(Canteen.id == canteen_id).first()
-        if not canteen:
+        if not (0 < menu_limit <= MAX_DETAIL_PAGE_SIZE and 0 < complaint_limit <= MAX_DETAIL_PAGE_SIZE):
+            raise GraphQLError(f"Page size must be between 1 and {MAX_DETAIL_PAGE_SIZE}.")
+        if menu_offset < 0 or complaint_offset < 0:
+            raise GraphQLError("Offsets must not be negative.")
+
+        # 1. Canteen and owner together.
+        row = (
+            db.query(Canteen, User)
+            .outerjoin(User, User.id == Canteen.user_id)
+            .filter(Canteen.id == canteen_id)
+            .first()
+        )
+        if row is None:
             return None
+        canteen, owner = row
 
-        # Build a CanteenType using the existing fields
-        ct = CanteenType(
+        # 2. One page of the menu.
+        menu_items = (
+            db.query(MenuItem)
+            .filter(MenuItem.canteen_id == canteen_id)
+            .order_by(MenuItem.id)
+            .offset(menu_offset)
+            .limit(menu_limit)
+            .all()
+        )
+
+        # 3. One page of complaints with their authors. Order ids stay in SQL
+        # (live, archived and frozen orders) so Postgres can plan a semi-join instead
+        # of receiving a literal IN list.
+        complaint_rows = (
+            db.query(Complaint, User)
+            .outerjoin(User, User.id == Complaint.user_id)
+            .filter(Complaint.order_id.in_(_canteen_order_ids(canteen_id)))
+            .order_by(Complaint.created_at.desc(), Complaint.id.desc())
+            .offset(complaint_offset)
+            .limit(complaint_limit)
+            .all()
+        )
+
+        # 4. Summary counts, cached briefly per canteen.
+        summary = _canteen_summary_cache.get_or_set(canteen_id, lambda: _canteen_detail_summary(db, canteen_id))
+
+        return CanteenDetailType(
             id=canteen.id,
             name=canteen.name,
             email=canteen.email,
@@ -119,22 +281,65 @@ class AdminQueries:
             phone=canteen.phone,
             userId=canteen.user_id,
             tags=canteen.tags or [],
+            owner=_convert_user_to_type(owner),
+            menuItems=[_convert_menu_item_to_type(m) for m in menu_items],
+            complaints=[
+                CanteenComplaintType(**vars(_convert_complaint_to_type(c)), user=_convert_user_to_type(u))
+                for c, u in complaint_rows
+            ],
+            summary=summary,
         )
 
-        # Attach menu and complaints as dynamic attributes (not part of CanteenType by default)
-        menu_items = db.query(MenuItem).filter(MenuItem.canteen_id == canteen.id).all()
-        complaints = db.query(Complaint).filter(Complaint.order_id == None, Complaint.order_id == None).all()  # placeholder: fetch all complaints related to this canteen via orders
 
-        # A better approach is to fetch complaints for orders placed at this canteen
-        order_ids = [o.id for o in db.query(Order.id).filter(Order.canteen_id == canteen.id).all()]
-        complaint_objs = db.query(Complaint).filter(Complaint.order_id.in_(order_ids)).all() if order_ids else []
+def _convert_user_to_type(user: Optional[User]) -> Optional[UserType]:
+    if user is None:
+        return None
+    return UserType(id=user.id, name=user.name, email=user.email, role=user.role)
+
 
-        # attach convenience attrs
-        setattr(ct, "menuItems", [_convert_menu_item_to_type(m) for m in menu_items])
-        setattr(ct, "complaints", [_convert_complaint_to_type(c) for c in complaint_objs])
+def _canteen_order_ids(canteen_id: int):
+    """A subquery of ids of every live, archived and frozen order placed at the canteen."""
+    return union_all(
+        select(Order.id).where(Order.canteen_id == canteen_id),
+        select(ArchivedOrder.id).where(ArchivedOrder.canteen_id == canteen_id),
+        select(func.unnest(ArchivedOrderChunk.order_ids)).where(ArchivedOrderChunk.canteen_id == canteen_id),
+    ).scalar_subquery()
 
-        # owner
-        owner = db.query(User).filter(User.id == canteen.user_id).first()
-        setattr(ct, "owner", UserType(id=owner.id, name=owner.name, email=owner.email, role=owner.role) if owner else None)
 
-        return ct
+def _canteen_detail_summary(db: Session, canteen_id: int) -> CanteenDetailSummaryType:
+    """Computes all summary counts for a canteen in a single round trip."""
+    rollup_totals = (
+        select(
+            func.coalesce(func.sum(CanteenSalesRollup.order_count), 0),
+            func.coalesce(func.sum(net_revenue), 0.0),
+        )
+        .where(CanteenSalesRollup.canteen_id == canteen_id, CanteenSalesRollup.granularity == "all")
+        .subquery()
+    )
+    menu_totals = (
+        select(
+            func.count(MenuItem.id),
+            func.count(MenuItem.id).filter(MenuItem.is_available == True),
+        )
+        .where(MenuItem.canteen_id == canteen_id)
+        .subquery()
+    )
+    complaint_totals = (
+        select(
+            func.count(Complaint.id),
+            func.count(Complaint.id).filter(Complaint.status != "resolved"),
+            func.count(Complaint.id).filter(Complaint.is_escalated == True),
+        )
+        .where(Complaint.order_id.in_(_canteen_order_ids(canteen_id)))
+        .subquery()
+    )
+    r = db.execute(select(rollup_totals, menu_totals, complaint_totals)).one()
+    return CanteenDetailSummaryType(
+        orderCount=int(r[0] or 0),
+        totalRevenue=float(r[1] or 0.0),
+        menuItemCount=int(r[2] or 0),
+        availableMenuItemCount=int(r[3] or 0),
+        complaintCount=int(r[4] or 0),
+        openComplaintCount=int(r[5] or 0),
+        escalatedComplaintCount=int(r[6] or 0),
+    )
@@ -0,0 +1,84 @@
+import strawberry
+from datetime import datetime, timezone
+from typing import Annotated
+from strawberry.types import Info
+from sqlalchemy.orm import Session
+from graphql import GraphQLError
+
+from app.models.menu_item import MenuItem
+from app.models.sales import (
+    SalesAnalyticsType, ItemSalesType, SalesSeriesPointType, BasketPercentilesType,
+)
+from app.helpers.analytics import compute_sales_analytics
+from app.helpers.time_utils import to_ist_iso
+from app.helpers.authz import owns_canteen
+
+
+def _parse_iso(value: str) -> datetime:
+    """Parses an ISO 8601 timestamp, treating naive values as UTC."""
+    dt = datetime.fromisoformat(value)
+    return dt if dt.tzinfo is not None else dt.replace(tzinfo=timezone.utc)
+
+
+@strawberry.type
+class AnalyticsQueries:
+    @strawberry.field
+    def sales_analytics(
+        self,
+        info: Info,
+        canteen_id: int,
+        from_: Annotated[str, strawberry.argument(name="from")],
+        to: str,
+        granularity: str = "day",
+    ) -> SalesAnalyticsType:
+        """
+        Top-selling items, a weekday/hour heatmap, basket statistics and an
+        hourly or daily series for a canteen. Available to admins and the
+        canteen's owner.
+        """
+        db: Session = info.context["db"]
+        current_user = info.context.get("user")
+        if not current_user:
+            raise GraphQLError("Authentication required.")
+
+        if current_user.role != "admin":
+            if not owns_canteen(db, current_user, canteen_id):
+                raise GraphQLError("Unauthorized: Only admins or the canteen owner can view analytics.")
+
+        try:
+            start, end = _parse_iso(from_), _parse_iso(to)
+        except ValueError:
+            raise GraphQLError("Invalid time format. Please use ISO 8601.")
+        if end <= start:
+            raise GraphQLError("'to' must be after 'from'.")
+
+        try:
+            summary = compute_sales_analytics(db, canteen_id, start, end, granularity)
+        except ValueError as e:
+            raise GraphQLError(str(e))
+
+        # One small lookup for the names of the top items only.
+        item_ids = [item_id for item_id, _, _ in summary.top_items]
+        names = dict(db.query(MenuItem.id, MenuItem.name).filter(MenuItem.id.in_(item_ids)).all()) if item_ids else {}
+
+        return SalesAnalyticsType(
+            canteenId=canteen_id,
+            fromTime=to_ist_iso(start),
+            toTime=to_ist_iso(end),
+            granularity=granularity,
+            totalOrders=summary.total_orders,
+            totalItems=summary.total_items,
+            grossRevenue=summary.gross_revenue,
+            averageBasketValue=summary.average_basket_value,
+            averageBasketSize=summary.average_basket_size,
+            basketValuePercentiles=BasketPercentilesType(**summary.basket_percentiles),
+            topItems=[
+                ItemSalesType(itemId=item_id, name=names.get(item_id), quantity=qty, revenue=rev)
+                for item_id, qty, rev in summary.top_items
+            ],
+            hourlyHeatmap=summary.heatmap,
+            series=[
+                SalesSeriesPointType(bucketStart=to_ist_iso(bucket_start), orders=orders, items=items, revenue=revenue)
+                for bucket_start, orders, items, revenue in summary.series
+            ],
+        )
@@ -1,9 +1,19 @@
+import base64
 import strawberry
+from datetime import datetime
 from typing import List, Optional
 from strawberry.types import Info
+from sqlalchemy import func, tuple_
 from sqlalchemy.orm import Session
 
-from app.models.complaints import Complaint, ComplaintType
+from app.models.complaints import (
+    Complaint, ComplaintType, ComplaintFilterInput, ComplaintConnection, ComplaintEdge,
+    ComplaintPageInfo, ComplaintCountsType, ComplaintStatusCountType, ComplaintCounter,
+)
+from app.queries.admin_queries import _canteen_order_ids
+from app.helpers.authz import owns_canteen
+
+MAX_PAGE_SIZE = 100
 
 def convert_complaint_model_to_type(complaint: Complaint) -> ComplaintType:
     """Converts a Complaint SQLAlchemy model to a ComplaintType."""
@@ -24,8 +34,107 @@ def convert_complaint_model_to_type(complaint: Complaint) -> ComplaintType:
         updatedAt=_iso(complaint.updated_at),
     )
 
+def _encode_cursor(complaint: Complaint) -> str:
+    raw = f"{complaint.created_at.isoformat()}|{complaint.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor: str):
+    try:
+        created_at, complaint_id = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(complaint_id)
+    except (ValueError, UnicodeDecodeError):
+        raise strawberry.GraphQLError("Invalid cursor.")
+
+
+def _complaint_counts(db: Session, canteen_id: Optional[int] = None) -> ComplaintCountsType:
+    """
+    Badge counts. System-wide counts come from the counter table (a handful
+    of rows, independent of complaint volume); a canteen's are counted over
+    that canteen's complaints only.
+    """
+    if canteen_id is None:
+        rows = db.query(ComplaintCounter.status, ComplaintCounter.is_escalated, ComplaintCounter.count).all()
+    else:
+        rows = (
+            db.query(Complaint.status, Complaint.is_escalated, func.count(Complaint.id))
+            .filter(Complaint.order_id.in_(_canteen_order_ids(canteen_id)))
+            .group_by(Complaint.status, Complaint.is_escalated)
+            .all()
+        )
+    by_status = {}
+    escalated = 0
+    for status, is_escalated, count in rows:
+        status = status or "pending"
+        by_status[status] = by_status.get(status, 0) + count
+        if is_escalated:
+            escalated += count
+    return ComplaintCountsType(
+        total=sum(by_status.values()),
+        escalated=escalated,
+        byStatus=[ComplaintStatusCountType(status=k, count=v) for k, v in sorted(by_status.items())],
+    )
+
+
 @strawberry.type
 class ComplaintQueries:
+    @strawberry.field
+    def complaints(
+        self,
+        info: Info,
+        filter: Optional[ComplaintFilterInput] = None,
+        first: int = 20,
+        after: Optional[str] = None,
+    ) -> ComplaintConnection:
+        """
+        Complaint inbox, newest first, with keyset pagination: pass the previous
+        page's `pageInfo.endCursor` as `after`. Admins see every complaint;
+        canteen owners may list complaints for their own canteen. `counts`
+        cover the filtered canteen, or every complaint for an admin listing
+        all canteens.
+        """
+        db: Session = info.context["db"]
+        current_user = info.context.get("user")
+        if not current_user:
+            raise strawberry.GraphQLError("Authentication required.")
+        f = filter or ComplaintFilterInput()
+        if current_user.role != "admin":
+            if not owns_canteen(db, current_user, f.canteen_id):
+                raise strawberry.GraphQLError("Unauthorized: admins only, or canteen owners filtering by their canteen.")
+        if not 0 < first <= MAX_PAGE_SIZE:
+            raise strawberry.GraphQLError(f"first must be between 1 and {MAX_PAGE_SIZE}.")
+
+        # Rows without a creation time cannot be ordered or put in a cursor
+        # (migration 0013 backfills legacy ones).
+        q = db.query(Complaint).filter(Complaint.created_at.isnot(None))
+        if f.status is not None:
+            q = q.filter(Complaint.status == f.status)
+        if f.is_escalated is not None:
+            q = q.filter(Complaint.is_escalated == f.is_escalated)
+        if f.complaint_type is not None:
+            q = q.filter(Complaint.complaint_type == f.complaint_type)
+        if f.canteen_id is not None:
+            q = q.filter(Complaint.order_id.in_(_canteen_order_ids(f.canteen_id)))
+        try:
+            if f.created_from:
+                q = q.filter(Complaint.created_at >= datetime.fromisoformat(f.created_from))
+            if f.created_to:
+                q = q.filter(Complaint.created_at < datetime.fromisoformat(f.created_to))
+        except ValueError:
+            raise strawberry.GraphQLError("Invalid date format. Please use ISO 8601.")
+        if after:
+            q = q.filter(tuple_(Complaint.created_at, Complaint.id) < _decode_cursor(after))
+
+        # Fetch one extra row to learn whether another page exists.
+        rows = q.order_by(Complaint.created_at.desc(), Complaint.id.desc()).limit(first + 1).all()
+        page = rows[:first]
+        edges = [ComplaintEdge(cursor=_encode_cursor(c), node=convert_complaint_model_to_type(c)) for c in page]
+        return ComplaintConnection(
+            edges=edges,
+            pageInfo=ComplaintPageInfo(hasNextPage=len(rows) > first, endCursor=edges[-1].cursor if edges else None),
+            counts=_complaint_counts(db, f.canteen_id),
+        )
+
     @strawberry.field
     def get_all_complaints(self, info: Info) -> List[ComplaintType]:
         """Get all complaints."""
@@ -5,7 +5,11 @@ from strawberry.types import Info
 from sqlalchemy import desc
 from sqlalchemy.orm import Session
 
-from app.models.order import Order, OrderType, OrderItemType, Customizations, OrderItem
+from app.models.order import (
+    Order, OrderType, OrderItemType, Customizations, OrderItem,
+    ArchivedOrder, ArchivedOrderItem,
+)
+from app.helpers.partitions import find_frozen_order
 
 # Define a constant for active order statuses to avoid repetition and magic strings
 ACTIVE_ORDER_STATUSES = ["pending", "confirmed", "preparing", "ready"]
@@ -41,8 +45,8 @@ def _convert_item_data_to_type(item_data: Dict[str, Any]) -> OrderItemType:
     Supports both the legacy JSON-like representation and the SQLAlchemy
     `OrderItem` model instances stored via relationships.
     """
-    # If this is a SQLAlchemy OrderItem instance
-    if isinstance(item_data, OrderItem):
+    # If this is a SQLAlchemy OrderItem (live or archived) instance
+    if isinstance(item_data, (OrderItem, ArchivedOrderItem)):
         return OrderItemType(
             id=item_data.id,
             itemId=item_data.item_id,
@@ -64,7 +68,7 @@ def _convert_item_data_to_type(item_data: Dict[str, Any]) -> OrderItemType:
         note=item_data.get('note')
     )
 
-def _convert_order_model_to_type(order: Order) -> OrderType:
+def _convert_order_model_to_type(order: Order | ArchivedOrder) -> OrderType:
     """Converts an Order SQLAlchemy model to an OrderType, processing its related items.
 
     This maps the snake_case DB attributes to the camelCase GraphQL fields and
@@ -133,9 +137,13 @@ class OrderQueries:
 
     @strawberry.field
     def get_order_by_id(self, order_id: int, info: Info) -> Optional[OrderType]:
-        """Get a specific order by its ID."""
+        """Get a specific order by its ID, falling back to the archive and then the frozen tier for old orders."""
         db: Session = info.context["db"]
         order = db.query(Order).filter(Order.id == order_id).first()
+        if not order:
+            order = db.query(ArchivedOrder).filter(ArchivedOrder.id == order_id).first()
+        if not order:
+            order = find_frozen_order(db, order_id)
         return _convert_order_model_to_type(order) if order else None
 
     @strawberry.field
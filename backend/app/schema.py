@@ -8,6 +8,7 @@ from app.queries.order_queries import OrderQueries
 from app.queries.payment_queries import PaymentQueries
 from app.queries.user_queries import UserQueries
 from app.queries.admin_queries import AdminQueries
+from app.queries.analytics_queries import AnalyticsQueries
 
 from app.mutations.auth_mutations import AuthMutations
 from app.mutations.cart_mutations import CartMutations
@@ -17,6 +18,7 @@ from app.mutations.menu_mutations import MenuMutations
 from app.mutations.order_mutations import OrderMutations
 from app.mutations.user_mutations import UserMutations
 from app.mutations.admin_user_mutations import AdminUserMutations
+from app.mutations.wallet_mutations import WalletMutations
 
 @strawberry.type
 class Query(
@@ -28,6 +30,7 @@ class Query(
     UserQueries,
     PaymentQueries,
     AdminQueries,
+    AnalyticsQueries,
 ):
     """
     The root query type for the GraphQL schema.
@@ -46,6 +49,7 @@ class Mutation(
     OrderMutations,
     UserMutations,
     AdminUserMutations,
+    WalletMutations,
 ):
     """
     The root mutation type for the GraphQL schema.
@@ -64,6 +68,26 @@ import app.models.menu_item
 import app.models.cart
 import app.models.payment
 import app.models.complaints
+import app.models.sales
+
+from strawberry.extensions import QueryDepthLimiter
+
+from app.core.config import GRAPHQL_MAX_DEPTH, METRICS_ENABLED
+from app.helpers.metrics import metrics_extension
+from app.helpers.persisted_queries import document_cache
+from app.helpers.query_cost import query_cost_limiter
 
 # The final schema object that will be used by the GraphQL router.
-schema = strawberry.Schema(query=Query, mutation=Mutation)
+# document_cache skips re-parsing and re-validating documents seen before;
+# the depth and cost limits keep a single request from loading the database
+# wholesale (see app/helpers/query_cost.py). metrics_extension goes first so
+# its operation timing covers the others.
+extensions = [document_cache, QueryDepthLimiter(max_depth=GRAPHQL_MAX_DEPTH), query_cost_limiter]
+if METRICS_ENABLED:
+    extensions.insert(0, metrics_extension)
+
+schema = strawberry.Schema(
+    query=Query,
+    mutation=Mutation,
+    extensions=extensions,
+)
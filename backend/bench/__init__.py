@@ -0,0 +1,14 @@
+"""
+Benchmarks and load models for the backend helpers.
+
+They live outside `app/` so production modules carry no benchmark code and
+the Docker image (which copies only `app/`) never ships them. Run from
+`backend/`:
+
+    python -m bench.<module> [args]
+
+Benchmarks that need a database take a Postgres server from BENCH_DATABASE_URL
+and refuse to run without it. They create a throwaway database on it
+(bench/db.py), fill it with their own synthetic users and canteens, and drop
+it afterwards.
+"""
@@ -0,0 +1,78 @@
+"""
+Benchmark for app/helpers/analytics.py: folds synthetic order lines through
+`SalesAccumulator` and fails when peak traced memory exceeds the budget.
+
+    python -m bench.analytics [LINES] [BUDGET_MB]
+
+The accumulator's state is fixed-size, so peak memory is dominated by one
+chunk of columns and must not grow with the number of lines.
+"""
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+
+from app.helpers.analytics import DEFAULT_CHUNK_SIZE, SalesAccumulator, SalesSummary
+
+DEFAULT_LINES = 5_000_000
+# Peak traced memory allowed while aggregating, whatever the number of lines.
+MEMORY_BUDGET_MB = 32.0
+
+
+def synthetic_chunks(n_lines: int, chunk_size: int, start_epoch: int, span_seconds: int, seed: int = 7):
+    """Generates sorted synthetic order-line chunks (~2.5 lines per order)."""
+    rng = np.random.default_rng(seed)
+    next_order = 1
+    produced = 0
+    while produced < n_lines:
+        n = min(chunk_size, n_lines - produced)
+        # Enough orders to cover n lines, whatever the draw.
+        lines_per_order = rng.integers(1, 5, size=n)
+        order_ids = np.repeat(np.arange(next_order, next_order + len(lines_per_order)), lines_per_order)[:n]
+        next_order = int(order_ids[-1])  # the last order may continue in the next chunk
+        epochs_per_order = start_epoch + np.sort(rng.integers(0, span_seconds, size=len(lines_per_order)))
+        order_epochs = np.repeat(epochs_per_order, lines_per_order)[:n]
+        item_ids = rng.integers(1, 200, size=n)
+        quantities = rng.integers(1, 4, size=n)
+        line_totals = quantities * rng.choice([20.0, 40.0, 60.0, 90.0, 120.0, 150.0], size=n)
+        produced += n
+        yield order_ids, item_ids, quantities, line_totals, order_epochs
+
+
+def measure(n_lines: int, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """Aggregates `n_lines` synthetic lines. Returns (summary, seconds, peak traced bytes)."""
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    span = 90 * 86400
+    acc = SalesAccumulator(start_epoch=int(start.timestamp()), end_epoch=int(start.timestamp()) + span, granularity="hour")
+
+    tracemalloc.start()
+    try:
+        began = time.perf_counter()
+        for chunk in synthetic_chunks(n_lines, chunk_size, int(start.timestamp()), span):
+            acc.add_chunk(*chunk)
+        summary: SalesSummary = acc.finish()
+        elapsed = time.perf_counter() - began
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return summary, elapsed, peak
+
+
+def main(n_lines: int = DEFAULT_LINES, budget_mb: float = MEMORY_BUDGET_MB) -> None:
+    summary, elapsed, peak = measure(n_lines)
+    print(f"lines={n_lines:,} chunk={DEFAULT_CHUNK_SIZE:,} orders={summary.total_orders:,}")
+    print(f"elapsed={elapsed:.2f}s throughput={n_lines / elapsed:,.0f} lines/s "
+          f"peak_traced={peak / 1e6:.1f} MB (budget {budget_mb:.0f} MB)")
+    print(f"avg_basket={summary.average_basket_value:.2f} p50={summary.basket_percentiles['p50']:.2f} "
+          f"p99={summary.basket_percentiles['p99']:.2f} top_item={summary.top_items[0]}")
+    if peak > budget_mb * 1e6:
+        raise SystemExit(f"FAIL: peak traced memory {peak / 1e6:.1f} MB exceeds the {budget_mb:.0f} MB budget")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_LINES,
+        float(sys.argv[2]) if len(sys.argv) > 2 else MEMORY_BUDGET_MB,
+    )
@@ -0,0 +1,133 @@
+"""
+A local CAS stub server and a concurrency benchmark for
+app/helpers/cas_auth.py (no database needed): many logins at once, while a
+5 ms timer measures event loop lag, then replays of the same tickets.
+
+    python -m bench.cas_auth [LOGINS] [LATENCY_SECONDS]
+"""
+import asyncio
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from cas import CASClient
+
+from app.helpers.cas_auth import CasValidator
+
+SUCCESS_XML = """<cas:serviceResponse xmlns:cas="http://www.yale.edu/tp/cas">
+  <cas:authenticationSuccess>
+    <cas:user>{uid}</cas:user>
+    <cas:attributes>
+      <cas:uid>{uid}</cas:uid>
+      <cas:E-Mail>{uid}@students.example.edu</cas:E-Mail>
+      <cas:FirstName>Student {uid}</cas:FirstName>
+    </cas:attributes>
+  </cas:authenticationSuccess>
+</cas:serviceResponse>"""
+
+FAILURE_XML = """<cas:serviceResponse xmlns:cas="http://www.yale.edu/tp/cas">
+  <cas:authenticationFailure code="INVALID_TICKET">Ticket {ticket} not recognized</cas:authenticationFailure>
+</cas:serviceResponse>"""
+
+
+def start_stub_server(latency: float = 0.0, status: int = 200):
+    """
+    A threaded CAS stub that accepts each ST-<n> ticket exactly once, after
+    `latency` seconds, answering with HTTP `status`. Returns the server and its
+    request/connection counters.
+    """
+    lock = threading.Lock()
+    used = set()
+    counters = {"requests": 0, "connections": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive
+
+        def setup(self):
+            super().setup()
+            with lock:
+                counters["connections"] += 1
+
+        def do_GET(self):
+            ticket = parse_qs(urlparse(self.path).query).get("ticket", [""])[0]
+            time.sleep(latency)
+            with lock:
+                counters["requests"] += 1
+                fresh = ticket.startswith("ST-") and ticket not in used
+                used.add(ticket)
+            body = (SUCCESS_XML.format(uid=ticket[3:]) if fresh else FAILURE_XML.format(ticket=ticket)).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/xml")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, counters
+
+
+def stub_client(server) -> CASClient:
+    """A CAS 3 client pointed at a stub server."""
+    base = f"http://127.0.0.1:{server.server_address[1]}/cas/"
+    return CASClient(version=3, service_url="http://localhost/cas", server_url=base)
+
+
+async def _bench(validator: CasValidator, logins: int) -> None:
+    loop = asyncio.get_running_loop()
+    lags = []
+    done = asyncio.Event()
+
+    async def ticker() -> None:
+        # Measures how late a 5 ms timer fires while logins are in flight.
+        while not done.is_set():
+            due = loop.time() + 0.005
+            await asyncio.sleep(0.005)
+            lags.append(loop.time() - due)
+
+    async def login(n: int) -> float:
+        started = time.perf_counter()
+        identity = await validator.validate(f"ST-{n}")
+        assert identity and identity.attributes["uid"] == str(n)
+        return time.perf_counter() - started
+
+    tick = asyncio.create_task(ticker())
+    started = time.perf_counter()
+    latencies = sorted(await asyncio.gather(*(login(n) for n in range(logins))))
+    elapsed = time.perf_counter() - started
+    replays = await asyncio.gather(*(validator.validate(f"ST-{n}") for n in range(logins)))
+    done.set()
+    await tick
+
+    lags.sort()
+    print(
+        f"{logins} concurrent logins in {elapsed:.2f}s "
+        f"(p50 {latencies[len(latencies) // 2] * 1000:.0f} ms, p99 {latencies[int(len(latencies) * 0.99)] * 1000:.0f} ms); "
+        f"event loop lag p99 {lags[int(len(lags) * 0.99)] * 1000:.1f} ms"
+    )
+    print(f"replayed tickets rejected: {sum(r is None for r in replays)}/{logins}")
+
+
+def main(logins: int = 200, latency: float = 0.05) -> None:
+    server, counters = start_stub_server(latency)
+    validator = CasValidator(stub_client(server))
+    try:
+        asyncio.run(_bench(validator, logins))
+        print(f"stub server saw {counters['requests']} validation requests over {counters['connections']} connections")
+        print(validator.stats())
+    finally:
+        validator.close()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 200,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 0.05,
+    )
@@ -0,0 +1,56 @@
+"""
+Disposable databases for benchmarks and database tests: a throwaway database
+is created on the given Postgres server, filled with the app's tables and
+dropped again afterwards, so nothing ever touches a live database.
+"""
+import os
+import uuid
+from contextlib import contextmanager
+from typing import Iterator
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine, make_url
+
+import app.models.user  # noqa: F401  (register every table on Base.metadata)
+import app.models.canteen  # noqa: F401
+import app.models.order  # noqa: F401
+import app.models.menu_item  # noqa: F401
+import app.models.cart  # noqa: F401
+import app.models.payment  # noqa: F401
+import app.models.complaints  # noqa: F401
+import app.models.sales  # noqa: F401
+import app.models.rate_limit  # noqa: F401
+from app.core.database import Base
+
+BENCH_DATABASE_URL_ENV = "BENCH_DATABASE_URL"
+
+
+@contextmanager
+def disposable_database(server_url: str, prefix: str = "canteenx_bench", **engine_options) -> Iterator[Engine]:
+    """
+    Creates a uniquely named database on the server `server_url` points at
+    (any database the role can connect to), creates every table in it and
+    yields an engine bound to it. The database is dropped on exit.
+    """
+    url = make_url(server_url)
+    name = f"{prefix}_{uuid.uuid4().hex[:12]}"
+    admin = create_engine(url, isolation_level="AUTOCOMMIT")
+    with admin.connect() as conn:
+        conn.execute(text(f'CREATE DATABASE "{name}"'))
+    engine = create_engine(url.set(database=name), **engine_options)
+    try:
+        Base.metadata.create_all(engine)
+        yield engine
+    finally:
+        engine.dispose()
+        with admin.connect() as conn:
+            conn.execute(text(f'DROP DATABASE IF EXISTS "{name}" WITH (FORCE)'))
+        admin.dispose()
+
+
+def bench_database(**engine_options):
+    """A disposable database on the BENCH_DATABASE_URL server; exits when it is unset."""
+    server_url = os.getenv(BENCH_DATABASE_URL_ENV)
+    if not server_url:
+        raise SystemExit(f"Set {BENCH_DATABASE_URL_ENV} to a Postgres server (a disposable database is created on it).")
+    return disposable_database(server_url, **engine_options)
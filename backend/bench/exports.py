@@ -0,0 +1,55 @@
+"""
+Benchmark for the encoders in app/helpers/exports.py: streams synthetic
+export rows through the CSV or Parquet encoder (no database needed) and
+reports throughput, output size and peak RSS.
+
+    python -m bench.exports [ROWS] [csv|parquet] [gzip]
+"""
+import resource
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, List
+
+from app.helpers.exports import DEFAULT_CHUNK_SIZE, encode_csv, encode_parquet
+
+
+def synthetic_rows(n_rows: int, chunk_size: int) -> Iterator[List[tuple]]:
+    """Generates export-shaped rows in chunks, a few lines per order."""
+    base = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    produced = 0
+    while produced < n_rows:
+        rows = []
+        for i in range(produced, min(produced + chunk_size, n_rows)):
+            order_id = i // 3
+            price = float(20 + i % 180)
+            rows.append((
+                order_id, base + timedelta(seconds=order_id * 7), 1 + order_id % 20, f"user-{order_id % 5000}",
+                "completed", 300.0, 15.0, 0.0, 315.0, "upi", "Paid",
+                i, 100 + i % 400, f"Item {i % 400}", 1 + i % 3, price, price * (1 + i % 3),
+                order_id, "COMPLETED", 315.0, f"pay_{order_id}",
+            ))
+        produced += len(rows)
+        yield rows
+
+
+def main(n_rows: int = 1_000_000, fmt: str = "csv", compress: bool = False,
+         chunk_size: int = DEFAULT_CHUNK_SIZE) -> None:
+    began = time.perf_counter()
+    chunks = synthetic_rows(n_rows, chunk_size)
+    blocks = encode_parquet(chunks) if fmt == "parquet" else encode_csv(chunks, compress=compress)
+    total_bytes = sum(len(b) for b in blocks)
+    elapsed = time.perf_counter() - began
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # kB on Linux
+
+    print(f"rows={n_rows:,} format={fmt}{'+gzip' if compress else ''} chunk={chunk_size:,}")
+    print(f"elapsed={elapsed:.2f}s throughput={n_rows / elapsed:,.0f} rows/s "
+          f"output={total_bytes / 1e6:.1f} MB peak_rss={peak_rss_mb:.0f} MB")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000,
+        sys.argv[2] if len(sys.argv) > 2 else "csv",
+        compress=len(sys.argv) > 3 and sys.argv[3] == "gzip",
+    )
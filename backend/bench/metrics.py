@@ -0,0 +1,28 @@
+"""
+Overhead check for app/helpers/metrics.py: the cost of one histogram
+observation, and of rendering a histogram with 200 series.
+
+    python -m bench.metrics [OBSERVATIONS]
+"""
+import sys
+import time
+
+from app.helpers.metrics import Histogram
+
+
+def main(observations: int = 200000) -> None:
+    histogram = Histogram("bench_seconds", "bench", ("field",))
+    started = time.perf_counter()
+    for n in range(observations):
+        histogram.observe((n % 1000) / 1000.0, "Query.getMenuItems")
+    per_observation = (time.perf_counter() - started) / observations
+    for n in range(200):
+        histogram.observe(0.01, f"Query.field{n}")
+    started = time.perf_counter()
+    text = "\n".join(histogram.render())
+    print(f"observe: {per_observation * 1e9:.0f} ns; render of 200 series: "
+          f"{(time.perf_counter() - started) * 1000:.2f} ms, {len(text)} bytes")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
@@ -0,0 +1,88 @@
+"""
+Load test for app/helpers/passwords.py: measures the latency of cheap
+"non-auth requests" on the event loop during a burst of logins, with bcrypt
+run inline and through the PasswordHasher pool.
+
+    python -m bench.passwords [LOGINS]
+"""
+import asyncio
+import sys
+import time
+from dataclasses import asdict
+from typing import List
+
+from app.core.config import PASSWORD_HASH_MAX_PENDING, PASSWORD_HASH_WORKERS
+from app.helpers.exceptions import PasswordHasherBusyError
+from app.helpers.passwords import PasswordHasher, _hash, _noop, _verify
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def _login_burst(logins: int, use_pool: bool, hasher: PasswordHasher, stored: str) -> dict:
+    """
+    Fires `logins` verifications at once while a steady stream of cheap
+    "non-auth requests" (one every 5 ms) runs alongside. Each request's latency
+    is measured from when it was due to when it finished, which is what a
+    client would see if the loop were busy with bcrypt.
+    """
+    latencies: List[float] = []
+    done = asyncio.Event()
+
+    async def login() -> None:
+        if use_pool:
+            try:
+                await hasher.run(_verify, "password123", stored)
+            except PasswordHasherBusyError:
+                pass
+        else:
+            _verify("password123", stored)
+            await asyncio.sleep(0)
+
+    async def traffic() -> None:
+        loop = asyncio.get_running_loop()
+        due = loop.time() + 0.005
+        while not done.is_set():
+            await asyncio.sleep(max(0.0, due - loop.time()))
+            # Every request that arrived while the loop was busy is served now.
+            now = loop.time()
+            while due <= now:
+                latencies.append(now - due)
+                due += 0.005
+
+    started = time.perf_counter()
+    ticker = asyncio.create_task(traffic())
+    await asyncio.sleep(0.05)
+    await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await ticker
+    return {
+        "mode": "pool" if use_pool else "inline",
+        "logins": logins,
+        "seconds": round(elapsed, 2),
+        "requests": len(latencies),
+        "p50_ms": round(_percentile(latencies, 50) * 1000, 1),
+        "p99_ms": round(_percentile(latencies, 99) * 1000, 1),
+        "max_ms": round(max(latencies) * 1000, 1),
+    }
+
+
+def main(logins: int = 40) -> None:
+    hasher = PasswordHasher(workers=max(1, PASSWORD_HASH_WORKERS), max_pending=max(logins, PASSWORD_HASH_MAX_PENDING))
+    stored = _hash("password123")
+    hasher.warm_up()
+    try:
+        # Let the workers finish spawning before measuring.
+        hasher.run_sync(_noop)
+        for use_pool in (False, True):
+            print(asyncio.run(_login_burst(logins, use_pool, hasher, stored)))
+        print(asdict(hasher.stats()))
+    finally:
+        hasher.shutdown()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 40)
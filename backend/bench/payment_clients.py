@@ -0,0 +1,89 @@
+"""
+Benchmark for app/helpers/payment_clients.py: compares a fresh
+`razorpay.Client` per call with pooled registry clients for initiate + verify
+against a local HTTP stub of the gateway (no network needed).
+
+    python -m bench.payment_clients [CALLS]
+"""
+import hashlib
+import hmac
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import razorpay
+
+from app.helpers.payment_adapters import RazorpayAdapter
+from app.helpers.payment_clients import gateway_clients
+
+
+def _start_gateway_stub():
+    """Starts a keep-alive HTTP stub of the Razorpay order/payment endpoints on a free port."""
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body are written separately; avoid Nagle/delayed-ACK stalls on keep-alive.
+        disable_nagle_algorithm = True
+
+        def _reply(self, body: dict) -> None:
+            data = json.dumps(body).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            self._reply({"id": f"order_{time.perf_counter_ns()}", "amount": payload.get("amount", 0), "status": "created"})
+
+        def do_GET(self):
+            self._reply({"id": self.path.rsplit("/", 1)[-1], "status": "captured"})
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+def main(n_calls: int = 500) -> None:
+    """Compares per-call clients with pooled registry clients for initiate + verify against a local stub."""
+    key_id, secret = "rzp_test_bench", "bench_secret"
+    server, base_url = _start_gateway_stub()
+    os.environ["RAZORPAY_BASE_URL"] = base_url
+
+    def one_round(adapter: RazorpayAdapter) -> None:
+        order = adapter.process_payment({"amount": 120.0, "order_id": 1, "user_id": "u"})
+        payment_id = f"pay_{order.processor_order_id}"
+        signature = hmac.new(secret.encode(), f"{order.processor_order_id}|{payment_id}".encode(), hashlib.sha256).hexdigest()
+        adapter.verify_payment({
+            "razorpay_order_id": order.processor_order_id,
+            "razorpay_payment_id": payment_id,
+            "razorpay_signature": signature,
+        })
+
+    def measure(label: str, make_adapter) -> None:
+        samples = []
+        for _ in range(n_calls):
+            began = time.perf_counter()
+            one_round(make_adapter())
+            samples.append((time.perf_counter() - began) * 1000)
+        samples.sort()
+        pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))]
+        print(f"{label:<8} n={n_calls} p50={pick(0.50):.2f}ms p90={pick(0.90):.2f}ms p99={pick(0.99):.2f}ms")
+
+    try:
+        measure("fresh", lambda: RazorpayAdapter(
+            key_id, secret, client=razorpay.Client(auth=(key_id, secret), base_url=base_url)))
+        measure("pooled", lambda: RazorpayAdapter(key_id, secret, client=gateway_clients.get(key_id, secret)))
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,88 @@
+"""
+Benchmark for PaymentService.verify_payment: creates pending UPI payments
+(one order each) for a synthetic buyer and canteen whose merchant has
+placeholder keys (so MockRazorpayAdapter stands in for the gateway), verifies
+them concurrently and reports latency and throughput.
+
+    BENCH_DATABASE_URL=postgresql://... python -m bench.payment_verification [PAYMENTS] [CONCURRENCY]
+
+Everything runs in a disposable database (see bench/db.py).
+"""
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy.orm import sessionmaker
+
+from app.helpers.payment_service import PaymentService
+from app.helpers.sales_rollups import record_order_created
+from app.models.canteen import Canteen
+from app.models.order import Order
+from app.models.payment import Merchant, Payment, PaymentMethod
+from app.models.user import User
+from bench.db import bench_database
+
+
+def seed(db, n_payments: int):
+    """A synthetic buyer, canteen and mock merchant with `n_payments` pending payments; returns their refs."""
+    owner = User(id="bench-owner", name="Bench Owner", email="owner@bench.test", role="canteen")
+    buyer = User(id="bench-buyer", name="Bench Buyer", email="buyer@bench.test", role="student")
+    db.add_all([owner, buyer])
+    db.flush()
+    canteen = Canteen(name="Bench Canteen", user_id=owner.id)
+    db.add(canteen)
+    db.flush()
+    merchant = Merchant(canteen_id=canteen.id, name=canteen.name, razorpay_merchant_id="acc_bench",
+                        razorpay_key_id="rzp_test_YOUR_KEY_ID", razorpay_key_secret="YOUR_KEY_SECRET")
+    db.add(merchant)
+    db.flush()
+
+    refs = []
+    for _ in range(n_payments):
+        order = Order(user_id=buyer.id, canteen_id=canteen.id, total_amount=100.0, status="pending",
+                      payment_method="UPI", phone="9999999999")
+        db.add(order)
+        db.flush()
+        record_order_created(db, order)
+        ref = f"bench_order_{uuid.uuid4().hex[:16]}"
+        db.add(Payment(order_id=order.id, user_id=buyer.id, merchant_id=merchant.id, amount=100.0,
+                       payment_method=PaymentMethod.UPI, razorpay_order_id=ref))
+        refs.append(ref)
+    db.commit()
+    return refs
+
+
+def main(n_payments: int = 500, concurrency: int = 16) -> None:
+    with bench_database(pool_size=concurrency) as engine:
+        Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        db = Session()
+        try:
+            refs = seed(db, n_payments)
+        finally:
+            db.close()
+
+        def _verify(ref: str) -> float:
+            session = Session()
+            try:
+                began = time.perf_counter()
+                PaymentService(session).verify_payment(ref, {"razorpay_payment_id": f"pay_{ref}"})
+                return (time.perf_counter() - began) * 1000
+            finally:
+                session.close()
+
+        began = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = sorted(pool.map(_verify, refs))
+        elapsed = time.perf_counter() - began
+
+    pick = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+    print(f"verified={n_payments} concurrency={concurrency} in {elapsed:.2f}s = {n_payments / elapsed:,.0f}/s")
+    print(f"latency p50={pick(0.50):.1f}ms p90={pick(0.90):.1f}ms p99={pick(0.99):.1f}ms")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 500,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 16,
+    )
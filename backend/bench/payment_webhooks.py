@@ -0,0 +1,82 @@
+"""
+Load generator for `POST /api/payment/webhook`: sends signed
+`payment.captured` events (with ~10% redeliveries) and reports
+acknowledgement latency.
+
+    python -m bench.payment_webhooks URL [EVENTS] [CONCURRENCY]
+
+Every event refers to a synthetic gateway order (`order_bench_<n>`) that no
+payment has, so the webhook workers only log and skip them. Still, point URL
+at a local API backed by a disposable database: the events are queued there.
+"""
+import hashlib
+import hmac
+import json
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+import requests
+
+from app.helpers.payment_webhooks import WEBHOOK_SECRET_ENV
+
+
+def synthetic_events(n_events: int):
+    """(event id, body) pairs for synthetic captures, plus redeliveries of the first 10%."""
+    events = []
+    for i in range(n_events):
+        order_ref = f"order_bench_{i}"
+        body = json.dumps({
+            "event": "payment.captured",
+            "payload": {"payment": {"entity": {
+                "id": f"pay_bench_{i}", "order_id": order_ref, "status": "captured", "amount": 10000,
+            }}},
+        }).encode()
+        events.append((f"evt_{uuid.uuid4().hex}", body))
+    return events + events[: n_events // 10]
+
+
+def main(url: str, n_events: int = 2000, concurrency: int = 32, secret: Optional[str] = None) -> None:
+    secret = secret or os.getenv(WEBHOOK_SECRET_ENV)
+    if not secret:
+        raise SystemExit(f"Set {WEBHOOK_SECRET_ENV} to the secret the API was started with.")
+
+    events = synthetic_events(n_events)
+    session = requests.Session()
+    session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=concurrency))
+
+    def _send(event):
+        event_id, body = event
+        signature = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+        began = time.perf_counter()
+        resp = session.post(url, data=body, headers={
+            "Content-Type": "application/json",
+            "X-Razorpay-Signature": signature,
+            "X-Razorpay-Event-Id": event_id,
+        })
+        return resp.status_code, (time.perf_counter() - began) * 1000
+
+    began = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(_send, events))
+    elapsed = time.perf_counter() - began
+
+    latencies = sorted(ms for _, ms in results)
+    codes: Dict[int, int] = {}
+    for code, _ in results:
+        codes[code] = codes.get(code, 0) + 1
+    pick = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+    print(f"sent={len(events):,} ({len(events) - n_events} redeliveries) in {elapsed:.2f}s "
+          f"= {len(events) / elapsed:,.0f} req/s status={codes}")
+    print(f"ack latency p50={pick(0.50):.1f}ms p90={pick(0.90):.1f}ms p99={pick(0.99):.1f}ms")
+
+
+if __name__ == "__main__":
+    main(
+        sys.argv[1] if len(sys.argv) > 1 else "http://localhost:8000/api/payment/webhook",
+        int(sys.argv[2]) if len(sys.argv) > 2 else 2000,
+        int(sys.argv[3]) if len(sys.argv) > 3 else 32,
+    )
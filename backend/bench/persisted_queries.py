@@ -0,0 +1,52 @@
+"""
+Benchmark for app/helpers/persisted_queries.py: parse + validate for every
+document in the persisted query manifest against the real schema, the same
+lookups served from a warm DocumentCache, and the request body saved by
+sending the hash instead of the query.
+
+    python -m bench.persisted_queries [ROUNDS]
+"""
+import json
+import sys
+import time
+
+from graphql import parse, specified_rules
+from strawberry.schema.schema import validate_document
+
+from app.core.config import GRAPHQL_DOCUMENT_CACHE_SIZE
+from app.helpers.cache import TTLCache
+from app.helpers.persisted_queries import _FOREVER, _CachedDocument, registry
+from app.schema import schema
+
+
+def main(rounds: int = 200) -> None:
+    documents = list(registry._documents.values())
+    if not documents:
+        raise SystemExit("no documents in the manifest; run `python -m app.helpers.persisted_queries build` first")
+    rules = tuple(specified_rules)
+    cache = TTLCache(maxsize=GRAPHQL_DOCUMENT_CACHE_SIZE, ttl=_FOREVER)
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for query in documents:
+            document = parse(query)
+            validate_document(schema._schema, document, rules)
+            cache.set(query, _CachedDocument(document, validated=True))
+    cold = (time.perf_counter() - started) / (rounds * len(documents))
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for query in documents:
+            cache.get(query)
+    warm = (time.perf_counter() - started) / (rounds * len(documents))
+
+    query_bytes = sum(len(json.dumps({"query": q})) for q in documents) / len(documents)
+    hash_bytes = len(json.dumps({"extensions": {"persistedQuery": {"version": 1, "sha256Hash": "0" * 64}}}))
+    print(f"{len(documents)} documents, {rounds} rounds")
+    print(f"parse + validate: {cold * 1000:.3f} ms/request; cached: {warm * 1000:.4f} ms/request; "
+          f"saved {(cold - warm) * 1000:.3f} ms/request")
+    print(f"request body: {query_bytes:.0f} bytes with the query, {hash_bytes} bytes with the hash")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -0,0 +1,68 @@
+"""
+Cost report for app/helpers/query_cost.py: every Query field with every
+nested field selected, and the costliest documents in the persisted query
+manifest. tests/test_query_cost.py pins the per-field costs; run this after
+changing a weight or list size to see the new ones.
+
+    python -m bench.query_cost
+"""
+from graphql import GraphQLSchema, get_named_type, is_composite_type, is_non_null_type, parse
+from graphql.pyutils import Undefined
+
+from app.core.config import QUERY_COST_LIMIT, QUERY_COST_THROTTLE_THRESHOLD
+from app.helpers.persisted_queries import registry
+from app.helpers.query_cost import operation_cost
+from app.schema import schema
+
+
+def _required(arg) -> bool:
+    return is_non_null_type(arg.type) and arg.default_value is Undefined
+
+
+def _full_selection(named_type, depth: int) -> str:
+    """Every field of `named_type` down to `depth` levels, skipping fields with required arguments."""
+    fields = []
+    for name, field in named_type.fields.items():
+        if any(_required(arg) for arg in field.args.values()):
+            continue
+        child = get_named_type(field.type)
+        if is_composite_type(child):
+            if depth > 1 and hasattr(child, "fields"):
+                fields.append(f"{name} {{ {_full_selection(child, depth - 1)} }}")
+        else:
+            fields.append(name)
+    return " ".join(fields) or "__typename"
+
+
+def full_selection_query(graphql_schema: GraphQLSchema, name: str, depth: int = 4) -> str:
+    """A query for `Query.<name>` selecting every nested field down to `depth` levels."""
+    field = graphql_schema.query_type.fields[name]
+    child = get_named_type(field.type)
+    selection = f" {{ {_full_selection(child, depth)} }}" if is_composite_type(child) else ""
+    # Required arguments get a placeholder; only their presence matters here.
+    required = [(arg_name, arg) for arg_name, arg in field.args.items() if _required(arg)]
+    arguments = ", ".join(f"{arg_name}: $_{arg_name}" for arg_name, _ in required)
+    variables = ", ".join(f"$_{arg_name}: {arg.type}" for arg_name, arg in required)
+    return (
+        f"query Q{f'({variables})' if variables else ''} "
+        f"{{ {name}{f'({arguments})' if arguments else ''}{selection} }}"
+    )
+
+
+def main() -> None:
+    graphql_schema = schema._schema
+    print(f"limit {QUERY_COST_LIMIT:.0f}, throttle above {QUERY_COST_THROTTLE_THRESHOLD:.0f}\n")
+    print("Query fields, every nested field selected:")
+    for name in graphql_schema.query_type.fields:
+        _, cost = operation_cost(graphql_schema, parse(full_selection_query(graphql_schema, name)))
+        print(f"  {name:<24} {cost:>10.0f}")
+
+    documents = [operation_cost(graphql_schema, parse(query)) for query in registry._documents.values()]
+    if documents:
+        print("\nFrontend documents (costliest first):")
+        for name, cost in sorted(documents, key=lambda item: -item[1])[:15]:
+            print(f"  {name or '<anonymous>':<32} {cost:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Load test for app/helpers/rate_limit.py (no database needed). Drives a
+stand-in GraphQL endpoint directly over ASGI. Each request holds one of 7
+"DB connections" for 30 ms, with a 1 s checkout timeout, much like the real
+pool. One client floods searchMenuItems from `flood_concurrency` parallel
+loops. `good_clients` others each send a cheap query every 200 ms. The test
+runs with and without RateLimitMiddleware.
+
+    python -m bench.rate_limit [SECONDS]
+"""
+import asyncio
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+
+from app.core.config import GRAPHQL_QUEUE_TIMEOUT_SECONDS
+from app.helpers.middleware import RateLimitMiddleware
+from app.helpers.rate_limit import ConcurrencyGate, MemoryBucketStore, RateLimiter
+
+
+def main(seconds: float = 5.0, flood_concurrency: int = 100, good_clients: int = 20) -> None:
+    flood_body = json.dumps({"query": "query Search { searchMenuItems(query: \"a\") { id } }"}).encode()
+    good_body = json.dumps({"query": "query Menu { getMenuItems { id name } }"}).encode()
+
+    def build_app(protected: bool):
+        pool = threading.BoundedSemaphore(7)
+        executor = ThreadPoolExecutor(max_workers=64)
+        counters = {"pool_timeouts": 0}
+        app = FastAPI()
+
+        def query_db() -> bool:
+            if not pool.acquire(timeout=1.0):
+                counters["pool_timeouts"] += 1
+                return False
+            try:
+                time.sleep(0.03)
+                return True
+            finally:
+                pool.release()
+
+        @app.post("/api/graphql")
+        async def graphql_endpoint():
+            ok = await asyncio.get_running_loop().run_in_executor(executor, query_db)
+            return JSONResponse({"data": {}} if ok else {"errors": [{"message": "QueuePool timeout"}]}, status_code=200 if ok else 500)
+
+        if protected:
+            app.add_middleware(
+                RateLimitMiddleware,
+                limiter=RateLimiter(MemoryBucketStore()),
+                gate=ConcurrencyGate(limit=6, max_queued=32, queue_timeout=GRAPHQL_QUEUE_TIMEOUT_SECONDS),
+            )
+        return app, counters, executor
+
+    async def call(app, body: bytes, ip: str) -> int:
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+            "scheme": "http", "path": "/api/graphql", "raw_path": b"/api/graphql", "query_string": b"",
+            "root_path": "", "headers": [(b"content-type", b"application/json")],
+            "client": (ip, 50000), "server": ("testserver", 80),
+        }
+        delivered = False
+        status = 0
+
+        async def receive():
+            nonlocal delivered
+            if not delivered:
+                delivered = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await asyncio.sleep(3600)
+
+        async def send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+
+        await app(scope, receive, send)
+        return status
+
+    async def scenario(protected: bool) -> dict:
+        app, counters, executor = build_app(protected)
+        deadline = time.perf_counter() + seconds
+        good = {"ok": 0, "limited": 0, "error": 0, "latencies": []}
+        flood = {"ok": 0, "limited": 0, "error": 0}
+
+        async def flooder():
+            while time.perf_counter() < deadline:
+                status = await call(app, flood_body, "10.0.0.66")
+                flood["ok" if status == 200 else "limited" if status == 429 else "error"] += 1
+                if status == 429:
+                    # A real client gets its 429 after a network round trip.
+                    await asyncio.sleep(0.01)
+
+        async def good_client(n: int):
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                status = await call(app, good_body, f"10.0.1.{n}")
+                good["ok" if status == 200 else "limited" if status == 429 else "error"] += 1
+                good["latencies"].append(time.perf_counter() - started)
+                await asyncio.sleep(0.2)
+
+        await asyncio.gather(*(flooder() for _ in range(flood_concurrency)), *(good_client(n) for n in range(good_clients)))
+        executor.shutdown(wait=False)
+        latencies = sorted(good.pop("latencies"))
+        return {
+            "middleware": protected,
+            "good": good,
+            "good_p50_ms": round(latencies[len(latencies) // 2] * 1000),
+            "good_p99_ms": round(latencies[int(len(latencies) * 0.99)] * 1000),
+            "flood": flood,
+            "pool_timeouts": counters["pool_timeouts"],
+        }
+
+    for protected in (False, True):
+        print(asyncio.run(scenario(protected)))
+
+
+if __name__ == "__main__":
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 5.0)
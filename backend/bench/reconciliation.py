@@ -0,0 +1,106 @@
+"""
+Synthetic settlement reports and a benchmark for app/helpers/reconciliation.py
+(no database needed).
+
+    python -m bench.reconciliation bench [ROWS]
+    python -m bench.reconciliation generate OUT.csv [ROWS]
+
+`bench` generates ROWS fake settlements in memory and reconciles them against
+an in-memory lookup; `generate` writes a fake settlement file (payment ids
+`pay_<n>`, order ids `order_<n>`) for trying the reconcile command against a
+disposable database.
+"""
+import csv
+import io
+import random
+import resource
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Iterable, Iterator, TextIO
+
+from app.helpers.reconciliation import (
+    DEFAULT_CHUNK_SIZE, SETTLEMENT_COLUMNS, PaymentRecord, iter_settlement_rows, reconcile,
+)
+
+
+class InMemoryPaymentLookup:
+    """A `reconcile` lookup over preloaded records instead of the payments table."""
+
+    def __init__(self, records: Iterable[PaymentRecord]):
+        self.by_payment, self.by_order = {}, {}
+        for r in records:
+            if r.razorpay_payment_id:
+                self.by_payment[r.razorpay_payment_id] = r
+            if r.razorpay_order_id:
+                self.by_order[r.razorpay_order_id] = r
+
+    def fetch(self, payment_ids, order_ids):
+        return (
+            {p: self.by_payment[p] for p in payment_ids if p in self.by_payment},
+            {o: self.by_order[o] for o in order_ids if o in self.by_order},
+        )
+
+
+def fake_records(n: int, seed: int = 7) -> Iterator[PaymentRecord]:
+    rnd = random.Random(seed)
+    for i in range(n):
+        yield PaymentRecord(i + 1, f"order_{i:014d}", f"pay_{i:014d}", rnd.randrange(2_000, 80_000), "completed")
+
+
+def generate_settlement(out: TextIO, records: Iterable[PaymentRecord], discrepancy_rate: float = 0.01,
+                        seed: int = 11) -> int:
+    """
+    Writes a settlement CSV for `records`, settling each completed payment and
+    injecting amount mismatches, unknown payments and refunds at `discrepancy_rate`.
+    """
+    rnd = random.Random(seed)
+    writer = csv.writer(out)
+    writer.writerow(SETTLEMENT_COLUMNS)
+    settled_at = datetime.now(timezone.utc).replace(microsecond=0).isoformat()
+    written = 0
+    for r in records:
+        amount = r.amount_paise
+        roll = rnd.random()
+        if roll < discrepancy_rate / 3:
+            amount += rnd.choice((-100, 100))
+        elif roll < 2 * discrepancy_rate / 3:
+            writer.writerow([f"pay_unknown_{uuid.uuid4().hex[:12]}", "payment", f"order_unknown_{written}",
+                             amount, amount // 50, amount // 250, "setl_fake", settled_at])
+            written += 1
+        elif roll < discrepancy_rate:
+            writer.writerow([f"rfnd_{r.id}", "refund", r.razorpay_order_id, amount, 0, 0, "setl_fake", settled_at])
+            written += 1
+        writer.writerow([r.razorpay_payment_id or f"pay_settled_{r.id}", "payment", r.razorpay_order_id,
+                         amount, amount // 50, amount // 250, "setl_fake", settled_at])
+        written += 1
+    return written
+
+
+def main(n_rows: int = 1_000_000, chunk_size: int = DEFAULT_CHUNK_SIZE) -> None:
+    records = list(fake_records(n_rows))
+    buf = io.StringIO()
+    began = time.perf_counter()
+    generate_settlement(buf, records)
+    print(f"generated {n_rows:,} settlement rows ({len(buf.getvalue()) / 1e6:.0f} MB) in {time.perf_counter() - began:.2f}s")
+
+    buf.seek(0)
+    report = io.StringIO()
+    summary = reconcile(iter_settlement_rows(buf), InMemoryPaymentLookup(records), report=report,
+                        chunk_size=chunk_size)
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # kB on Linux
+    print(summary)
+    print(f"peak_rss={peak_rss_mb:.0f} MB (includes the in-memory file and lookup)")
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "bench"
+    if command == "bench":
+        main(int(sys.argv[2]) if len(sys.argv) > 2 else 1_000_000)
+    elif command == "generate" and len(sys.argv) > 2:
+        with open(sys.argv[2], "w", newline="", encoding="utf-8") as out:
+            written = generate_settlement(out, fake_records(int(sys.argv[3]) if len(sys.argv) > 3 else 1_000_000))
+        print(f"wrote {written:,} rows to {sys.argv[2]}")
+    else:
+        raise SystemExit(__doc__)
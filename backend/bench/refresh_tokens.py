@@ -0,0 +1,65 @@
+"""
+Load model for app/helpers/refresh_tokens.py: a week of campus traffic, with
+logins per hour when access tokens simply expire and when they are refreshed.
+
+Each user visits around meal times, stays active for a few minutes, and makes
+a request every ~30 s. Without refresh, any request more than
+ACCESS_TOKEN_EXPIRE_MINUTES after the last login needs a fresh login. With
+rotation it needs a refresh call instead, and a login only once the refresh
+token has lapsed.
+
+    python -m bench.refresh_tokens [USERS]
+"""
+import random
+import sys
+
+from app.core.config import ACCESS_TOKEN_EXPIRE_MINUTES, REFRESH_TOKEN_EXPIRE_DAYS
+
+
+def main(users: int = 2000, days: int = 7, seed: int = 7) -> None:
+    rng = random.Random(seed)
+    access_ttl = ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    refresh_ttl = REFRESH_TOKEN_EXPIRE_DAYS * 86400
+    meal_windows = [(8, 10), (12, 14), (16, 17), (19, 21)]
+    hours = days * 24
+    logins_without = [0] * hours
+    logins_with = [0] * hours
+    refreshes = [0] * hours
+
+    for _ in range(users):
+        requests = []
+        for day in range(days):
+            for start_h, end_h in meal_windows:
+                if rng.random() < 0.6:
+                    t = day * 86400 + rng.uniform(start_h, end_h) * 3600
+                    for _ in range(rng.randint(5, 60)):
+                        requests.append(t)
+                        t += rng.expovariate(1 / 30)
+        requests.sort()
+
+        access_at = None  # when the current access token was issued (both scenarios)
+        login_at = None
+        session_at = None  # last login or refresh, for the refresh token's sliding expiry
+        for t in requests:
+            hour = min(int(t // 3600), hours - 1)
+            if login_at is None or t - login_at > access_ttl:
+                logins_without[hour] += 1
+                login_at = t
+            if access_at is None or t - access_at > access_ttl:
+                if session_at is None or t - session_at > refresh_ttl:
+                    logins_with[hour] += 1
+                else:
+                    refreshes[hour] += 1
+                access_at = session_at = t
+
+    def peak_and_mean(series):
+        return max(series), sum(series) / len(series)
+
+    for label, series in (("logins (no refresh)", logins_without), ("logins (with refresh)", logins_with), ("refreshes", refreshes)):
+        peak, mean = peak_and_mean(series)
+        print(f"{label:>22}: peak {peak:6d}/h  mean {mean:8.1f}/h  total {sum(series)}")
+
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
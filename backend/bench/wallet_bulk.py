@@ -0,0 +1,59 @@
+"""
+Benchmark for app/helpers/wallet_bulk.py: credits synthetic users in one bulk
+batch and compares the rate with one-at-a-time ledger credits (one commit
+each).
+
+    BENCH_DATABASE_URL=postgresql://... python -m bench.wallet_bulk [CREDITS] [SERIAL]
+
+Everything runs in a disposable database (see bench/db.py).
+"""
+import sys
+import time
+
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from app.helpers.payment_repository import WalletRepository
+from app.helpers.wallet_bulk import CreditRequest, bulk_credit
+from bench.db import bench_database
+
+
+def main(n_credits: int = 10_000, n_serial: int = 500) -> None:
+    with bench_database() as engine:
+        db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+        try:
+            db.execute(
+                text(
+                    """
+                    INSERT INTO users (id, name, email, password, role)
+                    SELECT 'bench-' || g, 'bench-' || g, 'bench-' || g || '@bench.invalid', 'x', 'student'
+                    FROM generate_series(1, :n) g
+                    """
+                ),
+                {"n": n_credits},
+            )
+            db.commit()
+
+            requests = [CreditRequest(i, f"bench-{i}", 5000, "Bench credit") for i in range(1, n_credits + 1)]
+            began = time.perf_counter()
+            summary = bulk_credit(db, requests)
+            db.commit()
+            bulk_elapsed = time.perf_counter() - began
+            print(f"bulk:   {summary.credited:,} credits in {bulk_elapsed:.2f}s = {summary.credited / bulk_elapsed:,.0f}/s")
+
+            repo = WalletRepository(db)
+            wallet_ids = [r.wallet_id for r in summary.rows[:n_serial]]
+            began = time.perf_counter()
+            for wallet_id in wallet_ids:
+                repo.credit(wallet_id, 5000, "Bench credit (serial)")
+            serial_elapsed = time.perf_counter() - began
+            print(f"serial: {len(wallet_ids):,} credits in {serial_elapsed:.2f}s = {len(wallet_ids) / serial_elapsed:,.0f}/s")
+        finally:
+            db.close()
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 10_000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 500,
+    )
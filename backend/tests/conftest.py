@@ -0,0 +1,44 @@
+"""
+Shared fixtures. Database tests run against a throwaway Postgres database
+created on the server named by TEST_DATABASE_URL (any database the role can
+connect to, e.g. postgresql://postgres@localhost/postgres) and dropped at the
+end of the session; they are skipped when it is unset.
+"""
+import os
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base
+from bench.db import disposable_database
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+
+@pytest.fixture(scope="session")
+def db_engine():
+    """An engine bound to a freshly created, disposable database."""
+    if not TEST_DATABASE_URL:
+        pytest.skip("Set TEST_DATABASE_URL to a Postgres server to run database tests.")
+    with disposable_database(TEST_DATABASE_URL, prefix="canteenx_test") as engine:
+        yield engine
+
+
+@pytest.fixture
+def session_factory(db_engine):
+    """Opens further sessions on the test database (e.g. to play a concurrent writer)."""
+    return sessionmaker(autocommit=False, autoflush=False, bind=db_engine)
+
+
+@pytest.fixture
+def db(db_engine, session_factory):
+    """A session on the disposable database; every table is emptied afterwards."""
+    session = session_factory()
+    try:
+        yield session
+    finally:
+        session.close()
+        tables = ", ".join(t.name for t in Base.metadata.sorted_tables)
+        with db_engine.begin() as conn:
+            conn.execute(text(f"TRUNCATE {tables} RESTART IDENTITY CASCADE"))
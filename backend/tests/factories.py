@@ -0,0 +1,54 @@
+"""Synthetic rows for database tests: users, canteens, merchants, orders and payments."""
+import uuid
+from datetime import datetime, timezone
+
+from sqlalchemy.orm import Session
+
+from app.models.canteen import Canteen
+from app.models.order import Order
+from app.models.payment import Merchant, Payment, PaymentMethod, PaymentStatus
+from app.models.user import User
+
+
+def make_user(db: Session, **fields) -> User:
+    user_id = fields.pop("id", f"test-{uuid.uuid4().hex[:10]}")
+    user = User(id=user_id, name="Test User", email=f"{user_id}@example.test", role="student", **fields)
+    db.add(user)
+    db.flush()
+    return user
+
+
+def make_canteen(db: Session, owner: User, **fields) -> Canteen:
+    canteen = Canteen(name=fields.pop("name", "Test Canteen"), user_id=owner.id, **fields)
+    db.add(canteen)
+    db.flush()
+    merchant = Merchant(
+        canteen_id=canteen.id, name=canteen.name, razorpay_merchant_id=f"acc_{canteen.id}",
+        # Placeholder keys route UPI payments to MockRazorpayAdapter.
+        razorpay_key_id="rzp_test_YOUR_KEY_ID", razorpay_key_secret="YOUR_KEY_SECRET",
+    )
+    db.add(merchant)
+    db.flush()
+    return canteen
+
+
+def make_order(db: Session, user: User, canteen: Canteen, total: float = 100.0, **fields) -> Order:
+    order = Order(
+        user_id=user.id, canteen_id=canteen.id, total_amount=total, subtotal=total, tax=0.0,
+        order_time=fields.pop("order_time", datetime.now(timezone.utc)), payment_method="upi", **fields,
+    )
+    db.add(order)
+    db.flush()
+    return order
+
+
+def make_payment(db: Session, order: Order, method: PaymentMethod = PaymentMethod.UPI,
+                 status: PaymentStatus = PaymentStatus.PENDING, **fields) -> Payment:
+    merchant = db.query(Merchant).filter(Merchant.canteen_id == order.canteen_id).one()
+    payment = Payment(
+        order_id=order.id, user_id=order.user_id, merchant_id=merchant.id, amount=order.total_amount,
+        payment_method=method, payment_status=status, **fields,
+    )
+    db.add(payment)
+    db.flush()
+    return payment
@@ -0,0 +1,39 @@
+"""SalesAccumulator results against a plain-Python reference, and its memory budget."""
+from collections import defaultdict
+
+import numpy as np
+
+from app.helpers.analytics import SalesAccumulator
+from bench.analytics import MEMORY_BUDGET_MB, measure, synthetic_chunks
+
+START = 1_767_225_600  # 2026-01-01T00:00:00Z
+SPAN = 7 * 86400
+
+
+def test_accumulator_matches_reference_across_chunk_boundaries():
+    chunks = list(synthetic_chunks(5_000, 333, START, SPAN, seed=3))
+    acc = SalesAccumulator(start_epoch=START, end_epoch=START + SPAN, granularity="day", top_n=5)
+    for chunk in chunks:
+        acc.add_chunk(*chunk)
+    summary = acc.finish()
+
+    order_ids, item_ids, quantities, line_totals, _ = (np.concatenate(cols) for cols in zip(*chunks))
+    per_item = defaultdict(lambda: [0, 0.0])
+    for item_id, quantity, total in zip(item_ids.tolist(), quantities.tolist(), line_totals.tolist()):
+        per_item[item_id][0] += quantity
+        per_item[item_id][1] += total
+
+    assert summary.total_orders == len(np.unique(order_ids))
+    assert summary.total_items == int(quantities.sum())
+    assert np.isclose(summary.gross_revenue, line_totals.sum())
+    assert np.isclose(summary.average_basket_value, line_totals.sum() / len(np.unique(order_ids)))
+    assert sum(map(sum, summary.heatmap)) == summary.total_items
+    assert sum(orders for _, orders, _, _ in summary.series) == summary.total_orders
+    best_item, (best_quantity, _) = max(per_item.items(), key=lambda kv: kv[1][0])
+    assert summary.top_items[0][0] == best_item and summary.top_items[0][1] == best_quantity
+
+
+def test_five_million_lines_stay_within_the_memory_budget():
+    summary, _, peak = measure(5_000_000)
+    assert summary.total_items > 0
+    assert peak <= MEMORY_BUDGET_MB * 1e6
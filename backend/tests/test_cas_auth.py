@@ -0,0 +1,91 @@
+"""CAS ticket validation against a local CAS stub, and user provisioning under concurrent first logins."""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.helpers.cas_auth import CasValidator, provision_user
+from app.helpers.exceptions import CasUnavailableError
+from app.models.user import User
+from bench.cas_auth import start_stub_server, stub_client
+
+POOL_SIZE = 8
+
+
+@pytest.fixture
+def stub():
+    server, counters = start_stub_server(latency=0.01)
+    yield server, counters
+    server.shutdown()
+
+
+@pytest.fixture
+def validator(stub):
+    server, _ = stub
+    validator = CasValidator(stub_client(server), pool_size=POOL_SIZE)
+    yield validator
+    validator.close()
+
+
+def _validate_all(validator, tickets):
+    async def run():
+        return await asyncio.gather(*(validator.validate(t) for t in tickets))
+    return asyncio.run(run())
+
+
+def test_concurrent_logins_share_the_connection_pool(stub, validator):
+    _, counters = stub
+    identities = _validate_all(validator, [f"ST-{n}" for n in range(64)])
+
+    assert [i.attributes["uid"] for i in identities] == [str(n) for n in range(64)]
+    assert identities[5].attributes["E-Mail"] == "5@students.example.edu"
+    assert counters["requests"] == 64
+    assert counters["connections"] <= POOL_SIZE
+
+
+def test_spent_and_rejected_tickets_skip_the_server(stub, validator):
+    _, counters = stub
+    assert _validate_all(validator, ["ST-1", "bogus"])[1] is None
+    assert counters["requests"] == 2
+
+    assert _validate_all(validator, ["ST-1", "bogus", "ST-1", ""]) == [None, None, None, None]
+    assert counters["requests"] == 2
+
+
+def test_server_error_is_reported_as_unavailable():
+    server, _ = start_stub_server(status=503)
+    validator = CasValidator(stub_client(server), pool_size=2)
+    try:
+        with pytest.raises(CasUnavailableError):
+            _validate_all(validator, ["ST-1"])
+    finally:
+        validator.close()
+        server.shutdown()
+
+
+def test_slow_server_times_out():
+    server, _ = start_stub_server(latency=0.5)
+    validator = CasValidator(stub_client(server), pool_size=2, timeout=(0.5, 0.05))
+    try:
+        with pytest.raises(CasUnavailableError):
+            _validate_all(validator, ["ST-1"])
+    finally:
+        validator.close()
+        server.shutdown()
+
+
+def test_concurrent_first_logins_create_one_user(db, session_factory):
+    def login(_):
+        session = session_factory()
+        try:
+            user = provision_user(session, "cas-42", "42@students.example.edu", "Student 42")
+            session.commit()
+            return user.id
+        finally:
+            session.close()
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        user_ids = set(pool.map(login, range(16)))
+
+    assert user_ids == {"cas-42"}
+    assert db.query(User).filter(User.email == "42@students.example.edu").count() == 1
@@ -0,0 +1,42 @@
+"""Export statements stream tier by tier, and the encoders round-trip chunked rows."""
+import csv
+import gzip
+import io
+
+import pyarrow.parquet as pq
+
+from app.helpers.exports import EXPORT_COLUMNS, _export_queries, encode_csv, encode_parquet
+from bench.exports import synthetic_rows
+
+
+def test_each_tier_is_its_own_ordered_statement():
+    for canteen_id in (None, 3):
+        statements = _export_queries(canteen_id)
+        assert len(statements) == 3
+        for sql in statements:
+            assert "UNION" not in sql
+            assert "ORDER BY" in sql and "ORDER BY 2" not in sql
+            assert (":canteen_id" in sql) == (canteen_id is not None)
+        frozen, archived, live = statements
+        assert "order_archive_chunks" in frozen
+        assert "orders_archive o" in archived
+        assert "FROM orders o" in live
+
+
+def test_csv_round_trips_through_gzip():
+    chunks = list(synthetic_rows(1_000, 300))
+    blocks = list(encode_csv(chunks, compress=True))
+    rows = list(csv.reader(io.StringIO(gzip.decompress(b"".join(blocks)).decode("utf-8"))))
+
+    assert rows[0] == [name for name, _ in EXPORT_COLUMNS]
+    assert len(rows) == 1 + 1_000
+    assert [int(r[11]) for r in rows[1:]] == list(range(1_000))
+
+
+def test_parquet_writes_one_row_group_per_chunk():
+    blocks = list(encode_parquet(synthetic_rows(1_000, 300)))
+    parquet = pq.ParquetFile(io.BytesIO(b"".join(blocks)))
+
+    assert parquet.metadata.num_rows == 1_000
+    assert parquet.metadata.num_row_groups == 4
+    assert parquet.schema_arrow.names == [name for name, _ in EXPORT_COLUMNS]
@@ -0,0 +1,72 @@
+"""PaymentService.verify_payment against a disposable database, including races with the webhook."""
+from types import SimpleNamespace
+
+import pytest
+
+from app.helpers import payment_service
+from app.helpers.payment_adapters import PaymentVerificationError
+from app.helpers.payment_service import PaymentService
+from app.models.order import Order
+from app.models.payment import Payment, PaymentStatus
+from tests.factories import make_canteen, make_order, make_payment, make_user
+
+
+@pytest.fixture
+def pending(db):
+    owner = make_user(db, role="canteen")
+    canteen = make_canteen(db, owner)
+    buyer = make_user(db)
+    order = make_order(db, buyer, canteen, total=80.0)
+    payment = make_payment(db, order, razorpay_order_id=f"order_test_{order.id}")
+    db.commit()
+    return SimpleNamespace(order_id=order.id, payment_id=payment.id, order_ref=payment.razorpay_order_id)
+
+
+class _RacingProcessor:
+    """Completes the payment from another session (as the webhook would), then fails verification."""
+
+    def __init__(self, session_factory, payment_id):
+        self.session_factory = session_factory
+        self.payment_id = payment_id
+
+    def verify_payment(self, verification_data):
+        other = self.session_factory()
+        try:
+            other.get(Payment, self.payment_id).payment_status = PaymentStatus.COMPLETED
+            other.commit()
+        finally:
+            other.close()
+        raise PaymentVerificationError("Signature mismatch.")
+
+
+def test_verification_completes_payment_and_confirms_order(db, pending):
+    payment = PaymentService(db).verify_payment(pending.order_ref, {"razorpay_payment_id": "pay_ok"})
+
+    assert payment.payment_status == PaymentStatus.COMPLETED
+    assert payment.razorpay_payment_id == "pay_ok"
+    order = db.get(Order, pending.order_id)
+    assert (order.status, order.payment_status) == ("confirmed", "Paid")
+
+
+def test_failed_verification_marks_the_payment_failed(db, pending, monkeypatch):
+    class _Failing:
+        def verify_payment(self, verification_data):
+            raise PaymentVerificationError("Signature mismatch.")
+
+    monkeypatch.setattr(payment_service, "get_payment_processor", lambda *a, **kw: _Failing())
+    with pytest.raises(PaymentVerificationError):
+        PaymentService(db).verify_payment(pending.order_ref, {"razorpay_payment_id": "pay_bad"})
+
+    db.expire_all()
+    assert db.get(Payment, pending.payment_id).payment_status == PaymentStatus.FAILED
+
+
+def test_failed_verification_keeps_a_payment_the_webhook_completed(db, session_factory, pending, monkeypatch):
+    racing = _RacingProcessor(session_factory, pending.payment_id)
+    monkeypatch.setattr(payment_service, "get_payment_processor", lambda *a, **kw: racing)
+
+    payment = PaymentService(db).verify_payment(pending.order_ref, {"razorpay_payment_id": "pay_bad"})
+
+    assert payment.payment_status == PaymentStatus.COMPLETED
+    db.expire_all()
+    assert db.get(Payment, pending.payment_id).payment_status == PaymentStatus.COMPLETED
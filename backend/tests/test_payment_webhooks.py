@@ -0,0 +1,104 @@
+"""Webhook queueing and application: dedupe, amount checks and late captures."""
+import hashlib
+import hmac
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from app.helpers.payment_webhooks import _decisive_events, enqueue_event, process_batch, verify_signature
+from app.models.order import Order
+from app.models.payment import Payment, PaymentStatus, PaymentWebhookEvent, RefundRequest
+from tests.factories import make_canteen, make_order, make_payment, make_user
+
+
+def _body(event: str, order_ref: str, payment_ref: str, amount_paise: int) -> bytes:
+    return json.dumps({
+        "event": event,
+        "payload": {"payment": {"entity": {
+            "id": payment_ref, "order_id": order_ref, "amount": amount_paise, "status": "captured",
+        }}},
+    }).encode()
+
+
+def test_signature_is_hmac_of_the_raw_body():
+    body = b'{"event": "payment.captured"}'
+    signature = hmac.new(b"secret", body, hashlib.sha256).hexdigest()
+    assert verify_signature(body, signature, secret="secret")
+    assert not verify_signature(body + b" ", signature, secret="secret")
+    assert not verify_signature(body, None, secret="secret")
+
+
+@pytest.mark.parametrize("event_id", [None, ""])
+def test_events_without_an_id_are_rejected(event_id):
+    with pytest.raises(ValueError):
+        enqueue_event(None, _body("payment.captured", "order_1", "pay_1", 100), event_id)
+
+
+def test_a_capture_beats_a_failure_for_the_same_payment():
+    failed = SimpleNamespace(event_type="payment.failed", razorpay_payment_id="pay_1")
+    captured = SimpleNamespace(event_type="payment.captured", razorpay_payment_id="pay_1")
+    assert _decisive_events([captured, failed])["pay_1"] is captured
+    assert _decisive_events([failed, captured])["pay_1"] is captured
+
+
+# ---------------------------------------------------------------------------
+# Against a disposable database
+# ---------------------------------------------------------------------------
+
+@pytest.fixture
+def pending(db):
+    """A synthetic buyer with a pending ₹120 gateway payment."""
+    owner = make_user(db, role="canteen")
+    canteen = make_canteen(db, owner)
+    buyer = make_user(db)
+    order = make_order(db, buyer, canteen, total=120.0)
+    payment = make_payment(db, order, razorpay_order_id=f"order_test_{order.id}")
+    db.commit()
+    return SimpleNamespace(order_id=order.id, payment_id=payment.id, order_ref=payment.razorpay_order_id)
+
+
+def test_capture_confirms_the_order_once(db, pending):
+    body = _body("payment.captured", pending.order_ref, "pay_test_1", 12000)
+    assert enqueue_event(db, body, "evt_1") is True
+    assert enqueue_event(db, body, "evt_1") is False  # redelivery
+
+    assert process_batch(db) == 1
+    db.expire_all()
+    assert db.get(Payment, pending.payment_id).payment_status == PaymentStatus.COMPLETED
+    order = db.get(Order, pending.order_id)
+    assert (order.status, order.payment_status) == ("confirmed", "Paid")
+
+
+def test_capture_with_a_different_amount_is_parked(db, pending):
+    enqueue_event(db, _body("payment.captured", pending.order_ref, "pay_test_2", 100), "evt_2")
+
+    process_batch(db)
+    db.expire_all()
+    assert db.get(Payment, pending.payment_id).payment_status == PaymentStatus.PENDING
+    assert db.get(Order, pending.order_id).status == "pending"
+    event = db.query(PaymentWebhookEvent).filter_by(event_id="evt_2").one()
+    assert event.status == "failed" and "does not match" in event.last_error
+
+
+def test_capture_after_cancellation_queues_a_refund(db, pending):
+    db.get(Order, pending.order_id).status = "cancelled"
+    db.commit()
+    enqueue_event(db, _body("payment.captured", pending.order_ref, "pay_test_3", 12000), "evt_3")
+
+    process_batch(db)
+    db.expire_all()
+    assert db.get(Payment, pending.payment_id).payment_status == PaymentStatus.COMPLETED
+    order = db.get(Order, pending.order_id)
+    assert (order.status, order.payment_status) == ("cancelled", "Refund Pending")
+    refund = db.query(RefundRequest).filter_by(payment_id=pending.payment_id).one()
+    assert refund.amount_paise == 12000 and refund.status == "pending"
+
+
+def test_failure_never_overrides_a_capture_in_the_same_batch(db, pending):
+    enqueue_event(db, _body("payment.captured", pending.order_ref, "pay_test_4", 12000), "evt_4")
+    enqueue_event(db, _body("payment.failed", pending.order_ref, "pay_test_4", 12000), "evt_5")
+
+    assert process_batch(db) == 2
+    db.expire_all()
+    assert db.get(Payment, pending.payment_id).payment_status == PaymentStatus.COMPLETED
@@ -0,0 +1,210 @@
+"""Cost estimates per Query field and QueryCostLimiter's reject/throttle behaviour."""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from graphql import parse
+from starlette.requests import Request
+
+from app.helpers import query_cost, rate_limit
+from app.helpers.query_cost import QueryCostLimiter, operation_cost
+from app.schema import schema
+from bench.query_cost import full_selection_query
+
+GRAPHQL_SCHEMA = schema._schema
+
+# Cost of every Query field with every nested field selected (`python -m
+# bench.query_cost`). Update deliberately when weights, list
+# sizes or types change.
+FULL_SELECTION_COSTS = {
+    "getAllCanteens": 40,
+    "getCanteenById": 2,
+    "getOpenCanteens": 40,
+    "searchCanteens": 120,
+    "getCartByUserId": 21,
+    "complaints": 52,
+    "getAllComplaints": 500,
+    "getComplaintById": 1,
+    "getComplaintsByUserId": 20,
+    "getComplaintsByOrderId": 5,
+    "getMenuItems": 6600,
+    "getMenuItemsByCanteen": 1100,
+    "getFeaturedMenuItems": 440,
+    "getPopularMenuItems": 440,
+    "searchMenuItems": 1550,
+    "getAllOrders": 1600,
+    "getActiveOrders": 160,
+    "getOrderById": 16,
+    "getCanteenOrders": 16000,
+    "getCanteenActiveOrders": 800,
+    "getUserById": 1,
+    "getUserByEmail": 1,
+    "getUsersByRole": 500,
+    "searchUsers": 500,
+    "getCurrentUser": 1,
+    "getPaymentById": 1,
+    "getUserPaymentHistory": 100,
+    "getCanteenStats": 400,
+    "getCanteenSalesStats": 1000,
+    "getCanteenDetail": 1147,
+    "salesAnalytics": 136,
+}
+
+
+def _cost(query: str, variables: dict = None) -> float:
+    return operation_cost(GRAPHQL_SCHEMA, parse(query), variables=variables)[1]
+
+
+def test_every_query_field_has_a_pinned_cost():
+    assert set(GRAPHQL_SCHEMA.query_type.fields) == set(FULL_SELECTION_COSTS)
+
+
+@pytest.mark.parametrize("field_name, expected", sorted(FULL_SELECTION_COSTS.items()))
+def test_full_selection_cost(field_name, expected):
+    assert _cost(full_selection_query(GRAPHQL_SCHEMA, field_name)) == expected
+
+
+def test_full_selection_costs_stay_under_the_limit():
+    assert max(FULL_SELECTION_COSTS.values()) <= query_cost.QUERY_COST_LIMIT
+
+
+def test_scalar_only_selection_costs_the_field_weight():
+    # 100 rows of a plain object field with only scalars selected.
+    assert _cost("{ getAllOrders(userId: \"u\") { id status } }") == 100
+    # A weighted aggregate pays its weight per expected row.
+    assert _cost("{ searchMenuItems(query: \"tea\") { id } }") == 50 * 10
+
+
+def test_first_variable_sizes_complaint_edges():
+    query = "query Q($n: Int) { complaints(first: $n) { edges { node { id } } } }"
+    # connection (1) + n edges * (edge 1 + node 1)
+    assert _cost(query, {"n": 5}) == 1 + 5 * 2
+    assert _cost(query, {"n": 200}) == 1 + 200 * 2
+    # Omitted variable falls back to the argument's default.
+    default_first = GRAPHQL_SCHEMA.query_type.fields["complaints"].args["first"].default_value
+    assert _cost(query, {}) == 1 + default_first * 2
+
+
+def test_canteen_detail_page_variables_size_nested_lists():
+    menu = "query Q($m: Int) { getCanteenDetail(canteenId: 1, menuLimit: $m) { menuItems { id } } }"
+    complaints = "query Q($c: Int) { getCanteenDetail(canteenId: 1, complaintLimit: $c) { complaints { id } } }"
+    # getCanteenDetail weighs 5; each menu item / complaint row costs 1.
+    assert _cost(menu, {"m": 10}) == 5 + 10
+    assert _cost(menu, {"m": 1000}) == 5 + 1000
+    assert _cost(complaints, {"c": 3}) == 5 + 3
+    # A page size of zero still costs one row.
+    assert _cost(menu, {"m": 0}) == 5 + 1
+
+
+def test_fragments_are_costed_like_inline_selections():
+    inline = "{ getCanteenOrders(canteenId: 1) { id items { id } } }"
+    spread = "query { getCanteenOrders(canteenId: 1) { ...F } } fragment F on OrderType { id items { id } }"
+    assert _cost(inline) == _cost(spread) == 1000 * (1 + 5)
+
+
+def test_operation_name_selects_the_costed_operation():
+    document = parse("query Cheap { getCurrentUser { id } } query Dear { getMenuItems { id } }")
+    assert operation_cost(GRAPHQL_SCHEMA, document, "Cheap") == ("Cheap", 1)
+    assert operation_cost(GRAPHQL_SCHEMA, document, "Dear") == ("Dear", 300)
+
+
+# ---------------------------------------------------------------------------
+# QueryCostLimiter
+# ---------------------------------------------------------------------------
+
+def _request(ip: str = "10.0.0.1") -> Request:
+    return Request({"type": "http", "headers": [], "client": (ip, 1234)})
+
+
+def _run(limiter: QueryCostLimiter, query: str, variables: dict = None, request=None):
+    """Runs the limiter's on_execute up to the point where execution would start."""
+    context = SimpleNamespace(
+        schema=schema,
+        graphql_document=parse(query),
+        operation_name=None,
+        variables=variables,
+        context={"request": request} if request is not None else {},
+        result=None,
+    )
+    limiter.execution_context = context
+
+    async def drive():
+        hook = limiter.on_execute()
+        await hook.__anext__()
+        await hook.aclose()
+
+    asyncio.run(drive())
+    return context.result
+
+
+@pytest.fixture
+def bucket(monkeypatch):
+    """A fresh in-memory rate limiter that practically never refills."""
+    limiter = rate_limit.RateLimiter(rate_limit.MemoryBucketStore(), capacity=10, rate=0.001)
+    monkeypatch.setattr(rate_limit, "limiter", limiter)
+    monkeypatch.setattr(query_cost, "RATE_LIMIT_ENABLED", True)
+    return limiter
+
+
+def test_cheap_operation_runs(bucket):
+    limiter = QueryCostLimiter(limit=100, throttle_threshold=50)
+    assert _run(limiter, "{ getCurrentUser { id } }", request=_request()) is None
+    assert limiter.stats()["rejected"] == 0
+
+
+def test_operation_over_the_limit_is_rejected(bucket):
+    limiter = QueryCostLimiter(limit=100, throttle_threshold=50)
+    result = _run(limiter, "{ getMenuItems { id } }", request=_request())
+
+    assert result is not None and result.data is None
+    error = result.errors[0]
+    assert error.extensions == {"code": "QUERY_TOO_EXPENSIVE", "cost": 300, "limit": 100}
+    assert limiter.stats()["rejected"] == 1
+    # Rejection does not spend rate-limit tokens.
+    assert bucket.limited == 0
+
+
+def test_page_size_variable_pushes_operation_over_the_limit(bucket):
+    limiter = QueryCostLimiter(limit=100, throttle_threshold=100)
+    query = "query Q($m: Int) { getCanteenDetail(canteenId: 1, menuLimit: $m) { menuItems { id } } }"
+
+    assert _run(limiter, query, {"m": 50}, request=_request()) is None
+    result = _run(limiter, query, {"m": 500}, request=_request())
+    assert result.errors[0].extensions["code"] == "QUERY_TOO_EXPENSIVE"
+    assert result.errors[0].extensions["cost"] == 505
+
+
+def test_operation_over_the_threshold_spends_extra_tokens_until_throttled(bucket):
+    # getMenuItems { id } costs 300: (300 - 100) / 50 = 4 tokens of a 10-token bucket.
+    limiter = QueryCostLimiter(limit=1000, throttle_threshold=100, cost_per_token=50)
+    query = "{ getMenuItems { id } }"
+
+    assert _run(limiter, query, request=_request()) is None
+    assert _run(limiter, query, request=_request()) is None
+    result = _run(limiter, query, request=_request())
+
+    assert result.data is None
+    assert result.errors[0].extensions["code"] == "RATE_LIMITED"
+    assert result.errors[0].extensions["retryAfter"] >= 0
+    assert limiter.stats()["throttled"] == 1
+    # Other clients have their own buckets.
+    assert _run(limiter, query, request=_request("10.0.0.2")) is None
+
+
+def test_operation_under_the_threshold_spends_no_tokens(bucket):
+    limiter = QueryCostLimiter(limit=1000, throttle_threshold=400, cost_per_token=1)
+    for _ in range(20):
+        assert _run(limiter, "{ getMenuItems { id } }", request=_request()) is None
+    assert bucket.limited == 0
+
+
+def test_costliest_operations_are_tracked(bucket):
+    limiter = QueryCostLimiter(limit=100_000, throttle_threshold=100_000, top_size=2)
+    _run(limiter, "query A { getCurrentUser { id } }")
+    _run(limiter, "query B { getMenuItems { id } }")
+    _run(limiter, "query C { getAllCanteens { id } }")
+
+    assert limiter.stats()["costliest"] == [
+        {"operation": "B", "cost": 300},
+        {"operation": "C", "cost": 20},
+    ]
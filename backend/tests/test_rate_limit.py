@@ -0,0 +1,122 @@
+"""Rate-limit client keys, and that the limiter rejects floods before AuthMiddleware's user lookup."""
+import asyncio
+import ipaddress
+from datetime import timedelta
+from unittest import mock
+
+import pytest
+import sqlalchemy
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from starlette.requests import Request
+
+from app.helpers import middleware, rate_limit
+from app.helpers.auth_utils import _create_token
+from app.helpers.middleware import AuthMiddleware, RateLimitMiddleware
+from app.helpers.rate_limit import ConcurrencyGate, MemoryBucketStore, RateLimiter, client_key
+
+QUERY = b'{"query": "{ getCurrentUser { id } }"}'
+
+
+def _token(typ: str = "access", sub: str = "user-1") -> str:
+    return _create_token({"sub": sub, "role": "student", "typ": typ}, timedelta(minutes=5))
+
+
+def _headers(cookie: str = None, real_ip: str = None) -> list:
+    headers = [(b"content-type", b"application/json")]
+    if cookie:
+        headers.append((b"cookie", f"access_token={cookie}".encode()))
+    if real_ip:
+        headers.append((b"x-real-ip", real_ip.encode()))
+    return headers
+
+
+def _request(peer: str = "10.0.0.1", **kwargs) -> Request:
+    return Request({"type": "http", "headers": _headers(**kwargs), "client": (peer, 1234)})
+
+
+def test_signed_in_clients_are_keyed_by_token_subject():
+    assert client_key(_request(cookie=_token())) == "user:user-1"
+    # Refresh tokens and garbage fall back to the address.
+    assert client_key(_request(cookie=_token("refresh"))) == "ip:10.0.0.1"
+    assert client_key(_request(cookie="not-a-jwt")) == "ip:10.0.0.1"
+
+
+def test_x_real_ip_is_ignored_unless_the_peer_is_a_trusted_proxy(monkeypatch):
+    assert client_key(_request(real_ip="203.0.113.9")) == "ip:10.0.0.1"
+
+    monkeypatch.setattr(rate_limit, "trusted_proxies", [ipaddress.ip_network("172.18.0.0/16")])
+    assert client_key(_request(peer="172.18.0.5", real_ip="203.0.113.9")) == "ip:203.0.113.9"
+    assert client_key(_request(peer="10.0.0.1", real_ip="203.0.113.9")) == "ip:10.0.0.1"
+
+
+def test_main_app_runs_the_limiter_outside_authentication():
+    with mock.patch.object(sqlalchemy.MetaData, "create_all"):
+        from app.main import app
+
+    order = [m.cls for m in app.user_middleware]  # outermost first
+    assert order.index(RateLimitMiddleware) < order.index(AuthMiddleware)
+
+
+# ---------------------------------------------------------------------------
+# Middleware stack
+# ---------------------------------------------------------------------------
+
+async def _call(app, headers) -> int:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": "/api/graphql", "raw_path": b"/api/graphql", "query_string": b"",
+        "root_path": "", "headers": headers, "client": ("10.0.0.1", 50000), "server": ("testserver", 80),
+    }
+    delivered = False
+    status = 0
+
+    async def receive():
+        nonlocal delivered
+        if not delivered:
+            delivered = True
+            return {"type": "http.request", "body": QUERY, "more_body": False}
+        await asyncio.sleep(3600)
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+@pytest.fixture
+def user_lookups(monkeypatch):
+    """Counts AuthMiddleware's database sessions (each one is a user lookup)."""
+    lookups = []
+
+    def fake_get_db():
+        lookups.append(1)
+        yield mock.MagicMock(**{"query.return_value.filter.return_value.first.return_value": None})
+
+    monkeypatch.setattr(middleware, "get_db", fake_get_db)
+    return lookups
+
+
+def test_rate_limited_requests_never_reach_the_user_lookup(user_lookups):
+    app = FastAPI()
+
+    @app.post("/api/graphql")
+    async def graphql_endpoint():
+        return JSONResponse({"data": {}})
+
+    # Same order as app.main: AuthMiddleware first, so the limiter wraps it.
+    app.add_middleware(AuthMiddleware)
+    app.add_middleware(
+        RateLimitMiddleware,
+        limiter=RateLimiter(MemoryBucketStore(), capacity=2, rate=0.001),
+        gate=ConcurrencyGate(limit=4, max_queued=4, queue_timeout=0.1),
+    )
+
+    async def burst():
+        return [await _call(app, _headers(cookie=_token())) for _ in range(5)]
+
+    assert asyncio.run(burst()) == [200, 200, 429, 429, 429]
+    assert len(user_lookups) == 2
@@ -0,0 +1,69 @@
+"""Settlement rows against payment records, without a database."""
+import csv
+import io
+
+from app.helpers.reconciliation import (
+    AMOUNT_MISMATCH, NOT_CAPTURED, PAYMENT_ID_MISMATCH, REFUND_NOT_RECORDED, SETTLEMENT_COLUMNS, UNKNOWN_PAYMENT,
+    PaymentRecord, iter_settlement_rows, reconcile,
+)
+from bench.reconciliation import InMemoryPaymentLookup, fake_records, generate_settlement
+
+RECORDS = [
+    PaymentRecord(1, "order_1", "pay_1", 10_000, "completed"),
+    PaymentRecord(2, "order_2", None, 5_000, "pending"),
+    PaymentRecord(3, "order_3", "pay_3", 7_000, "completed"),
+    PaymentRecord(4, "order_4", "pay_4", 2_500, "completed"),
+    PaymentRecord(5, "order_5", "pay_5", 4_000, "completed"),
+]
+SETTLEMENT = [
+    ["pay_1", "payment", "order_1", 10_000],
+    ["pay_2", "payment", "order_2", 5_000],
+    ["pay_3", "payment", "order_3", 7_100],
+    ["pay_4", "payment", "order_4", 2_500],
+    ["rfnd_4", "refund", "order_4", 2_500],
+    ["pay_other", "payment", "order_5", 4_000],
+    ["pay_x", "payment", "order_x", 900],
+]
+
+
+def _run(rows, records, chunk_size=2):
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(SETTLEMENT_COLUMNS)
+    for entity_id, kind, order_id, amount in rows:
+        writer.writerow([entity_id, kind, order_id, amount, 0, 0, "setl_1", "2026-10-01T00:00:00+00:00"])
+    out.seek(0)
+    report = io.StringIO()
+    summary = reconcile(iter_settlement_rows(out), InMemoryPaymentLookup(records), report=report,
+                        chunk_size=chunk_size)
+    return summary, list(csv.DictReader(io.StringIO(report.getvalue())))
+
+
+def test_each_kind_of_discrepancy_is_reported():
+    summary, report = _run(SETTLEMENT, RECORDS)
+
+    assert summary.rows == len(SETTLEMENT)
+    assert summary.matched == len(SETTLEMENT) - 1
+    assert dict(summary.discrepancies) == {
+        NOT_CAPTURED: 1, AMOUNT_MISMATCH: 1, REFUND_NOT_RECORDED: 1, PAYMENT_ID_MISMATCH: 1, UNKNOWN_PAYMENT: 1,
+    }
+    by_kind = {r["kind"]: r for r in report}
+    assert by_kind[AMOUNT_MISMATCH]["payment_id"] == "3"
+    assert (by_kind[AMOUNT_MISMATCH]["expected"], by_kind[AMOUNT_MISMATCH]["actual"]) == ("7000", "7100")
+    assert by_kind[UNKNOWN_PAYMENT]["razorpay_payment_id"] == "pay_x"
+    assert summary.fixed == 0
+
+
+def test_generated_settlement_reconciles_to_its_injected_discrepancies():
+    records = list(fake_records(3_000))
+    buf = io.StringIO()
+    written = generate_settlement(buf, records, discrepancy_rate=0.03)
+    buf.seek(0)
+
+    summary = reconcile(iter_settlement_rows(buf), InMemoryPaymentLookup(records), chunk_size=500)
+    injected = written - len(records)
+
+    assert summary.rows == written
+    assert summary.discrepancies[UNKNOWN_PAYMENT] + summary.discrepancies[REFUND_NOT_RECORDED] == injected
+    assert summary.discrepancies[AMOUNT_MISMATCH] > 0
+    assert NOT_CAPTURED not in summary.discrepancies
@@ -0,0 +1,93 @@
+"""Refund pipeline end to end on a disposable database: mock gateway and wallet refunds."""
+import pytest
+from sqlalchemy import text
+
+from app.helpers import wallet_ledger
+from app.helpers.refunds import drain_refunds, request_refunds
+from app.helpers.sales_rollups import rebuild_sales_rollups, record_order_created
+from app.models.order import Order
+from app.models.payment import Payment, PaymentMethod, PaymentStatus, RefundRequest, UserWallet, WalletTransaction
+from tests.factories import make_canteen, make_order, make_payment, make_user
+
+FLOAT_PAISE = 100_000
+
+
+def _rollups(db):
+    """Non-empty rollup rows; incremental updates leave zeroed rows that a rebuild does not."""
+    return {
+        (r.canteen_id, r.granularity, r.bucket_start, r.status, r.order_count,
+         round(r.gross_amount, 2), round(r.tax_amount, 2), round(r.refund_amount, 2))
+        for r in db.execute(text("SELECT * FROM canteen_sales_rollups"))
+        if r.order_count or r.gross_amount or r.tax_amount or r.refund_amount
+    }
+
+
+@pytest.fixture
+def paid_orders(db):
+    """Six confirmed orders of a synthetic buyer: three paid through the mock gateway, three from the wallet."""
+    owner = make_user(db, role="canteen")
+    canteen = make_canteen(db, owner)
+    buyer = make_user(db)
+    wallet = UserWallet(user_id=buyer.id, balance_paise=0)
+    db.add(wallet)
+    db.flush()
+    wallet_ledger.credit(db, wallet.id, FLOAT_PAISE, "Test top-up")
+
+    order_ids = []
+    for i in range(6):
+        order = make_order(db, buyer, canteen, total=100.0 + i, status="confirmed", payment_status="Paid")
+        record_order_created(db, order)
+        if i % 2:
+            payment = make_payment(db, order, method=PaymentMethod.WALLET, status=PaymentStatus.COMPLETED)
+            entry = wallet_ledger.debit(db, wallet.id, wallet_ledger.to_paise(order.total_amount),
+                                        f"Payment {payment.id}", payment_id=payment.id)
+            payment.transaction_id = f"wallet_txn_{entry.entry_id}"
+        else:
+            make_payment(db, order, status=PaymentStatus.COMPLETED,
+                         razorpay_order_id=f"order_test_{order.id}", razorpay_payment_id=f"pay_test_{order.id}")
+        order_ids.append(order.id)
+    db.commit()
+    return order_ids, wallet.id
+
+
+def test_cancelled_orders_are_refunded_through_gateway_and_wallet(db, paid_orders):
+    order_ids, wallet_id = paid_orders
+
+    result = request_refunds(db, order_ids, reason="Canteen closed early", requested_by="test")
+    db.commit()
+    assert (result.cancelled, result.refunds_requested) == (6, 6)
+    assert drain_refunds(db) == 6
+
+    db.expire_all()
+    assert {r.status for r in db.query(RefundRequest)} == {"succeeded"}
+    assert {p.payment_status for p in db.query(Payment)} == {PaymentStatus.REFUNDED}
+    assert {(o.status, o.payment_status) for o in db.query(Order)} == {("cancelled", "Refunded")}
+    # Every wallet payment came back through one refund ledger entry.
+    assert db.get(UserWallet, wallet_id).balance_paise == FLOAT_PAISE
+    refunds = db.query(WalletTransaction).filter_by(wallet_id=wallet_id, kind=wallet_ledger.REFUND).all()
+    assert sorted(t.amount_paise for t in refunds) == [10_100, 10_300, 10_500]
+
+
+def test_refunding_again_changes_nothing(db, paid_orders):
+    order_ids, wallet_id = paid_orders
+    request_refunds(db, order_ids)
+    db.commit()
+    drain_refunds(db)
+
+    again = request_refunds(db, order_ids)
+    db.commit()
+    assert (again.cancelled, again.refunds_requested) == (0, 0)
+    assert drain_refunds(db) == 0
+    db.expire_all()
+    assert db.get(UserWallet, wallet_id).balance_paise == FLOAT_PAISE
+
+
+def test_incremental_rollups_match_a_rebuild(db, paid_orders):
+    order_ids, _ = paid_orders
+    request_refunds(db, order_ids[:4])
+    db.commit()
+    drain_refunds(db)
+
+    incremental = _rollups(db)
+    rebuild_sales_rollups(db)
+    assert _rollups(db) == incremental
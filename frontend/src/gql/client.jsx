@@ -1,4 +1,7 @@
-import { ApolloClient, InMemoryCache, ApolloProvider } from '@apollo/client';
+import { ApolloClient, InMemoryCache, ApolloProvider, HttpLink, split } from '@apollo/client';
+import { BatchHttpLink } from '@apollo/client/link/batch-http';
+import { createPersistedQueryLink } from '@apollo/client/link/persisted-queries';
+import { getMainDefinition } from '@apollo/client/utilities';
 
 // Get API URL from environment variables
 // Vite exposes env variables that start with VITE_ prefix
@@ -9,10 +12,68 @@ const GRAPHQL_ENDPOINT = import.meta.env.VITE_GRAPHQL_ENDPOINT || '/api/graphql'
 // If API_URL is empty, it will use relative path (useful when served from same origin)
 const graphqlUri = API_URL ? `${API_URL}${GRAPHQL_ENDPOINT}` : GRAPHQL_ENDPOINT;
 
-const client = new ApolloClient({
+const httpLink = new HttpLink({
     uri: graphqlUri,
-    cache: new InMemoryCache(),
     credentials: 'include', // Include cookies for authentication
+});
+
+// Operations issued within a few milliseconds of each other (e.g. everything
+// the app asks for on launch) go out as one POST. The backend runs them with
+// one auth lookup and one DB session; keep batchMax at or below its
+// GRAPHQL_BATCH_MAX_OPERATIONS.
+const batchLink = new BatchHttpLink({
+    uri: graphqlUri,
+    credentials: 'include',
+    batchInterval: 10,
+    batchMax: 10,
+});
+
+// Root fields whose results are the same for every user; mirrors
+// PUBLIC_QUERY_FIELDS in backend/app/helpers/persisted_queries.py. Queries
+// that select only these stay single GETs so nginx and the browser can cache them.
+const PUBLIC_QUERY_FIELDS = new Set([
+    'getAllCanteens',
+    'getCanteenById',
+    'getOpenCanteens',
+    'searchCanteens',
+    'getMenuItems',
+    'getMenuItemsByCanteen',
+    'getFeaturedMenuItems',
+    'getPopularMenuItems',
+    'searchMenuItems',
+]);
+
+const isPublicQuery = ({ query }) => {
+    const definition = getMainDefinition(query);
+    return definition.kind === 'OperationDefinition'
+        && definition.operation === 'query'
+        && definition.selectionSet.selections.every(
+            (selection) => selection.kind === 'Field' && PUBLIC_QUERY_FIELDS.has(selection.name.value),
+        );
+};
+
+// Send sha256 hashes instead of full documents (persisted queries). The backend
+// knows every document in src/gql from its deploy-time manifest and learns any
+// other on first use. Public queries go out as GET so nginx can cache them.
+// Web Crypto is only available in secure contexts (https or localhost).
+const sha256 = async (text) => {
+    const digest = await crypto.subtle.digest('SHA-256', new TextEncoder().encode(text));
+    return Array.from(new Uint8Array(digest), (b) => b.toString(16).padStart(2, '0')).join('');
+};
+
+const withPersistedQueries = (options, terminal) => (globalThis.crypto?.subtle
+    ? createPersistedQueryLink({ sha256, ...options }).concat(terminal)
+    : terminal);
+
+const link = split(
+    isPublicQuery,
+    withPersistedQueries({ useGETForHashedQueries: true }, httpLink),
+    withPersistedQueries({}, batchLink),
+);
+
+const client = new ApolloClient({
+    link,
+    cache: new InMemoryCache(),
     defaultOptions: {
         watchQuery: {
             fetchPolicy: 'cache-and-network',